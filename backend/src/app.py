@@ -1,4 +1,6 @@
+import time, uuid
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from mangum import Mangum
 
@@ -11,19 +13,28 @@ from .controllers.contrib_controller import router as contrib_router
 from .controllers.config_controller import router as config_router
 from .controllers.log_controller import router as log_router
 from .controllers.metrics_controller import router as metrics_router
+from .controllers.analytics_controller import router as analytics_router
+from .controllers.profile_controller import router as profile_router
+from .controllers.tiles_controller import router as tiles_router
+from .controllers.search_controller import router as search_router
+from .controllers.ask_controller import router as ask_router
 from .controllers import poi_docs_controller
+from .infra import admission, metrics, profiling
+from .utils import http_cache
+from .infra.settings import get_settings
+from starlette.concurrency import run_in_threadpool
 
 # ====== DEBUG POI_DOCS ROUTE ======
 from fastapi import APIRouter
 from bson import ObjectId
-from .infra.db import poi_docs
+from .infra import db_async
 
-debug_router = APIRouter()
+debug_router = APIRouter(route_class=profiling.SampledRoute)
 
 @debug_router.get("/debug/poi_docs/{poi_id}")
 async def debug_poi_docs(poi_id: str):
     oid = ObjectId(poi_id)
-    docs = list(poi_docs.find({"poi_id": oid}, {"_id": 0}))
+    docs = await db_async.poi_docs.find({"poi_id": oid}, {"_id": 0}).to_list()
     return {"count": len(docs), "docs": docs}
 # ==================================
 
@@ -44,9 +55,29 @@ app = FastAPI(title="GeoGuide API", version="1.0.0")
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"], allow_methods=["*"], allow_headers=["*"], allow_credentials=False
+    allow_origins=["*"], allow_methods=["*"], allow_headers=["*"], allow_credentials=False,
+    expose_headers=["X-Next-Cursor", "X-Degraded", "X-Tile-Truncated"],
 )
 
+@app.middleware("http")
+async def rate_limit(req: Request, call_next):
+    route_class, cost = admission.classify(req.method, req.url.path, req.query_params)
+    s = get_settings()
+    if route_class and s.RATE_LIMIT_ENABLED:
+        client = admission.client_key(req.headers, req.client.host if req.client else None,
+                                      s.RATE_TRUSTED_PROXY_HOPS)
+        wait = admission.rate_limiter().take(route_class, client, cost)
+        if wait:
+            metrics.ADMISSION_REJECTED.labels("rate", route_class).inc()
+            return JSONResponse({"detail": "Too many requests"}, status_code=429,
+                                headers={"Retry-After": str(max(1, int(wait + 0.999)))})
+    return await call_next(req)
+
+@app.exception_handler(admission.Overloaded)
+async def overloaded(req: Request, e: admission.Overloaded):
+    return JSONResponse({"detail": "Service overloaded, retry later", "reason": e.reason}, status_code=429,
+                        headers={"Retry-After": str(e.retry_after)})
+
 @app.middleware("http")
 async def security_headers(req: Request, call_next):
     resp = await call_next(req)
@@ -56,6 +87,86 @@ async def security_headers(req: Request, call_next):
     resp.headers["X-Content-Type-Options"] = "nosniff"
     return resp
 
+@app.middleware("http")
+async def conditional_get(req: Request, call_next):
+    resp = await call_next(req)
+    if req.method not in ("GET", "HEAD") or resp.status_code != 200:
+        return resp
+    if http_cache.response_is_fresh(req.headers, resp.headers):
+        return http_cache.not_modified_from(resp)
+    return await http_cache.maybe_compress(req.headers, resp)
+
+@app.middleware("http")
+async def prometheus_metrics(req: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        resp = await call_next(req)
+        status = resp.status_code
+        return resp
+    finally:
+        route = req.scope.get("route")
+        metrics.observe_request(getattr(route, "path", "unmatched"), req.method, status, time.perf_counter() - t0)
+
+@app.middleware("http")
+async def request_profiler(req: Request, call_next):
+    if not profiling.should_profile(req.headers.get("x-profile")):
+        return await call_next(req)
+    # _id sempre generato qui: X-Request-Id viene dal client e potrebbe sovrascrivere un profilo altrui
+    rid = uuid.uuid4().hex
+    p = profiling.Profile(rid, f"{req.method} {req.url.path}")
+    tok = profiling.activate(p)
+    p.start(sample=False)       # si agganciano l'handler (SampledRoute) e i job nei pool di thread
+    try:
+        resp = await call_next(req)
+    finally:
+        p.stop()
+        profiling.deactivate(tok)
+    try:
+        from .models import request_profile
+        await run_in_threadpool(request_profile.save, p, req.headers.get("x-request-id"))
+        resp.headers["X-Profile-Id"] = rid
+    except Exception:
+        logging.exception("[profile] save failed for %s", rid)
+    return resp
+
+@app.on_event("startup")
+def watch_app_config():
+    from .infra.settings import config_store
+    config_store().current()    # prima versione prima del traffico: dopo i poll non bloccano il loop
+    config_store().start_watch()
+
+@app.on_event("startup")
+def warm_name_index():
+    # su Lambda l'indice si costruisce alla prima ricerca, non a ogni cold start
+    import os, threading
+    from .services import name_search
+    if not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        threading.Thread(target=name_search.warm, name="name-index-warm", daemon=True).start()
+
+@app.on_event("startup")
+async def start_area_refresher():
+    # su Lambda niente task di lunga durata: il refresh gira come job schedulato
+    import asyncio, os
+    from .services import refresher
+    if not os.getenv("AWS_LAMBDA_FUNCTION_NAME") and get_settings().REFRESH_ENABLED:
+        app.state.area_refresher = asyncio.create_task(refresher.loop(), name="area-refresher")
+
+@app.on_event("shutdown")
+async def stop_area_refresher():
+    task = getattr(app.state, "area_refresher", None)
+    if task is not None:
+        task.cancel()
+
+@app.on_event("shutdown")
+def flush_usage_logs():
+    from .models import usage_log, user
+    from .infra.settings import config_store
+    config_store().stop_watch()
+    usage_log.flush()
+    user.flush()
+    metrics.maybe_push(force=True)
+
 # mount routers con prefix /v1
 app.include_router(health_router,    prefix="/v1")
 app.include_router(auth_router,      prefix="/v1")
@@ -65,6 +176,20 @@ app.include_router(contrib_router,   prefix="/v1")
 app.include_router(config_router,    prefix="/v1")
 app.include_router(log_router,       prefix="/v1")
 app.include_router(metrics_router,   prefix="/v1")
+app.include_router(analytics_router, prefix="/v1")
+app.include_router(profile_router,   prefix="/v1")
+app.include_router(tiles_router,     prefix="/v1")
+app.include_router(search_router,    prefix="/v1")
+app.include_router(ask_router,       prefix="/v1")
 app.include_router(debug_router,     prefix="/v1")  # <== aggiunto qui
 app.include_router(poi_docs_controller.router, prefix="/v1")
-handler = Mangum(app)
\ No newline at end of file
+
+_asgi_handler = Mangum(app)
+
+def handler(event, context):
+    # push su Lambda a invocazione conclusa, fuori dall'event loop e dal percorso della richiesta
+    try:
+        return _asgi_handler(event, context)
+    finally:
+        if metrics.should_push():
+            metrics.maybe_push()
\ No newline at end of file
@@ -0,0 +1,37 @@
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query
+from ..models import usage_rollup, usage_log
+from ..utils.jsonresp import stream_page
+from ..infra.profiling import SampledRoute
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"], route_class=SampledRoute)
+
+def _gran(g: str) -> str:
+    if g not in ("m", "h"):
+        raise HTTPException(status_code=400, detail="gran must be 'm' or 'h'")
+    return g
+
+@router.get("/usage")
+def usage_summary(gran: str = "h", since: datetime | None = None, until: datetime | None = None,
+                  event: str | None = None):
+    """Totali, breakdown platform/network e percentili di latenza sull'intervallo."""
+    return usage_rollup.summary(_gran(gran), since, until, event)
+
+@router.get("/usage/series")
+def usage_series(gran: str = "h", since: datetime | None = None, until: datetime | None = None,
+                 event: str | None = None):
+    return {"items": usage_rollup.series(_gran(gran), since, until, event)}
+
+@router.get("/top-pois")
+def top_pois(since: datetime | None = None, until: datetime | None = None,
+             limit: int = Query(default=10, ge=1, le=100)):
+    return {"items": usage_rollup.top_pois(since, until, limit)}
+
+
+@router.get("/events")
+def events(session_id: str | None = None, user_hash: str | None = None,
+           limit: int = Query(default=200, ge=1, le=1000), cursor: str | None = None):
+    """Eventi grezzi di una sessione o di un utente dal più recente; `next` va ripassato come `cursor`."""
+    if not (session_id or user_hash):
+        raise HTTPException(status_code=400, detail="session_id or user_hash required")
+    return stream_page(usage_log.page(session_id=session_id, user_hash=user_hash, limit=limit, cursor=cursor))
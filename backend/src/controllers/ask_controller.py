@@ -0,0 +1,39 @@
+# controllers/ask_controller.py
+"""
+POST /poi/{poi_id}/ask: risponde a una domanda sul POI a partire dai soli
+passaggi più pertinenti dei suoi poi_docs (BM25 locale, services/passages).
+"""
+from datetime import datetime, timezone
+from fastapi import APIRouter, Body, HTTPException
+from ..infra import admission, aio
+from ..models import poi as poi_model
+from ..services.narration_service import answer
+from ..utils.validators import oid
+from ..infra.profiling import SampledRoute
+
+router = APIRouter(tags=["Narration"], route_class=SampledRoute)
+
+
+@router.post("/poi/{poi_id}/ask")
+async def ask_poi(poi_id: str, payload: dict = Body(...)):
+    oid(poi_id)
+    question = " ".join(str(payload.get("question") or "").split())
+    if not 3 <= len(question) <= 300:
+        raise HTTPException(status_code=400, detail="question must be 3-300 characters")
+    lang = (payload.get("lang") or "it").lower()
+
+    p = await aio.run(poi_model.get, poi_id)
+    if not p:
+        raise HTTPException(status_code=404, detail="POI not found")
+
+    with admission.priority(admission.NORMAL):
+        out = await answer(p, question, lang)
+
+    try:
+        from ..models import usage_log as ulog
+        await ulog.log_async({"event": "poi.ask", "ts": datetime.now(timezone.utc), "poi_id": poi_id, "lang": lang,
+                              "passages": len(out["passages"])})
+    except Exception:
+        pass
+
+    return {"poi_id": poi_id, "lang": lang, "question": question, **out}
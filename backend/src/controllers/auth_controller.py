@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Request
-from jose import jwt, JWTError
-import httpx, urllib.parse as urlparse
+from fastapi import APIRouter, Header, HTTPException, Request
+import httpx, logging, urllib.parse as urlparse
 from ..infra.settings import get_settings
 from ..models.schemas import AuthTokens
 from ..models import user as user_model
+from ..infra.metrics import outbound
+from ..infra import oidc
+from ..infra.profiling import SampledRoute, run_in_threadpool
 
-router = APIRouter(prefix="/auth", tags=["Auth"])
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/auth", tags=["Auth"], route_class=SampledRoute)
 
 @router.post("/login")
 def auth_login(payload: dict):
@@ -42,18 +45,22 @@ async def auth_callback(payload: dict):
         "redirect_uri": redirect_uri,
         "code_verifier": code_verifier,
     }
-    async with httpx.AsyncClient(timeout=10) as hx:
-        r = await hx.post(token_url, data=data, headers={"Content-Type": "application/x-www-form-urlencoded"})
-        if r.status_code != 200:
-            raise HTTPException(r.status_code, f"OIDC token error: {r.text}")
-        tokens = r.json()
+    with outbound("oidc") as o:
+        async with httpx.AsyncClient(timeout=10) as hx:
+            r = await hx.post(token_url, data=data, headers={"Content-Type": "application/x-www-form-urlencoded"})
+            o.status = r.status_code
+    if r.status_code != 200:
+        raise HTTPException(r.status_code, f"OIDC token error: {r.text}")
+    tokens = r.json()
 
-    # Decodifica soft (MVP). In prod valida via JWKS.
+    # token appena ricevuto dall'IdP: verifica JWKS (mette anche in cache i claims).
+    # Col key set freddo o ruotato verify scarica il JWKS (httpx sincrono) e su Lambda
+    # il write-behind scrive inline: entrambi fuori dall'event loop
     try:
-        claims = jwt.get_unverified_claims(tokens.get("id_token") or tokens.get("access_token"))
-        user_model.upsert_from_claims(claims)  # salva/aggiorna utente
-    except JWTError:
-        pass
+        claims = await run_in_threadpool(oidc.verify, tokens.get("id_token") or tokens.get("access_token"))
+        await run_in_threadpool(user_model.sync_from_claims, claims)  # write-behind, solo se cambiato
+    except oidc.TokenError as e:
+        logger.warning("[auth] token dall'IdP non verificabile: %s", e)
 
     return {
         "access_token": tokens.get("access_token"),
@@ -64,16 +71,15 @@ async def auth_callback(payload: dict):
     }
 
 @router.get("/me")
-def me(authorization: str | None = None):
+def me(authorization: str | None = Header(default=None)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing token")
     token = authorization[7:]
     try:
-        claims = jwt.get_unverified_claims(token)  # TODO: JWKS verify in prod
-    except JWTError:
+        claims = oidc.verify(token)  # LRU per token: la firma si verifica una volta sola
+    except oidc.TokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
-    # opzionale: sync utente ad ogni chiamata
-    user_model.upsert_from_claims(claims)
+    user_model.sync_from_claims(claims)
     return {"sub": claims.get("sub"), "claims": claims}
 
 @router.post("/logout", status_code=204)
@@ -1,14 +1,17 @@
-from fastapi import APIRouter
-from ..models import app_config as appcfg_model
+from fastapi import APIRouter, Request, Response
+from ..infra.settings import config_store
+from ..utils import http_cache
+from ..infra.profiling import SampledRoute
 
-router = APIRouter(tags=["Config"])
+router = APIRouter(tags=["Config"], route_class=SampledRoute)
 
 @router.get("/config")
-def get_config():
-    doc = appcfg_model.get_latest() or {}
-    if not doc: return {}
-    d = {**doc}
-    d["_id"] = str(d["_id"])
-    if d.get("updated_at") and hasattr(d["updated_at"], "isoformat"):
-        d["updated_at"] = d["updated_at"].isoformat()
-    return d
\ No newline at end of file
+def get_config(request: Request):
+    """Servito dalla copia in memoria (già serializzata), aggiornata da config_store."""
+    snap = config_store().current()
+    if not snap.doc:
+        return {}
+    lm = snap.doc.get("updated_at")
+    if nm := http_cache.not_modified(request, snap.etag, lm):
+        return nm
+    return Response(snap.body, media_type="application/json", headers=http_cache.headers_for(snap.etag, lm))
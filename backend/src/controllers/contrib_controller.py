@@ -1,9 +1,12 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query, Request, Response
 from ..models.schemas import ContribPostRequest, ContribItem
 from ..utils.validators import oid, ensure_locale
 from ..models import user_contrib as contrib_model
+from ..utils import http_cache
+from ..utils.jsonresp import stream_page
+from ..infra.profiling import SampledRoute
 
-router = APIRouter(prefix="/contrib", tags=["Contrib"])
+router = APIRouter(prefix="/contrib", tags=["Contrib"], route_class=SampledRoute)
 
 @router.post("", response_model=ContribItem, status_code=201)
 def post_contrib(req: ContribPostRequest):
@@ -14,17 +17,31 @@ def post_contrib(req: ContribPostRequest):
         "text": doc["text"], "status": doc["status"], "created_at": doc["created_at"].isoformat()
     }
 
+def _item(c):
+    return {
+        "_id": str(c["_id"]), "poi_id": str(c["poi_id"]), "lang": c["lang"],
+        "text": c["text"], "status": c["status"],
+        "created_at": c["created_at"].isoformat(),
+        "updated_at": c.get("updated_at") and c["updated_at"].isoformat()
+    }
+
+@router.get("")
+def moderation_queue(status: str = "pending", limit: int = Query(default=50, ge=1, le=500),
+                     cursor: str | None = None):
+    """Contributi per stato (indice status_created_id), in streaming a pagine keyset."""
+    return stream_page(contrib_model.page_by_status(status, limit, cursor), _item)
+
 @router.get("/{poi_id}")
-def list_contrib(poi_id: str, status: str | None = None):
-    items = []
-    for c in contrib_model.list_for_poi(oid(poi_id), status=status):
-        items.append({
-            "_id": str(c["_id"]), "poi_id": str(c["poi_id"]), "lang": c["lang"],
-            "text": c["text"], "status": c["status"],
-            "created_at": c["created_at"].isoformat(),
-            "updated_at": c.get("updated_at") and c["updated_at"].isoformat()
-        })
-    return {"items": items}
+def list_contrib(poi_id: str, request: Request, response: Response, status: str | None = None,
+                 limit: int = Query(default=100, ge=1, le=100), cursor: str | None = None):
+    page = contrib_model.page_for_poi(oid(poi_id), status=status, limit=limit, cursor=cursor)
+    rows = list(page)
+    etag = http_cache.etag_for(rows, status, cursor, page.next)
+    lm = http_cache.last_modified_of(rows)
+    if nm := http_cache.not_modified(request, etag, lm):
+        return nm
+    response.headers.update(http_cache.headers_for(etag, lm))
+    return {"items": [_item(c) for c in rows], "next": page.next}
 
 @router.patch("/{id}", response_model=ContribItem)
 def moderate(id: str, payload: dict = Body(...)):
@@ -33,9 +50,4 @@ def moderate(id: str, payload: dict = Body(...)):
         raise HTTPException(status_code=400, detail="Invalid status")
     upd = contrib_model.moderate(id, status)
     if not upd: raise HTTPException(status_code=404, detail="Not found")
-    return {
-        "_id": str(upd["_id"]), "poi_id": str(upd["poi_id"]), "lang": upd["lang"],
-        "text": upd["text"], "status": upd["status"],
-        "created_at": upd["created_at"].isoformat(),
-        "updated_at": upd.get("updated_at") and upd["updated_at"].isoformat()
-    }
\ No newline at end of file
+    return _item(upd)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
-router = APIRouter(tags=["System"])
+from ..infra.profiling import SampledRoute
+router = APIRouter(tags=["System"], route_class=SampledRoute)
 
 @router.get("/health")
 def health():
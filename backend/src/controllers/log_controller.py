@@ -1,10 +1,44 @@
-from fastapi import APIRouter
+import gzip, io, json
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
 from ..models.schemas import UsageLogEvent
 from ..models import usage_log as ulog_model
+from ..infra.settings import get_settings
+from ..infra.profiling import SampledRoute, run_in_threadpool
 
-router = APIRouter(prefix="/log", tags=["Logging"])
+router = APIRouter(prefix="/log", tags=["Logging"], route_class=SampledRoute)
+
+_BATCH = TypeAdapter(list[UsageLogEvent])
+_MAX_BODY = 2 * 1024 * 1024  # limite dopo decompressione (anti gzip-bomb)
+
+def _busy():
+    raise HTTPException(status_code=429, detail="Log buffer full", headers={"Retry-After": "2"})
 
 @router.post("", status_code=204)
 def post_log(evt: UsageLogEvent):
-    ulog_model.log(evt.model_dump())
-    return
\ No newline at end of file
+    if not ulog_model.log_many([evt.model_dump()]):
+        _busy()
+    return
+
+@router.post("/batch", status_code=202)
+async def post_log_batch(req: Request):
+    """Array di UsageLogEvent, opzionalmente con `Content-Encoding: gzip`."""
+    raw = await req.body()
+    if "gzip" in (req.headers.get("content-encoding") or "").lower():
+        try:
+            with gzip.GzipFile(fileobj=io.BytesIO(raw)) as gz:
+                raw = gz.read(_MAX_BODY + 1)
+        except (OSError, EOFError):
+            raise HTTPException(status_code=400, detail="Invalid gzip body")
+    if len(raw) > _MAX_BODY:
+        raise HTTPException(status_code=413, detail="Batch too large")
+    try:
+        events = _BATCH.validate_python(json.loads(raw or b"[]"))
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=str(e)[:500])
+    if len(events) > get_settings().LOG_BATCH_MAX_EVENTS:
+        raise HTTPException(status_code=413, detail="Too many events")
+    # offer può attendere il flusher (o scrivere inline su Lambda): fuori dall'event loop
+    if not await run_in_threadpool(ulog_model.log_many, [e.model_dump() for e in events]):
+        _busy()
+    return {"accepted": len(events)}
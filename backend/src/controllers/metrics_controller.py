@@ -1,12 +1,10 @@
 from fastapi import APIRouter, Response
-from prometheus_client import CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest, Counter
+from prometheus_client import CONTENT_TYPE_LATEST
+from ..infra import metrics as m
+from ..infra.profiling import SampledRoute
 
-router = APIRouter(tags=["System"])
-
-# metrica semplice (esempio)
-REQS = Counter("geoguide_requests_total", "Totale richieste (sample)", ["endpoint"])
+router = APIRouter(tags=["System"], route_class=SampledRoute)
 
 @router.get("/metrics")
 def metrics():
-    data = generate_latest()  # default registry
-    return Response(content=data, media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
+    return Response(content=m.render(), media_type=CONTENT_TYPE_LATEST)
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response
 from bson import ObjectId
 from datetime import datetime, timezone
 from ..models import poi as poi_model
-from ..services.narration_service import generate as narr_generate
+from ..services.narration_service import generate as narr_generate, get_cached, _normalize_style
+from ..utils import http_cache
+from ..infra import admission, aio
+from ..utils.validators import oid, ensure_locale
+from ..infra.profiling import SampledRoute
 
-router = APIRouter(prefix="/narration", tags=["narration"])
+router = APIRouter(prefix="/narration", tags=["narration"], route_class=SampledRoute)
 
 @router.post("")
 async def create_narration(
@@ -21,24 +25,47 @@ async def create_narration(
     except Exception:
         raise HTTPException(status_code=400, detail="invalid poi_id")
 
-    p = poi_model.get(poi_id)
+    p = await aio.run(poi_model.get, poi_id)
     if not p:
         raise HTTPException(status_code=404, detail="POI not found")
 
-    out = await narr_generate(p, lang=lang, style=style, cache=cache)
+    # rigenerazione forzata = lavoro sacrificabile: sotto carico 429 subito
+    with admission.priority(admission.NORMAL if cache else admission.LOW):
+        out = await narr_generate(p, lang=lang, style=style, cache=cache)
 
     # log minimale (non blocca)
     try:
         from ..models import usage_log as ulog
-        ulog.log({
+        await ulog.log_async({
             "event": "narration.generated",
             "ts": datetime.now(timezone.utc),
             "poi_id": poi_id,
             "lang": lang,
             "style": style,
-            "cached": out.get("from_cache", False)
+            "cached": out.get("from_cache", False),
+            "derived": out.get("derived", False)
         })
     except Exception:
         pass
 
-    return {"text": out["text"], "cached": out.get("from_cache", False)}
\ No newline at end of file
+    return {"text": out["text"], "cached": out.get("from_cache", False), "derived": out.get("derived", False)}
+
+@router.get("/{poi_id}/{lang}/{style}")
+def get_narration(poi_id: str, lang: str, style: str, request: Request, response: Response):
+    oid(poi_id); ensure_locale(lang)
+    lang = lang.lower()
+    style = _normalize_style(style)
+    cached = get_cached(poi_id, lang, style)
+    if not cached:
+        raise HTTPException(status_code=404, detail="Not found")
+    etag = http_cache.etag_for([cached])
+    lm = http_cache.last_modified_of([cached])
+    if nm := http_cache.not_modified(request, etag, lm):
+        return nm
+    response.headers.update(http_cache.headers_for(etag, lm))
+    return {
+        "poi_id": poi_id, "lang": lang, "style": style,
+        "text": cached["text"], "sources": cached.get("sources", []),
+        "confidence": float(cached.get("confidence", 0.8)),
+        "derived_from": (cached.get("derived_from") or {}).get("lang"),
+    }
@@ -1,20 +1,31 @@
-from fastapi import APIRouter, Body
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response
+from datetime import datetime, timedelta, timezone
 import logging
 from bson import ObjectId
-from difflib import SequenceMatcher
 
-from ..infra.db import pois, poi_docs, searched_pois
-from ..services.osm_service import fetch_osm_pois
-from ..services.wiki_service import fetch_wiki_docs
-import reverse_geocoder as rg
+from ..infra.db import pois, poi_docs, collection
+from ..infra import aio, db_async
+from ..infra.settings import get_settings
+from ..models import poi as poi_model, poi_doc, area_tile, usage_log as ulog
+from ..utils.validators import ensure_locale
+from ..utils.projection import poi_projection, doc_projection
+from ..utils.jsonresp import FastJSONResponse
+from ..utils import poipack, tiles
+from ..services.osm_service import resolve_profile
+from ..services import poi_ingest
+from ..services.poi_ingest import SEARCH_TTL_DAYS, get_lang_from_coords, round_coord
+from ..services.poi_ingest import is_relevant_name  # noqa: F401 (tests/bench)
+from ..infra.metrics import cache_result
+from ..infra.profiling import SampledRoute, run_in_threadpool, span
+
+router = APIRouter(route_class=SampledRoute)
 
-router = APIRouter()
-
-SEARCH_TTL_DAYS = 5
-COORD_PRECISION = 6
 POI_RADIUS_METERS = 200
 
+# risposte dalla cache: letture anche dai secondari; dopo un fetch si legge dal primario
+_pois_geo = db_async.collection("pois", "nearby")
+_docs_content = collection("poi_docs", "content")
+
 def serialize_doc(doc):
     """Converte ObjectId in stringhe per la serializzazione JSON."""
     if "_id" in doc and isinstance(doc["_id"], ObjectId):
@@ -23,46 +34,68 @@ def serialize_doc(doc):
         doc["poi_id"] = str(doc["poi_id"])
     return doc
 
-def get_lang_from_coords(lat, lon):
-    result = rg.search((lat, lon))[0]
-    country_code = result['cc']
-    country_lang_map = {
-        "IT": "it",
-        "FR": "fr",
-        "DE": "de",
-        "US": "en",
-    }
-    return country_lang_map.get(country_code, "en")
-
-def round_coord(lat, lon):
-    return (round(lat, COORD_PRECISION), round(lon, COORD_PRECISION))
-
-def is_relevant_name(name1: str, name2: str, threshold: float = 0.85) -> bool:
-    """Verifica se due nomi sono molto simili."""
-    if not name1 or not name2:
-        return False
-    n1, n2 = name1.lower().strip(), name2.lower().strip()
-    if n1 == n2:
-        return True
-    return SequenceMatcher(None, n1, n2).ratio() >= threshold
+@router.post("/poi/nearby")
+def nearby_summary(request: Request, payload: dict = Body(...)):
+    """Sola lettura dall'indice 2dsphere, senza fetch esterni. Con
+    `Accept: application/vnd.geoguide.poipack` risponde nel formato binario."""
+    try:
+        lat = float(payload["lat"]); lon = float(payload["lon"])
+        radius = int(payload.get("radius_m", get_settings().POI_DEFAULT_RADIUS_M))
+        lang = ensure_locale(payload.get("lang", "en"))
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Bad request")
+    items = poi_model.nearby(lat, lon, radius, lang)
+    if poipack.wants(request.headers.get("accept")):
+        return Response(poipack.encode(poipack.from_nearby(items)), media_type=poipack.MEDIA_TYPE,
+                        headers={"Vary": "Accept"})
+    return {"items": items}
+
+def _nearby_response(source: str, poi_ids: list, poi_proj: dict, doc_proj: dict | None, pois_list=None,
+                     docs_mode: str = "meta", excerpt_chars: int = 300):
+    docs_coll = _docs_content if source == "cache" else poi_docs
+    if pois_list is None:
+        pois_list = list(pois.find({"_id": {"$in": poi_ids}}, poi_proj))
+    docs_list = list(docs_coll.find({"poi_id": {"$in": poi_ids}}, doc_proj)) if doc_proj is not None else []
+    poi_doc.present(docs_list, docs_mode, excerpt_chars)
+    return FastJSONResponse({"source": source, "pois": pois_list, "docs": docs_list})
 
 @router.post("/nearby")
-async def get_nearby_pois(payload: dict = Body(...)):
+async def get_nearby_pois(
+    payload: dict = Body(...),
+    fields: str | None = Query(default=None, description="Campi POI separati da virgola (default compatto)"),
+    docs: str = Query(default="meta", description="none | meta | excerpt | full"),
+    excerpt_chars: int = Query(default=300, ge=1, le=5000),
+):
+    poi_proj = poi_projection(fields)
+    doc_proj = doc_projection(docs, excerpt_chars)
     lat = payload["lat"]
     lon = payload["lon"]
-    radius_m = payload.get("radius", POI_RADIUS_METERS)
+    try:
+        radius_m = int(payload.get("radius", POI_RADIUS_METERS))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Bad request")
+    radius_m = max(1, min(radius_m, get_settings().NEARBY_MAX_RADIUS_M))
     enrich = payload.get("enrich", False)
 
-    req_lang = get_lang_from_coords(lat, lon)
+    with span("reverse_geocoder", cat="cpu"):
+        req_lang = await run_in_threadpool(get_lang_from_coords, lat, lon)
     logging.info(f"[NEARBY] Request for lat={lat}, lon={lon}, enrich={enrich}, lang={req_lang}")
 
     now = datetime.utcnow()
     lat_r, lon_r = round_coord(lat, lon)
-
-    # Cache hit
-    search_entry = searched_pois.find_one({"lat": lat_r, "lon": lon_r})
-    if search_entry and search_entry["last_search_at"] >= now - timedelta(days=SEARCH_TTL_DAYS):
-        pois_list = [serialize_doc(p) for p in pois.find({
+    profile = resolve_profile(payload.get("profile"))
+    await _log_demand(lat, lon)
+
+    # Cache hit: stessa ricerca recente, oppure area tenuta calda dal refresher
+    search_entry = await db_async.searched_pois.find_one({"lat_round": lat_r, "lon_round": lon_r})
+    search_hit = bool(search_entry and search_entry["last_search_at"] >= now - timedelta(days=SEARCH_TTL_DAYS))
+    if not search_hit and profile == resolve_profile(None):
+        z = get_settings().REFRESH_TILE_ZOOM
+        search_hit = await aio.run(area_tile.fresh, z, tiles.intersecting(z, lat, lon, radius_m),
+                                   now - timedelta(days=SEARCH_TTL_DAYS))
+    cache_result("search", search_hit)
+    if search_hit:
+        pois_list = await _pois_geo.find({
             "location": {
                 "$near": {
                     "$geometry": {"type": "Point", "coordinates": [lon, lat]},
@@ -70,100 +103,29 @@ async def get_nearby_pois(payload: dict = Body(...)):
                 }
             },
             "is_active": True
-        })]
-        poi_ids = [ObjectId(p["_id"]) for p in pois_list]
-        docs_list = [serialize_doc(d) for d in poi_docs.find({"poi_id": {"$in": poi_ids}})]
-        return {"source": "cache", "pois": pois_list, "docs": docs_list}
-
-    # Step 1: Fetch OSM
-    osm_pois = await fetch_osm_pois(lat, lon, radius_m)
-
-    found_ids = []
-    seen_names = []
-
-    for osm_poi in osm_pois:
-        name = osm_poi.get("name", "").strip()
-        if not name or len(name) < 3:
-            continue
-        if any(is_relevant_name(name, seen) for seen in seen_names):
-            logging.debug(f"[NEARBY] Skipping duplicate/similar POI name '{name}'")
-            continue
-        seen_names.append(name)
-
-        lat_r_poi, lon_r_poi = round_coord(osm_poi["lat"], osm_poi["lon"])
-        existing = pois.find_one({
-            "lat_round": lat_r_poi,
-            "lon_round": lon_r_poi,
-            "provider": "osm",
-            "provider_id": osm_poi.get("id")
-        })
-
-        if existing:
-            pois.update_one(
-                {"_id": existing["_id"]},
-                {"$set": {"last_seen_at": now, "is_active": True}}
-            )
-            poi_id = existing["_id"]
-        else:
-            poi_id = pois.insert_one({
-                "lat_round": lat_r_poi,
-                "lon_round": lon_r_poi,
-                "provider": "osm",
-                "provider_id": osm_poi.get("id"),
-                "name": {"default": name},
-                "aliases": [],
-                "location": {
-                    "type": "Point",
-                    "coordinates": [osm_poi["lon"], osm_poi["lat"]]
-                },
-                "langs": [req_lang],
-                "photos": [],
-                "last_seen_at": now,
-                "is_active": True,
-                "created_at": now,
-                "updated_at": now
-            }).inserted_id
-        found_ids.append(poi_id)
-
-    # Disattiva POI fuori raggio
-    pois.update_many(
-        {
-            "location": {
-                "$geoWithin": {
-                    "$centerSphere": [[lon, lat], radius_m / 6378137]
-                }
-            },
-            "_id": {"$nin": found_ids}
-        },
-        {"$set": {"is_active": False}}
-    )
-
-    # Step 2: Enrichment Wikipedia
-    if enrich:
-        for poi_id in found_ids:
-            poi = pois.find_one({"_id": poi_id})
-            docs = await fetch_wiki_docs(poi)
-            for doc in docs:
-                if isinstance(doc.get("poi_id"), str):
-                    doc["poi_id"] = ObjectId(doc["poi_id"])
-                poi_docs.update_one(
-                    {
-                        "poi_id": poi_id,
-                        "lang": doc["lang"],
-                        "source": "wikipedia",
-                        "url": doc["url"]
-                    },
-                    {"$set": {**doc, "updated_at": now}},
-                    upsert=True
-                )
-
-    searched_pois.update_one(
-        {"lat_round": lat_r, "lon_round": lon_r},
-        {"$set": {"lat_round": lat_r, "lon_round": lon_r, "last_search_at": now}},
-        upsert=True
-    )
-
-    pois_list = [serialize_doc(p) for p in pois.find({"_id": {"$in": found_ids}})]
-    docs_list = [serialize_doc(d) for d in poi_docs.find({"poi_id": {"$in": found_ids}})]
-
-    return {"source": "fresh", "pois": pois_list, "docs": docs_list}
\ No newline at end of file
+        }, poi_proj).to_list()
+        return await aio.run(_nearby_response, "cache", [p["_id"] for p in pois_list], poi_proj, doc_proj,
+                             pois_list, docs, excerpt_chars)
+
+    # Step 1: Fetch OSM (in streaming: si salva mentre la risposta arriva)
+    res = await poi_ingest.ingest_osm(lat, lon, radius_m, profile, req_lang, now)
+    await aio.run(poi_ingest.reconcile, res, profile, lat, lon, radius_m, now)
+
+    # Step 2: Enrichment Wikipedia (bassa priorità: sotto carico si salta il resto)
+    degraded = await poi_ingest.enrich(res.found_ids, now) if enrich else False
+
+    if not degraded and res.complete:  # area da ripassare: enrichment o fetch OSM incompleti
+        await aio.run(poi_ingest.mark_searched, lat, lon, now)
+
+    resp = await aio.run(_nearby_response, "fresh", res.found_ids, poi_proj, doc_proj, None, docs, excerpt_chars)
+    if degraded or not res.complete:
+        resp.headers["X-Degraded"] = ", ".join(k for k, v in (("osm", not res.complete), ("enrichment", degraded)) if v)
+    return resp
+
+async def _log_demand(lat: float, lon: float):
+    """Domanda per area, letta dal refresher (services/refresher). Non blocca."""
+    try:
+        await ulog.log_async({"event": "poi.nearby", "ts": datetime.now(timezone.utc),
+                  "latlon_q50m": ulog.latlon_q50m(lat, lon), "extra": {"src": "api"}})
+    except Exception:
+        logging.exception("[NEARBY] log domanda fallito")
@@ -1,12 +1,28 @@
 # controllers/poi_docs_controller.py
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Request
 from bson import ObjectId
-from ..infra.db import poi_docs
+from ..infra import aio, db_async
+from ..models import poi_doc
+from ..utils.projection import doc_projection
+from ..utils.jsonresp import FastJSONResponse
+from ..utils import http_cache
+from ..utils.cursor import after as cursor_after, encode as cursor_encode
+from ..infra.profiling import SampledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=SampledRoute)
+
+poi_docs = db_async.collection("poi_docs", "content")
 
 @router.get("/poi/{poi_id}/docs")
-async def get_poi_docs(poi_id: str, lang: str = None, limit: int = 10):
+async def get_poi_docs(
+    request: Request,
+    poi_id: str,
+    lang: str = None,
+    limit: int = Query(default=10, ge=1, le=100),
+    cursor: str | None = Query(default=None, description="X-Next-Cursor della pagina precedente"),
+    docs: str = Query(default="full", description="meta | excerpt | full"),
+    excerpt_chars: int = Query(default=300, ge=1, le=5000),
+):
     try:
         poi_oid = ObjectId(poi_id)
     except:
@@ -16,8 +32,24 @@ async def get_poi_docs(poi_id: str, lang: str = None, limit: int = 10):
     if lang:
         query["lang"] = lang
 
-    docs = list(poi_docs.find(query).limit(limit))
-    for d in docs:
-        d["_id"] = str(d["_id"])
-        d["poi_id"] = str(d["poi_id"])
-    return docs
\ No newline at end of file
+    proj = doc_projection(docs, excerpt_chars)
+    if proj is None:
+        return FastJSONResponse([])
+    proj.pop("_id", None)  # qui l'_id del documento serve al client
+
+    # prima solo le versioni (una in più per sapere se c'è un seguito):
+    # se il client è aggiornato non si legge il testo
+    query = cursor_after(query, "_id", cursor, direction=1)
+    versions = await (poi_docs.find(query, {"_id": 1, "updated_at": 1, "created_at": 1})
+                      .sort("_id", 1).limit(limit + 1).to_list())
+    nxt = cursor_encode(versions[limit - 1]["_id"]) if len(versions) > limit else None
+    versions = versions[:limit]
+    etag = http_cache.etag_for(versions, lang, limit, docs, excerpt_chars if docs == "excerpt" else None, cursor)
+    lm = http_cache.last_modified_of(versions)
+    headers = {"X-Next-Cursor": nxt} if nxt else {}
+    if nm := http_cache.not_modified(request, etag, lm):
+        nm.headers.update(headers)
+        return nm
+    body = await poi_docs.find({"_id": {"$in": [v["_id"] for v in versions]}}, proj or None).sort("_id", 1).to_list()
+    await aio.run(poi_doc.present, body, docs, excerpt_chars)
+    return FastJSONResponse(body, headers={**http_cache.headers_for(etag, lm), **headers})
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Header, HTTPException
+from ..infra import profiling
+from ..models import request_profile
+
+router = APIRouter(prefix="/debug/profiles", tags=["System"], route_class=profiling.SampledRoute)
+
+def _auth(x_profile: str | None):
+    if not profiling.verify(x_profile):
+        raise HTTPException(status_code=403, detail="Signed X-Profile header required")
+
+@router.get("")
+def list_profiles(x_profile: str | None = Header(default=None), limit: int = 50):
+    _auth(x_profile)
+    return {"items": request_profile.list_recent(min(limit, 200))}
+
+@router.get("/{request_id}")
+def get_profile(request_id: str, x_profile: str | None = Header(default=None)):
+    """Chrome-trace JSON: aprire con ui.perfetto.dev o speedscope.app."""
+    _auth(x_profile)
+    trace = request_profile.get_trace(request_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail="Not found")
+    return trace
@@ -0,0 +1,23 @@
+# controllers/search_controller.py
+"""
+GET /poi/search?q=: type-ahead sui nomi dei POI (indice in memoria,
+services/name_search), opzionalmente pesato sulla distanza da lat/lon.
+"""
+from fastapi import APIRouter, HTTPException, Query
+from ..services import name_search
+from ..utils.jsonresp import FastJSONResponse
+from ..infra.profiling import SampledRoute
+
+router = APIRouter(tags=["Search"], route_class=SampledRoute)
+
+
+@router.get("/poi/search")
+def search_pois(q: str = Query(min_length=1, max_length=100),
+                lat: float | None = Query(default=None, ge=-90, le=90),
+                lon: float | None = Query(default=None, ge=-180, le=180),
+                lang: str | None = None,
+                limit: int = Query(default=10, ge=1, le=50)):
+    if (lat is None) != (lon is None):
+        raise HTTPException(status_code=400, detail="lat and lon must be given together")
+    items = name_search.index().search(q, lat, lon, limit=limit, lang=lang)
+    return FastJSONResponse({"items": items})
@@ -0,0 +1,50 @@
+# controllers/tiles_controller.py
+"""
+GET /tiles/{z}/{x}/{y}: POI per tile slippy-map. URL stabile e risposta
+deterministica (ordine per _id), quindi cacheabile da CDN e browser.
+"""
+from fastapi import APIRouter, HTTPException, Request, Response
+from ..infra.settings import get_settings
+from ..models import poi as poi_model
+from ..utils import http_cache, poipack, tiles
+from ..utils.jsonresp import FastJSONResponse
+from ..utils.projection import POI_DEFAULT
+from ..infra.profiling import SampledRoute
+
+router = APIRouter(tags=["Tiles"], route_class=SampledRoute)
+
+_PROJ = {**{f: 1 for f in POI_DEFAULT}, "updated_at": 1, "created_at": 1}
+
+
+def _cache_control(s) -> str:
+    return (f"public, max-age={s.TILE_MAX_AGE_SECS}, s-maxage={s.TILE_CDN_MAX_AGE_SECS}, "
+            f"stale-while-revalidate={s.TILE_MAX_AGE_SECS}")
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+def get_tile(z: int, x: int, y: int, request: Request, lang: str = "it"):
+    s = get_settings()
+    if not s.TILE_MIN_ZOOM <= z <= s.TILE_MAX_ZOOM:
+        raise HTTPException(status_code=400, detail=f"Zoom must be between {s.TILE_MIN_ZOOM} and {s.TILE_MAX_ZOOM}")
+    if not tiles.valid(z, x, y):
+        raise HTTPException(status_code=400, detail="Invalid tile")
+
+    rows = poi_model.in_tile(z, x, y, _PROJ, s.TILE_MAX_POIS)
+    truncated = len(rows) > s.TILE_MAX_POIS
+    rows = rows[: s.TILE_MAX_POIS]
+
+    packed = poipack.wants(request.headers.get("accept"))
+    cc = _cache_control(s)
+    etag = http_cache.etag_for(rows, z, x, y, truncated, packed and lang)
+    lm = http_cache.last_modified_of(rows)
+    if nm := http_cache.not_modified(request, etag, lm, cc):
+        nm.headers["Vary"] = "Accept"
+        return nm
+    headers = {**http_cache.headers_for(etag, lm, cc), "Vary": "Accept",
+               "X-Tile-Truncated": "1" if truncated else "0"}
+    if packed:
+        return Response(poipack.encode(poipack.from_docs(rows, lang)), media_type=poipack.MEDIA_TYPE, headers=headers)
+    for r in rows:
+        r.pop("updated_at", None); r.pop("created_at", None)
+    body = {"z": z, "x": x, "y": y, "bbox": list(tiles.bounds(z, x, y)), "truncated": truncated, "pois": rows}
+    return FastJSONResponse(body, headers=headers)
@@ -0,0 +1,231 @@
+# backend/src/infra/admission.py
+"""
+Controllo di ammissione: token bucket per client/route in ingresso e limiti
+di concorrenza adattivi (AIMD) per provider in uscita.
+
+- `RateLimiter`: un bucket per (classe di route, client). Il client è il
+  `sub` se il token è già nella cache dei claims verificati, altrimenti l'IP.
+- `AdaptiveLimit`: finché le chiamate vanno bene il limite cresce di ~1 per
+  "finestra" (additive increase); su 429/5xx/timeout/lentezza si riduce di
+  un fattore (multiplicative decrease).
+- Priorità: il lavoro marcato `low` (enrichment, rigenerazione senza cache)
+  entra solo se resta margine e non aspetta mai; quello normale attende al
+  massimo `max_wait`. In entrambi i casi il rifiuto è `Overloaded`, che
+  l'app trasforma in 429 con Retry-After.
+
+Lo stato è per processo: su Lambda ogni container ha i suoi bucket.
+"""
+from __future__ import annotations
+import asyncio
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+
+from .metrics import ADMISSION_REJECTED, OUTBOUND_LIMIT, outbound
+from .settings import get_settings
+from . import oidc
+
+LOW, NORMAL = "low", "normal"
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("admission_priority", default=NORMAL)
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+@contextmanager
+def priority(level: str):
+    """with priority(LOW): ... -> le chiamate in uscita qui dentro sono sacrificabili."""
+    tok = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(tok)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+# ---------- token bucket ----------
+@dataclass
+class Rule:
+    rate: float      # token al secondo
+    burst: int
+
+
+class RateLimiter:
+    def __init__(self, rules: dict[str, Rule], max_keys: int = 50_000, clock=time.monotonic):
+        self.rules = rules
+        self.max_keys = max_keys
+        self.clock = clock
+        self._b: OrderedDict[tuple, list] = OrderedDict()   # (classe, client) -> [token, ultimo refill]
+        self._lock = threading.Lock()
+
+    def take(self, route_class: str, client: str, cost: float = 1.0) -> float:
+        """0 = ammesso; altrimenti secondi da attendere prima di riprovare."""
+        rule = self.rules.get(route_class)
+        if rule is None:
+            return 0.0
+        now = self.clock()
+        k = (route_class, client)
+        with self._lock:
+            b = self._b.get(k)
+            if b is None:
+                b = self._b[k] = [float(rule.burst), now]
+            else:
+                b[0] = min(rule.burst, b[0] + (now - b[1]) * rule.rate)
+                b[1] = now
+                self._b.move_to_end(k)
+            while len(self._b) > self.max_keys:
+                self._b.popitem(last=False)
+            if b[0] >= cost:
+                b[0] -= cost
+                return 0.0
+            return (cost - b[0]) / rule.rate
+
+
+# route costose: fan-out verso Overpass/Wikipedia/OpenAI
+EXPENSIVE = {("POST", "/v1/nearby"), ("POST", "/v1/narration")}
+EXPENSIVE_SUFFIXES = {("POST", "/ask")}      # /v1/poi/{id}/ask
+EXEMPT = ("/v1/health", "/v1/metrics")
+
+
+def classify(method: str, path: str, query) -> tuple[str | None, float]:
+    """(classe di route, costo in token). None = non limitata."""
+    if path.startswith(EXEMPT):
+        return None, 0
+    p = path.rstrip("/")
+    if (method, p) in EXPENSIVE or (method, p[p.rfind("/"):]) in EXPENSIVE_SUFFIXES:
+        # rigenerazione senza cache: costa come più richieste normali
+        return "expensive", 3.0 if str(query.get("cache", "")).lower() == "false" else 1.0
+    return "default", 1.0
+
+
+def client_key(headers, peer: str | None, trusted_hops: int = 0) -> str:
+    """Utente verificato, altrimenti IP. X-Forwarded-For si legge da destra e solo
+    per `trusted_hops` proxy fidati: le voci a sinistra le scrive il client."""
+    auth = headers.get("authorization") or ""
+    if auth.startswith("Bearer "):
+        claims = oidc.cached_claims(auth[7:])
+        if claims and claims.get("sub"):
+            return "sub:" + claims["sub"]
+    fwd = [p.strip() for p in (headers.get("x-forwarded-for") or "").split(",") if p.strip()]
+    if trusted_hops > 0 and fwd:
+        return "ip:" + fwd[max(0, len(fwd) - trusted_hops)]
+    return "ip:" + (peer or "?")
+
+
+_limiter: RateLimiter | None = None
+
+
+def rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        s = get_settings()
+        _limiter = RateLimiter({"default": Rule(s.RATE_DEFAULT_RPS, s.RATE_DEFAULT_BURST),
+                                "expensive": Rule(s.RATE_EXPENSIVE_RPS, s.RATE_EXPENSIVE_BURST)})
+    return _limiter
+
+
+# ---------- AIMD ----------
+class AdaptiveLimit:
+    def __init__(self, name: str, initial: int = 8, min_limit: int = 1, max_limit: int = 32,
+                 backoff: float = 0.7, slow_secs: float = 5.0, max_wait: float = 1.0, low_share: float = 0.7):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit, self.max_limit = min_limit, max_limit
+        self.backoff = backoff
+        self.slow_secs = slow_secs
+        self.max_wait = max_wait
+        self.low_share = low_share
+        self.inflight = 0
+        self._last_drop = 0.0
+        self._cond: asyncio.Condition | None = None
+        self._loop = None
+        OUTBOUND_LIMIT.labels(name).set(self.limit)
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond, self._loop = asyncio.Condition(), loop
+        return self._cond
+
+    def _room(self, level: str) -> bool:
+        cap = int(self.limit) if level != LOW else int(self.limit * self.low_share)
+        return self.inflight < max(cap, 1 if level != LOW else 0)
+
+    async def acquire(self, level: str = NORMAL):
+        cond = self._condition()
+        async with cond:
+            if not self._room(level):
+                if level == LOW:
+                    ADMISSION_REJECTED.labels("shed", self.name).inc()
+                    raise Overloaded(f"{self.name}: low-priority work shed", retry_after=self.max_wait * 2)
+                try:
+                    await asyncio.wait_for(cond.wait_for(lambda: self._room(level)), self.max_wait)
+                except asyncio.TimeoutError:
+                    ADMISSION_REJECTED.labels("outbound", self.name).inc()
+                    raise Overloaded(f"{self.name}: concurrency limit {int(self.limit)}",
+                                     retry_after=self.max_wait * 2) from None
+            self.inflight += 1
+
+    async def release(self, ok: bool):
+        cond = self._condition()
+        async with cond:
+            self.inflight -= 1
+            if ok:
+                self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+            elif time.monotonic() - self._last_drop >= 1.0:
+                # una sola riduzione per raffica di errori concorrenti
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_drop = time.monotonic()
+            OUTBOUND_LIMIT.labels(self.name).set(self.limit)
+            cond.notify_all()
+
+
+def congested(status, seconds: float, slow_secs: float) -> bool:
+    if status == "error" or status is None:
+        return True
+    if isinstance(status, int) and (status == 429 or status >= 500):
+        return True
+    return seconds > slow_secs
+
+
+_limits: dict[str, AdaptiveLimit] = {}
+
+
+def limit_for(provider: str) -> AdaptiveLimit:
+    lim = _limits.get(provider)
+    if lim is None:
+        s = get_settings()
+        lim = _limits[provider] = AdaptiveLimit(
+            provider, initial=s.OUTBOUND_INITIAL_CONCURRENCY, max_limit=s.OUTBOUND_MAX_CONCURRENCY,
+            slow_secs=s.OUTBOUND_SLOW_SECS, max_wait=s.OUTBOUND_MAX_WAIT_SECS,
+            low_share=s.OUTBOUND_LOW_PRIORITY_SHARE)
+    return lim
+
+
+@asynccontextmanager
+async def guarded(provider: str):
+    """
+    async with guarded("overpass") as o:
+        ... ; o.status = resp.status
+    Come `metrics.outbound`, ma prima passa dal limite adattivo del provider.
+    """
+    lim = limit_for(provider)
+    await lim.acquire(current_priority())
+    t0 = time.perf_counter()
+    o = None
+    try:
+        with outbound(provider) as o:
+            yield o
+    finally:
+        status = getattr(o, "status", None)
+        await lim.release(not congested(status, time.perf_counter() - t0, lim.slow_secs))
@@ -0,0 +1,119 @@
+# backend/src/infra/aio.py
+"""
+Mongo dai route handler async senza bloccare l'event loop.
+
+pymongo 4.7 (la versione fissata) non ha ancora l'API async e Motor non è
+fra le dipendenze: il modello è lo stesso di Motor, il driver sincrono gira
+in un pool di thread dedicato. Il pool è separato da quello di Starlette
+(handler `def`), così le attese su Mongo non tolgono posti alle route
+sincrone, ed è grande quanto il pool di connessioni: più thread resterebbero
+comunque in coda per una connessione.
+
+- `run(fn, ...)`: codice sincrono che parla con Mongo (model, servizi);
+- `AsyncCollection`: gli stessi metodi di `pymongo.Collection`, awaitable;
+  `find()` ritorna un cursore pigro con `sort/limit/skip/hint` e `to_list()`.
+
+Le collezioni async con gli stessi nomi di `infra/db` sono in `infra/db_async`.
+"""
+from __future__ import annotations
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from . import profiling
+from .settings import _env_settings
+from .mongo import client_options
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                s = _env_settings()
+                n = s.MONGO_ASYNC_THREADS
+                if not n:
+                    n = client_options(s, in_lambda=bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME")))["maxPoolSize"]
+                _executor = ThreadPoolExecutor(max_workers=n, thread_name_prefix="mongo")
+    return _executor
+
+
+async def run(fn, *args, **kwargs):
+    """fn(*args, **kwargs) nel pool Mongo; il contesto (span, profilo, priorità di admission) segue la chiamata."""
+    ctx = contextvars.copy_context()
+    job = partial(ctx.run, profiling.call_sampled, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(executor(), job)
+
+
+class AsyncCursor:
+    """Cursore pigro: la query parte solo con `to_list()`, tutta in un thread del pool."""
+
+    def __init__(self, coll, args, kwargs):
+        self._coll, self._args, self._kwargs = coll, args, kwargs
+        self._chain: list[tuple[str, tuple]] = []
+
+    def _add(self, name: str, *a) -> "AsyncCursor":
+        self._chain.append((name, a))
+        return self
+
+    def sort(self, *a):
+        return self._add("sort", *a)
+
+    def limit(self, n: int):
+        return self._add("limit", n)
+
+    def skip(self, n: int):
+        return self._add("skip", n)
+
+    def hint(self, index):
+        return self._add("hint", index)
+
+    def _fetch(self, length: int | None) -> list:
+        cur = self._coll.find(*self._args, **self._kwargs)
+        for name, a in self._chain:
+            cur = getattr(cur, name)(*a)
+        return list(cur if length is None else islice(cur, length))
+
+    async def to_list(self, length: int | None = None) -> list:
+        return await run(self._fetch, length)
+
+
+class AsyncCollection:
+    """Wrapper awaitable di una collezione pymongo (`sync` resta accessibile)."""
+
+    _METHODS = frozenset((
+        "find_one", "count_documents", "estimated_document_count", "distinct",
+        "insert_one", "insert_many", "replace_one", "update_one", "update_many",
+        "delete_one", "delete_many", "bulk_write",
+        "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+    ))
+
+    def __init__(self, coll):
+        self.sync = coll
+
+    @property
+    def name(self) -> str:
+        return self.sync.name
+
+    def find(self, *args, **kwargs) -> AsyncCursor:
+        return AsyncCursor(self.sync, args, kwargs)
+
+    async def aggregate(self, pipeline: list, **kwargs) -> list:
+        return await run(lambda: list(self.sync.aggregate(pipeline, **kwargs)))
+
+    def __getattr__(self, name):
+        if name not in self._METHODS:
+            raise AttributeError(name)
+        fn = getattr(self.sync, name)
+
+        async def call(*args, **kwargs):
+            return await run(fn, *args, **kwargs)
+        call.__name__ = name
+        return call
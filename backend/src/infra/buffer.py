@@ -0,0 +1,140 @@
+# backend/src/infra/buffer.py
+"""
+Buffer in-process limitato per scritture batch su Mongo.
+
+Gli eventi vengono accodati e scritti con `insert_many(ordered=False)` quando
+si raggiunge `max_batch` oppure dopo `flush_secs` dal primo evento in coda.
+Se la coda è piena `offer` attende al massimo `put_timeout` e poi rifiuta
+(backpressure): il chiamante decide se scartare o rispondere 429.
+"""
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Iterable
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# su Lambda i thread vengono congelati tra le invocazioni: si scrive inline
+_IN_LAMBDA = bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+
+
+class BatchBuffer:
+    def __init__(self, sink, max_batch: int = 200, flush_secs: float = 2.0,
+                 max_size: int = 5000, put_timeout: float = 0.05, inline: bool | None = None):
+        self._sink = sink                      # collection (o oggetto con insert_many)
+        self.max_batch = max(1, int(max_batch))
+        self.flush_secs = float(flush_secs)
+        self.max_size = max(self.max_batch, int(max_size))
+        self.put_timeout = float(put_timeout)
+        self.inline = _IN_LAMBDA if inline is None else inline
+        self._q: deque = deque()
+        self._cond = threading.Condition()
+        self._first_at: float | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+        self.dropped = 0
+        self.written = 0
+
+    # ---------- API ----------
+    def offer(self, docs: Iterable[dict], block: bool = True) -> bool:
+        """Accoda tutti i documenti o nessuno. False = buffer pieno (backpressure)."""
+        docs = list(docs)
+        if not docs:
+            return True
+        if self.inline or self._stopped:
+            self._write(docs)
+            return True
+        deadline = time.monotonic() + (self.put_timeout if block else 0)
+        with self._cond:
+            while len(self._q) + len(docs) > self.max_size:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    self.dropped += len(docs)
+                    return False
+                self._cond.notify_all()        # sveglia il flusher
+                self._cond.wait(left)
+            if not self._q:
+                self._first_at = time.monotonic()
+            self._q.extend(docs)
+            self._ensure_thread()
+            if len(self._q) >= self.max_batch:
+                self._cond.notify_all()
+        return True
+
+    def flush(self) -> int:
+        """Scrive sincronicamente tutto ciò che è in coda."""
+        n = 0
+        while True:
+            batch = self._take(force=True)
+            if not batch:
+                return n
+            n += self._write(batch)
+
+    def close(self) -> int:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        t = self._thread
+        if t and t.is_alive() and t is not threading.current_thread():
+            t.join(timeout=5)
+        return self.flush()
+
+    def __len__(self) -> int:
+        return len(self._q)
+
+    # ---------- interni ----------
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="batch-buffer", daemon=True)
+            self._thread.start()
+
+    def _take(self, force: bool = False) -> list[dict]:
+        with self._cond:
+            if not self._q:
+                return []
+            due = self._first_at is not None and time.monotonic() - self._first_at >= self.flush_secs
+            if not (force or due or len(self._q) >= self.max_batch):
+                return []
+            batch = [self._q.popleft() for _ in range(min(self.max_batch, len(self._q)))]
+            self._first_at = time.monotonic() if self._q else None
+            self._cond.notify_all()            # libera eventuali produttori in attesa
+            return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                if len(self._q) < self.max_batch:
+                    wait = self.flush_secs
+                    if self._first_at is not None:
+                        wait = max(0.0, self._first_at + self.flush_secs - time.monotonic())
+                    self._cond.wait(wait)
+                if self._stopped:
+                    return
+            batch = self._take()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: list[dict]) -> int:
+        try:
+            self._sink.insert_many(batch, ordered=False)
+            self.written += len(batch)
+            return len(batch)
+        except PyMongoError as e:
+            # con ordered=False gli eventi validi sono comunque scritti
+            ok = getattr(e, "details", {}) or {}
+            n = int(ok.get("nInserted", 0)) if isinstance(ok, dict) else 0
+            self.written += n
+            self.dropped += len(batch) - n
+            logger.warning("[buffer] insert_many failed (%d/%d written): %s", n, len(batch), e)
+            return n
+        except Exception as e:  # il flusher non deve morire
+            self.dropped += len(batch)
+            logger.exception("[buffer] unexpected error: %s", e)
+            return 0
@@ -0,0 +1,193 @@
+# backend/src/infra/config_store.py
+"""
+Ultima versione di `app_config` in memoria, aggiornata per cambiamento.
+
+- `current()` non tocca Mongo finché la copia è fresca; scaduti
+  `APP_CONFIG_CACHE_SECS` fa un poll leggero (solo version/updated_at,
+  indice `version_desc`) e ricarica il documento solo se è cambiato.
+  Chiamato dall'event loop (middleware, handler async) il poll va in un
+  thread e intanto resta valida la copia in memoria.
+- `start_watch()` apre un change stream (serve un replica set): a ogni
+  modifica ricarica subito e i poll diventano superflui. Su standalone o su
+  Lambda resta il poll.
+- Ogni nuova versione diventa uno `Snapshot` immutabile sostituito con una
+  sola assegnazione: chi legge vede o la vecchia o la nuova, mai un misto.
+  I componenti non si registrano: `get_settings()`/`flag()` derivano i
+  limiti dallo snapshot corrente a ogni lettura.
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Mapping
+
+from pymongo.errors import PyMongoError
+
+from ..utils.jsonresp import dumps
+
+logger = logging.getLogger(__name__)
+
+_IN_LAMBDA = bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+_EMPTY = MappingProxyType({})
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    doc: Mapping[str, Any]                     # documento app_config (sola lettura)
+    token: tuple = ()                          # (version, _id, updated_at): identifica la versione
+    etag: str | None = None
+    body: bytes = b"{}"                        # /config già serializzato
+    loaded_at: float = field(default_factory=time.time)
+
+    @property
+    def version(self):
+        return self.doc.get("version")
+
+    @property
+    def flags(self) -> Mapping[str, Any]:
+        return self.doc.get("flags") or _EMPTY
+
+    @property
+    def limits(self) -> Mapping[str, Any]:
+        return self.doc.get("limits") or _EMPTY
+
+    @property
+    def llm(self) -> Mapping[str, Any]:
+        return self.doc.get("llm") or _EMPTY
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _token(doc: Mapping | None) -> tuple:
+    if not doc:
+        return ()
+    ts = doc.get("updated_at")
+    return (doc.get("version"), str(doc.get("_id")), ts.isoformat() if hasattr(ts, "isoformat") else ts)
+
+
+def _freeze(v):
+    if isinstance(v, dict):
+        return MappingProxyType({k: _freeze(x) for k, x in v.items()})
+    if isinstance(v, list):
+        return tuple(_freeze(x) for x in v)
+    return v
+
+
+def make_snapshot(doc: Mapping | None) -> Snapshot:
+    if not doc:
+        return Snapshot(doc=_EMPTY)
+    tok = _token(doc)
+    etag = '"' + hashlib.sha1(repr(tok).encode()).hexdigest()[:24] + '"'
+    return Snapshot(doc=_freeze(dict(doc)), token=tok, etag=etag, body=dumps(doc))
+
+
+class ConfigStore:
+    """`load(head_only)` -> documento più recente (o solo version/_id/updated_at)."""
+
+    def __init__(self, load: Callable[[bool], dict | None], poll_secs: float = 60.0,
+                 watch: Callable[[], Any] | None = None):
+        self._load = load
+        self._watch = watch
+        self.poll_secs = float(poll_secs)
+        self._snap: Snapshot | None = None
+        self._next_poll = 0.0
+        self._lock = threading.Lock()
+        self._watching = False
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._polling = False
+
+    # ---------- lettura ----------
+    def current(self) -> Snapshot:
+        snap = self._snap
+        if snap is not None and (self._watching or time.monotonic() < self._next_poll):
+            return snap
+        if snap is not None and _in_event_loop():
+            self._poll_later()
+            return snap
+        return self.refresh()
+
+    def _poll_later(self):
+        if self._polling:
+            return
+        self._polling = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._polling = False
+        threading.Thread(target=run, name="app-config-poll", daemon=True).start()
+
+    def refresh(self, force: bool = False) -> Snapshot:
+        """Poll della versione; un solo thread alla volta parla con Mongo."""
+        if not self._lock.acquire(blocking=force or self._snap is None):
+            return self._snap                   # qualcun altro sta già aggiornando
+        try:
+            if not force and self._snap is not None and time.monotonic() < self._next_poll and not self._watching:
+                return self._snap
+            try:
+                if self._snap is not None and not force:
+                    head = self._load(True)
+                    if _token(head) == self._snap.token:
+                        return self._snap
+                self._swap(make_snapshot(self._load(False)))
+            except PyMongoError as e:
+                logger.warning("[config] app_config non disponibile, resta la versione in memoria: %s", e)
+                if self._snap is None:
+                    self._snap = make_snapshot(None)
+            return self._snap
+        finally:
+            self._next_poll = time.monotonic() + self.poll_secs
+            self._lock.release()
+
+    def _swap(self, snap: Snapshot):
+        old, self._snap = self._snap, snap
+        if old is None or old.token != snap.token:
+            logger.info("[config] app_config versione %s attiva", snap.version)
+
+    # ---------- change stream ----------
+    def start_watch(self) -> bool:
+        if self._watch is None or _IN_LAMBDA or self._thread is not None:
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_watch, name="app-config-watch", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop_watch(self):
+        self._stop.set()
+        self._watching = False
+
+    def _run_watch(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                with self._watch() as stream:
+                    self._watching = True
+                    self.refresh(force=True)    # niente buchi fra l'ultimo poll e l'apertura
+                    backoff = 1.0
+                    while not self._stop.is_set() and stream.alive:
+                        if stream.try_next() is not None:
+                            self.refresh(force=True)
+            except PyMongoError as e:
+                self._watching = False
+                if getattr(e, "code", None) == 40573:   # change stream non supportato (standalone)
+                    logger.info("[config] change stream non disponibile, uso il poll ogni %.0fs", self.poll_secs)
+                    break
+                logger.warning("[config] change stream interrotto: %s", e)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+        self._watching = False
+        self._thread = None
@@ -1,12 +1,23 @@
-from .settings import get_db
+from .settings import get_db, _env_settings
+from .mongo import profiled
 db = get_db()
 
-pois             = db["pois"]
-poi_docs         = db["poi_docs"]
-narrations_cache = db["narrations_cache"]
-user_contrib     = db["user_contrib"]
-usage_logs       = db["usage_logs"]
-users            = db["users"]
-app_config       = db["app_config"] 
-enrich_cache     = db["nearby_enrich_cache"]  # TTL cache anti-enrich ripetuto
-searched_pois    = db["searched_pois"]
\ No newline at end of file
+def collection(name: str, profile: str = "primary"):
+    """`db[name]` con read preference/concern e write concern del profilo (infra/mongo.PROFILES)."""
+    return profiled(db[name], profile, _env_settings())
+
+pois             = collection("pois")
+poi_docs         = collection("poi_docs")
+doc_blobs        = collection("doc_blobs")      # testi dei poi_docs compressi, _id = sha256
+wiki_pages       = collection("wiki_pages")     # cache pagine Wikipedia per (lang, title) con revid
+narrations_cache = collection("narrations_cache")
+user_contrib     = collection("user_contrib")
+usage_logs       = collection("usage_logs")
+usage_rollups    = collection("usage_rollups")   # aggregati per minuto/ora
+users            = collection("users", "strong")
+app_config       = collection("app_config", "strong")
+enrich_cache     = collection("nearby_enrich_cache")  # TTL cache anti-enrich ripetuto
+searched_pois    = collection("searched_pois")
+osm_tiles        = collection("osm_tiles")     # snapshot per tile dei POI OSM (riconciliazione)
+area_tiles       = collection("area_tiles")    # domanda e freschezza per tile (refresh in background)
+request_profiles = collection("request_profiles")  # trace profilazione opt-in (TTL)
@@ -0,0 +1,28 @@
+# backend/src/infra/db_async.py
+"""Le collezioni di infra/db per i route handler async (infra/aio): stessi nomi, metodi awaitable."""
+from . import db
+from .aio import AsyncCollection
+
+_cache: dict[tuple[str, str], AsyncCollection] = {}
+
+def collection(name: str, profile: str = "primary") -> AsyncCollection:
+    k = (name, profile)
+    if k not in _cache:
+        _cache[k] = AsyncCollection(db.collection(name, profile))
+    return _cache[k]
+
+pois             = AsyncCollection(db.pois)
+poi_docs         = AsyncCollection(db.poi_docs)
+doc_blobs        = AsyncCollection(db.doc_blobs)
+wiki_pages       = AsyncCollection(db.wiki_pages)
+narrations_cache = AsyncCollection(db.narrations_cache)
+user_contrib     = AsyncCollection(db.user_contrib)
+usage_logs       = AsyncCollection(db.usage_logs)
+usage_rollups    = AsyncCollection(db.usage_rollups)
+users            = AsyncCollection(db.users)
+app_config       = AsyncCollection(db.app_config)
+enrich_cache     = AsyncCollection(db.enrich_cache)
+searched_pois    = AsyncCollection(db.searched_pois)
+osm_tiles        = AsyncCollection(db.osm_tiles)
+area_tiles       = AsyncCollection(db.area_tiles)
+request_profiles = AsyncCollection(db.request_profiles)
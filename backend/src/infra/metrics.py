@@ -0,0 +1,204 @@
+# backend/src/infra/metrics.py
+"""
+Metriche Prometheus condivise (route, Mongo, HTTP in uscita, cache, LLM).
+
+- Più worker (gunicorn/uvicorn): impostare PROMETHEUS_MULTIPROC_DIR prima
+  dell'avvio; /metrics aggrega i file dei processi con MultiProcessCollector.
+- Lambda: non c'è nessuno che faccia scrape del container, quindi dopo le
+  richieste si fa push (al massimo ogni PUSH_INTERVAL_SECS) verso
+  PROMETHEUS_PUSHGATEWAY_URL.
+"""
+from __future__ import annotations
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               generate_latest, multiprocess, pushadd_to_gateway)
+from pymongo import monitoring
+
+from .profiling import span
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+PUSHGATEWAY_URL = os.getenv("PROMETHEUS_PUSHGATEWAY_URL")
+PUSH_INTERVAL_SECS = float(os.getenv("PROMETHEUS_PUSH_INTERVAL_SECS", "15"))
+_IN_LAMBDA = bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+
+_LAT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+# ---------- definizioni ----------
+REQS = Counter("geoguide_requests_total", "Totale richieste HTTP", ["endpoint", "method", "status"])
+REQ_LATENCY = Histogram("geoguide_request_duration_seconds", "Latenza per route",
+                        ["endpoint", "method"], buckets=_LAT_BUCKETS)
+MONGO_LATENCY = Histogram("geoguide_mongo_command_duration_seconds", "Latenza comandi Mongo",
+                          ["command", "collection"], buckets=_LAT_BUCKETS)
+MONGO_CMDS = Counter("geoguide_mongo_commands_total", "Comandi Mongo", ["command", "outcome"])
+OUTBOUND_LATENCY = Histogram("geoguide_outbound_duration_seconds", "Latenza chiamate esterne",
+                             ["provider"], buckets=_LAT_BUCKETS)
+OUTBOUND = Counter("geoguide_outbound_requests_total", "Chiamate esterne per esito", ["provider", "status"])
+CACHE = Counter("geoguide_cache_requests_total", "Lookup cache", ["cache", "result"])
+LLM_TOKENS = Counter("geoguide_llm_tokens_total", "Token LLM", ["model", "kind"])
+ADMISSION_REJECTED = Counter("geoguide_admission_rejected_total", "Richieste/chiamate rifiutate (429)",
+                             ["kind", "key"])
+OUTBOUND_LIMIT = Gauge("geoguide_outbound_concurrency_limit", "Limite AIMD per provider", ["provider"],
+                       multiprocess_mode="max")
+OVERPASS_BREAKER = Gauge("geoguide_overpass_breaker_state", "Breaker per mirror (0 chiuso, 1 prova, 2 aperto)",
+                         ["mirror"], multiprocess_mode="max")
+OVERPASS_ATTEMPTS = Counter("geoguide_overpass_attempts_total", "Richieste per mirror Overpass", ["mirror", "outcome"])
+OVERPASS_HEDGES = Counter("geoguide_overpass_hedges_total", "Richieste hedged (launched/won/lost)", ["outcome"])
+LLM_PURPOSE_TOKENS = Counter("geoguide_llm_purpose_tokens_total", "Token LLM per uso (narration/derive/ask)",
+                             ["purpose", "kind"])
+NARRATION_SECONDS = Histogram("geoguide_narration_generation_seconds", "Generazione narrazione (full/derived)",
+                              ["mode"], buckets=_LAT_BUCKETS)
+MONGO_POOL_WAIT = Histogram("geoguide_mongo_pool_wait_seconds", "Attesa per una connessione dal pool",
+                            ["address"], buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+MONGO_POOL_WAITING = Gauge("geoguide_mongo_pool_waiting", "Checkout in attesa di una connessione", ["address"],
+                           multiprocess_mode="livesum")
+MONGO_POOL_IN_USE = Gauge("geoguide_mongo_pool_in_use", "Connessioni prese dal pool", ["address"],
+                          multiprocess_mode="livesum")
+MONGO_POOL_OPEN = Gauge("geoguide_mongo_pool_connections", "Connessioni aperte", ["address"],
+                        multiprocess_mode="livesum")
+MONGO_POOL_FAILED = Counter("geoguide_mongo_pool_checkout_failed_total", "Checkout falliti (timeout, pool chiuso...)",
+                            ["address", "reason"])
+MONGO_POOL_CLEARED = Counter("geoguide_mongo_pool_cleared_total", "Pool svuotati (errori di rete, failover)",
+                             ["address"])
+REFRESH_TILES = Counter("geoguide_refresh_tiles_total", "Tile rinfrescate in background (ok/failed/busy)",
+                        ["outcome"])
+
+# ---------- helpers ----------
+def cache_result(cache: str, hit: bool):
+    CACHE.labels(cache, "hit" if hit else "miss").inc()
+
+def llm_usage(model: str, usage: dict | None, purpose: str | None = None):
+    for kind in ("prompt_tokens", "completion_tokens"):
+        n = (usage or {}).get(kind)
+        if isinstance(n, int) and n > 0:
+            LLM_TOKENS.labels(model, kind.split("_")[0]).inc(n)
+            if purpose:
+                LLM_PURPOSE_TOKENS.labels(purpose, kind.split("_")[0]).inc(n)
+
+class _Outbound:
+    status: int | str | None = None
+
+@contextmanager
+def outbound(provider: str):
+    """
+    with outbound("overpass") as o:
+        ... ; o.status = resp.status
+    Le eccezioni vengono contate con status="error" e rilanciate.
+    """
+    o = _Outbound()
+    t0 = time.perf_counter()
+    try:
+        with span(f"http {provider}", cat="http"):
+            yield o
+    except BaseException:
+        o.status = o.status or "error"
+        raise
+    finally:
+        OUTBOUND_LATENCY.labels(provider).observe(time.perf_counter() - t0)
+        OUTBOUND.labels(provider, str(o.status or "unknown")).inc()
+
+def observe_request(endpoint: str, method: str, status: int, seconds: float):
+    REQ_LATENCY.labels(endpoint, method).observe(seconds)
+    REQS.labels(endpoint, method, str(status)).inc()
+
+# ---------- Mongo ----------
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Conta e cronometra ogni comando (registrato in get_db)."""
+    def __init__(self):
+        self._colls: dict[tuple, str] = {}
+
+    def started(self, event):
+        cmd = event.command_name
+        coll = event.command.get(cmd) if cmd in event.command else None
+        self._colls[(event.request_id, event.connection_id)] = coll if isinstance(coll, str) else "-"
+
+    def _done(self, event, outcome: str):
+        coll = self._colls.pop((event.request_id, event.connection_id), "-")
+        MONGO_LATENCY.labels(event.command_name, coll).observe(event.duration_micros / 1e6)
+        MONGO_CMDS.labels(event.command_name, outcome).inc()
+
+    def succeeded(self, event):
+        self._done(event, "ok")
+
+    def failed(self, event):
+        self._done(event, "error")
+
+def _addr(address) -> str:
+    return f"{address[0]}:{address[1]}" if isinstance(address, tuple) else str(address)
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Attesa e contesa sul pool di connessioni, per server (registrato in get_db)."""
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        MONGO_POOL_CLEARED.labels(_addr(event.address)).inc()
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        MONGO_POOL_OPEN.labels(_addr(event.address)).inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_POOL_OPEN.labels(_addr(event.address)).dec()
+
+    def connection_check_out_started(self, event):
+        MONGO_POOL_WAITING.labels(_addr(event.address)).inc()
+
+    def connection_checked_out(self, event):
+        a = _addr(event.address)
+        MONGO_POOL_WAITING.labels(a).dec()
+        MONGO_POOL_IN_USE.labels(a).inc()
+        if event.duration is not None:
+            MONGO_POOL_WAIT.labels(a).observe(event.duration)
+
+    def connection_check_out_failed(self, event):
+        a = _addr(event.address)
+        MONGO_POOL_WAITING.labels(a).dec()
+        MONGO_POOL_FAILED.labels(a, str(event.reason)).inc()
+        if event.duration is not None:
+            MONGO_POOL_WAIT.labels(a).observe(event.duration)
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_IN_USE.labels(_addr(event.address)).dec()
+
+# ---------- esposizione ----------
+def render() -> bytes:
+    if MULTIPROC_DIR:
+        reg = CollectorRegistry()
+        multiprocess.MultiProcessCollector(reg)
+        return generate_latest(reg)
+    return generate_latest(REGISTRY)
+
+_last_push = 0.0
+
+def maybe_push(force: bool = False):
+    """Push verso il Pushgateway (solo se configurato), con throttling."""
+    global _last_push
+    if not PUSHGATEWAY_URL:
+        return
+    now = time.monotonic()
+    if not force and now - _last_push < PUSH_INTERVAL_SECS:
+        return
+    _last_push = now
+    instance = os.getenv("AWS_LAMBDA_LOG_STREAM_NAME") or f"{os.uname().nodename}:{os.getpid()}"
+    try:
+        pushadd_to_gateway(PUSHGATEWAY_URL, job="geoguide-api",
+                           grouping_key={"instance": instance}, registry=REGISTRY, timeout=2)
+    except Exception as e:
+        logger.warning("[metrics] push failed: %s", e)
+
+def should_push() -> bool:
+    return bool(PUSHGATEWAY_URL) and _IN_LAMBDA
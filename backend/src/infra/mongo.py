@@ -0,0 +1,129 @@
+# backend/src/infra/mongo.py
+"""
+Opzioni del MongoClient e profili di accesso per collezione.
+
+Client (`client_options`):
+- pool dimensionato per l'ambiente: su Lambda un container serve una
+  richiesta alla volta e viene congelato fra un'invocazione e l'altra, quindi
+  pool piccolo e nessuna connessione minima; sui worker pool ampio con qualche
+  connessione sempre pronta;
+- compressione del protocollo (zstd/snappy/zlib), solo con i codec installati;
+- retryable reads/writes espliciti.
+
+Profili (`PROFILES`, scelti dai model con `infra.db.collection(name, profile)`):
+read preference, read concern e write concern per tipo di operazione. Le
+letture tolleranti a qualche secondo di ritardo (nearby, contenuti,
+analytics) vanno ai secondari; `MONGO_SECONDARY_READS=false` le riporta
+tutte sul primario, `MONGO_READ_PROFILES="nearby=nearest,..."` cambia la
+read preference di un profilo senza toccare il codice.
+"""
+from __future__ import annotations
+import importlib.util
+from dataclasses import dataclass, replace
+
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import (Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred)
+from pymongo.write_concern import WriteConcern
+
+LAMBDA_POOL = (10, 0, 60_000)       # max, min, maxIdleTimeMS
+WORKER_POOL = (100, 5, 300_000)
+
+# codec del protocollo -> modulo Python che lo implementa
+_CODECS = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+# ---------- client ----------
+def compressors(requested: str) -> list[str]:
+    """Codec richiesti (in ordine di preferenza) e davvero disponibili."""
+    out = []
+    for c in (x.strip().lower() for x in (requested or "").split(",")):
+        mod = _CODECS.get(c)
+        if mod and c not in out and importlib.util.find_spec(mod) is not None:
+            out.append(c)
+    return out
+
+
+def client_options(s, in_lambda: bool) -> dict:
+    max_pool, min_pool, idle_ms = LAMBDA_POOL if in_lambda else WORKER_POOL
+    opts = {
+        "serverSelectionTimeoutMS": s.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "maxPoolSize": s.MONGO_MAX_POOL_SIZE if s.MONGO_MAX_POOL_SIZE is not None else max_pool,
+        "minPoolSize": s.MONGO_MIN_POOL_SIZE if s.MONGO_MIN_POOL_SIZE is not None else min_pool,
+        "maxIdleTimeMS": s.MONGO_MAX_IDLE_TIME_MS if s.MONGO_MAX_IDLE_TIME_MS is not None else idle_ms,
+        "maxConnecting": s.MONGO_MAX_CONNECTING,
+        "waitQueueTimeoutMS": s.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "retryWrites": s.MONGO_RETRY_WRITES,
+        "retryReads": s.MONGO_RETRY_READS,
+        "appname": s.MONGO_APPNAME,
+    }
+    codecs = compressors(s.MONGO_COMPRESSORS)
+    if codecs:
+        opts["compressors"] = ",".join(codecs)
+        if "zlib" in codecs:
+            opts["zlibCompressionLevel"] = s.MONGO_ZLIB_LEVEL
+    return opts
+
+
+# ---------- profili ----------
+@dataclass(frozen=True)
+class Profile:
+    read: str = "primary"               # primary | primaryPreferred | secondaryPreferred | secondary | nearest
+    concern: str | None = None          # local | majority | available (None = default del server)
+    w: int | str | None = None          # None = default del client
+    replica: bool = False               # legge dai secondari (disattivabile con MONGO_SECONDARY_READS)
+
+
+PROFILES = {
+    "primary":   Profile(),
+    "nearby":    Profile(read="secondaryPreferred", concern="local", replica=True),   # geo/POI
+    "content":   Profile(read="secondaryPreferred", concern="local", replica=True),   # doc, narrazioni
+    "analytics": Profile(read="secondaryPreferred", concern="local", replica=True),   # log e rollup
+    "strong":    Profile(read="primary", concern="majority", w="majority"),          # utenti, config
+}
+
+_MODES = {"primary": Primary, "primaryPreferred": PrimaryPreferred, "secondaryPreferred": SecondaryPreferred,
+          "secondary": Secondary, "nearest": Nearest}
+
+
+def _overrides(spec: str) -> dict[str, str]:
+    out = {}
+    for part in (spec or "").split(","):
+        name, _, mode = part.partition("=")
+        if name.strip() and mode.strip() in _MODES:
+            out[name.strip()] = mode.strip()
+    return out
+
+
+def resolve(profile: str, s) -> Profile:
+    p = PROFILES[profile]
+    mode = _overrides(s.MONGO_READ_PROFILES).get(profile)
+    if mode:
+        p = replace(p, read=mode, replica=mode != "primary")
+    if p.replica and not s.MONGO_SECONDARY_READS:
+        p = replace(p, read="primary", replica=False)
+    return p
+
+
+def read_preference(p: Profile, max_staleness: int):
+    cls = _MODES[p.read]
+    if cls is Primary:
+        return Primary()
+    return cls(max_staleness=max_staleness if max_staleness > 0 else -1)
+
+
+_cache: dict[tuple[str, str], object] = {}
+
+
+def profiled(coll, profile: str, s):
+    """La stessa collezione con le opzioni del profilo (istanze in cache: `with_options` non è gratis)."""
+    k = (coll.full_name, profile)
+    out = _cache.get(k)
+    if out is None:
+        p = resolve(profile, s)
+        opts = {"read_preference": read_preference(p, s.MONGO_MAX_STALENESS_SECS)}
+        if p.concern:
+            opts["read_concern"] = ReadConcern(p.concern)
+        if p.w is not None:
+            opts["write_concern"] = WriteConcern(w=p.w)
+        out = _cache[k] = coll.with_options(**opts)
+    return out
@@ -0,0 +1,173 @@
+# backend/src/infra/oidc.py
+"""
+Verifica dei JWT OIDC con JWKS in cache.
+
+- Il key set si scarica una volta e si tiene `OIDC_JWKS_CACHE_SECS`; un
+  `kid` sconosciuto forza un refresh (rotazione chiavi), al massimo uno ogni
+  `OIDC_JWKS_MIN_REFRESH_SECS` per non farsi martellare da token inventati.
+- I claims già verificati stanno in un LRU indicizzato per hash del token
+  fino a `exp`: le chiamate successive con lo stesso token non rifanno la
+  verifica della firma.
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from jose import jwt, JWTError
+
+from .metrics import cache_result, outbound
+from .settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ["RS256", "RS384", "RS512", "ES256", "ES384", "PS256"]
+
+
+class TokenError(Exception):
+    pass
+
+
+# ---------- JWKS ----------
+class JWKSCache:
+    def __init__(self, url: str, ttl: float = 3600, min_refresh: float = 30, timeout: float = 5):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self.timeout = timeout
+        self._keys: dict[str, dict] = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch(self) -> dict[str, dict]:
+        with outbound("oidc") as o:
+            r = httpx.get(self.url, timeout=self.timeout)
+            o.status = r.status_code
+        r.raise_for_status()
+        return {k["kid"]: k for k in r.json().get("keys", []) if k.get("kid")}
+
+    def refresh(self, force: bool = False) -> bool:
+        with self._lock:
+            age = time.monotonic() - self._fetched_at
+            if self._keys and age < (self.min_refresh if force else self.ttl):
+                return False
+            if not self._keys and self._fetched_at and age < self.min_refresh:
+                raise TokenError("JWKS unavailable")    # IdP giù: non ritentare a ogni richiesta
+            try:
+                self._keys = self._fetch()
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning("[oidc] JWKS non disponibile (%s): %s", self.url, e)
+                if not self._keys:
+                    raise TokenError("JWKS unavailable") from e
+                return False
+            finally:
+                self._fetched_at = time.monotonic()
+            return True
+
+    def get(self, kid: str | None) -> dict:
+        if not self._keys or time.monotonic() - self._fetched_at >= self.ttl:
+            self.refresh()
+        key = self._keys.get(kid) if kid else (next(iter(self._keys.values())) if len(self._keys) == 1 else None)
+        if key is None and self.refresh(force=True):   # kid nuovo: chiavi ruotate
+            key = self._keys.get(kid)
+        if key is None:
+            raise TokenError("Unknown signing key")
+        return key
+
+
+# ---------- claims verificati ----------
+class ClaimsCache:
+    """LRU token-hash -> claims, valido fino a `exp`."""
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._d: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str, now: float | None = None) -> dict | None:
+        k = self.key(token)
+        now = time.time() if now is None else now
+        with self._lock:
+            hit = self._d.get(k)
+            if hit is None:
+                return None
+            if hit[0] <= now:
+                del self._d[k]
+                return None
+            self._d.move_to_end(k)
+            return hit[1]
+
+    def put(self, token: str, claims: dict):
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return                                  # senza exp non si mette in cache
+        with self._lock:
+            self._d[self.key(token)] = (float(exp), claims)
+            self._d.move_to_end(self.key(token))
+            while len(self._d) > self.maxsize:
+                self._d.popitem(last=False)
+
+    def __len__(self):
+        return len(self._d)
+
+
+class Verifier:
+    def __init__(self, jwks: JWKSCache, issuer: str | None, audience: str | None = None,
+                 cache: ClaimsCache | None = None):
+        self.jwks = jwks
+        self.issuer = issuer
+        self.audience = audience
+        self.cache = cache or ClaimsCache()
+
+    def verify(self, token: str) -> dict:
+        claims = self.cache.get(token)
+        cache_result("auth_claims", claims is not None)
+        if claims is not None:
+            return claims
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            raise TokenError("Malformed token") from e
+        if header.get("alg") not in ALGORITHMS:
+            raise TokenError("Unsupported alg")
+        key = self.jwks.get(header.get("kid"))
+        try:
+            claims = jwt.decode(token, key, algorithms=[header["alg"]], issuer=self.issuer,
+                                audience=self.audience,
+                                options={"verify_aud": bool(self.audience), "verify_at_hash": False})
+        except JWTError as e:
+            raise TokenError(str(e)) from e
+        self.cache.put(token, claims)
+        return claims
+
+
+_verifier: Verifier | None = None
+
+
+def verifier() -> Verifier:
+    global _verifier
+    if _verifier is None:
+        s = get_settings()
+        if not s.OIDC_ISS:
+            raise TokenError("OIDC not configured")
+        url = s.OIDC_JWKS_URL or f"{s.OIDC_ISS}/protocol/openid-connect/certs"
+        _verifier = Verifier(JWKSCache(url, ttl=s.OIDC_JWKS_CACHE_SECS, min_refresh=s.OIDC_JWKS_MIN_REFRESH_SECS),
+                             issuer=s.OIDC_ISS, audience=s.OIDC_AUDIENCE,
+                             cache=ClaimsCache(s.AUTH_CLAIMS_CACHE_SIZE))
+    return _verifier
+
+
+def verify(token: str) -> dict:
+    return verifier().verify(token)
+
+
+def cached_claims(token: str) -> dict | None:
+    """Claims già verificati per questo token, senza verifiche né I/O."""
+    return _verifier.cache.get(token) if _verifier is not None else None
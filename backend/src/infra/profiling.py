@@ -0,0 +1,290 @@
+# backend/src/infra/profiling.py
+"""
+Profilazione opt-in per singola richiesta.
+
+Si attiva con l'header `X-Profile: <unix_ts>.<hmac_sha256(PROFILE_SECRET, unix_ts)>`
+(valido PROFILE_TOKEN_TTL_SECS) oppure a campione con PROFILE_SAMPLE_RATE.
+Durante la richiesta:
+- un thread campiona ogni PROFILE_INTERVAL_MS (sys._current_frames, nessun
+  hook per-chiamata) i thread che stanno lavorando per la richiesta: il
+  thread del threadpool di un handler sincrono, i job di `aio.run` e di
+  `run_in_threadpool`, e per gli handler async l'event loop, ma solo mentre
+  sullo stack c'è la coroutine dell'handler (non le altre richieste servite
+  dallo stesso loop). Gli handler si agganciano con `SampledRoute`;
+- ogni comando Mongo e ogni chiamata HTTP in uscita diventa uno span.
+Il risultato è un JSON Chrome-trace (apribile con Perfetto o speedscope)
+salvato per request id.
+"""
+from __future__ import annotations
+import asyncio
+import functools
+import hashlib
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+from starlette.concurrency import run_in_threadpool as _starlette_threadpool
+
+PROFILE_SECRET = os.getenv("PROFILE_SECRET")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_TOKEN_TTL_SECS = 300
+MAX_SAMPLES = 20000
+MAX_DEPTH = 64
+
+_current: ContextVar["Profile | None"] = ContextVar("geoguide_profile", default=None)
+
+
+def sign(ts: int | None = None, secret: str | None = None) -> str:
+    """Genera il valore per l'header X-Profile (uso: script/ops)."""
+    ts = int(ts if ts is not None else time.time())
+    key = (secret or PROFILE_SECRET or "").encode()
+    return f"{ts}.{hmac.new(key, str(ts).encode(), hashlib.sha256).hexdigest()}"
+
+
+def verify(token: str | None, secret: str | None = None, now: float | None = None) -> bool:
+    secret = secret or PROFILE_SECRET
+    if not (token and secret and "." in token):
+        return False
+    ts, _, mac = token.partition(".")
+    if not ts.isdigit() or abs((now or time.time()) - int(ts)) > PROFILE_TOKEN_TTL_SECS:
+        return False
+    return hmac.compare_digest(sign(int(ts), secret), token)
+
+
+def should_profile(header: str | None) -> bool:
+    if verify(header):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class Profile:
+    def __init__(self, request_id: str, name: str = "request", interval_ms: float = PROFILE_INTERVAL_MS):
+        self.request_id = request_id
+        self.name = name
+        self.interval = max(0.001, interval_ms / 1000.0)
+        self.t0 = time.perf_counter()
+        self.duration = 0.0
+        self.spans: list[tuple] = []           # (name, cat, start_s, dur_s, args)
+        self.samples: list[tuple] = []         # (t_s, thread_id, (frame, ...)) radice -> foglia
+        self._threads: dict[int, object] = {}  # thread campionati -> frame di ancoraggio (None: tutto lo stack)
+        self._names: dict[int, str] = {}
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    # ---------- span ----------
+    def add_span(self, name: str, cat: str, start: float, dur: float, args: dict | None = None):
+        self.spans.append((name, cat, start - self.t0, dur, args or {}))
+
+    # ---------- campionamento ----------
+    def start(self, thread_id: int | None = None, sample: bool = True):
+        """sample=False: nessun thread da campionare finché non se ne aggancia uno con `on_this_thread`."""
+        if sample:
+            self.attach(thread_id or threading.get_ident())
+        self._sampler = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._sampler.start()
+
+    def attach(self, thread_id: int, anchor=None):
+        """Campiona `thread_id`; con `anchor` solo i campioni che lo contengono, dall'anchor in giù."""
+        prev = self._threads.get(thread_id, _NOT_SAMPLED)
+        self._threads[thread_id] = anchor
+        self._names.setdefault(thread_id, _thread_name(thread_id))
+        return prev
+
+    def detach(self, thread_id: int, prev=None):
+        if prev is _NOT_SAMPLED:
+            self._threads.pop(thread_id, None)
+        else:
+            self._threads[thread_id] = prev
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join(timeout=1)
+        self.duration = time.perf_counter() - self.t0
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if len(self.samples) >= MAX_SAMPLES:
+                return
+            if not self._threads:
+                continue
+            frames = sys._current_frames()
+            t = time.perf_counter() - self.t0
+            for tid, anchor in list(self._threads.items()):
+                f = frames.get(tid)
+                if f is None or tid == me:
+                    continue
+                chain = []
+                while f is not None:
+                    chain.append(f)
+                    if f is anchor:
+                        break
+                    f = f.f_back
+                if anchor is not None and chain[-1] is not anchor:
+                    continue                   # il loop sta servendo un'altra richiesta
+                self.samples.append((t, tid, tuple(_label(f) for f in reversed(chain[:MAX_DEPTH]))))
+
+    # ---------- export ----------
+    def to_chrome_trace(self) -> dict:
+        """Span su tid 1, un flame chart per thread campionato da tid 2 (tempi in µs)."""
+        us = lambda s: round(s * 1e6, 1)
+        ev = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": "spans"}},
+              {"name": self.name, "cat": "request", "ph": "X", "pid": 1, "tid": 1,
+               "ts": 0, "dur": us(self.duration), "args": {"request_id": self.request_id}}]
+        for name, cat, start, dur, args in self.spans:
+            ev.append({"name": name, "cat": cat, "ph": "X", "pid": 1, "tid": 1,
+                       "ts": us(start), "dur": us(dur), "args": args})
+        for track, tid in enumerate(dict.fromkeys(t for _, t, _ in self.samples), start=2):
+            ev.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": track,
+                       "args": {"name": f"samples {self._names.get(tid, tid)}"}})
+            ev.extend(_flame([(t, st) for t, th, st in self.samples if th == tid], self.interval, us, track))
+        return {"traceEvents": ev, "displayTimeUnit": "ms",
+                "otherData": {"request_id": self.request_id, "samples": len(self.samples),
+                              "interval_ms": self.interval * 1000}}
+
+
+_NOT_SAMPLED = object()
+
+
+def _label(f) -> str:
+    c = f.f_code
+    return f"{c.co_name} ({os.path.basename(c.co_filename)}:{c.co_firstlineno})"
+
+
+def _thread_name(tid: int) -> str:
+    return next((t.name for t in threading.enumerate() if t.ident == tid), str(tid))
+
+
+def _flame(samples: list[tuple], interval: float, us, tid: int = 2) -> list[dict]:
+    """Fonde campioni consecutivi con lo stesso prefisso in eventi "X" per profondità."""
+    out: list[dict] = []
+    open_: list[list] = []                     # [frame, start]
+    last_t = 0.0
+    for t, stack in samples:
+        i = 0
+        while i < len(open_) and i < len(stack) and open_[i][0] == stack[i]:
+            i += 1
+        for frame, start in reversed(open_[i:]):
+            out.append({"name": frame, "cat": "sample", "ph": "X", "pid": 1, "tid": tid,
+                        "ts": us(start), "dur": us(max(t - start, interval))})
+        del open_[i:]
+        for frame in stack[i:]:
+            open_.append([frame, t])
+        last_t = t
+    for frame, start in reversed(open_):
+        out.append({"name": frame, "cat": "sample", "ph": "X", "pid": 1, "tid": tid,
+                    "ts": us(start), "dur": us(max(last_t + interval - start, interval))})
+    return out
+
+
+# ---------- API per gli strumenti ----------
+def current() -> Profile | None:
+    return _current.get()
+
+
+def activate(p: Profile):
+    return _current.set(p)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def on_this_thread(anchor=None):
+    """Il thread corrente lavora per la richiesta profilata (se c'è): va campionato finché dura."""
+    p = _current.get()
+    if p is None:
+        yield
+        return
+    tid = threading.get_ident()
+    prev = p.attach(tid, anchor)
+    try:
+        yield
+    finally:
+        p.detach(tid, prev)
+
+
+def call_sampled(fn, *args, **kwargs):
+    """fn(*args, **kwargs) con il thread corrente campionato: per i job in un pool di thread."""
+    with on_this_thread():
+        return fn(*args, **kwargs)
+
+
+async def run_in_threadpool(fn, *args, **kwargs):
+    """`starlette.concurrency.run_in_threadpool` con il job campionato."""
+    return await _starlette_threadpool(call_sampled, fn, *args, **kwargs)
+
+
+def sampled(fn):
+    """Handler campionato: sincrono nel thread che lo esegue, async nel loop finché gira la sua coroutine."""
+    if getattr(fn, "_sampled", False):
+        return fn
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def run(*args, **kwargs):
+            with on_this_thread(anchor=sys._getframe()):
+                return await fn(*args, **kwargs)
+    else:
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            return call_sampled(fn, *args, **kwargs)
+    run._sampled = True
+    return run
+
+
+class SampledRoute(APIRoute):
+    """route_class dei router: l'endpoint è avvolto da `sampled` alla registrazione."""
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, sampled(endpoint), **kwargs)
+
+
+@contextmanager
+def span(name: str, cat: str = "app", **args):
+    """Span esplicito; costo nullo se la richiesta non è profilata."""
+    p = _current.get()
+    if p is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        p.add_span(name, cat, t0, time.perf_counter() - t0, args)
+
+
+class MongoSpans(monitoring.CommandListener):
+    """Uno span per comando, solo per le richieste profilate."""
+    def __init__(self):
+        self._open: dict[tuple, tuple] = {}
+
+    def started(self, event):
+        p = _current.get()
+        if p is None:
+            return
+        cmd = event.command_name
+        coll = event.command.get(cmd)
+        self._open[(event.request_id, event.connection_id)] = (p, time.perf_counter(), coll if isinstance(coll, str) else None)
+
+    def _done(self, event, ok: bool):
+        st = self._open.pop((event.request_id, event.connection_id), None)
+        if st is None:
+            return
+        p, t0, coll = st
+        name = f"mongo {event.command_name}" + (f" {coll}" if coll else "")
+        p.add_span(name, "mongo", t0, time.perf_counter() - t0, {"ok": ok})
+
+    def succeeded(self, event):
+        self._done(event, True)
+
+    def failed(self, event):
+        self._done(event, False)
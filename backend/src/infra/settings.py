@@ -1,5 +1,5 @@
 from __future__ import annotations
-import os, time
+import os
 from pathlib import Path
 from typing import Optional, Literal, Dict, Any
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -7,6 +7,10 @@ from pydantic import Field
 from dotenv import load_dotenv
 from pymongo import MongoClient
 import certifi
+from .metrics import MongoCommandMetrics, MongoPoolMetrics
+from .mongo import client_options
+from .profiling import MongoSpans
+from .config_store import ConfigStore, Snapshot
 
 # --- percorsi .env (root progetto) ---
 # file attuale: backend/src/infra/settings.py -> root = parents[3]
@@ -26,9 +30,26 @@ class Settings(BaseSettings):
     ENV: Literal["local","staging","prod"] = Field(default=STAGE)
     STAGE: Literal["local","staging","prod"] = Field(default=STAGE)
     MONGO_URI: str = "mongodb://localhost:27017"
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 8000
     DB_NAME_BASE: str = "geo_guide"
     DB_NAME: Optional[str] = None
 
+    # MongoClient (infra/mongo): pool per ambiente, compressione, retry, profili di lettura
+    MONGO_MAX_POOL_SIZE: Optional[int] = None       # None = 10 su Lambda, 100 sui worker
+    MONGO_MIN_POOL_SIZE: Optional[int] = None       # None = 0 su Lambda, 5 sui worker
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGO_MAX_CONNECTING: int = 2
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None   # attesa massima di una connessione libera
+    MONGO_COMPRESSORS: str = "zstd,snappy,zlib"     # solo quelli installati
+    MONGO_ZLIB_LEVEL: int = 6
+    MONGO_RETRY_WRITES: bool = True
+    MONGO_RETRY_READS: bool = True
+    MONGO_APPNAME: str = "geoguide-api"
+    MONGO_SECONDARY_READS: bool = True              # false = profili nearby/content/analytics sul primario
+    MONGO_MAX_STALENESS_SECS: int = 120             # secondari più indietro esclusi (min 90, <=0 = nessun limite)
+    MONGO_READ_PROFILES: str = ""                   # override: "nearby=nearest,analytics=secondary"
+    MONGO_ASYNC_THREADS: Optional[int] = None       # thread per le route async (infra/aio); None = maxPoolSize
+
     # OIDC (per /auth)
     OIDC_ISS: Optional[str] = None              # es: https://auth.example.com/realms/xyz
     OIDC_CLIENT_ID: Optional[str] = None
@@ -36,19 +57,96 @@ class Settings(BaseSettings):
     OIDC_PROVIDER: Optional[str] = "keycloak"   # libero
     OIDC_TOKEN_URL: Optional[str] = None        # se non valorizzato -> {ISS}/protocol/openid-connect/token
     OIDC_AUTH_URL: Optional[str] = None         # se non valorizzato -> {ISS}/protocol/openid-connect/auth
+    OIDC_JWKS_URL: Optional[str] = None         # se non valorizzato -> {ISS}/protocol/openid-connect/certs
+    OIDC_AUDIENCE: Optional[str] = None         # se valorizzato verifica `aud`
+    OIDC_JWKS_CACHE_SECS: int = 3600
+    OIDC_JWKS_MIN_REFRESH_SECS: int = 30        # refresh su kid sconosciuto, al massimo ogni N s
+    AUTH_CLAIMS_CACHE_SIZE: int = 10000         # LRU claims verificati (fino a exp)
+    USER_SYNC_FLUSH_SECS: float = 5.0           # write-behind profilo utente
 
     # Limiti
     POI_DEFAULT_RADIUS_M: int = 50
+    NEARBY_MAX_RADIUS_M: int = 5000         # raggio /nearby oltre cui si taglia (costo Overpass e riconciliazione)
     NARRATION_MAX_CHARS: int = 1200
+    NARRATION_DERIVE_ENABLED: bool = True           # narrazione tradotta da un'altra lingua già in cache
+    NARRATION_DERIVE_MIN_CONFIDENCE: float = 0.8    # solo da narrazioni complete e affidabili
 
     # app_config refresh
     APP_CONFIG_CACHE_SECS: int = 60
 
+    # usage_logs: buffer batch in-process
+    LOG_BUFFER_MAX_BATCH: int = 200
+    LOG_BUFFER_FLUSH_SECS: float = 2.0
+    LOG_BUFFER_MAX_SIZE: int = 5000
+    LOG_BATCH_MAX_EVENTS: int = 500
+    USAGE_LOG_TTL_SECS: int = 24*3600
+
+    # admission control: token bucket per client e AIMD per provider esterni
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_DEFAULT_RPS: float = 10.0
+    RATE_DEFAULT_BURST: int = 40
+    RATE_EXPENSIVE_RPS: float = 0.5        # /nearby, /narration
+    RATE_EXPENSIVE_BURST: int = 10
+    RATE_TRUSTED_PROXY_HOPS: int = 0        # proxy fidati davanti all'app (0 = indirizzo del peer, XFF ignorato)
+    OUTBOUND_INITIAL_CONCURRENCY: int = 8
+    OUTBOUND_MAX_CONCURRENCY: int = 32
+    OUTBOUND_MAX_WAIT_SECS: float = 1.0     # attesa massima di uno slot prima del 429
+    OUTBOUND_SLOW_SECS: float = 5.0         # oltre = segnale di congestione
+    OUTBOUND_LOW_PRIORITY_SHARE: float = 0.7
+
+    # Overpass: mirror separati da virgola (vuoto = OVERPASS_URL o i default pubblici)
+    OVERPASS_URLS: str = ""
+    OVERPASS_PROFILE: str = "tourism"       # tourism | historic | all_named (services/osm_service.PROFILES)
+    OVERPASS_TIMEOUT_SECS: float = 25.0
+    OVERPASS_BREAKER_FAILURES: int = 3
+    OVERPASS_BREAKER_COOLDOWN_SECS: float = 30.0
+    OVERPASS_HEDGE_MIN_SECS: float = 0.3    # l'hedge parte al p90 del mirror, entro questi limiti
+    OVERPASS_HEDGE_MAX_SECS: float = 5.0
+
+    # riconciliazione POI OSM per tile (models/osm_tile)
+    RECON_TILE_ZOOM: int = 18               # ~110 m di lato alle nostre latitudini
+    RECON_TOMBSTONE_GRACE_DAYS: int = 14    # sparito da OSM: disattivato solo dopo questo periodo
+    RECON_MAX_TILES: int = 1500             # ricerche più ampie (bbox in tile) non riconciliano
+
+    # /poi/search: indice nomi in memoria, riallineato su updated_at
+    NAME_INDEX_SYNC_SECS: int = 60
+
+    # /poi/{id}/ask: retrieval BM25 sui passaggi dei poi_docs
+    ASK_TOP_K: int = 4                      # passaggi nel prompt
+    ASK_MAX_CONTEXT_CHARS: int = 2400       # tetto al materiale nel prompt
+    ASK_INDEX_CACHE_SIZE: int = 256         # indici per POI tenuti in memoria
+
+    # doc_blobs: testi decompressi tenuti in memoria (caratteri)
+    DOC_BLOB_CACHE_CHARS: int = 8_000_000
+
+    # wiki_pages: entro questo tempo la pagina in cache si usa senza chiedere la revisione
+    WIKI_PAGE_FRESH_SECS: int = 6 * 3600
+
+    # refresh in background delle aree richieste (services/refresher)
+    REFRESH_ENABLED: bool = True
+    REFRESH_TILE_ZOOM: int = 15             # ~1 km di lato: una query Overpass per tile
+    REFRESH_INTERVAL_SECS: int = 300
+    REFRESH_DEMAND_WINDOW_HOURS: int = 24   # non oltre USAGE_LOG_TTL_SECS
+    REFRESH_DEMAND_HALF_LIFE_HOURS: float = 6.0
+    REFRESH_MIN_DEMAND: float = 2.0         # sotto, la tile si lascia alle richieste interattive
+    REFRESH_MIN_AGE_HOURS: float = 24.0     # tile più giovani non si rinfrescano (ben prima di SEARCH_TTL_DAYS)
+    REFRESH_OVERPASS_PER_RUN: int = 10      # budget per giro: query Overpass (una per tile)
+    REFRESH_WIKI_PER_RUN: int = 100         # budget per giro: POI nuovi da arricchire + pagine da riverificare
+    REFRESH_LEASE_SECS: int = 600
+    REFRESH_RETRY_SECS: int = 1800          # backoff dopo un refresh fallito (raddoppia a ogni fallimento)
+
+    # /tiles/{z}/{x}/{y}: tile cacheabili da CDN
+    TILE_MIN_ZOOM: int = 12
+    TILE_MAX_ZOOM: int = 19
+    TILE_MAX_POIS: int = 500
+    TILE_MAX_AGE_SECS: int = 300          # browser
+    TILE_CDN_MAX_AGE_SECS: int = 86400    # CloudFront (s-maxage)
+
     model_config = SettingsConfigDict(env_file=None, extra="allow")
 
 _settings: Settings | None = None
-_cfg_cache: Dict[str, Any] | None = None
-_cfg_exp: float = 0.0
+_effective: tuple | None = None   # (snapshot app_config, Settings con i limiti applicati)
+_store: ConfigStore | None = None
 _mongo_client: MongoClient | None = None
 
 def _db_name(s):
@@ -63,36 +161,63 @@ from pymongo import MongoClient
 
 _mongo_client = None
 
+def _env_settings() -> Settings:
+    """Solo env/.env: nessun accesso a Mongo (sicuro all'import dei moduli)."""
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
 def get_db():
     """Crea client Mongo con CA bundle per connessione sicura"""
-    s = get_settings()
+    s = _env_settings()
     global _mongo_client
     if _mongo_client is None:
         kwargs = {
-            "serverSelectionTimeoutMS": 8000,
-            "tlsCAFile": certifi.where()  # 🔹 Forza certificati validi sempre
+            **client_options(s, in_lambda=bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))),
+            "tlsCAFile": certifi.where(),  # 🔹 Forza certificati validi sempre
+            "event_listeners": [MongoCommandMetrics(), MongoPoolMetrics(), MongoSpans()],
         }
         _mongo_client = MongoClient(s.MONGO_URI, **kwargs)
     return _mongo_client[_db_name(s)]
 
-def _load_app_config(s: Settings) -> Dict[str, Any]:
-    global _cfg_cache, _cfg_exp
-    now = time.time()
-    if _cfg_cache and now < _cfg_exp:
-        return _cfg_cache
-    doc = get_db()["app_config"].find_one({}, sort=[("version",-1)]) or {}
-    flags  = doc.get("flags", {}) or {}
-    limits = doc.get("limits", {}) or {}
-    llm    = doc.get("llm", {}) or {}
-    _cfg_cache = {"flags": flags, "limits": limits, "llm": llm}
-    _cfg_exp   = now + get_settings().APP_CONFIG_CACHE_SECS
-    return _cfg_cache
+# ---------- app_config ----------
+_HEAD = {"version": 1, "updated_at": 1}
+
+def _load_app_config(head_only: bool = False) -> Dict[str, Any] | None:
+    return get_db()["app_config"].find_one({}, _HEAD if head_only else None, sort=[("version",-1)])
+
+def _watch_app_config():
+    return get_db()["app_config"].watch(max_await_time_ms=1000)
+
+def config_store() -> ConfigStore:
+    """Store unico di app_config (lazy: nessun accesso a Mongo all'import)."""
+    global _store
+    if _store is None:
+        _store = ConfigStore(_load_app_config, poll_secs=_env_settings().APP_CONFIG_CACHE_SECS,
+                             watch=_watch_app_config)
+    return _store
+
+def _with_limits(s: Settings, snap: Snapshot) -> Settings:
+    lim = snap.limits
+    return s.model_copy(update={
+        "POI_DEFAULT_RADIUS_M": int(lim.get("poi_radius_m", s.POI_DEFAULT_RADIUS_M)),
+        "NARRATION_MAX_CHARS":  int(lim.get("narration_max_chars", s.NARRATION_MAX_CHARS)),
+    })
 
 def get_settings() -> Settings:
-    global _settings
-    if _settings is None:
-        _settings = Settings()
-        cfg = _load_app_config(_settings)
-        _settings.POI_DEFAULT_RADIUS_M = int(cfg.get("limits",{}).get("poi_radius_m", _settings.POI_DEFAULT_RADIUS_M))
-        _settings.NARRATION_MAX_CHARS  = int(cfg.get("limits",{}).get("narration_max_chars", _settings.NARRATION_MAX_CHARS))
-    return _settings
\ No newline at end of file
+    """Settings da env + limiti dall'ultima versione di app_config.
+
+    Ogni nuova versione produce una nuova istanza (scambio atomico): chi ha
+    già in mano un Settings non vede mai limiti a metà aggiornamento."""
+    global _effective
+    snap = config_store().current()
+    eff = _effective
+    if eff is None or eff[0] is not snap:
+        eff = (snap, _with_limits(_env_settings(), snap))
+        _effective = eff
+    return eff[1]
+
+def flag(name: str, default: Any = None) -> Any:
+    """Feature flag dall'ultima versione di app_config."""
+    return config_store().current().flags.get(name, default)
\ No newline at end of file
@@ -3,9 +3,14 @@ from .poi_doc import ensure_indexes as _poidoc_idx
 from .narration_cache import ensure_indexes as _ncache_idx
 from .user_contrib import ensure_indexes as _ucontrib_idx
 from .usage_log import ensure_indexes as _ulog_idx
+from .usage_rollup import ensure_indexes as _urollup_idx
 from .user import ensure_indexes as _user_idx
 from .app_config import ensure_indexes as _appcfg_idx
 from .enrich_cache import ensure_indexes as _enrich_idx
+from .request_profile import ensure_indexes as _rprof_idx
+from .osm_tile import ensure_indexes as _osmtile_idx
+from .doc_blob import ensure_indexes as _docblob_idx
+from .wiki_page import ensure_indexes as _wikipage_idx
 
 def ensure_all_indexes():
-    _poi_idx(); _poidoc_idx(); _ncache_idx(); _ucontrib_idx(); _ulog_idx(); _user_idx(); _appcfg_idx(); _enrich_idx()
\ No newline at end of file
+    _poi_idx(); _poidoc_idx(); _ncache_idx(); _ucontrib_idx(); _ulog_idx(); _urollup_idx(); _user_idx(); _appcfg_idx(); _enrich_idx(); _rprof_idx(); _osmtile_idx(); _docblob_idx(); _wikipage_idx()
\ No newline at end of file
@@ -0,0 +1,83 @@
+# backend/src/models/area_tile.py
+"""
+Stato per tile (z = REFRESH_TILE_ZOOM) del refresh in background.
+
+- `demand`/`demand_at`: domanda recente (decadimento esponenziale) calcolata
+  dagli eventi `poi.nearby` in usage_logs;
+- `refreshed_at`: ultimo refresh completo della tile (Overpass sull'intera
+  tile): entro SEARCH_TTL_DAYS /nearby risponde dalla cache;
+- `data_at`: età stimata dai `last_refresh_at` dei POI, solo per dare una
+  priorità alle tile mai rinfrescate;
+- `lease_until`: la tile è in lavorazione su un processo (più worker non
+  spendono due volte il budget Overpass sulla stessa tile);
+- `failures`/`failed_at`: backoff dopo refresh falliti.
+"""
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from ..infra.db import area_tiles, collection
+from ..utils import tiles
+
+# nessun indice oltre _id: si legge sempre per chiave
+
+_pois = collection("pois", "nearby")
+
+
+def key(z: int, x: int, y: int) -> str:
+    return f"{z}/{x}/{y}"
+
+
+def get_many(z: int, xys) -> dict[tuple[int, int], dict]:
+    ids = [key(z, x, y) for x, y in xys]
+    return {(d["x"], d["y"]): d for d in area_tiles.find({"_id": {"$in": ids}})} if ids else {}
+
+
+def fresh(z: int, xys, since: datetime) -> bool:
+    """True se tutte le tile sono state rinfrescate per intero dopo `since`."""
+    ids = [key(z, x, y) for x, y in xys]
+    if not ids:
+        return False
+    return area_tiles.count_documents({"_id": {"$in": ids}, "refreshed_at": {"$gte": since}}) == len(ids)
+
+
+def seed_age(z: int, x: int, y: int) -> datetime | None:
+    """Il `last_refresh_at` più vecchio fra i POI attivi della tile (None = tile vuota)."""
+    cur = _pois.find({"location": {"$geoWithin": {"$geometry": tiles.polygon(z, x, y)}}, "is_active": True,
+                     "last_refresh_at": {"$type": "date"}}, {"last_refresh_at": 1})
+    doc = next(iter(cur.sort("last_refresh_at", 1).limit(1)), None)
+    return doc["last_refresh_at"] if doc else None
+
+
+def set_demand(z: int, demand: dict[tuple[int, int], float], now: datetime, data_at: dict | None = None) -> int:
+    """Scrive la domanda corrente (ed eventualmente `data_at`) delle tile; crea quelle nuove."""
+    data_at = data_at or {}
+    ops = []
+    for (x, y), d in demand.items():
+        fields = {"z": z, "x": x, "y": y, "demand": round(d, 3), "demand_at": now}
+        if (x, y) in data_at:
+            fields["data_at"] = data_at[(x, y)]
+        ops.append(UpdateOne({"_id": key(z, x, y)}, {"$set": fields, "$setOnInsert": {"created_at": now}},
+                             upsert=True))
+    if ops:
+        area_tiles.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def claim(z: int, x: int, y: int, now: datetime, lease: timedelta) -> bool:
+    res = area_tiles.update_one({"_id": key(z, x, y), "$or": [{"lease_until": {"$exists": False}},
+                                                               {"lease_until": {"$lt": now}}]},
+                                {"$set": {"lease_until": now + lease}})
+    return res.modified_count == 1
+
+
+def done(z: int, x: int, y: int, now: datetime, ok: bool, stats: dict | None = None):
+    if ok:
+        update = {"$set": {"refreshed_at": now, "failures": 0, "last_stats": stats or {}},
+                  "$unset": {"lease_until": "", "failed_at": ""}}
+    else:
+        update = {"$set": {"failed_at": now}, "$inc": {"failures": 1}, "$unset": {"lease_until": ""}}
+    area_tiles.update_one({"_id": key(z, x, y)}, update)
+
+
+def release(z: int, x: int, y: int):
+    """Lascia la tile senza esito (provider sotto carico): nessun backoff."""
+    area_tiles.update_one({"_id": key(z, x, y)}, {"$unset": {"lease_until": ""}})
@@ -0,0 +1,234 @@
+# backend/src/models/doc_blob.py
+"""
+Testi dei poi_docs salvati una volta sola, compressi e indirizzati per contenuto.
+
+La stessa voce Wikipedia (la pagina della città, del quartiere) finisce
+sotto decine di POI: in `doc_blobs` il corpo sta una volta, con
+`_id` = sha256 del testo, compresso zstd (se `zstandard` è installato,
+altrimenti zlib; il codec è salvato nel blob). I poi_docs tengono il
+riferimento (`content_ref`), la lunghezza e i primi HEAD_CHARS caratteri
+(`content_head`, bastano per gli estratti).
+
+Il testo si decomprime solo quando serve davvero (`texts`, `attach`), con
+una LRU di processo limitata in caratteri.
+
+Migrazione dei dati esistenti, a batch in streaming e riprendibile:
+
+    cd backend
+    python -m src.models.doc_blob migrate --batch 500
+    python -m src.models.doc_blob sweep          # blob non più referenziati (poi_docs, wiki_pages)
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from bson import Binary
+from pymongo import ASCENDING, UpdateOne
+
+from ..infra.db import doc_blobs, poi_docs, wiki_pages
+from ..infra.settings import get_settings
+
+try:  # opzionale: a parità di livello comprime meglio e decomprime più in fretta di zlib
+    import zstandard
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+HEAD_CHARS = 1000
+ZLIB_LEVEL, ZSTD_LEVEL = 6, 9
+
+
+def ensure_indexes():
+    poi_docs.create_index([("content_ref", ASCENDING)], name="content_ref", sparse=True)
+    wiki_pages.create_index([("content_ref", ASCENDING)], name="content_ref", sparse=True)
+
+
+# ---------- codec ----------
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress(text: str) -> tuple[str, bytes]:
+    raw = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(codec: str, data: bytes) -> str:
+    if codec == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("doc_blobs: blob zstd ma il pacchetto zstandard non è installato")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    raise ValueError(f"doc_blobs: codec sconosciuto {codec!r}")
+
+
+# ---------- LRU dei testi decompressi ----------
+_lru: OrderedDict[str, str] = OrderedDict()
+_lru_chars = 0
+_lock = threading.Lock()
+
+
+def _remember(h: str, text: str):
+    global _lru_chars
+    cap = get_settings().DOC_BLOB_CACHE_CHARS
+    if len(text) > cap:
+        return
+    with _lock:
+        if h in _lru:
+            _lru.move_to_end(h)
+            return
+        _lru[h] = text
+        _lru_chars += len(text)
+        while _lru_chars > cap:
+            _, old = _lru.popitem(last=False)
+            _lru_chars -= len(old)
+
+
+def _cached(h: str) -> str | None:
+    with _lock:
+        text = _lru.get(h)
+        if text is not None:
+            _lru.move_to_end(h)
+        return text
+
+
+# ---------- scrittura ----------
+def _blob_op(h: str, text: str, now) -> tuple[UpdateOne, int]:
+    # seen_at si aggiorna a ogni write: sweep non cancella un blob che sta per essere referenziato
+    codec, data = compress(text)
+    return UpdateOne({"_id": h}, {"$set": {"seen_at": now},
+                                  "$setOnInsert": {"codec": codec, "z": Binary(data), "n": len(text),
+                                                   "zn": len(data), "created_at": now}}, upsert=True), len(data)
+
+
+def _ref_fields(h: str, text: str) -> dict:
+    return {"content_ref": h, "content_len": len(text), "content_head": text[:HEAD_CHARS]}
+
+
+def body_fields(text: str, now=None) -> dict:
+    """Salva il blob (idempotente) e ritorna i campi da `$set` sul poi_doc al posto di `content_text`."""
+    h = digest(text)
+    op, _ = _blob_op(h, text, now or datetime.now(timezone.utc))
+    doc_blobs.bulk_write([op], ordered=False)
+    _remember(h, text)
+    return _ref_fields(h, text)
+
+
+# ---------- lettura ----------
+def texts(hashes) -> dict[str, str]:
+    """hash -> testo; una query sola per quelli non in LRU."""
+    out, missing = {}, []
+    for h in dict.fromkeys(hashes):
+        text = _cached(h)
+        if text is None:
+            missing.append(h)
+        else:
+            out[h] = text
+    if missing:
+        for b in doc_blobs.find({"_id": {"$in": missing}}, {"codec": 1, "z": 1}):
+            out[b["_id"]] = text = decompress(b["codec"], b["z"])
+            _remember(b["_id"], text)
+    return out
+
+
+def existing(hashes) -> set[str]:
+    """Gli hash che hanno ancora il blob (senza leggere né decomprimere il corpo)."""
+    hashes = list(dict.fromkeys(hashes))
+    if not hashes:
+        return set()
+    return {b["_id"] for b in doc_blobs.find({"_id": {"$in": hashes}}, {"_id": 1})}
+
+
+def attach(docs: list[dict]) -> list[dict]:
+    """Mette `content_text` nei doc che hanno solo il riferimento (in place)."""
+    refs = [d["content_ref"] for d in docs if d.get("content_ref") and not d.get("content_text")]
+    if refs:
+        found = texts(refs)
+        for d in docs:
+            h = d.get("content_ref")
+            if h and not d.get("content_text"):
+                if h not in found:
+                    logger.warning("[doc_blob] blob %s mancante, uso content_head", h)
+                d["content_text"] = found.get(h, d.get("content_head") or "")
+    return docs
+
+
+# ---------- manutenzione ----------
+def migrate(batch: int = 500, after=None, dry_run: bool = False) -> dict:
+    """
+    Sposta `content_text` dei poi_docs nei blob, a batch per `_id` crescente:
+    memoria costante e si riprende da `after` (l'ultimo `_id` loggato).
+    """
+    stats = {"docs": 0, "blobs": 0, "chars": 0, "stored": 0, "last_id": after}
+    q = {"content_text": {"$type": "string"}}
+    while True:
+        page_q = {**q, "_id": {"$gt": after}} if after is not None else q
+        rows = list(poi_docs.find(page_q, {"content_text": 1}).sort("_id", 1).limit(batch))
+        if not rows:
+            break
+        now = datetime.now(timezone.utc)
+        blobs, docs = {}, []
+        for r in rows:
+            text = r["content_text"]
+            h = digest(text)
+            if h not in blobs:
+                blobs[h], zn = _blob_op(h, text, now)
+                stats["chars"] += len(text)
+                stats["stored"] += zn
+            # il filtro sul testo salta i doc riscritti nel frattempo da un processo non aggiornato
+            docs.append(UpdateOne({"_id": r["_id"], "content_text": text},
+                                  {"$set": _ref_fields(h, text), "$unset": {"content_text": ""}}))
+        if not dry_run:
+            res = doc_blobs.bulk_write(list(blobs.values()), ordered=False)
+            stats["blobs"] += res.upserted_count
+            poi_docs.bulk_write(docs, ordered=False)    # blob prima dei riferimenti
+        stats["docs"] += len(rows)
+        after = stats["last_id"] = rows[-1]["_id"]
+        logger.info("[doc_blob] migrati %d doc (ultimo _id %s)", stats["docs"], after)
+    return stats
+
+
+def sweep(min_age_hours: float = 24, batch: int = 500) -> int:
+    """Cancella i blob non referenziati (né da poi_docs né da wiki_pages) e non scritti da
+    `min_age_hours` (i recenti possono avere il doc in volo)."""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=min_age_hours)
+    deleted, after = 0, None
+    while True:
+        q = {"seen_at": {"$lt": cutoff}, **({"_id": {"$gt": after}} if after else {})}
+        ids = [b["_id"] for b in doc_blobs.find(q, {"_id": 1}).sort("_id", 1).limit(batch)]
+        if not ids:
+            return deleted
+        refs = {"content_ref": {"$in": ids}}
+        used = set(poi_docs.distinct("content_ref", refs)) | set(wiki_pages.distinct("content_ref", refs))
+        orphans = [h for h in ids if h not in used]
+        if orphans:
+            deleted += doc_blobs.delete_many({"_id": {"$in": orphans}, "seen_at": {"$lt": cutoff}}).deleted_count
+        after = ids[-1]
+
+
+if __name__ == "__main__":  # pragma: no cover
+    import argparse
+    from bson import ObjectId
+
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser(prog="python -m src.models.doc_blob")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    m = sub.add_parser("migrate")
+    m.add_argument("--batch", type=int, default=500)
+    m.add_argument("--after", help="riprende dopo questo _id")
+    m.add_argument("--dry-run", action="store_true")
+    s = sub.add_parser("sweep")
+    s.add_argument("--min-age-hours", type=float, default=24)
+    a = ap.parse_args()
+    if a.cmd == "migrate":
+        print(migrate(a.batch, ObjectId(a.after) if a.after else None, a.dry_run))
+    else:
+        print({"deleted": sweep(a.min_age_hours)})
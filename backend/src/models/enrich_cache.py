@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 from pymongo import ASCENDING, errors
 from ..infra.db import enrich_cache
+from ..infra.metrics import cache_result
 
 TTL_SECONDS = 30  # evita enrich ripetuti per stessa cella/raggio
 
@@ -21,6 +22,8 @@ def should_enrich(lat: float, lon: float, radius_m: int) -> bool:
     key = _bucket(lat, lon, radius_m)
     try:
         enrich_cache.insert_one({"key": key, "created_at": datetime.now(timezone.utc)})
+        cache_result("enrich", False)
         return True  # primo che arriva: ok
     except errors.DuplicateKeyError:
+        cache_result("enrich", True)
         return False  # già fatto da poco
\ No newline at end of file
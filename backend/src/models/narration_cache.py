@@ -1,7 +1,9 @@
 from datetime import datetime, timezone
 from bson import ObjectId
 from pymongo import ASCENDING
-from ..infra.db import narrations_cache
+from ..infra.db import narrations_cache, collection
+
+_content = collection("narrations_cache", "content")
 
 TTL_SECONDS = 24*3600
 
@@ -17,12 +19,16 @@ def _oid(x):
     return x if isinstance(x, ObjectId) else ObjectId(x)
 
 def get(poi_id, lang, style):
-    return narrations_cache.find_one({"poi_id": _oid(poi_id), "lang": lang, "style": style})
+    q = {"poi_id": _oid(poi_id), "lang": lang, "style": style}
+    return _content.find_one(q) or narrations_cache.find_one(q)   # miss: forse appena scritta, dal primario
 def upsert(poi_id, lang, style, text, sources, audio_url=None, confidence=0.8):
     doc={"poi_id":_oid(poi_id),"lang":lang,"style":style,"text":text,"sources":sources,
          "audio_url":audio_url,"confidence":float(confidence),"created_at":datetime.now(timezone.utc)}
     narrations_cache.update_one({"poi_id":doc["poi_id"],"lang":lang,"style":style}, {"$setOnInsert": doc}, upsert=True)
     return doc
+def invalidate_pois(poi_ids) -> int:
+    ids = [_oid(x) for x in poi_ids]
+    return narrations_cache.delete_many({"poi_id": {"$in": ids}}).deleted_count if ids else 0
 def invalidate(poi_id=None):
     if poi_id: return narrations_cache.delete_many({"poi_id": _oid(poi_id)}).deleted_count
     return narrations_cache.delete_many({}).deleted_count
\ No newline at end of file
@@ -0,0 +1,135 @@
+# backend/src/models/osm_tile.py
+"""
+Snapshot per tile dei POI OSM visti dall'ultima ricerca completa.
+
+Una ricerca riconcilia solo le tile interamente dentro il suo raggio (le
+altre le ha viste a metà) e solo per il profilo Overpass di default. Il
+confronto con lo snapshot precedente tocca solo i POI che cambiano:
+
+- comparsi: riattivati se erano disattivati o in attesa di rimozione;
+- spariti: `missing_since` (restano attivi: tombstone);
+- spariti da più di `grace`: `is_active=False`.
+
+La prima volta che si vede una tile la base sono i POI OSM attivi già salvati
+lì dentro (una sola query sul bbox delle tile nuove), così anche quelli
+precedenti agli snapshot entrano nel giro.
+
+In `found` un `poi_id` None è un POI che OSM ha ancora ma che la ricerca non
+ha salvato (scartato dal dedup per nome): resta com'è, non si tombstona.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, UpdateOne
+from ..infra.db import osm_tiles, pois
+from ..utils import tiles
+
+
+def ensure_indexes():
+    osm_tiles.create_index([("checked_at", ASCENDING)], name="checked_at")
+
+
+def key(profile: str, z: int, x: int, y: int) -> str:
+    return f"{profile}:{z}/{x}/{y}"
+
+
+@dataclass
+class Plan:
+    revive: list = field(default_factory=list)       # poi_id da riattivare
+    tombstone: list = field(default_factory=list)    # poi_id appena spariti
+    deactivate: list = field(default_factory=list)   # poi_id spariti da oltre il grace
+    snapshot: dict | None = None                     # nuovo snapshot (None = invariato)
+
+
+def diff(prev: dict | None, seen: dict, now: datetime, grace: timedelta) -> Plan:
+    """
+    prev: snapshot precedente ({"members": {provider_id: poi_id}, "gone": {provider_id: [poi_id, since]}})
+    seen: {provider_id: poi_id} trovati ora nella tile
+    """
+    members = dict((prev or {}).get("members") or {})
+    gone = {p: list(v) for p, v in ((prev or {}).get("gone") or {}).items()}
+    plan = Plan()
+    now_members = {}
+    for p, pid in seen.items():
+        if p in gone:
+            old = gone.pop(p)[0]
+            plan.revive.append(old)
+            now_members[p] = old if pid is None else pid
+        elif p in members:
+            now_members[p] = members[p] if pid is None else pid
+        elif pid is not None:
+            plan.revive.append(pid)
+            now_members[p] = pid
+    for p, pid in members.items():
+        if p not in seen:
+            gone[p] = [pid, now]
+            plan.tombstone.append(pid)
+    for p, (pid, since) in list(gone.items()):
+        if since <= now - grace:
+            plan.deactivate.append(pid)
+            del gone[p]
+    if plan.revive or plan.tombstone or plan.deactivate or not (prev or {}).get("version"):
+        plan.snapshot = {"members": now_members, "gone": gone,
+                         "version": int((prev or {}).get("version", 0)) + 1, "updated_at": now}
+    return plan
+
+
+BBOX_PAD_DEG = 1e-4      # ~10 m: i lati del poligono GeoJSON sono geodetici, non paralleli
+
+
+def _baselines(z: int, xys: list[tuple[int, int]]) -> dict[tuple[int, int], dict]:
+    """Base delle tile mai viste: una query sul loro bbox, POI raggruppati per tile."""
+    out = {xy: {"members": {}, "gone": {}, "version": 0} for xy in xys}
+    if not xys:
+        return out
+    w, _, _, n = tiles.bounds(z, min(x for x, _ in xys), min(y for _, y in xys))
+    _, s, e, _ = tiles.bounds(z, max(x for x, _ in xys), max(y for _, y in xys))
+    w, s, e, n = w - BBOX_PAD_DEG, s - BBOX_PAD_DEG, e + BBOX_PAD_DEG, n + BBOX_PAD_DEG
+    box = {"type": "Polygon", "coordinates": [[[w, s], [e, s], [e, n], [w, n], [w, s]]]}
+    cur = pois.find({"location": {"$geoWithin": {"$geometry": box}},
+                     "provider": "osm", "is_active": {"$ne": False}, "provider_id": {"$ne": None}},
+                    {"provider_id": 1, "location": 1})
+    for d in cur:
+        lon, lat = d["location"]["coordinates"]
+        base = out.get(tiles.tile_of(z, lon, lat))
+        if base is not None:
+            base["members"][d["provider_id"]] = d["_id"]
+    return out
+
+
+def reconcile(profile: str, z: int, covered: list[tuple[int, int]], found: list[dict],
+              now: datetime, grace: timedelta) -> dict:
+    """found: [{"provider_id", "poi_id", "lat", "lon"}] della ricerca appena conclusa."""
+    if not covered:
+        return {"tiles": 0, "revived": 0, "tombstoned": 0, "deactivated": 0}
+    seen = {xy: {} for xy in covered}
+    for f in found:
+        xy = tiles.tile_of(z, f["lon"], f["lat"])
+        if xy in seen:
+            seen[xy][f["provider_id"]] = f["poi_id"]
+    keys = {key(profile, z, x, y): (x, y) for x, y in covered}
+    prev = {d["_id"]: d for d in osm_tiles.find({"_id": {"$in": list(keys)}})}
+    base = _baselines(z, [xy for k, xy in keys.items() if k not in prev])
+
+    revive, tomb, deact, writes = [], [], [], []
+    for k, (x, y) in keys.items():
+        plan = diff(prev.get(k) or base[(x, y)], seen[(x, y)], now, grace)
+        revive += plan.revive
+        tomb += plan.tombstone
+        deact += plan.deactivate
+        if plan.snapshot is not None:
+            writes.append(UpdateOne({"_id": k}, {"$set": {**plan.snapshot, "z": z, "x": x, "y": y,
+                                                          "profile": profile, "checked_at": now}}, upsert=True))
+        else:
+            writes.append(UpdateOne({"_id": k}, {"$set": {"checked_at": now}}))
+
+    if revive:
+        pois.update_many({"_id": {"$in": revive}, "$or": [{"is_active": False}, {"missing_since": {"$exists": True}}]},
+                         {"$set": {"is_active": True, "updated_at": now}, "$unset": {"missing_since": ""}})
+    if tomb:
+        pois.update_many({"_id": {"$in": tomb}, "missing_since": {"$exists": False}},
+                         {"$set": {"missing_since": now}})
+    if deact:
+        pois.update_many({"_id": {"$in": deact}, "missing_since": {"$lte": now - grace}},
+                         {"$set": {"is_active": False, "updated_at": now}})
+    osm_tiles.bulk_write(writes, ordered=False)
+    return {"tiles": len(keys), "revived": len(revive), "tombstoned": len(tomb), "deactivated": len(deact)}
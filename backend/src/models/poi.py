@@ -1,9 +1,13 @@
 # backend/src/models/poi.py
+import logging
 from datetime import datetime, timezone
 from math import radians, cos, sin, asin, sqrt
 from pymongo import ASCENDING, GEOSPHERE
 from bson import ObjectId
-from ..infra.db import pois
+from ..infra.db import pois, collection
+
+_geo = collection("pois", "nearby")     # letture geo: anche dai secondari
+from ..utils import tiles
 
 # ---------- indici ----------
 def ensure_indexes():
@@ -13,6 +17,21 @@ def ensure_indexes():
     pois.create_index([("name.en", ASCENDING)], name="name_en")
     pois.create_index([("updated_at", ASCENDING)], name="updated_at")
 
+# ---------- notifiche di scrittura ----------
+_listeners = []
+
+def on_change(fn):
+    """fn(poi_id, doc=None, deleted=False) dopo ogni write fatto da questo processo."""
+    _listeners.append(fn)
+    return fn
+
+def notify_change(poi_id, doc: dict | None = None, deleted: bool = False):
+    for fn in _listeners:
+        try:
+            fn(poi_id, doc, deleted)
+        except Exception:
+            logging.getLogger(__name__).exception("[poi] listener %r fallito", fn)
+
 # ---------- utils ----------
 def _oid(x): return x if isinstance(x, ObjectId) else ObjectId(x)
 
@@ -23,19 +42,29 @@ def _haversine(lat1, lon1, lat2, lon2):
     return 2 * R * asin(sqrt(a))
 
 # ---------- CRUD ----------
+# per _id sempre dal primario: narration/ask cercano il POI subito dopo che /nearby l'ha inserito
 def get(poi_id): return pois.find_one({"_id": _oid(poi_id)})
 def get_many(ids): return list(pois.find({"_id": {"$in": [_oid(i) for i in ids]}}))
 
 def insert(doc: dict):
     now = datetime.now(timezone.utc)
     doc.setdefault("created_at", now); doc.setdefault("updated_at", now)
-    return pois.insert_one(doc).inserted_id
+    doc["_id"] = pois.insert_one(doc).inserted_id
+    notify_change(doc["_id"], doc)
+    return doc["_id"]
 
 def update(poi_id: str, data: dict):
     data["updated_at"] = datetime.now(timezone.utc)
-    return pois.update_one({"_id": _oid(poi_id)}, {"$set": data}).modified_count
+    n = pois.update_one({"_id": _oid(poi_id)}, {"$set": data}).modified_count
+    if n:
+        notify_change(_oid(poi_id))
+    return n
 
-def delete(poi_id: str): return pois.delete_one({"_id": _oid(poi_id)}).deleted_count
+def delete(poi_id: str):
+    n = pois.delete_one({"_id": _oid(poi_id)}).deleted_count
+    if n:
+        notify_change(_oid(poi_id), deleted=True)
+    return n
 
 # ---------- query geospaziale ----------
 def nearby(lat: float, lon: float, radius_m: int, lang: str, limit: int = 10):
@@ -50,11 +79,11 @@ def nearby(lat: float, lon: float, radius_m: int, lang: str, limit: int = 10):
     items = []
     used_near = True
     try:
-        cur = pois.find(q, {"name": 1, "location": 1, "wikipedia": 1}).limit(50)
+        cur = _geo.find(q, {"name": 1, "location": 1, "wikipedia": 1}).limit(50)
     except Exception:
         # fallback senza indice geospaziale
         used_near = False
-        cur = pois.find({}, {"name": 1, "location": 1, "wikipedia": 1}).limit(300)
+        cur = _geo.find({}, {"name": 1, "location": 1, "wikipedia": 1}).limit(300)
     for p in cur:
         coords = p["location"]["coordinates"]
         dist = _haversine(lat, lon, coords[1], coords[0])
@@ -70,6 +99,17 @@ def nearby(lat: float, lon: float, radius_m: int, lang: str, limit: int = 10):
     items.sort(key=lambda x: x["distance_m"])
     return items[:limit]
 
+def in_tile(z: int, x: int, y: int, projection: dict, limit: int) -> list[dict]:
+    """POI attivi nella tile, in ordine di _id (risposta deterministica); limit+1 per
+    capire se la tile è troncata. I bordi semiaperti di `tiles.contains` sono nella
+    query, così il limit lato server non taglia prima di un filtro lato client."""
+    w, s, e, n = tiles.bounds(z, x, y)
+    q = {"location": {"$geoWithin": {"$geometry": tiles.polygon(z, x, y)}},
+         "location.coordinates.0": {"$gte": w, "$lt": e},
+         "location.coordinates.1": {"$gt": s, "$lte": n},
+         "is_active": {"$ne": False}}
+    return list(_geo.find(q, projection).sort("_id", ASCENDING).limit(limit + 1))
+
 # ---------- upsert da OSM ----------
 def upsert_many_from_osm(docs: list[dict], max_inserts: int = 30) -> dict:
     inserted = 0
@@ -130,8 +170,9 @@ def upsert_many_from_osm(docs: list[dict], max_inserts: int = 30) -> dict:
         )
         if res.upserted_id:
             inserted += 1
+            notify_change(res.upserted_id)
         elif res.modified_count:   # ✅ conta solo se qualcosa è davvero cambiato
-            updated += 1
+            updated += 1           # l'indice nomi lo riprende dal sync su updated_at
             
         
 
@@ -1,7 +1,11 @@
 from datetime import datetime, timezone
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
-from ..infra.db import poi_docs
+from ..infra.db import poi_docs, collection
+from ..utils.chunking import chunk
+from . import doc_blob
+
+_content = collection("poi_docs", "content")
 
 def ensure_indexes():
     poi_docs.create_index([("poi_id", ASCENDING)], name="poi_id")
@@ -23,12 +27,41 @@ def list_by_poi(poi_id: str, lang: str | None = None, limit: int = 5):
     q = {"poi_id": ObjectId(poi_id)}
     if lang:
         q["lang"] = lang
-    proj = {"_id": 0, "poi_id": 1, "lang": 1, "source": 1, "url": 1, "content_text": 1, "updated_at": 1}
-    cur = poi_docs.find(q, proj).sort("updated_at", -1).limit(limit)
-    return [ _ser(x) for x in cur ]
+    proj = {"_id": 0, "poi_id": 1, "lang": 1, "source": 1, "url": 1, "content_text": 1, "content_ref": 1, "updated_at": 1}
+    cur = _content.find(q, proj).sort("updated_at", -1).limit(limit)
+    return [ _ser(x) for x in present(list(cur), "full") ]
+
+def present(docs: list[dict], mode: str, excerpt_chars: int = 300) -> list[dict]:
+    """Doc per le risposte API: testo dai doc_blobs solo dove serve, senza i campi del riferimento."""
+    if mode == "full":
+        doc_blob.attach(docs)
+    elif mode == "excerpt":
+        short = [d for d in docs if d.get("content_ref")
+                 and len(d.get("excerpt") or "") < min(excerpt_chars, d.get("content_len") or 0)]
+        for d in doc_blob.attach(short):
+            d["excerpt"] = d.pop("content_text")[:excerpt_chars]
+    for d in docs:
+        for k in ("content_ref", "content_head", "content_len"):
+            d.pop(k, None)
+    return docs
+
+def body(content_text: str, now=None) -> dict:
+    """Campi da `$set` per il testo di un doc (blob + riferimento); va con `UNSET_TEXT`."""
+    return {**doc_blob.body_fields(content_text, now), "sections": chunk(content_text)}
+
+UNSET_TEXT = {"content_text": ""}
 
 def insert(poi_id, source, lang, content_text, url=None, meta=None):
-    doc={"poi_id":_oid(poi_id),"source":source,"lang":lang,"content_text":content_text,"url":url,"meta":meta or {}, "created_at":datetime.now(timezone.utc)}
+    doc={"poi_id":_oid(poi_id),"source":source,"lang":lang,**body(content_text),"url":url,"meta":meta or {}, "created_at":datetime.now(timezone.utc)}
     return poi_docs.insert_one(doc).inserted_id
 
+def replace_text(url: str, content_text: str, now=None) -> list:
+    """Nuova revisione di una pagina: aggiorna i doc di tutti i POI che la usano; ritorna i loro poi_id."""
+    now = now or datetime.now(timezone.utc)
+    ids = poi_docs.distinct("poi_id", {"url": url})
+    if ids:
+        poi_docs.update_many({"url": url}, {"$set": {**body(content_text, now), "updated_at": now},
+                                            "$unset": UNSET_TEXT})
+    return ids
+
 def delete_for_poi(poi_id): return poi_docs.delete_many({"poi_id": _oid(poi_id)}).deleted_count
\ No newline at end of file
@@ -0,0 +1,36 @@
+# backend/src/models/request_profile.py
+import json, zlib
+from datetime import datetime, timezone
+from bson import Binary
+from pymongo import ASCENDING
+from ..infra.db import request_profiles
+
+TTL_SECONDS = 3*24*3600
+
+def ensure_indexes():
+    try:
+        request_profiles.create_index([("created_at", ASCENDING)], name="ttl_created_at", expireAfterSeconds=TTL_SECONDS)
+    except Exception:
+        pass
+
+def save(profile, client_request_id: str | None = None) -> str:
+    """Salva il trace compresso (zlib) con _id = request id generato dal server."""
+    trace = profile.to_chrome_trace()
+    blob = zlib.compress(json.dumps(trace, separators=(",", ":")).encode(), 6)
+    request_profiles.replace_one({"_id": profile.request_id}, {
+        "_id": profile.request_id, "name": profile.name, "duration_ms": round(profile.duration * 1000, 1),
+        "samples": len(profile.samples), "spans": len(profile.spans),
+        "client_request_id": client_request_id,
+        "trace_z": Binary(blob), "created_at": datetime.now(timezone.utc),
+    }, upsert=True)
+    return profile.request_id
+
+def get_trace(request_id: str) -> dict | None:
+    doc = request_profiles.find_one({"_id": request_id})
+    if not doc:
+        return None
+    return json.loads(zlib.decompress(doc["trace_z"]))
+
+def list_recent(limit: int = 50) -> list[dict]:
+    cur = request_profiles.find({}, {"trace_z": 0}).sort("created_at", -1).limit(limit)
+    return [{**d, "created_at": d["created_at"].isoformat()} for d in cur]
@@ -1,10 +1,16 @@
 from datetime import datetime, timezone
 from pymongo import ASCENDING, DESCENDING
-from pymongo.errors import PyMongoError
-from ..infra.db import usage_logs
+from ..infra.db import usage_logs, collection
+from . import usage_rollup
+from ..infra import aio
+from ..infra.buffer import BatchBuffer
+from ..infra.settings import get_settings
+from ..utils.cursor import Page
+
+_reads = collection("usage_logs", "analytics")
 
 _ALLOWED = {
-    "app.open", "auth.login", "poi.nearby", "poi.view",
+    "app.open", "auth.login", "poi.nearby", "poi.view", "poi.ask",
     "narration.request", "narration.generated", "audio.play",
     "contrib.posted", "contrib.moderated", "error"
 }
@@ -12,8 +18,20 @@ _ALLOWED = {
 def ensure_indexes():
     usage_logs.create_index([("ts", DESCENDING)], name="ts_desc")
     usage_logs.create_index([("event", ASCENDING), ("ts", DESCENDING)], name="event_ts")
-    usage_logs.create_index([("session_id", ASCENDING), ("ts", DESCENDING)], name="session_ts", sparse=True)
-    usage_logs.create_index([("user_hash", ASCENDING), ("ts", DESCENDING)], name="user_ts", sparse=True)
+    usage_logs.create_index([("session_id", ASCENDING), ("ts", DESCENDING), ("_id", DESCENDING)],
+                            name="session_ts_id", sparse=True)
+    usage_logs.create_index([("user_hash", ASCENDING), ("ts", DESCENDING), ("_id", DESCENDING)],
+                            name="user_ts_id", sparse=True)
+    for old in ("session_ts", "user_ts"):       # sostituiti dalle versioni con _id (cursori keyset)
+        try:
+            usage_logs.drop_index(old)
+        except Exception:
+            pass
+    try:
+        usage_logs.create_index([("ts", ASCENDING)], name="ttl_ts",
+                                expireAfterSeconds=get_settings().USAGE_LOG_TTL_SECS)
+    except Exception:
+        pass
 
 def _dt(x):
     return x if isinstance(x, datetime) else datetime.now(timezone.utc)
@@ -23,22 +41,88 @@ def _event(ev):
         return "error", ev
     return ev, None
 
-def log(evt: dict):
+class _Sink:
+    """Scrive gli eventi grezzi e aggiorna i rollup nello stesso flush.
+    I rollup contano gli eventi ricevuti anche se la scrittura grezza fallisce."""
+    def insert_many(self, docs, ordered=False):
+        try:
+            return usage_logs.insert_many(docs, ordered=ordered)
+        finally:
+            usage_rollup.apply(docs)
+
+_buffer: BatchBuffer | None = None
+
+def buffer() -> BatchBuffer:
+    global _buffer
+    if _buffer is None:
+        s = get_settings()
+        _buffer = BatchBuffer(_Sink(), max_batch=s.LOG_BUFFER_MAX_BATCH,
+                              flush_secs=s.LOG_BUFFER_FLUSH_SECS, max_size=s.LOG_BUFFER_MAX_SIZE)
+    return _buffer
+
+def _normalize(evt: dict) -> dict:
+    ev, raw = _event(evt.get("event"))
+    evt["event"] = ev
+    if raw and raw != ev:
+        evt["event_raw"] = raw
+    evt["ts"] = _dt(evt.get("ts"))
+    return evt
+
+def log(evt: dict) -> bool:
+    """Accoda un evento senza bloccare: se il buffer è pieno viene scartato."""
+    return buffer().offer([_normalize(evt)], block=False)
+
+async def log_async(evt: dict) -> bool:
+    """`log` dalle route async: su Lambda il buffer scrive inline, la scrittura va nel pool Mongo."""
+    if buffer().inline:
+        return await aio.run(log, evt)
+    return log(evt)
+
+def log_many(evts: list[dict]) -> bool:
+    """Accoda un batch (tutto o niente). False = buffer pieno, il client deve ritentare."""
+    return buffer().offer([_normalize(e) for e in evts])
+
+def flush() -> int:
+    return _buffer.close() if _buffer else 0
+
+def page(session_id: str | None = None, user_hash: str | None = None, limit: int = 200,
+         cursor: str | None = None) -> Page:
+    """Eventi di una sessione o di un utente dal più recente, a pagine keyset su session_ts_id / user_ts_id."""
+    if session_id:
+        return Page(_reads, {"session_id": session_id}, "ts", limit, cursor, hint="session_ts_id")
+    if user_hash:
+        return Page(_reads, {"user_hash": user_hash}, "ts", limit, cursor, hint="user_ts_id")
+    raise ValueError("session_id or user_hash required")
+
+# ---------- domanda per area (services/refresher) ----------
+Q50M_STEP = 0.0005   # ~55 m di latitudine
+
+def latlon_q50m(lat: float, lon: float) -> str:
+    return f"{round(lat / Q50M_STEP) * Q50M_STEP:.4f},{round(lon / Q50M_STEP) * Q50M_STEP:.4f}"
+
+def parse_latlon(s: str | None) -> tuple[float, float] | None:
     try:
-        ev, raw = _event(evt.get("event"))
-        evt["event"] = ev
-        if raw and raw != ev:
-            evt["event_raw"] = raw
-        evt["ts"] = _dt(evt.get("ts"))
-        usage_logs.insert_one(evt)
-    except PyMongoError:
-        pass
+        lat, lon = (float(v) for v in (s or "").split(","))
+    except ValueError:
+        return None
+    return (lat, lon) if -90 <= lat <= 90 and -180 <= lon <= 180 else None
+
+def nearby_demand(since: datetime) -> list[dict]:
+    """Eventi `poi.nearby` per (latlon_q50m, ora) da `since`: [{"p", "hour", "n"}]."""
+    rows = _reads.aggregate([
+        {"$match": {"event": "poi.nearby", "ts": {"$gte": since}, "latlon_q50m": {"$type": "string"}}},
+        {"$group": {"_id": {"p": "$latlon_q50m",
+                            "h": {"$dateToString": {"date": "$ts", "format": "%Y-%m-%dT%H"}}},
+                    "n": {"$sum": 1}}},
+    ], hint="event_ts")
+    return [{"p": r["_id"]["p"], "hour": datetime.strptime(r["_id"]["h"], "%Y-%m-%dT%H"), "n": r["n"]}
+            for r in rows]
 
 def list_recent(limit: int = 200):
-    return list(usage_logs.find({}).sort("ts", -1).limit(limit))
+    return list(_reads.find({}).sort("ts", -1).limit(limit))
 
 def by_session(session_id: str, limit: int = 200):
-    return list(usage_logs.find({"session_id": session_id}).sort("ts", -1).limit(limit))
+    return list(page(session_id=session_id, limit=limit))
 
 def by_user(user_hash: str, limit: int = 200):
-    return list(usage_logs.find({"user_hash": user_hash}).sort("ts", -1).limit(limit))
\ No newline at end of file
+    return list(page(user_hash=user_hash, limit=limit))
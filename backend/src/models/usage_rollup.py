@@ -0,0 +1,72 @@
+# backend/src/models/usage_rollup.py
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+import logging
+from ..infra.db import usage_rollups, collection
+from ..utils import rollup
+
+logger = logging.getLogger(__name__)
+
+_reads = collection("usage_rollups", "analytics")
+
+# retention dei bucket: minuti 7 giorni, ore 13 mesi (aggregati anonimi)
+RETENTION = {"m": timedelta(days=7), "h": timedelta(days=400)}
+
+def ensure_indexes():
+    usage_rollups.create_index([("gran", ASCENDING), ("bucket", ASCENDING)], name="gran_bucket")
+    try:
+        usage_rollups.create_index([("expire_at", ASCENDING)], name="ttl_expire_at", expireAfterSeconds=0)
+    except Exception:
+        pass
+
+def apply(events: list[dict]) -> int:
+    """Aggiorna i bucket con un `$inc` per bucket. Ritorna il numero di bucket toccati."""
+    folded = rollup.fold(events)
+    if not folded:
+        return 0
+    ops = []
+    for bid, b in folded.items():
+        ops.append(UpdateOne(
+            {"_id": bid},
+            {"$inc": dict(b["inc"]),
+             "$setOnInsert": {"gran": b["gran"], "bucket": b["bucket"],
+                              "expire_at": b["bucket"] + RETENTION[b["gran"]]}},
+            upsert=True,
+        ))
+    try:
+        usage_rollups.bulk_write(ops, ordered=False)
+    except PyMongoError as e:
+        logger.warning("[usage_rollup] bulk_write failed: %s", e)
+    return len(ops)
+
+def _range(gran: str, since: datetime | None, until: datetime | None, default: timedelta):
+    until = until or datetime.now(timezone.utc)
+    since = since or until - default
+    return {"gran": gran, "bucket": {"$gte": rollup.floor_ts(since, gran), "$lte": until}}
+
+def series(gran: str = "h", since: datetime | None = None, until: datetime | None = None,
+           event: str | None = None) -> list[dict]:
+    q = _range(gran, since, until, timedelta(hours=24) if gran == "h" else timedelta(hours=1))
+    out = []
+    for d in _reads.find(q, {"pois": 0}).sort("bucket", 1):
+        s = rollup.summarize([d], event=event)
+        out.append({"bucket": d["bucket"].isoformat(), **s})
+    return out
+
+def summary(gran: str = "h", since: datetime | None = None, until: datetime | None = None,
+            event: str | None = None) -> dict:
+    q = _range(gran, since, until, timedelta(hours=24) if gran == "h" else timedelta(hours=1))
+    return rollup.summarize(_reads.find(q, {"pois": 0}), event=event)
+
+def top_pois(since: datetime | None = None, until: datetime | None = None, limit: int = 10) -> list[dict]:
+    q = _range("h", since, until, timedelta(hours=24))
+    pipeline = [
+        {"$match": q},
+        {"$project": {"p": {"$objectToArray": {"$ifNull": ["$pois", {}]}}}},
+        {"$unwind": "$p"},
+        {"$group": {"_id": "$p.k", "n": {"$sum": "$p.v"}}},
+        {"$sort": {"n": -1}},
+        {"$limit": int(limit)},
+    ]
+    return [{"poi_id": d["_id"], "n": d["n"]} for d in _reads.aggregate(pipeline)]
@@ -1,38 +1,99 @@
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
 from ..infra.db import users
-from pymongo import ASCENDING
+from ..infra.buffer import BatchBuffer
+from ..infra.settings import get_settings
 
 COLLECTION = "users"
+PROFILE_CLAIMS = ("email", "name", "given_name", "family_name")
 
 def ensure_indexes():
     users.create_index([("sub", ASCENDING)], name="uq_sub", unique=True, sparse=True)   # OIDC subject
     users.create_index([("email", ASCENDING)], name="uq_email", unique=True, sparse=True)
 
+def _profile(claims: dict) -> dict:
+    return {"sub": claims["sub"], **{k: claims.get(k) for k in PROFILE_CLAIMS}}
+
+def _fingerprint(profile: dict) -> str:
+    return hashlib.sha1(repr(sorted(profile.items())).encode()).hexdigest()
+
 def upsert_from_claims(claims: dict):
     """
-    Inserisce o aggiorna un utente in base alle claims OIDC.
+    Inserisce o aggiorna un utente in base alle claims OIDC (scrittura sincrona).
     """
     if not claims or "sub" not in claims:
         return None
-    db = get_db()
-    data = {
-        "sub": claims["sub"],
-        "email": claims.get("email"),
-        "name": claims.get("name"),
-        "given_name": claims.get("given_name"),
-        "family_name": claims.get("family_name"),
-        "updated_at": datetime.utcnow()
-    }
-    return db[COLLECTION].find_one_and_update(
+    now = datetime.now(timezone.utc)
+    data = {**_profile(claims), "profile_hash": _fingerprint(_profile(claims)), "updated_at": now}
+    return users.find_one_and_update(
         {"sub": claims["sub"]},
-        {"$set": data, "$setOnInsert": {"created_at": datetime.utcnow()}},
+        {"$set": data, "$setOnInsert": {"created_at": now}},
         upsert=True,
         return_document=ReturnDocument.AFTER
     )
 
+# ---------- write-behind ----------
+class _Sink:
+    """Un upsert per utente per batch: l'ultima versione vince."""
+    def insert_many(self, docs, ordered=False):
+        last = {}
+        for d in docs:
+            last[d["sub"]] = d
+        ops = []
+        for sub, d in last.items():
+            now = d.pop("_queued_at")
+            ops.append(UpdateOne({"sub": sub},
+                                 {"$set": {**d, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+                                 upsert=True))
+        return users.bulk_write(ops, ordered=False) if ops else None
+
+class UserSync:
+    """Accoda il profilo solo se le claims sono cambiate rispetto all'ultima
+    versione vista da questo processo (LRU di `sub` -> hash)."""
+    def __init__(self, buffer: BatchBuffer, max_seen: int = 50_000):
+        self.buffer = buffer
+        self.max_seen = max_seen
+        self._seen: OrderedDict[str, str] = OrderedDict()
+        self.skipped = 0
+
+    def sync(self, claims: dict) -> bool:
+        if not claims or "sub" not in claims:
+            return False
+        profile = _profile(claims)
+        h = _fingerprint(profile)
+        sub = profile["sub"]
+        if self._seen.get(sub) == h:
+            self._seen.move_to_end(sub)
+            self.skipped += 1
+            return False
+        if not self.buffer.offer([{**profile, "profile_hash": h, "_queued_at": datetime.now(timezone.utc)}], block=False):
+            return False                         # coda piena: si riprova alla prossima chiamata
+        self._seen[sub] = h
+        self._seen.move_to_end(sub)
+        while len(self._seen) > self.max_seen:
+            self._seen.popitem(last=False)
+        return True
+
+_sync: UserSync | None = None
+
+def user_sync() -> UserSync:
+    global _sync
+    if _sync is None:
+        s = get_settings()
+        _sync = UserSync(BatchBuffer(_Sink(), max_batch=200, flush_secs=s.USER_SYNC_FLUSH_SECS, max_size=5000))
+    return _sync
+
+def sync_from_claims(claims: dict) -> bool:
+    """Sync non bloccante del profilo (write-behind, deduplicato)."""
+    return user_sync().sync(claims)
+
+def flush() -> int:
+    return _sync.buffer.close() if _sync else 0
+
 def get_by_sub(sub: str):
-    db = get_db()
-    return db[COLLECTION].find_one({"sub": sub})
+    return users.find_one({"sub": sub})
 
 def list_users(limit: int = 50):
-    db = get_db()
-    return list(db[COLLECTION].find().limit(limit))
\ No newline at end of file
+    return list(users.find().limit(limit))
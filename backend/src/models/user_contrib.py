@@ -2,10 +2,16 @@ from datetime import datetime, timezone
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
 from ..infra.db import user_contrib
+from ..utils.cursor import Page
 
 def ensure_indexes():
-    user_contrib.create_index([("poi_id", ASCENDING), ("created_at", DESCENDING)], name="poi_created")
-    user_contrib.create_index([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created")
+    user_contrib.create_index([("poi_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="poi_created_id")
+    user_contrib.create_index([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="status_created_id")
+    for old in ("poi_created", "status_created"):   # sostituiti dalle versioni con _id (cursori keyset)
+        try:
+            user_contrib.drop_index(old)
+        except Exception:
+            pass
     user_contrib.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created", sparse=True)
 
 def _oid(x): return x if isinstance(x, ObjectId) else ObjectId(x)
@@ -15,9 +21,14 @@ def post(poi_id, text, lang, user_id=None):
     doc={"poi_id":_oid(poi_id),"user_id":user_id,"lang":lang,"text":text,"status":"pending","created_at":now,"updated_at":now}
     doc["_id"]=user_contrib.insert_one(doc).inserted_id; return doc
 def list_for_poi(poi_id, status=None, limit=100):
-    q={"poi_id":_oid(poi_id)}; 
+    return list(page_for_poi(poi_id, status, limit))
+def page_for_poi(poi_id, status=None, limit=50, cursor=None) -> Page:
+    q={"poi_id":_oid(poi_id)}
     if status: q["status"]=status
-    return list(user_contrib.find(q).sort("created_at",-1).limit(limit))
+    return Page(user_contrib, q, "created_at", limit, cursor, hint="poi_created_id")
+def page_by_status(status, limit=50, cursor=None) -> Page:
+    """Coda di moderazione, dalla più recente."""
+    return Page(user_contrib, {"status":status}, "created_at", limit, cursor, hint="status_created_id")
 def list_for_user(user_id, limit=100):
     return list(user_contrib.find({"user_id":user_id}).sort("created_at",-1).limit(limit))
 def moderate(contrib_id, status):
@@ -0,0 +1,62 @@
+# backend/src/models/wiki_page.py
+"""
+Cache delle pagine Wikipedia per `(lang, title)`, con `pageid`/`revid`.
+
+L'estratto sta in doc_blobs (`content_ref`): una pagina usata da più POI
+si salva e si comprime una volta. `checked_at` è l'ultima volta che la
+revisione è stata verificata con l'API; `fetched_at` l'ultimo download
+dell'estratto.
+"""
+from datetime import datetime
+from pymongo import ASCENDING
+from ..infra.db import wiki_pages, poi_docs
+from . import doc_blob
+
+
+def ensure_indexes():
+    wiki_pages.create_index([("checked_at", ASCENDING)], name="checked_at")
+    poi_docs.create_index([("url", ASCENDING)], name="url")     # pagina cambiata -> doc dei POI
+
+
+def key(lang: str, title: str) -> str:
+    return f"{lang}:{title}"
+
+
+def get_many(lang: str, titles) -> dict[str, dict]:
+    """title -> voce in cache (senza testo)."""
+    ids = [key(lang, t) for t in titles]
+    return {d["title"]: d for d in wiki_pages.find({"_id": {"$in": ids}}, {"content_head": 0})}
+
+
+def text_of(entries: list[dict]) -> dict[str, str]:
+    """title -> estratto, decompresso solo ora."""
+    found = doc_blob.texts(e["content_ref"] for e in entries if e.get("content_ref"))
+    return {e["title"]: found[e["content_ref"]] for e in entries if e.get("content_ref") in found}
+
+
+def without_blob(entries: list[dict]) -> list[str]:
+    """Titoli la cui voce punta a un blob che non c'è più: vanno riscaricati."""
+    have = doc_blob.existing(e["content_ref"] for e in entries if e.get("content_ref"))
+    return [e["title"] for e in entries if e.get("content_ref") not in have]
+
+
+def save(lang: str, title: str, pageid: int, revid: int, text: str, now: datetime) -> dict:
+    fields = {"lang": lang, "title": title, "pageid": pageid, "revid": revid,
+              **doc_blob.body_fields(text, now), "checked_at": now, "fetched_at": now}
+    wiki_pages.update_one({"_id": key(lang, title)}, {"$set": fields, "$setOnInsert": {"created_at": now}},
+                          upsert=True)
+    return fields
+
+
+def touch(lang: str, titles, now: datetime) -> int:
+    """Revisione invariata: si aggiorna solo `checked_at`."""
+    ids = [key(lang, t) for t in titles]
+    if not ids:
+        return 0
+    return wiki_pages.update_many({"_id": {"$in": ids}}, {"$set": {"checked_at": now}}).modified_count
+
+
+def stale(before: datetime, limit: int = 500) -> list[dict]:
+    """Le pagine verificate meno di recente, prima di `before`."""
+    cur = wiki_pages.find({"checked_at": {"$lt": before}}, {"lang": 1, "title": 1}).sort("checked_at", 1)
+    return list(cur.limit(limit))
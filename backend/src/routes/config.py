@@ -1,14 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from ..infra.db import app_config
+from fastapi import APIRouter, Request
+from ..controllers.config_controller import get_config as _get_config
 
 router = APIRouter(prefix="/config", tags=["Config"])
 
 @router.get("")
-def get_config():
-    doc = app_config.find_one({}, sort=[("version",-1)]) or {}
-    if not doc: return {}
-    d = {**doc}
-    d["_id"] = str(d["_id"])
-    if "updated_at" in d and hasattr(d["updated_at"], "isoformat"):
-        d["updated_at"] = d["updated_at"].isoformat()
-    return d
\ No newline at end of file
+def get_config(request: Request):
+    # stessa copia in memoria del controller montato
+    return _get_config(request)
@@ -0,0 +1,269 @@
+# services/name_search.py
+"""
+Ricerca POI per nome (type-ahead) su un indice in memoria.
+
+- Nomi normalizzati: NFKD senza diacritici, casefold, punteggiatura ->
+  spazio ("Sant'Agnese in Agone" -> "sant agnese in agone"). Si indicizzano
+  tutte le varianti: `name.*` e `aliases`.
+- Prefissi di 2..4 caratteri di ogni parola -> id: la query interseca i
+  candidati delle sue parole (l'ultima è quella in digitazione) e verifica
+  i prefissi più lunghi sulle parole del POI.
+- Trigrammi del nome come ripiego per refusi e sottostringhe.
+- Con lat/lon il punteggio testuale riceve un bonus che decresce con la
+  distanza: a parità di testo vince il POI vicino.
+
+L'indice si costruisce al primo uso con una scansione di `pois` (solo nomi e
+posizione), si aggiorna subito dai write dei model (`poi.on_change`) e ogni
+NAME_INDEX_SYNC_SECS rilegge i POI con `updated_at` recente (indice
+`updated_at`) per le scritture fatte da altri processi.
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from math import cos, radians, sqrt
+
+from ..infra.db import pois
+from ..infra.settings import get_settings
+from ..models import poi as poi_model
+from ..utils.text import fold
+
+logger = logging.getLogger(__name__)
+
+PREFIX_MIN, PREFIX_MAX = 2, 4
+MIN_QUERY = 2
+MAX_CANDIDATES = 1500           # oltre, la query è troppo generica: si valuta un campione
+MAX_GRAM_POSTINGS = 5000        # trigrammi troppo comuni non aiutano
+GEO_WEIGHT, GEO_SCALE_M = 2.0, 5000.0     # in città il bonus vale quasi un livello di match
+
+
+def _grams(f: str) -> set[str]:
+    p = f" {f} "
+    return {p[i:i + 3] for i in range(len(p) - 2)}
+
+
+def _dist_m(lat1, lon1, lat2, lon2) -> float:
+    """Equirettangolare: all'interno di una città l'errore è trascurabile."""
+    x = radians(lon2 - lon1) * cos(radians((lat1 + lat2) / 2))
+    y = radians(lat2 - lat1)
+    return 6371000.0 * sqrt(x * x + y * y)
+
+
+class _Entry:
+    __slots__ = ("names", "folded", "words", "lon", "lat")
+
+    def __init__(self, names: dict, lon: float, lat: float):
+        self.names = names                                  # lingua/alias -> nome da mostrare
+        self.folded = tuple(dict.fromkeys(f for f in map(fold, names.values()) if f))
+        self.words = tuple(tuple(f.split()) for f in self.folded)
+        self.lon, self.lat = lon, lat
+
+    def display(self, lang: str | None) -> str:
+        n = self.names
+        return n.get(lang) or n.get("default") or n.get("en") or next(iter(n.values()))
+
+    def text_score(self, qf: str, qtok: list[str]) -> float:
+        best = 0.0
+        for f, words in zip(self.folded, self.words):
+            if f == qf:
+                s = 4.0
+            elif f.startswith(qf):
+                s = 3.0
+            elif all(any(w.startswith(t) for w in words) for t in qtok):
+                s = 2.0
+            elif qf in f:
+                s = 1.5
+            else:
+                continue
+            best = max(best, s - len(f) / 500)             # a parità, nomi più corti prima
+        return best
+
+
+class NameIndex:
+    def __init__(self):
+        self._e: dict[str, _Entry] = {}
+        self._pre: dict[str, set[str]] = defaultdict(set)
+        self._gram: dict[str, set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._e)
+
+    # ---------- aggiornamenti ----------
+    def upsert(self, poi_id: str, names: dict, lon: float, lat: float):
+        e = _Entry({k: v for k, v in names.items() if isinstance(v, str) and v.strip()}, lon, lat)
+        with self._lock:
+            self._drop(poi_id)
+            if not e.folded:
+                return
+            self._e[poi_id] = e
+            for words in e.words:
+                for w in words:
+                    for n in range(PREFIX_MIN, min(len(w), PREFIX_MAX) + 1):
+                        self._pre[w[:n]].add(poi_id)
+            for f in e.folded:
+                for g in _grams(f):
+                    self._gram[g].add(poi_id)
+
+    def remove(self, poi_id: str):
+        with self._lock:
+            self._drop(poi_id)
+
+    def _drop(self, poi_id: str):
+        e = self._e.pop(poi_id, None)
+        if e is None:
+            return
+        for words in e.words:
+            for w in words:
+                for n in range(PREFIX_MIN, min(len(w), PREFIX_MAX) + 1):
+                    s = self._pre.get(w[:n])
+                    if s is not None:
+                        s.discard(poi_id)
+                        if not s:
+                            del self._pre[w[:n]]
+        for f in e.folded:
+            for g in _grams(f):
+                s = self._gram.get(g)
+                if s is not None:
+                    s.discard(poi_id)
+                    if not s:
+                        del self._gram[g]
+
+    # ---------- ricerca ----------
+    def search(self, q: str, lat: float | None = None, lon: float | None = None,
+               limit: int = 10, lang: str | None = None) -> list[dict]:
+        qf = fold(q or "")
+        if len(qf) < MIN_QUERY:
+            return []
+        qtok = qf.split()
+        with self._lock:
+            scores = self._by_prefix(qf, qtok)
+            if len(scores) < limit and len(qf) >= 3:
+                for pid, s in self._by_grams(qf).items():
+                    scores.setdefault(pid, s)
+            geo = lat is not None and lon is not None
+            ranked = []
+            for pid, s in scores.items():
+                e = self._e[pid]
+                d = _dist_m(lat, lon, e.lat, e.lon) if geo else None
+                ranked.append((s + (GEO_WEIGHT / (1 + d / GEO_SCALE_M) if geo else 0.0), d, pid, e))
+        ranked.sort(key=lambda r: (-r[0], r[2]))
+        return [{"poi_id": pid, "name": e.display(lang), "coords": [e.lon, e.lat], "score": round(sc, 3),
+                 **({"distance_m": round(d, 1)} if d is not None else {})}
+                for sc, d, pid, e in ranked[:limit]]
+
+    def _by_prefix(self, qf: str, qtok: list[str]) -> dict[str, float]:
+        sets = []
+        for t in qtok:
+            if len(t) < PREFIX_MIN:
+                continue                                    # iniziali: verificate nel punteggio
+            s = self._pre.get(t[:PREFIX_MAX])
+            if not s:
+                return {}
+            sets.append(s)
+        if not sets:
+            return {}
+        sets.sort(key=len)
+        cand = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+        out = {}
+        for pid in islice(cand, MAX_CANDIDATES):
+            s = self._e[pid].text_score(qf, qtok)
+            if s > 0:
+                out[pid] = s
+        return out
+
+    def _by_grams(self, qf: str, min_sim: float = 0.5) -> dict[str, float]:
+        qg = _grams(qf)
+        posts = sorted((self._gram.get(g, ()) for g in qg), key=len)
+        counts = Counter()
+        for p in posts:
+            if len(p) > MAX_GRAM_POSTINGS:
+                break
+            counts.update(p)
+        need = min_sim * len(qg)
+        return {pid: c / len(qg) for pid, c in counts.items() if c >= need}   # sempre < dei match per prefisso
+
+
+# ---------- indice di processo ----------
+_PROJ = {"name": 1, "aliases": 1, "location": 1, "is_active": 1, "updated_at": 1}
+
+_index: NameIndex | None = None
+_build_lock = threading.Lock()
+_sync_lock = threading.Lock()
+_synced_to: datetime | None = None
+_next_sync = 0.0
+
+
+def names_of(doc: dict) -> dict:
+    name = doc.get("name")
+    names = dict(name) if isinstance(name, dict) else ({"default": name} if isinstance(name, str) else {})
+    for i, a in enumerate(doc.get("aliases") or []):
+        if isinstance(a, str):
+            names[f"alias{i}"] = a
+        elif isinstance(a, dict) and isinstance(a.get("name"), str):
+            names[f"alias{i}"] = a["name"]
+    return names
+
+
+def apply_doc(idx: NameIndex, doc: dict):
+    loc = (doc.get("location") or {}).get("coordinates")
+    pid = str(doc["_id"])
+    if doc.get("is_active") is False or not loc:
+        idx.remove(pid)
+    else:
+        idx.upsert(pid, names_of(doc), float(loc[0]), float(loc[1]))
+
+
+def index() -> NameIndex:
+    global _index, _synced_to, _next_sync
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                t0 = time.perf_counter()
+                start = datetime.now(timezone.utc) - timedelta(seconds=5)   # margine per write in volo
+                idx = NameIndex()
+                for d in pois.find({"is_active": {"$ne": False}}, _PROJ):
+                    apply_doc(idx, d)
+                _synced_to, _next_sync = start, time.monotonic() + get_settings().NAME_INDEX_SYNC_SECS
+                _index = idx
+                logger.info("[search] indice nomi: %d POI in %.0f ms", len(idx), (time.perf_counter() - t0) * 1000)
+    elif time.monotonic() >= _next_sync and _sync_lock.acquire(blocking=False):
+        try:
+            start = datetime.now(timezone.utc) - timedelta(seconds=5)
+            for d in pois.find({"updated_at": {"$gt": _synced_to}}, _PROJ).hint("updated_at"):
+                apply_doc(_index, d)
+            _synced_to = start
+        except Exception as e:
+            logger.warning("[search] sync incrementale fallito: %s", e)
+        finally:
+            _next_sync = time.monotonic() + get_settings().NAME_INDEX_SYNC_SECS
+            _sync_lock.release()
+    return _index
+
+
+def warm():
+    try:
+        index()
+    except Exception as e:
+        logger.warning("[search] indice nomi non costruito all'avvio: %s", e)
+
+
+def on_poi_change(poi_id, doc: dict | None = None, deleted: bool = False):
+    """Hook dei model: applica subito il write all'indice (se già costruito)."""
+    if _index is None:
+        return
+    if deleted:
+        _index.remove(str(poi_id))
+        return
+    if doc is None or "name" not in doc or "location" not in doc:
+        doc = pois.find_one({"_id": poi_id}, _PROJ)
+        if doc is None:
+            _index.remove(str(poi_id))
+            return
+    apply_doc(_index, doc)
+
+
+poi_model.on_change(on_poi_change)
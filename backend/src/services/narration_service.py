@@ -2,17 +2,31 @@
 from __future__ import annotations
 import os
 import re
+import time
 from datetime import datetime
 from typing import Tuple, List
 from bson import ObjectId
 import json
 import httpx
-from ..infra.db import poi_docs, narrations_cache
+from ..infra.db import collection
+from ..infra import aio, metrics
+from ..infra.admission import guarded
+from ..infra.settings import get_settings, flag
+from . import passages
+from ..models import doc_blob
 import logging
 
 logger = logging.getLogger(__name__)
 
+# letture tolleranti a qualche secondo di ritardo: anche dai secondari, con ripiego sul
+# primario quando non trovano nulla (doc o narrazione appena scritti, secondario indietro)
+poi_docs = collection("poi_docs", "content")
+_poi_docs_primary = collection("poi_docs")
+narrations_cache = collection("narrations_cache")
+_narrations_read = collection("narrations_cache", "content")
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
 _ALLOWED = {"guide", "quick", "kids", "anecdotes"}
 _SYNONYMS = {
@@ -52,7 +66,7 @@ def _build_prompt(name: str, text_src: str | None, style: str, lang: str) -> str
     )
     return base
 
-async def _call_openai(prompt: str, lang: str) -> str:
+async def _call_openai(prompt: str, lang: str, purpose: str = "narration") -> str:
     if not OPENAI_API_KEY:
         body = _clean_text(prompt)
         return (body[-700:] if len(body) > 700 else body) or "Contenuto non disponibile."
@@ -65,22 +79,29 @@ async def _call_openai(prompt: str, lang: str) -> str:
     }
     logging.debug(f"OpenAI payload: {payload}")
     headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
-    async with httpx.AsyncClient(timeout=60) as hx:
-        r = await hx.post("https://api.openai.com/v1/chat/completions", json=payload, headers=headers)
-        r.raise_for_status()
-        data = r.json()
-        return data["choices"][0]["message"]["content"].strip()
+    async with guarded("openai") as o:
+        async with httpx.AsyncClient(timeout=60) as hx:
+            r = await hx.post(f"{OPENAI_BASE_URL}/chat/completions", json=payload, headers=headers)
+            o.status = r.status_code
+            r.raise_for_status()
+            data = r.json()
+    metrics.llm_usage(payload["model"], data.get("usage"), purpose)
+    return data["choices"][0]["message"]["content"].strip()
 
 def _read_docs(poi_id: str):
     """Ritorna (text_src, sources_list[dict{name,url,...}])."""
     oid = ObjectId(poi_id)
-    docs = list(poi_docs.find({"poi_id": oid}, {"content_text": 1, "url": 1, "lang": 1}))
+    proj = {"content_text": 1, "content_ref": 1, "url": 1, "lang": 1}
+    docs = list(poi_docs.find({"poi_id": oid}, proj))
+    if not docs:
+        # doc appena scritti da /nearby e secondario indietro: la narrazione senza testo finirebbe in cache
+        docs = list(_poi_docs_primary.find({"poi_id": oid}, proj))
 
     text_src = None
     sources = []
     for doc in docs:
-        if not text_src and doc.get("content_text"):
-            text_src = doc["content_text"]
+        if not text_src and (doc.get("content_text") or doc.get("content_ref")):
+            text_src = doc_blob.attach([doc])[0]["content_text"]     # si decomprime solo il testo usato
         if doc.get("url"):
             sources.append({
                 "name": "wikipedia",
@@ -95,51 +116,159 @@ def _cache_key(poi_id: str, lang: str, style: str) -> str:
 def _confidence(has_text: bool) -> float:
     return 0.85 if has_text else 0.6
 
+def _cached_one(q: dict, **kw):
+    """Dal secondario; su un miss dal primario: GET subito dopo POST, o un secondo POST, non
+    devono mancare una narrazione appena scritta (e pagare un'altra generazione)."""
+    return _narrations_read.find_one(q, **kw) or narrations_cache.find_one(q, **kw)
+
 def get_cached(poi_id: str, lang: str, style: str):
-    return narrations_cache.find_one({"_id": _cache_key(poi_id, lang, style)})
+    return _cached_one({"_id": _cache_key(poi_id, lang, style)})
 
-def set_cached(poi_id: str, lang: str, style: str, text: str, sources: list, conf: float):
+def set_cached(poi_id: str, lang: str, style: str, text: str, sources: list, conf: float,
+               derived_from: dict | None = None, stats: dict | None = None):
+    """
+    `derived_from` marca le narrazioni tradotte da un'altra lingua; una
+    narrazione completa nuova fa cadere quelle derivate da lei.
+    `stats`: tempo e dimensione del prompt, per confrontare i due percorsi.
+    """
     now = datetime.utcnow()
-    narrations_cache.update_one(
-        {"_id": f"{poi_id}:{lang}:{style}"},
-        {"$set": {
-            "poi_id": ObjectId(poi_id),
-            "lang": lang,
-            "style": style,
-            "text": text,
-            "sources": sources,
-            "confidence": float(conf),
-            "updated_at": now,
-        }, "$setOnInsert": {"created_at": now}},
-        upsert=True
+    fields = {
+        "poi_id": ObjectId(poi_id),
+        "lang": lang,
+        "style": style,
+        "text": text,
+        "sources": sources,
+        "confidence": float(conf),
+        "updated_at": now,
+    }
+    if stats:
+        fields["stats"] = stats
+    update = {"$set": fields, "$setOnInsert": {"created_at": now}}
+    if derived_from:
+        fields["derived_from"] = derived_from
+    else:
+        update["$unset"] = {"derived_from": ""}
+    narrations_cache.update_one({"_id": f"{poi_id}:{lang}:{style}"}, update, upsert=True)
+    if not derived_from:
+        narrations_cache.delete_many({"poi_id": ObjectId(poi_id), "style": style, "derived_from.lang": lang})
+
+# --------- derivazione da un'altra lingua ---------
+def _derive_source(poi_id: str, lang: str, style: str):
+    """Narrazione completa (non derivata) dello stesso POI e stile in un'altra lingua."""
+    return _cached_one(
+        {"poi_id": ObjectId(poi_id), "style": style, "lang": {"$ne": lang},
+         "confidence": {"$gte": get_settings().NARRATION_DERIVE_MIN_CONFIDENCE},
+         "derived_from": {"$exists": False}},
+        sort=[("confidence", -1), ("updated_at", -1)],
     )
 
+def _derive_prompt(text: str, src_lang: str, style: str, lang: str) -> str:
+    return (
+        f"Stile: {_style_preamble(style)}\n\n"
+        f"Narrazione ({src_lang}):\n{_clean_text(text)}\n\n"
+        f"Traduci e adatta la narrazione in {lang}, mantenendo fatti, tono e lunghezza. "
+        "Non aggiungere informazioni."
+    )
+
+async def _derive(poi_id: str, lang: str, style: str) -> dict | None:
+    t0 = time.perf_counter()
+    src = await aio.run(_derive_source, poi_id, lang, style)
+    if not src:
+        return None
+    prompt = _derive_prompt(src["text"], src["lang"], style, lang)
+    out_text = await _call_openai(prompt, lang, purpose="derive")
+    elapsed = time.perf_counter() - t0
+    metrics.NARRATION_SECONDS.labels("derived").observe(elapsed)
+
+    sources = [s for s in src.get("sources") or [] if not s.get("derived")]
+    sources.append({"name": "narration", "lang": src["lang"], "derived": True})
+    conf = round(float(src["confidence"]) * 0.95, 3)
+    await aio.run(set_cached, poi_id, lang, style, out_text, sources, conf,
+                  derived_from={"lang": src["lang"], "updated_at": src.get("updated_at")},
+                  stats={"ms": round(elapsed * 1000), "prompt_chars": len(prompt)})
+    logger.info("[narration.derive] %s %s->%s in %.0f ms", poi_id, src["lang"], lang, elapsed * 1000)
+    return {"from_cache": False, "derived": True, "text": out_text}
+
 # --------- API principale ---------
 async def generate(poi: dict, lang: str, style: str, cache: bool = True) -> dict:
     poi_id = str(poi["_id"])
     style_norm = _normalize_style(style)
 
     if cache:
-        cached = get_cached(poi_id, lang, style_norm)
+        cached = await aio.run(get_cached, poi_id, lang, style_norm)
+        metrics.cache_result("narration_derived" if cached and cached.get("derived_from") else "narration",
+                             bool(cached))
         if cached:
-            return {"from_cache": True, "text": cached["text"]}
+            return {"from_cache": True, "derived": bool(cached.get("derived_from")), "text": cached["text"]}
+
+        # senza LLM la "traduzione" sarebbe il testo originale: si deriva solo con la chiave
+        if OPENAI_API_KEY and flag("narration_derive", get_settings().NARRATION_DERIVE_ENABLED):
+            derived = await _derive(poi_id, lang, style_norm)
+            if derived:
+                return derived
 
     name = (poi.get("name") or {}).get(lang) \
         or (poi.get("name") or {}).get("it") \
         or (poi.get("name") or {}).get("en") \
         or "Questo luogo"
 
-    text_src, sources = _read_docs(poi_id)
+    t0 = time.perf_counter()
+    text_src, sources = await aio.run(_read_docs, poi_id)
     logger.debug("[narration.generate] POI %s has_text=%s sources_count=%d",
                  poi_id, bool(text_src), len(sources or []))
 
     prompt = _build_prompt(name, text_src, style_norm, lang)
     out_text = await _call_openai(prompt, lang)
+    elapsed = time.perf_counter() - t0
+    metrics.NARRATION_SECONDS.labels("full").observe(elapsed)
 
     conf = _confidence(bool(text_src))
     if not sources:
         logger.warning(f"[narr_generate] No sources for {poi_id}, skipping cache save")
         return {"poi_id": poi_id, "lang": lang, "style": style, "text": out_text, "sources": []}
 
-    set_cached(poi_id, lang, style_norm, out_text, sources or [], conf)
-    return {"from_cache": False, "text": out_text}
\ No newline at end of file
+    await aio.run(set_cached, poi_id, lang, style_norm, out_text, sources or [], conf,
+                  stats={"ms": round(elapsed * 1000), "prompt_chars": len(prompt)})
+    return {"from_cache": False, "derived": False, "text": out_text}
+
+# --------- domande sul POI (/poi/{id}/ask) ---------
+def _ask_prompt(name: str, question: str, hits: list[tuple[float, dict]], lang: str, max_chars: int) -> str:
+    parts, used = [], 0
+    for n, (_, p) in enumerate(hits, 1):
+        text = p["text"][:max(0, max_chars - used)]
+        if not text:
+            break
+        parts.append(f"[{n}] {p['title'] + ': ' if p['title'] else ''}{text}")
+        used += len(text)
+    return (
+        f"Titolo POI: {name}\n\nPassaggi:\n" + "\n\n".join(parts) + "\n\n"
+        f"Domanda: {question}\n\n"
+        f"Rispondi in {lang} usando solo i passaggi sopra, in poche frasi. "
+        "Se non contengono la risposta, dillo."
+    )
+
+
+async def answer(poi: dict, question: str, lang: str) -> dict:
+    """Retrieval BM25 sui passaggi del POI, poi narrazione solo da quelli."""
+    s = get_settings()
+    names = poi.get("name") if isinstance(poi.get("name"), dict) else {}
+    ignore = {t for n in names.values() if isinstance(n, str) for t in passages.tokens(n)}
+    idx = await aio.run(passages.index_for, poi["_id"])
+    hits = idx.search(question, k=s.ASK_TOP_K, lang=lang, ignore=ignore)
+    if not hits:
+        return {"answer": "Nessuna fonte disponibile per rispondere.", "passages": [], "sources": []}
+
+    name = names.get(lang) or names.get("default") or "Questo luogo"
+    if OPENAI_API_KEY:
+        prompt = _ask_prompt(name, question, hits, lang, s.ASK_MAX_CONTEXT_CHARS)
+        text = await _call_openai(prompt, lang, purpose="ask")
+    else:
+        text = hits[0][1]["text"]                   # senza LLM: il passaggio migliore
+    sources = list({p["url"]: {"name": p.get("source") or "wikipedia", "url": p["url"], "lang": p["lang"]}
+                    for _, p in hits if p.get("url")}.values())
+    return {
+        "answer": text,
+        "passages": [{"text": p["text"], "section": p["title"], "lang": p["lang"], "url": p.get("url"), "score": sc}
+                     for sc, p in hits],
+        "sources": sources,
+    }
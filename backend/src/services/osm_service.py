@@ -1,51 +1,131 @@
 # services/osm_service.py
+import asyncio
 import logging
-import aiohttp
-import ssl
-import certifi
-
-OSM_OVERPASS_URL = "https://overpass-api.de/api/interpreter"
-
-# Forza certificati certifi
-ssl_context = ssl.create_default_context(cafile=certifi.where())
-
-async def fetch_osm_pois(lat: float, lon: float, radius_m: int):
-    logging.info(f"[OSM] Fetching POIs for lat={lat}, lon={lon}, radius={radius_m}m")
-    query = f"""
-    [out:json];
-    (
-      node
-        (around:{radius_m},{lat},{lon})
-        ["name"];
-    );
-    out body;
+from dataclasses import dataclass
+from typing import AsyncIterator
+from ..infra.admission import guarded
+from ..infra.settings import get_settings
+from .overpass import OverpassUnavailable, pool
+
+# ---------- profili di query ----------
+@dataclass(frozen=True)
+class QueryProfile:
+    filters: tuple[str, ...]                          # filtri tag Overpass, uno per statement
+    types: tuple[str, ...] = ("node", "way", "relation")
+
+PROFILES = {
+    # luoghi da visitare: attrazioni, monumenti, beni tutelati (anche come way/relation)
+    "tourism": QueryProfile(filters=(
+        '["tourism"~"^(attraction|museum|artwork|gallery|viewpoint)$"]["name"]',
+        '["historic"]["name"]',
+        '["heritage"]["name"]',
+        '["amenity"="place_of_worship"]["name"]["wikidata"]',
+    )),
+    "historic": QueryProfile(filters=('["historic"]["name"]', '["heritage"]["name"]')),
+    # comportamento precedente: ogni nodo con un nome
+    "all_named": QueryProfile(filters=('["name"]',), types=("node",)),
+}
+
+def build_query(profile: QueryProfile, lat: float, lon: float, radius_m: int, timeout: int = 25) -> str:
+    """
+    Nodi con `out` (id, coordinate, tag); way e relation con `out tags center`:
+    niente riferimenti ai nodi né membri, solo il centro del bbox.
+    """
+    around = f"(around:{radius_m},{lat},{lon})"
+    stmts = "\n".join(f"  {t}{around}{f};" for f in profile.filters for t in profile.types)
+    out = []
+    if "node" in profile.types:
+        out.append("node.p;\nout qt;")
+    if set(profile.types) - {"node"}:
+        out.append("(way.p; relation.p;);\nout tags center qt;")
+    return f"[out:json][timeout:{timeout}];\n(\n{stmts}\n)->.p;\n" + "\n".join(out)
+
+def to_poi(el: dict) -> dict | None:
+    """Elemento Overpass -> POI grezzo (None se senza nome o coordinate)."""
+    tags = el.get("tags") or {}
+    name = tags.get("name")
+    pos = el if "lat" in el else el.get("center") or {}
+    if not name or "lat" not in pos:
+        return None
+    kind = el.get("type", "node")
+    return {
+        "provider": "osm",
+        # i nodi tengono l'id nudo (compatibile con i POI già salvati)
+        "provider_id": str(el.get("id")) if kind == "node" else f"{kind}/{el.get('id')}",
+        "name": name,
+        "lat": pos["lat"],
+        "lon": pos["lon"],
+        "lang": None,
+        "osm_type": kind,
+        "wikidata": tags.get("wikidata"),
+    }
+
+_END = object()
+
+def resolve_profile(name: str | None) -> str:
+    """Nome di profilo valido: quello richiesto, altrimenti il default configurato."""
+    if name in PROFILES:
+        return name
+    default = get_settings().OVERPASS_PROFILE
+    return default if default in PROFILES else "tourism"
+
+async def stream_osm_pois(lat: float, lon: float, radius_m: int, profile: str | None = None) -> AsyncIterator[dict]:
     """
-    logging.debug(f"[OSM] Overpass query:\n{query.strip()}")
-
-    async with aiohttp.ClientSession() as session:
-        async with session.post(OSM_OVERPASS_URL, data={"data": query}, ssl=ssl_context) as resp:
-            if resp.status != 200:
-                logging.error(f"[OSM] Failed with status {resp.status}")
-                return []
-            data = await resp.json()
-
-    pois = []
-    for el in data.get("elements", []):
-        name = el.get("tags", {}).get("name")
-        if not name:
-            logging.debug(f"[OSM] Skipping element {el.get('id')} (no name)")
-            continue
-        lat_poi, lon_poi = el["lat"], el["lon"]
-        lang_guess = None
-        pois.append({
-            "provider": "osm",
-            "provider_id": str(el.get("id")),  # ID OSM
-            "name": name,
-            "lat": lat_poi,
-            "lon": lon_poi,
-            "lang": lang_guess
-        })
-        logging.debug(f"[OSM] Found POI: '{name}' ({lat_poi},{lon_poi}) → provider_id={el.get('id')}")
-
-    logging.info(f"[OSM] Total POIs fetched: {len(pois)}")
-    return pois
\ No newline at end of file
+    POI man mano che arrivano da Overpass. Se la risposta è incompleta
+    (mirror giù, troncata, timeout lato server) alla fine solleva
+    OverpassUnavailable: i POI già consegnati restano validi.
+    """
+    s = get_settings()
+    name = resolve_profile(profile)
+    query = build_query(PROFILES[name], lat, lon, radius_m, timeout=int(s.OVERPASS_TIMEOUT_SECS))
+    logging.info(f"[OSM] Fetching POIs for lat={lat}, lon={lon}, radius={radius_m}m, profile={name}")
+    logging.debug(f"[OSM] Overpass query:\n{query}")
+
+    # mirror, breaker e hedge nel pool; il limite AIMD resta sull'intera query.
+    # La lettura gira in un task e consegna i POI da una coda: lo slot e il tempo
+    # misurati sono solo quelli di Overpass, non le scritture del chiamante.
+    q: asyncio.Queue = asyncio.Queue()
+
+    async def read():
+        n = 0
+        try:
+            async with guarded("overpass") as o:
+                try:
+                    async for el in pool().stream(query):
+                        poi = to_poi(el)
+                        if poi is None:
+                            logging.debug(f"[OSM] Skipping element {el.get('type')}/{el.get('id')} (no name/coords)")
+                            continue
+                        n += 1
+                        q.put_nowait(poi)
+                    o.status = 200
+                except OverpassUnavailable as e:
+                    o.status = 503
+                    logging.error(f"[OSM] Overpass unavailable after {n} POIs: {e}")
+                    raise
+            logging.info(f"[OSM] Total POIs fetched: {n}")
+        finally:
+            q.put_nowait(_END)
+
+    task = asyncio.create_task(read())
+    try:
+        while (poi := await q.get()) is not _END:
+            yield poi
+        await task                      # OverpassUnavailable / Overloaded al chiamante
+    finally:
+        if not task.done():             # il chiamante si è fermato prima: la lettura non serve più
+            task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+async def fetch_osm_pois(lat: float, lon: float, radius_m: int, profile: str | None = None):
+    """Lista dei POI; Overpass giù = quelli arrivati fin lì (anche nessuno)."""
+    out = []
+    try:
+        async for p in stream_osm_pois(lat, lon, radius_m, profile):
+            out.append(p)
+    except OverpassUnavailable:
+        pass
+    return out
@@ -0,0 +1,282 @@
+# services/overpass.py
+"""
+Pool di endpoint Overpass con circuit breaker e richieste "hedged".
+
+- Ogni mirror ha un breaker: dopo `failures` errori consecutivi (429/5xx,
+  timeout, risposta illeggibile) si apre per `cooldown` secondi; poi passa
+  in half-open e lascia passare una sola richiesta di prova.
+- I mirror chiusi sono ordinati per latenza mediana osservata; quelli in
+  prova vengono dopo.
+- Se il primo mirror non risponde entro il suo p90 (limitato fra
+  `hedge_min` e `hedge_max`) parte un duplicato sul mirror successivo: vince
+  la prima risposta valida, l'altra richiesta viene cancellata. Un errore
+  veloce passa subito al mirror seguente senza aspettare.
+- La gara si decide sugli header; il body del vincitore viene letto a
+  pezzi e gli elementi escono uno alla volta (`stream`).
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import ssl
+import time
+from collections import deque
+from typing import AsyncIterator
+from urllib.parse import urlsplit
+
+import aiohttp
+import certifi
+
+from ..infra.metrics import OVERPASS_ATTEMPTS, OVERPASS_BREAKER, OVERPASS_HEDGES
+from ..infra.profiling import span
+from ..infra.settings import get_settings
+from ..utils.jsonstream import ElementStream, StreamError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URLS = ("https://overpass-api.de/api/interpreter",
+                "https://overpass.kumi.systems/api/interpreter",
+                "https://overpass.private.coffee/api/interpreter")
+
+ssl_context = ssl.create_default_context(cafile=certifi.where())
+CHUNK_BYTES = 64 * 1024
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+
+class OverpassUnavailable(Exception):
+    pass
+
+
+class MirrorError(Exception):
+    def __init__(self, mirror: str, status):
+        super().__init__(f"{mirror}: {status}")
+        self.status = status
+
+
+# ---------- breaker ----------
+class CircuitBreaker:
+    def __init__(self, failures: int = 3, cooldown: float = 30.0, clock=time.monotonic):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = CLOSED
+        self._fails = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def available(self) -> bool:
+        """Senza effetti: il mirror accetterebbe una richiesta adesso?"""
+        if self.state == OPEN:
+            return self.clock() - self._opened_at >= self.cooldown
+        return not (self.state == HALF_OPEN and self._probing)
+
+    def allow(self) -> bool:
+        """Da chiamare subito prima della richiesta: in half-open passa una sola prova."""
+        if self.state == OPEN:
+            if self.clock() - self._opened_at < self.cooldown:
+                return False
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def success(self):
+        self.state, self._fails, self._probing = CLOSED, 0, False
+
+    def failure(self):
+        self._fails += 1
+        if self.state == HALF_OPEN or self._fails >= self.failures:
+            self.state, self._opened_at, self._probing = OPEN, self.clock(), False
+
+    def release(self):
+        """Richiesta cancellata (hedge perso): né successo né errore."""
+        self._probing = False
+
+
+# ---------- mirror ----------
+class Mirror:
+    def __init__(self, url: str, breaker: CircuitBreaker, window: int = 50):
+        self.url = url
+        self.name = urlsplit(url).netloc or url
+        self.breaker = breaker
+        self._lat: deque[float] = deque(maxlen=window)
+        self._publish()
+
+    def _publish(self):
+        OVERPASS_BREAKER.labels(self.name).set(self.breaker.state)
+
+    def quantile(self, q: float) -> float | None:
+        if len(self._lat) < 5:
+            return None
+        s = sorted(self._lat)
+        return s[min(len(s) - 1, int(q * len(s)))]
+
+    def ok(self, seconds: float):
+        self._lat.append(seconds)
+        self.breaker.success()
+        self._publish()
+
+    def failed(self):
+        self.breaker.failure()
+        self._publish()
+
+    def cancelled(self):
+        self.breaker.release()
+        self._publish()
+
+
+# ---------- pool ----------
+class OverpassPool:
+    def __init__(self, urls, failures: int = 3, cooldown: float = 30.0, timeout: float = 25.0,
+                 hedge_min: float = 0.3, hedge_max: float = 5.0, hedge_default: float = 1.5,
+                 clock=time.monotonic):
+        self.mirrors = [Mirror(u, CircuitBreaker(failures, cooldown, clock)) for u in urls]
+        self.timeout = timeout
+        self.hedge_min, self.hedge_max, self.hedge_default = hedge_min, hedge_max, hedge_default
+
+    def hedge_delay(self, m: Mirror) -> float:
+        p90 = m.quantile(0.9)
+        return self.hedge_default if p90 is None else min(self.hedge_max, max(self.hedge_min, p90))
+
+    def ranked(self) -> list[Mirror]:
+        """Chiusi per latenza mediana (ordine di configurazione a parità), poi quelli in prova."""
+        order = {id(m): i for i, m in enumerate(self.mirrors)}
+        live = [m for m in self.mirrors if m.breaker.available()]
+        return sorted(live, key=lambda m: (m.breaker.state != CLOSED,
+                                           m.quantile(0.5) or 0.0, order[id(m)]))
+
+    async def _open(self, session: aiohttp.ClientSession, m: Mirror, query: str) -> aiohttp.ClientResponse:
+        """Richiesta fino agli header: è il tempo su cui si misura il p90 dell'hedge."""
+        t0 = time.perf_counter()
+        resp = None
+        try:
+            with span(f"http overpass {m.name}", cat="http"):
+                resp = await session.post(m.url, data={"data": query}, ssl=ssl_context,
+                                          timeout=aiohttp.ClientTimeout(total=self.timeout))
+                if resp.status != 200:
+                    raise MirrorError(m.name, resp.status)
+        except asyncio.CancelledError:
+            if resp is not None:
+                resp.release()
+            m.cancelled()
+            OVERPASS_ATTEMPTS.labels(m.name, "cancelled").inc()
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError, MirrorError) as e:
+            if resp is not None:
+                resp.release()
+            m.failed()
+            OVERPASS_ATTEMPTS.labels(m.name, str(getattr(e, "status", "error"))).inc()
+            raise MirrorError(m.name, getattr(e, "status", type(e).__name__)) from e
+        m.ok(time.perf_counter() - t0)
+        OVERPASS_ATTEMPTS.labels(m.name, "200").inc()
+        return resp
+
+    async def _race(self, session: aiohttp.ClientSession, query: str) -> tuple[Mirror, aiohttp.ClientResponse]:
+        queue = self.ranked()
+        running: dict[asyncio.Task, Mirror] = {}
+        errors: list[str] = []
+        hedged = False
+        loop = asyncio.get_running_loop()
+
+        def launch() -> Mirror | None:
+            while queue:
+                m = queue.pop(0)
+                if m.breaker.allow():
+                    running[asyncio.ensure_future(self._open(session, m, query))] = m
+                    return m
+            return None
+
+        primary = launch()
+        if primary is None:
+            raise OverpassUnavailable("all Overpass mirrors are open")
+        hedge_at = loop.time() + self.hedge_delay(primary)
+        try:
+            while running:
+                wait = max(0.0, hedge_at - loop.time()) if queue and not hedged else None
+                done, _ = await asyncio.wait(running, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if launch() is not None:
+                        OVERPASS_HEDGES.labels("launched").inc()
+                    hedged = True
+                    continue
+                winner = None
+                for t in done:
+                    m = running.pop(t)
+                    if t.exception() is not None:
+                        errors.append(str(t.exception()))
+                    elif winner is None:
+                        winner = (m, t.result())
+                    else:
+                        t.result().release()
+                if winner is not None:
+                    if hedged:
+                        OVERPASS_HEDGES.labels("won" if winner[0] is not primary else "lost").inc()
+                    return winner
+                if not running:
+                    # errore veloce: failover senza aspettare l'hedge; il nuovo mirror è il
+                    # primario, con il suo p90 e un hedge tutto suo
+                    primary = launch()
+                    if primary is not None:
+                        hedge_at, hedged = loop.time() + self.hedge_delay(primary), False
+        finally:
+            for t in running:
+                t.cancel()
+            for r in await asyncio.gather(*running, return_exceptions=True):
+                if isinstance(r, aiohttp.ClientResponse):
+                    r.release()
+        raise OverpassUnavailable("; ".join(errors) or "no Overpass mirror available")
+
+    async def stream(self, query: str, session: aiohttp.ClientSession | None = None) -> AsyncIterator[dict]:
+        """Elementi della risposta man mano che arrivano dal mirror vincente."""
+        if session is None:
+            async with aiohttp.ClientSession() as s:
+                async for el in self.stream(query, s):
+                    yield el
+            return
+        m, resp = await self._race(session, query)
+        parser = ElementStream()
+        try:
+            async for chunk in resp.content.iter_chunked(CHUNK_BYTES):
+                for el in parser.feed(chunk):
+                    yield el
+            extra = parser.close()
+        except (aiohttp.ClientError, asyncio.TimeoutError, StreamError) as e:
+            # elementi già consegnati: niente failover a metà risposta
+            m.failed()
+            OVERPASS_ATTEMPTS.labels(m.name, "truncated").inc()
+            raise OverpassUnavailable(f"{m.name}: {e}") from e
+        finally:
+            resp.release()
+        remark = extra.get("remark")
+        if remark and "error" in remark:
+            # es. "runtime error: Query timed out": 200 ma risultato parziale
+            m.failed()
+            OVERPASS_ATTEMPTS.labels(m.name, "partial").inc()
+            raise OverpassUnavailable(f"{m.name}: {remark}")
+        if remark:
+            logger.info("[overpass] %s: %s", m.name, remark)
+
+    async def query(self, query: str, session: aiohttp.ClientSession | None = None) -> dict:
+        return {"elements": [el async for el in self.stream(query, session)]}
+
+
+_pool: OverpassPool | None = None
+
+
+def urls_from(s) -> list[str]:
+    raw = s.OVERPASS_URLS or os.getenv("OVERPASS_URL") or ""
+    return [u.strip() for u in raw.split(",") if u.strip()] or list(DEFAULT_URLS)
+
+
+def pool() -> OverpassPool:
+    global _pool
+    if _pool is None:
+        s = get_settings()
+        _pool = OverpassPool(urls_from(s), failures=s.OVERPASS_BREAKER_FAILURES,
+                             cooldown=s.OVERPASS_BREAKER_COOLDOWN_SECS, timeout=s.OVERPASS_TIMEOUT_SECS,
+                             hedge_min=s.OVERPASS_HEDGE_MIN_SECS, hedge_max=s.OVERPASS_HEDGE_MAX_SECS)
+    return _pool
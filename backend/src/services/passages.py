@@ -0,0 +1,135 @@
+# services/passages.py
+"""
+Passaggi dei poi_docs e retrieval lessicale (BM25) per /poi/{id}/ask.
+
+- `chunk(text)` (utils/chunking) divide l'estratto Wikipedia in passaggi;
+  si salvano come `poi_docs.sections` (titolo + offset in `content_text`)
+  nello stesso write del testo, così il lavoro si fa una volta per upsert e
+  non a ogni domanda.
+- `PassageIndex` è un BM25 sui passaggi di un POI; i termini sono parole
+  normalizzate troncate a STEM_LEN caratteri (stemming grezzo ma valido
+  per tutte le lingue: "costruita"/"costruzione").
+- `index_for(poi_id)` tiene gli indici in una LRU di processo, rivalidata a
+  ogni domanda con la firma (_id, updated_at) dei doc del POI: i testi si
+  rileggono solo se un doc è cambiato, anche se a scriverlo è stato un
+  altro processo.
+"""
+from __future__ import annotations
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from math import log
+
+from bson import ObjectId
+
+from ..infra.db import collection
+from ..infra.settings import get_settings
+from ..models import doc_blob
+from ..utils.chunking import MAX_PASSAGES, PASSAGE_CHARS, chunk  # noqa: F401
+from ..utils.text import fold
+
+poi_docs = collection("poi_docs", "content")
+
+STEM_LEN = 5
+K1, B = 1.2, 0.75
+
+STOPWORDS = set((
+    "il lo la i gli le un uno una di a da in con su per tra fra e o ma se che chi cui non come dove "
+    "quando quanto quale quali perche del dello della dei degli delle al allo alla ai agli alle dal "
+    "dallo dalla dai dagli dalle nel nello nella nei negli nelle sul sullo sulla sui sugli sulle "
+    "stato stata stati state sono era erano ha hanno ho essere questo questa quello quella ci si "
+    "the a an of to in on at by for with from and or but is are was were be been it its this that "
+    "what who whom which when where why how did does do has have had"
+).split())
+
+
+def passage_text(text: str, sec: dict) -> str:
+    return " ".join(text[sec["start"]:sec["end"]].split())
+
+
+def tokens(s: str) -> list[str]:
+    return [w[:STEM_LEN] for w in fold(s).split() if w not in STOPWORDS and (len(w) > 1 or w.isdigit())]
+
+
+# ---------- BM25 ----------
+class PassageIndex:
+    def __init__(self, passages: list[dict]):
+        """`passages`: `{"text", "title", "lang", "url", "source"}`."""
+        self.passages = passages
+        self._post: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self._len = []
+        for i, p in enumerate(passages):
+            tf = Counter(tokens(f"{p['title']} {p['text']}"))
+            self._len.append(sum(tf.values()))
+            for t, n in tf.items():
+                self._post[t].append((i, n))
+        self._avg = (sum(self._len) / len(self._len)) if self._len else 0.0
+
+    def __len__(self):
+        return len(self.passages)
+
+    def scores(self, question: str, ignore: set[str] = frozenset()) -> dict[int, float]:
+        n = len(self.passages)
+        out: dict[int, float] = defaultdict(float)
+        for t in set(tokens(question)) - ignore:
+            post = self._post.get(t)
+            if not post:
+                continue
+            idf = log(1 + (n - len(post) + 0.5) / (len(post) + 0.5))
+            for i, tf in post:
+                norm = K1 * (1 - B + B * self._len[i] / self._avg)
+                out[i] += idf * tf * (K1 + 1) / (tf + norm)
+        return out
+
+    def search(self, question: str, k: int = 4, lang: str | None = None,
+               ignore: set[str] = frozenset()) -> list[tuple[float, dict]]:
+        """
+        Top-k passaggi; se la lingua richiesta ha risultati si resta su quella.
+        `ignore`: termini da non pesare (il nome del POI, implicito in ogni domanda).
+        """
+        sc = self.scores(question, ignore)
+        if lang and any(self.passages[i]["lang"] == lang for i in sc):
+            sc = {i: s for i, s in sc.items() if self.passages[i]["lang"] == lang}
+        best = sorted(sc.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+        return [(round(s, 4), self.passages[i]) for i, s in best]
+
+
+def build(docs: list[dict]) -> PassageIndex:
+    passages = []
+    for d in docs:
+        text = d.get("content_text") or ""
+        secs = d.get("sections") or chunk(text)             # doc scritti prima dei passaggi
+        meta = {"lang": (d.get("lang") or "").lower(), "url": d.get("url"), "source": d.get("source")}
+        for sec in secs:
+            if isinstance(sec, dict) and "start" in sec:
+                passages.append({"text": passage_text(text, sec), "title": sec.get("title") or "", **meta})
+    return PassageIndex(passages)
+
+
+# ---------- indici per POI ----------
+_cache: OrderedDict[str, tuple[tuple, PassageIndex]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _oid(x):
+    return x if isinstance(x, ObjectId) else ObjectId(x)
+
+
+def index_for(poi_id) -> PassageIndex:
+    oid = _oid(poi_id)
+    heads = poi_docs.find({"poi_id": oid}, {"updated_at": 1, "created_at": 1})
+    sig = tuple(sorted((str(d["_id"]), str(d.get("updated_at") or d.get("created_at"))) for d in heads))
+    key = str(oid)
+    with _lock:
+        hit = _cache.get(key)
+        if hit and hit[0] == sig:
+            _cache.move_to_end(key)
+            return hit[1]
+    docs = list(poi_docs.find({"poi_id": oid}, {"content_text": 1, "content_ref": 1, "sections": 1,
+                                                "lang": 1, "url": 1, "source": 1}))
+    idx = build(doc_blob.attach(docs))
+    with _lock:
+        _cache[key] = (sig, idx)
+        _cache.move_to_end(key)
+        while len(_cache) > get_settings().ASK_INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return idx
@@ -5,6 +5,7 @@ from datetime import datetime, timezone
 from ..infra.db import pois, poi_docs
 from .wiki_service import _clean_text
 from . import wiki_service
+from ..models import poi_doc
 from pymongo import UpdateOne
 from bson import ObjectId
 
@@ -171,11 +172,12 @@ async def enrich_poi_list(pois_list: list[dict], lang: str = "en", write_to_db:
                         "$set": {
                             "poi_id": ObjectId(p["_id"]),
                             "lang": poi_lang,
-                            "content_text": wiki_content,
+                            **poi_doc.body(wiki_content, now),
                             "source": "wikipedia",
                             "url": wiki_url,
                             "updated_at": now
                         },
+                        "$unset": poi_doc.UNSET_TEXT,
                         "$setOnInsert": {"created_at": now}
                     },
                     upsert=True
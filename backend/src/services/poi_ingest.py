@@ -0,0 +1,201 @@
+# backend/src/services/poi_ingest.py
+"""
+Fetch OSM -> pois/poi_docs, condiviso da /nearby (interattivo) e dal
+refresher in background (services/refresher).
+
+`ingest_osm` salva i POI mentre la risposta Overpass arriva; `reconcile`
+aggiorna gli snapshot per tile; `enrich` scarica e salva i doc Wikipedia.
+Le funzioni sincrone si chiamano dal codice async con `aio.run`.
+"""
+from __future__ import annotations
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+
+from bson import ObjectId
+import reverse_geocoder as rg
+
+from ..infra.db import pois, poi_docs, searched_pois
+from ..infra.settings import get_settings
+from ..infra.profiling import span
+from ..infra import admission, aio, db_async
+from ..models import poi as poi_model, osm_tile, poi_doc
+from ..utils import tiles
+from .osm_service import resolve_profile, stream_osm_pois
+from .overpass import OverpassUnavailable
+from .wiki_service import fetch_wiki_docs
+
+SEARCH_TTL_DAYS = 5
+COORD_PRECISION = 6
+
+
+def get_lang_from_coords(lat, lon):
+    result = rg.search((lat, lon))[0]
+    country_code = result['cc']
+    country_lang_map = {
+        "IT": "it",
+        "FR": "fr",
+        "DE": "de",
+        "US": "en",
+    }
+    return country_lang_map.get(country_code, "en")
+
+
+def round_coord(lat, lon):
+    return (round(lat, COORD_PRECISION), round(lon, COORD_PRECISION))
+
+
+def is_relevant_name(name1: str, name2: str, threshold: float = 0.85) -> bool:
+    """Verifica se due nomi sono molto simili."""
+    if not name1 or not name2:
+        return False
+    n1, n2 = name1.lower().strip(), name2.lower().strip()
+    if n1 == n2:
+        return True
+    return SequenceMatcher(None, n1, n2).ratio() >= threshold
+
+
+@dataclass
+class Ingest:
+    found_ids: list = field(default_factory=list)
+    found: list = field(default_factory=list)       # per la riconciliazione per tile
+    new_ids: list = field(default_factory=list)     # inseriti ora
+    complete: bool = True
+
+
+async def ingest_osm(lat: float, lon: float, radius_m: float, profile: str, lang: str,
+                     now: datetime) -> Ingest:
+    """POI Overpass nel cerchio, deduplicati per nome; Overpass giù = `complete=False`."""
+    out = Ingest()
+    seen_names = []
+    try:
+        async for osm_poi in stream_osm_pois(lat, lon, radius_m, profile):
+            provider_id = osm_poi.get("provider_id")
+            # in `found` anche i POI scartati qui sotto (poi_id None): OSM li ha ancora
+            entry = {"provider_id": provider_id, "poi_id": None, "lat": osm_poi["lat"], "lon": osm_poi["lon"]}
+            out.found.append(entry)
+            name = osm_poi.get("name", "").strip()
+            if not name or len(name) < 3:
+                continue
+            with span("dedup", cat="cpu", n=len(seen_names)):
+                dup = any(is_relevant_name(name, seen) for seen in seen_names)
+            if dup:
+                logging.debug(f"[NEARBY] Skipping duplicate/similar POI name '{name}'")
+                continue
+            seen_names.append(name)
+
+            lat_r_poi, lon_r_poi = round_coord(osm_poi["lat"], osm_poi["lon"])
+            existing = await db_async.pois.find_one({
+                "lat_round": lat_r_poi,
+                "lon_round": lon_r_poi,
+                "provider": "osm",
+                "provider_id": {"$in": [provider_id, None]}  # None: POI salvati prima senza id
+            }, {"provider_id": 1, "is_active": 1, "missing_since": 1})
+
+            if existing:
+                # i POI già noti e attivi non si riscrivono: le sparizioni le gestisce osm_tile
+                fix = {}
+                if existing.get("provider_id") != provider_id:
+                    fix["provider_id"] = provider_id
+                if existing.get("is_active") is False or "missing_since" in existing:
+                    fix.update(is_active=True, last_seen_at=now, updated_at=now)  # delta sync di NameIndex
+                if fix:
+                    await db_async.pois.update_one({"_id": existing["_id"]},
+                                                   {"$set": fix, "$unset": {"missing_since": ""}})
+                    await aio.run(poi_model.notify_change, existing["_id"])
+                poi_id = existing["_id"]
+            else:
+                poi_id = (await db_async.pois.insert_one({
+                    "lat_round": lat_r_poi,
+                    "lon_round": lon_r_poi,
+                    "provider": "osm",
+                    "provider_id": provider_id,
+                    "osm_type": osm_poi.get("osm_type", "node"),
+                    **({"wikidata_qid": osm_poi["wikidata"]} if osm_poi.get("wikidata") else {}),
+                    "name": {"default": name},
+                    "aliases": [],
+                    "location": {
+                        "type": "Point",
+                        "coordinates": [osm_poi["lon"], osm_poi["lat"]]
+                    },
+                    "langs": [lang],
+                    "photos": [],
+                    "last_seen_at": now,
+                    "last_refresh_at": now,
+                    "is_active": True,
+                    "created_at": now,
+                    "updated_at": now
+                })).inserted_id
+                await aio.run(poi_model.notify_change, poi_id)
+                out.new_ids.append(poi_id)
+            out.found_ids.append(poi_id)
+            entry["poi_id"] = poi_id
+    except OverpassUnavailable as e:
+        logging.warning(f"[NEARBY] Risultato OSM incompleto: {e}")
+        out.complete = False
+    return out
+
+
+def reconcile(res: Ingest, profile: str, lat: float, lon: float, radius_m: float, now: datetime) -> dict | None:
+    """Riconciliazione: solo tile viste per intero, solo con una risposta completa del profilo di default."""
+    if not res.complete or profile != resolve_profile(None):
+        return None
+    s = get_settings()
+    z = s.RECON_TILE_ZOOM
+    n = tiles.bbox_size(z, lat, lon, radius_m)
+    if n > s.RECON_MAX_TILES:
+        logging.info(f"[NEARBY] Riconciliazione saltata: {n} tile nel bbox (max {s.RECON_MAX_TILES})")
+        return None
+    with span("osm_reconcile", cat="db"):
+        stats = osm_tile.reconcile(profile, z, tiles.covered(z, lat, lon, radius_m), res.found, now,
+                                   timedelta(days=s.RECON_TOMBSTONE_GRACE_DAYS))
+    logging.info(f"[NEARBY] Riconciliazione tile: {stats}")
+    return stats
+
+
+async def enrich(poi_ids: list, now: datetime) -> bool:
+    """Doc Wikipedia dei POI, a bassa priorità. True = interrotto per carico."""
+    for poi_id in poi_ids:
+        poi = await db_async.pois.find_one({"_id": poi_id})
+        try:
+            with span("wiki_enrich", poi_id=str(poi_id)), admission.priority(admission.LOW):
+                wiki_docs = await fetch_wiki_docs(poi)
+        except admission.Overloaded as e:
+            logging.warning(f"[NEARBY] Enrichment interrotto: {e}")
+            return True
+        await aio.run(save_wiki_docs, poi_id, wiki_docs, now)
+    return False
+
+
+def save_wiki_docs(poi_id, wiki_docs: list[dict], now: datetime):
+    for doc in wiki_docs:
+        if isinstance(doc.get("poi_id"), str):
+            doc["poi_id"] = ObjectId(doc["poi_id"])
+        text = doc.pop("content_text", None) or ""
+        poi_docs.update_one(
+            {
+                "poi_id": poi_id,
+                "lang": doc["lang"],
+                "source": "wikipedia",
+                "url": doc["url"]
+            },
+            {"$set": {**doc, **poi_doc.body(text, now), "updated_at": now}, "$unset": poi_doc.UNSET_TEXT},
+            upsert=True
+        )
+
+
+def mark_searched(lat: float, lon: float, now: datetime):
+    lat_r, lon_r = round_coord(lat, lon)
+    searched_pois.update_one(
+        {"lat_round": lat_r, "lon_round": lon_r},
+        {"$set": {"lat_round": lat_r, "lon_round": lon_r, "last_search_at": now}},
+        upsert=True
+    )
+
+
+def confirm(res: Ingest, now: datetime) -> int:
+    """`last_refresh_at` sui POI appena confermati da Overpass (un solo update)."""
+    if not res.found_ids:
+        return 0
+    return pois.update_many({"_id": {"$in": res.found_ids}}, {"$set": {"last_refresh_at": now}}).modified_count
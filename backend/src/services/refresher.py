@@ -0,0 +1,170 @@
+# backend/src/services/refresher.py
+"""
+Refresh in background delle aree richieste, per tile (REFRESH_TILE_ZOOM).
+
+A ogni giro (`run_once`, ogni REFRESH_INTERVAL_SECS):
+
+1. domanda per tile dagli eventi `poi.nearby` delle ultime
+   REFRESH_DEMAND_WINDOW_HOURS, con decadimento esponenziale;
+2. priorità = domanda x età (`refreshed_at`, o `data_at` stimata dai
+   `pois.last_refresh_at` per le tile mai rinfrescate); si saltano le tile
+   con poca domanda, quelle rinfrescate da meno di REFRESH_MIN_AGE_HOURS e
+   quelle in backoff dopo un errore;
+3. entro il budget Overpass, ogni tile si riscarica per intero (un cerchio
+   che la contiene), si riconcilia e si arricchiscono i POI nuovi; il
+   budget Wikipedia che avanza va a riverificare le pagine più vecchie.
+
+Tutto a priorità LOW: sotto carico le chiamate cedono il passo a quelle
+interattive. Le tile calde restano sotto SEARCH_TTL_DAYS e /nearby risponde
+dalla cache (`area_tile.fresh`).
+
+Su Lambda il task non parte: si lancia da un job schedulato
+
+    cd backend
+    python -m src.services.refresher
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from ..infra import admission, aio
+from ..infra.metrics import REFRESH_TILES
+from ..infra.settings import get_settings, flag
+from ..models import area_tile, usage_log
+from ..utils import tiles
+from . import poi_ingest, wiki_service
+from .osm_service import resolve_profile
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE_FACTOR = 2.0     # oltre 2 x TTL (o età ignota) una tile non diventa più urgente
+MAX_BACKOFF_STEPS = 6
+
+
+# ---------- pianificazione (pura) ----------
+def tile_demand(rows: list[dict], z: int, now: datetime, half_life_h: float) -> dict[tuple[int, int], float]:
+    """rows di `usage_log.nearby_demand` -> {(x, y): domanda con decadimento}."""
+    out = defaultdict(float)
+    for r in rows:
+        p = usage_log.parse_latlon(r["p"])
+        if p is None:
+            continue
+        age_h = max(0.0, (now - r["hour"]).total_seconds() / 3600)
+        out[tiles.tile_of(z, p[1], p[0])] += r["n"] * 0.5 ** (age_h / half_life_h)
+    return dict(out)
+
+
+def priority(demand: float, state: dict, now: datetime, s) -> float:
+    """0 = da non rinfrescare in questo giro."""
+    if demand < s.REFRESH_MIN_DEMAND:
+        return 0.0
+    fails = state.get("failures") or 0
+    if fails and state.get("failed_at"):
+        wait = s.REFRESH_RETRY_SECS * 2 ** min(fails - 1, MAX_BACKOFF_STEPS)
+        if now < state["failed_at"] + timedelta(seconds=wait):
+            return 0.0
+    seen = state.get("refreshed_at") or state.get("data_at")
+    if seen is None:
+        return demand * MAX_AGE_FACTOR
+    age_h = (now - seen).total_seconds() / 3600
+    if age_h < s.REFRESH_MIN_AGE_HOURS:
+        return 0.0
+    return demand * min(age_h / (poi_ingest.SEARCH_TTL_DAYS * 24), MAX_AGE_FACTOR)
+
+
+def plan(demand: dict, states: dict, now: datetime, s) -> list[tuple[int, int]]:
+    """Tile da rinfrescare, dalla più urgente."""
+    scored = [(priority(d, states.get(xy) or {}, now, s), xy) for xy, d in demand.items()]
+    return [xy for p, xy in sorted(scored, reverse=True) if p > 0]
+
+
+# ---------- esecuzione ----------
+async def refresh_tile(z: int, x: int, y: int, profile: str, enrich_budget: int, now: datetime) -> dict:
+    lat, lon, radius = tiles.circle(z, x, y)
+    lang = await asyncio.to_thread(poi_ingest.get_lang_from_coords, lat, lon)
+    res = await poi_ingest.ingest_osm(lat, lon, radius, profile, lang, now)
+    stats = {"ok": res.complete, "pois": len(res.found_ids), "new": len(res.new_ids), "enriched": 0}
+    if not res.complete:
+        return stats
+    await aio.run(poi_ingest.reconcile, res, profile, lat, lon, radius, now)
+    await aio.run(poi_ingest.confirm, res, now)
+    todo = res.new_ids[:max(0, enrich_budget)]
+    if todo:
+        degraded = await poi_ingest.enrich(todo, now)
+        stats["enriched"] = 0 if degraded else len(todo)
+    return stats
+
+
+async def run_once(now: datetime | None = None) -> dict:
+    s = get_settings()
+    now = now or datetime.utcnow()
+    z = s.REFRESH_TILE_ZOOM
+    rows = await aio.run(usage_log.nearby_demand, now - timedelta(hours=s.REFRESH_DEMAND_WINDOW_HOURS))
+    demand = {xy: d for xy, d in tile_demand(rows, z, now, s.REFRESH_DEMAND_HALF_LIFE_HOURS).items()
+              if d >= s.REFRESH_MIN_DEMAND}
+    states = await aio.run(area_tile.get_many, z, demand)
+    seeds = {}
+    for xy in demand:
+        st = states.get(xy) or {}
+        if not st.get("refreshed_at") and not st.get("data_at"):
+            at = await aio.run(area_tile.seed_age, z, *xy)
+            if at is not None:
+                seeds[xy] = at
+                states.setdefault(xy, {})["data_at"] = at
+    await aio.run(area_tile.set_demand, z, demand, now, seeds)
+
+    stats = {"demand_tiles": len(demand), "refreshed": 0, "failed": 0, "busy": 0, "pois": 0, "new": 0,
+             "enriched": 0, "wiki": None}
+    wiki_budget = s.REFRESH_WIKI_PER_RUN
+    profile = resolve_profile(None)
+    lease = timedelta(seconds=s.REFRESH_LEASE_SECS)
+    for x, y in plan(demand, states, now, s):
+        if stats["refreshed"] + stats["failed"] >= s.REFRESH_OVERPASS_PER_RUN:
+            break
+        if not await aio.run(area_tile.claim, z, x, y, now, lease):
+            continue                                    # la sta già facendo un altro processo
+        try:
+            with admission.priority(admission.LOW):
+                t = await refresh_tile(z, x, y, profile, wiki_budget, now)
+        except admission.Overloaded as e:
+            await aio.run(area_tile.release, z, x, y)
+            REFRESH_TILES.labels("busy").inc()
+            stats["busy"] += 1
+            logger.info("[refresh] provider sotto carico, giro interrotto: %s", e)
+            break
+        except Exception:
+            logger.exception("[refresh] tile %s fallita", area_tile.key(z, x, y))
+            t = {"ok": False}
+        await aio.run(area_tile.done, z, x, y, now, t["ok"], t)
+        REFRESH_TILES.labels("ok" if t["ok"] else "failed").inc()
+        stats["refreshed" if t["ok"] else "failed"] += 1
+        for k in ("pois", "new", "enriched"):
+            stats[k] += t.get(k, 0)
+        wiki_budget -= t.get("enriched", 0)
+
+    if wiki_budget > 0:
+        try:
+            with admission.priority(admission.LOW):
+                stats["wiki"] = await wiki_service.refresh_stale(limit=wiki_budget)
+        except admission.Overloaded as e:
+            logger.info("[refresh] Wikipedia sotto carico: %s", e)
+    return stats
+
+
+async def loop():
+    """Task di lunga durata (worker, non Lambda): un giro ogni REFRESH_INTERVAL_SECS."""
+    while True:
+        await asyncio.sleep(get_settings().REFRESH_INTERVAL_SECS)
+        if not get_settings().REFRESH_ENABLED or not flag("area_refresh", True):
+            continue
+        try:
+            logger.info("[refresh] %s", await run_once())
+        except Exception:
+            logger.exception("[refresh] giro fallito")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(run_once()))
@@ -1,14 +1,22 @@
 # services/wiki_service.py
 import logging
+import os
 import aiohttp
 import certifi
 import ssl
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timedelta
 from bson import ObjectId
 from difflib import SequenceMatcher
+from ..infra import aio
+from ..infra.admission import guarded
+from ..infra.metrics import CACHE
+from ..infra.settings import get_settings
+from ..models import narration_cache, poi_doc, wiki_page
 
-WIKI_API_URL = "https://{lang}.wikipedia.org/w/api.php"
+WIKI_API_URL = os.getenv("WIKI_API_URL", "https://{lang}.wikipedia.org/w/api.php")
 ssl_context = ssl.create_default_context(cafile=certifi.where())
+REVISION_BATCH = 50   # titoli per richiesta: limite dell'API per client non bot
 
 def is_relevant(title: str, name: str, threshold: float = 0.8) -> bool:
     title_lower = title.lower()
@@ -41,12 +49,14 @@ async def fetch_wiki_docs(poi):
         "srsearch": name,
         "format": "json"
     }
-    async with aiohttp.ClientSession() as session:
-        async with session.get(WIKI_API_URL.format(lang=lang), params=params_search, ssl=ssl_context) as resp:
-            if resp.status != 200:
-                logging.error(f"[WIKI] Search failed for '{name}' (status={resp.status})")
-                return []
-            search_data = await resp.json()
+    async with guarded("wikipedia") as o:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(WIKI_API_URL.format(lang=lang), params=params_search, ssl=ssl_context) as resp:
+                o.status = resp.status
+                if resp.status != 200:
+                    logging.error(f"[WIKI] Search failed for '{name}' (status={resp.status})")
+                    return []
+                search_data = await resp.json()
 
     search_results = search_data.get("query", {}).get("search", [])
     if not search_results:
@@ -59,44 +69,149 @@ async def fetch_wiki_docs(poi):
         logging.info(f"[WIKI] No relevant search results for '{name}' in lang={lang}")
         return []
 
-    docs = []
+    titles = [r["title"] for r in search_results]
     async with aiohttp.ClientSession() as session:
-        for result in search_results:
-            page_title = result["title"]
-            logging.info(f"[WIKI] Found page title: {page_title}")
-
-            params_extract = {
-                "action": "query",
-                "prop": "extracts",
-                "explaintext": "true",
-                "titles": page_title,
-                "format": "json"
-            }
-            async with session.get(WIKI_API_URL.format(lang=lang), params=params_extract, ssl=ssl_context) as resp:
-                if resp.status != 200:
-                    logging.warning(f"[WIKI] Failed to fetch content for '{page_title}'")
-                    continue
-                page_data = await resp.json()
-
-            for _, page in page_data.get("query", {}).get("pages", {}).items():
-                content = page.get("extract", "").strip()
-                if not content:
-                    logging.debug(f"[WIKI] Page '{page_title}' has no extract")
-                    continue
-
-                docs.append({
-                    "poi_id": poi["_id"],  # ObjectId, non stringa
-                    "provider": poi.get("provider", "unknown"),
-                    "provider_id": poi.get("provider_id"),
-                    "source": "wikipedia",
-                    "url": f"https://{lang}.wikipedia.org/wiki/{page_title.replace(' ', '_')}",
-                    "lang": lang,
-                    "content_text": content,
-                    "sections": [],
-                    "meta": {"title": page_title},
-                    "created_at": datetime.utcnow()
-                })
-                logging.debug(f"[WIKI] Added doc for '{page_title}' ({len(content)} chars)")
+        extracts = await pages(session, lang, titles)
+
+    docs = []
+    for page_title in titles:
+        content = extracts.get(page_title)
+        if not content:
+            logging.debug(f"[WIKI] Page '{page_title}' has no extract")
+            continue
+        docs.append({
+            "poi_id": poi["_id"],  # ObjectId, non stringa
+            "provider": poi.get("provider", "unknown"),
+            "provider_id": poi.get("provider_id"),
+            "source": "wikipedia",
+            "url": page_url(lang, page_title),
+            "lang": lang,
+            "content_text": content,
+            "meta": {"title": page_title},
+            "created_at": datetime.utcnow()
+        })
+        logging.debug(f"[WIKI] Added doc for '{page_title}' ({len(content)} chars)")
 
     logging.info(f"[WIKI] Total docs for '{name}': {len(docs)}")
-    return docs
\ No newline at end of file
+    return docs
+
+# ---------- cache pagine per revisione ----------
+def page_url(lang: str, title: str) -> str:
+    return f"https://{lang}.wikipedia.org/wiki/{title.replace(' ', '_')}"
+
+async def _api(session, lang: str, params: dict) -> dict | None:
+    async with guarded("wikipedia") as o:
+        async with session.get(WIKI_API_URL.format(lang=lang), ssl=ssl_context,
+                               params={**params, "format": "json", "formatversion": "2"}) as resp:
+            o.status = resp.status
+            if resp.status != 200:
+                logging.warning(f"[WIKI] API {params.get('prop')} failed (status={resp.status})")
+                return None
+            return await resp.json()
+
+async def latest_revisions(session, lang: str, titles) -> dict[str, tuple[int, int]] | None:
+    """title -> (pageid, revid) dell'ultima revisione, REVISION_BATCH titoli per richiesta.
+    Le pagine sparite non compaiono; None se l'API non risponde."""
+    titles, out = list(titles), {}
+    for i in range(0, len(titles), REVISION_BATCH):
+        batch = titles[i:i + REVISION_BATCH]
+        data = await _api(session, lang, {"action": "query", "prop": "revisions", "rvprop": "ids",
+                                          "titles": "|".join(batch)})
+        if data is None:
+            return None
+        q = data.get("query", {})
+        norm = {n["from"]: n["to"] for n in q.get("normalized", [])}
+        found = {p["title"]: p for p in q.get("pages", []) if not p.get("missing") and p.get("revisions")}
+        for t in batch:
+            p = found.get(norm.get(t, t))
+            if p:
+                out[t] = (p["pageid"], p["revisions"][0]["revid"])
+    return out
+
+async def fetch_extract(session, lang: str, title: str) -> tuple[int, int, str] | None:
+    """(pageid, revid, estratto) in una sola richiesta."""
+    data = await _api(session, lang, {"action": "query", "prop": "extracts|revisions", "explaintext": "true",
+                                      "rvprop": "ids", "titles": title})
+    for p in (data or {}).get("query", {}).get("pages", []):
+        content = (p.get("extract") or "").strip()
+        if p.get("missing") or not content:
+            return None
+        return p["pageid"], (p.get("revisions") or [{}])[0].get("revid", 0), content
+    return None
+
+async def _revalidate(session, lang: str, titles: list[str], now: datetime, max_age: int):
+    """
+    Divide i titoli in: voci in cache usabili, titoli da scaricare (assenti)
+    e titoli cambiati (revid diverso). Le voci più vecchie di `max_age`
+    si riverificano con un batch di revid; se l'API non risponde si usa
+    la copia in cache.
+    """
+    cached = await aio.run(wiki_page.get_many, lang, titles)
+    limit = now - timedelta(seconds=max_age)
+    usable = [e for e in cached.values() if e["checked_at"] >= limit]
+    stale = [e for e in cached.values() if e["checked_at"] < limit]
+    missing = [t for t in titles if t not in cached]
+    changed = []
+    CACHE.labels("wiki_page", "fresh").inc(len(usable))
+    CACHE.labels("wiki_page", "miss").inc(len(missing))
+    if stale:
+        revs = await latest_revisions(session, lang, [e["title"] for e in stale])
+        if revs is None:
+            usable += stale
+        else:
+            same = [e for e in stale if e["title"] in revs and revs[e["title"]][1] == e["revid"]]
+            changed = [e["title"] for e in stale if e["title"] in revs and revs[e["title"]][1] != e["revid"]]
+            await aio.run(wiki_page.touch, lang, [e["title"] for e in same], now)
+            usable += same
+            CACHE.labels("wiki_page", "unchanged").inc(len(same))
+            CACHE.labels("wiki_page", "changed").inc(len(changed))
+    return usable, missing, changed
+
+async def _download(session, lang: str, titles: list[str], changed: set, now: datetime) -> dict[str, str]:
+    out = {}
+    for t in titles:
+        got = await fetch_extract(session, lang, t)
+        if not got:
+            continue
+        pageid, revid, text = got
+        await aio.run(wiki_page.save, lang, t, pageid, revid, text, now)
+        out[t] = text
+        if t in changed:
+            ids, n = await aio.run(_propagate, lang, t, text, now)
+            logging.info(f"[WIKI] '{t}' ({lang}) rev {revid}: {len(ids)} POI aggiornati, {n} narrazioni invalidate")
+    return out
+
+def _propagate(lang: str, title: str, text: str, now: datetime):
+    """Nuova revisione: i doc di tutti i POI che usano la pagina e le loro narrazioni."""
+    ids = poi_doc.replace_text(page_url(lang, title), text, now)
+    return ids, narration_cache.invalidate_pois(ids)
+
+async def pages(session, lang: str, titles: list[str], now: datetime | None = None,
+                max_age: int | None = None) -> dict[str, str]:
+    """title -> estratto, riscaricando solo le pagine assenti o cambiate."""
+    now = now or datetime.utcnow()
+    max_age = get_settings().WIKI_PAGE_FRESH_SECS if max_age is None else max_age
+    usable, missing, changed = await _revalidate(session, lang, titles, now, max_age)
+    out = await aio.run(wiki_page.text_of, usable)
+    lost = [e["title"] for e in usable if e["title"] not in out]     # blob sparito: è un miss
+    CACHE.labels("wiki_page", "blob_missing").inc(len(lost))
+    out.update(await _download(session, lang, missing + lost + changed, set(changed), now))
+    return out
+
+async def refresh_stale(limit: int = 500, max_age: int | None = None) -> dict:
+    """Job di manutenzione: riverifica le pagine più vecchie e riscarica solo quelle cambiate."""
+    now = datetime.utcnow()
+    max_age = get_settings().WIKI_PAGE_FRESH_SECS if max_age is None else max_age
+    by_lang = defaultdict(list)
+    for e in await aio.run(wiki_page.stale, now - timedelta(seconds=max_age), limit):
+        by_lang[e["lang"]].append(e["title"])
+    stats = {"checked": 0, "changed": 0}
+    async with aiohttp.ClientSession() as session:
+        for lang, titles in by_lang.items():
+            usable, _, changed = await _revalidate(session, lang, titles, now, max_age)
+            lost = await aio.run(wiki_page.without_blob, usable)
+            CACHE.labels("wiki_page", "blob_missing").inc(len(lost))
+            await _download(session, lang, lost + changed, set(changed), now)
+            stats["checked"] += len(titles)
+            stats["changed"] += len(changed)
+    return stats
@@ -0,0 +1,87 @@
+# backend/src/utils/chunking.py
+"""
+Passaggi di un estratto Wikipedia, per il retrieval di /poi/{id}/ask.
+
+Al più PASSAGE_CHARS caratteri: per sezione (`== Storia ==`), poi paragrafi,
+frasi e, al limite, parole. Le sezioni di servizio (Note, Bibliografia, ...)
+non diventano passaggi. Solo testo: lo usano sia models/poi_doc (al salvataggio)
+sia services/passages (indice BM25).
+"""
+import re
+
+from .text import fold
+
+PASSAGE_CHARS = 600
+MAX_PASSAGES = 300               # per documento
+
+_HEADING = re.compile(r"^[ \t]*(={2,6})[ \t]*(.+?)[ \t]*\1[ \t]*$", re.M)
+_PARA = re.compile(r"\n[ \t]*\n")
+_SENTENCE = re.compile(r"(?<=[.!?;])\s+")
+
+SKIP_SECTIONS = {fold(t) for t in (
+    "Note", "Bibliografia", "Voci correlate", "Altri progetti", "Collegamenti esterni", "Fonti",
+    "Notes", "References", "Bibliography", "See also", "External links", "Further reading", "Sources",
+    "Références", "Voir aussi", "Liens externes", "Referencias", "Véase también", "Enlaces externos",
+    "Einzelnachweise", "Literatur", "Weblinks", "Siehe auch",
+)}
+
+
+def _strip(text: str, s: int, e: int):
+    while s < e and text[s].isspace():
+        s += 1
+    while e > s and text[e - 1].isspace():
+        e -= 1
+    if s < e:
+        yield s, e
+
+
+def _pieces(text: str, sep: re.Pattern, s: int, e: int):
+    pos = s
+    for m in sep.finditer(text, s, e):
+        yield from _strip(text, pos, m.start())
+        pos = m.end()
+    yield from _strip(text, pos, e)
+
+
+def _units(text: str, s: int, e: int, max_chars: int):
+    """Span di al più max_chars: paragrafi, se troppo lunghi frasi, se troppo lunghe parole."""
+    for ps, pe in _pieces(text, _PARA, s, e):
+        if pe - ps <= max_chars:
+            yield ps, pe
+            continue
+        for ss, se in _pieces(text, _SENTENCE, ps, pe):
+            while se - ss > max_chars:
+                cut = text.rfind(" ", ss, ss + max_chars)
+                cut = cut if cut > ss else ss + max_chars
+                yield from _strip(text, ss, cut)
+                ss = cut
+            yield from _strip(text, ss, se)
+
+
+def _sections(text: str):
+    title, pos = "", 0
+    for m in _HEADING.finditer(text):
+        yield title, pos, m.start()
+        title, pos = m.group(2), m.end()
+    yield title, pos, len(text)
+
+
+def chunk(text: str, max_chars: int = PASSAGE_CHARS) -> list[dict]:
+    """Passaggi come `{"title", "start", "end"}` su `text`: unità consecutive della stessa sezione."""
+    out = []
+    for title, s, e in _sections(text or ""):
+        if fold(title) in SKIP_SECTIONS:
+            continue
+        cur = None
+        for us, ue in _units(text, s, e, max_chars):
+            if cur and ue - cur["start"] <= max_chars:
+                cur["end"] = ue
+                continue
+            if cur:
+                out.append(cur)
+            cur = {"title": title, "start": us, "end": ue}
+        if cur:
+            out.append(cur)
+        if len(out) >= MAX_PASSAGES:
+            break
+    return out[:MAX_PASSAGES]
@@ -0,0 +1,92 @@
+# backend/src/utils/cursor.py
+"""
+Paginazione keyset con cursori opachi.
+
+L'ordinamento è `(campo, _id)`: `_id` rompe la parità fra documenti con la
+stessa chiave (eventi con lo stesso ts al ms). Il cursore contiene solo
+l'ultima coppia restituita e la pagina dopo riparte da
+`campo < valore or (campo == valore and _id < ultimo_id)`, con il range su
+`campo` fuori dall'`$or` così la scansione dell'indice resta limitata. Serve
+un indice composto che finisca con `_id` (es. `session_ts_id`,
+`poi_created_id`); una pagina costa uguale a qualsiasi profondità (niente
+skip) e il cursore ha dimensione fissa.
+"""
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+
+def _enc(v):
+    if isinstance(v, datetime):
+        return {"$d": v.isoformat()}
+    if isinstance(v, ObjectId):
+        return {"$o": str(v)}
+    return v
+
+
+def _dec(v):
+    if isinstance(v, dict):
+        if "$d" in v:
+            return datetime.fromisoformat(v["$d"])
+        if "$o" in v:
+            return ObjectId(v["$o"])
+    return v
+
+
+def encode(value, last_id=None) -> str:
+    raw = json.dumps([_enc(value), _enc(last_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode(token: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        value, last_id = (_dec(v) for v in json.loads(raw))
+        if isinstance(last_id, (list, dict)):
+            raise ValueError("not a keyset cursor")
+        return value, last_id
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
+
+def after(query: dict, field: str, token: str | None, direction: int = -1) -> dict:
+    """Filtro della pagina successiva a `token` (None = prima pagina)."""
+    if not token:
+        return query
+    value, last_id = decode(token)
+    op, op_eq = ("$lt", "$lte") if direction < 0 else ("$gt", "$gte")
+    if field == "_id":
+        return {**query, "_id": {op: value}}
+    cond = {field: {op_eq: value}, "$or": [{field: {op: value}}, {"_id": {op: last_id}}]}
+    return {"$and": [query, cond]} if field in query or "$or" in query else {**query, **cond}
+
+
+class Page:
+    """
+    Itera al più `limit` documenti; a iterazione finita `next` è il cursore
+    della pagina dopo (None se non ce ne sono altre). Legge un documento in
+    più solo per sapere se esiste un seguito.
+    """
+
+    def __init__(self, coll, query: dict, field: str, limit: int, token: str | None = None,
+                 projection: dict | None = None, direction: int = -1, hint: str | None = None):
+        self.field = field
+        self.limit = limit
+        self.next: str | None = None
+        order = [(field, direction)] if field == "_id" else [(field, direction), ("_id", direction)]
+        cur = coll.find(after(query, field, token, direction), projection).sort(order).limit(limit + 1)
+        self._cur = cur.hint(hint) if hint else cur
+
+    def __iter__(self):
+        last, n = None, 0
+        for doc in self._cur:
+            if n == self.limit:
+                self.next = encode(last.get(self.field), last["_id"])
+                break
+            last = doc
+            n += 1
+            yield doc
+        self._cur.close()
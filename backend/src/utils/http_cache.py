@@ -0,0 +1,185 @@
+# backend/src/utils/http_cache.py
+"""
+GET condizionali (ETag forte / Last-Modified) e compressione negoziata.
+
+I controller calcolano i validatori dalle versioni dei documenti
+(`_id` + `updated_at`/`created_at`) e rispondono 304 con `not_modified`
+prima di costruire il body; il middleware `conditional_get` in app.py fa lo
+stesso controllo sulle risposte che portano già un ETag e comprime i body
+grandi (br se disponibile, altrimenti gzip).
+"""
+import gzip
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dipendenza opzionale
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE = ("application/json", "text/", "application/javascript", "application/openmetrics-text",
+                "application/vnd.geoguide.")
+CACHE_CONTROL = "private, no-cache"  # il client tiene la copia ma rivalida sempre
+
+# suffisso dell'ETag per la variante compressa (la rappresentazione cambia)
+_ENC_SUFFIX = {"br": "-br", "gzip": "-gz"}
+
+
+# ---------- validatori ----------
+def _utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def version_of(doc: dict) -> tuple:
+    ts = doc.get("updated_at") or doc.get("created_at")
+    return (str(doc.get("_id")), ts.isoformat() if hasattr(ts, "isoformat") else ts)
+
+
+def etag_for(docs, *extra) -> str:
+    """ETag forte dalle versioni dei documenti (+ parametri che cambiano il body)."""
+    h = hashlib.sha1()
+    for part in extra:
+        h.update(repr(part).encode())
+    for d in docs:
+        h.update(repr(version_of(d)).encode())
+    return f'"{h.hexdigest()[:24]}"'
+
+
+def last_modified_of(docs) -> datetime | None:
+    ts = [d.get("updated_at") or d.get("created_at") for d in docs]
+    ts = [_utc(t) for t in ts if isinstance(t, datetime)]
+    return max(ts) if ts else None
+
+
+def headers_for(etag: str | None, last_modified: datetime | None, cache_control: str = CACHE_CONTROL) -> dict:
+    h = {"Cache-Control": cache_control}
+    if etag:
+        h["ETag"] = etag
+    if last_modified:
+        h["Last-Modified"] = format_datetime(_utc(last_modified), usegmt=True)
+    return h
+
+
+def _strip(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suf in _ENC_SUFFIX.values():
+        if tag.endswith(suf + '"'):
+            return tag[: -len(suf) - 1] + '"'
+    return tag
+
+
+def is_fresh(req_headers, etag: str | None, last_modified: datetime | None) -> bool:
+    """Se c'è If-None-Match vale solo quello (RFC 9110 §13.2.2)."""
+    inm = req_headers.get("if-none-match")
+    if inm is not None:
+        if not etag:
+            return False
+        if inm.strip() == "*":
+            return True
+        return _strip(etag) in {_strip(t) for t in inm.split(",")}
+    ims = req_headers.get("if-modified-since")
+    if ims and last_modified:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        return _utc(last_modified).replace(microsecond=0) <= _utc(since)
+    return False
+
+
+def not_modified(request, etag: str | None, last_modified: datetime | None = None,
+                 cache_control: str = CACHE_CONTROL) -> Response | None:
+    """Risposta 304 se il client ha già la versione corrente, altrimenti None."""
+    if request.method in ("GET", "HEAD") and is_fresh(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=headers_for(etag, last_modified, cache_control))
+    return None
+
+
+# ---------- compressione ----------
+def pick_encoding(accept_encoding: str | None) -> str | None:
+    """Sceglie br/gzip in base ad Accept-Encoding (q=0 esclude)."""
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip()] = q
+    star = offered.get("*", 0.0)
+    for enc in (("br",) if brotli is not None else ()) + ("gzip",):
+        if offered.get(enc, star) > 0:
+            return enc
+    return None
+
+
+def compressible(content_type: str | None, size: int) -> bool:
+    return size >= MIN_COMPRESS_BYTES and bool(content_type) and content_type.startswith(COMPRESSIBLE)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def variant_etag(etag: str, encoding: str) -> str:
+    return etag[:-1] + _ENC_SUFFIX[encoding] + '"' if etag.endswith('"') else etag
+
+
+# ---------- middleware ----------
+def response_is_fresh(req_headers, resp_headers) -> bool:
+    lm = resp_headers.get("last-modified")
+    try:
+        lm = parsedate_to_datetime(lm) if lm else None
+    except (TypeError, ValueError):
+        lm = None
+    if not resp_headers.get("etag") and not lm:
+        return False
+    return is_fresh(req_headers, resp_headers.get("etag"), lm)
+
+
+def not_modified_from(resp) -> Response:
+    keep = ("etag", "last-modified", "cache-control", "vary")
+    return Response(status_code=304, headers={k: v for k, v in resp.headers.items() if k in keep})
+
+
+def _add_vary(headers, field: str):
+    cur = headers.get("vary")
+    if not cur:
+        headers["Vary"] = field
+    elif field.lower() not in cur.lower():
+        headers["Vary"] = f"{cur}, {field}"
+
+
+async def maybe_compress(req_headers, resp):
+    """Comprime il body se il client lo accetta e ne vale la pena."""
+    if "content-encoding" in resp.headers:
+        return resp
+    enc = pick_encoding(req_headers.get("accept-encoding"))
+    size = int(resp.headers.get("content-length") or 0)  # niente length = streaming: non si tocca
+    if not compressible(resp.headers.get("content-type"), size):
+        return resp
+    if enc is None:
+        _add_vary(resp.headers, "Accept-Encoding")
+        return resp
+    body = b"".join([chunk async for chunk in resp.body_iterator])
+    data = compress(body, enc)
+    out = Response(content=data, status_code=resp.status_code, background=resp.background)
+    out.raw_headers = [(k, v) for k, v in resp.raw_headers if k not in (b"content-length", b"etag")]
+    out.headers["Content-Length"] = str(len(data))
+    out.headers["Content-Encoding"] = enc
+    _add_vary(out.headers, "Accept-Encoding")
+    if resp.headers.get("etag"):
+        out.headers["ETag"] = variant_etag(resp.headers["etag"], enc)
+    return out
@@ -0,0 +1,55 @@
+# backend/src/utils/jsonresp.py
+"""
+Risposta JSON veloce per liste grandi: serializza direttamente i documenti
+Mongo (ObjectId, datetime) senza passare da jsonable_encoder/pydantic.
+Usa orjson se presente, altrimenti json della stdlib.
+
+`stream_page` scrive una pagina keyset (`utils.cursor.Page`) man mano che il
+cursore Mongo avanza: `{"items": [...], "next": "<cursore>|null"}`.
+"""
+import json
+from datetime import date, datetime
+from bson import ObjectId
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dipendenza opzionale
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, (set, tuple)):
+        return list(o)
+    raise TypeError(f"Type is not JSON serializable: {type(o).__name__}")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+
+def stream_page(page, serialize=None, chunk_bytes: int = 32 * 1024, headers: dict | None = None) -> StreamingResponse:
+    def body():
+        buf = bytearray(b'{"items":[')
+        sep = b""
+        for doc in page:
+            buf += sep + dumps(serialize(doc) if serialize else doc)
+            sep = b","
+            if len(buf) >= chunk_bytes:
+                yield bytes(buf)
+                buf.clear()
+        buf += b'],"next":' + dumps(page.next) + b"}"
+        yield bytes(buf)
+    return StreamingResponse(body(), media_type="application/json", headers=headers)
@@ -0,0 +1,81 @@
+# backend/src/utils/jsonstream.py
+"""
+Parsing incrementale dell'array `elements` di una risposta Overpass.
+
+`ElementStream.feed(chunk)` restituisce gli oggetti completi arrivati fin
+qui, senza tenere in memoria il documento intero: il buffer contiene al più
+l'elemento in corso. Solo stdlib (`JSONDecoder.raw_decode`).
+"""
+import codecs
+import json
+
+_SKIP = " \t\r\n,"
+_MAX_HEAD = 1 << 16
+
+
+class StreamError(ValueError):
+    pass
+
+
+class ElementStream:
+    def __init__(self, key: str = "elements"):
+        self._key = f'"{key}"'
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()   # multibyte spezzati fra chunk
+        self._buf = ""
+        self._state = "head"          # head -> items -> tail
+        self._tail = []
+        self._dec = json.JSONDecoder()
+
+    def feed(self, chunk: bytes) -> list:
+        try:
+            text = self._utf8.decode(chunk)
+        except UnicodeDecodeError as e:
+            raise StreamError(str(e)) from None
+        if self._state == "tail":
+            self._tail.append(text)
+            return []
+        self._buf += text
+        if self._state == "head" and not self._find_array():
+            return []
+        out, buf, i, n = [], self._buf, 0, len(self._buf)
+        while True:
+            while i < n and buf[i] in _SKIP:
+                i += 1
+            if i >= n:
+                break
+            if buf[i] == "]":
+                self._state = "tail"
+                self._tail.append(buf[i + 1:])
+                i = n
+                break
+            try:
+                obj, i2 = self._dec.raw_decode(buf, i)
+            except json.JSONDecodeError:
+                break                   # elemento incompleto: aspetta il prossimo chunk
+            out.append(obj)
+            i = i2
+        self._buf = buf[i:]
+        return out
+
+    def _find_array(self) -> bool:
+        k = self._buf.find(self._key)
+        b = self._buf.find("[", k) if k >= 0 else -1
+        if b < 0:
+            if len(self._buf) > _MAX_HEAD:
+                raise StreamError("no elements array")
+            return False
+        self._buf = self._buf[b + 1:]
+        self._state = "items"
+        return True
+
+    def close(self) -> dict:
+        """Fine del body: verifica che l'array sia chiuso e restituisce i campi successivi (es. `remark`)."""
+        if self._state != "tail":
+            raise StreamError("truncated response")
+        tail = "".join(self._tail).strip().lstrip(",").rstrip().removesuffix("}").strip()
+        if not tail:
+            return {}
+        try:
+            return json.loads("{" + tail + "}")
+        except ValueError:
+            return {}
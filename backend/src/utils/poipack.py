@@ -0,0 +1,151 @@
+# backend/src/utils/poipack.py
+"""
+Formato binario colonnare per i pin della mappa (`Accept: application/vnd.geoguide.poipack`).
+
+    magic "GGP" | versione u8 | n varint
+    id        n x 12 byte (ObjectId grezzo)
+    lon, lat  n x zigzag-varint ciascuna: gradi*1e6 (int32), delta dal POI precedente
+    nomi      tabella stringhe (varint k, k x [varint len, utf-8]) + n x varint indice
+    flag      n x u8 (FLAG_*)
+
+Niente chiavi ripetute, nomi duplicati una volta sola, coordinate vicine in
+1-3 byte. Solo stdlib: il client JS lo decodifica in poche righe.
+"""
+from bson import ObjectId
+
+MEDIA_TYPE = "application/vnd.geoguide.poipack"
+MAGIC = b"GGP"
+VERSION = 1
+SCALE = 1_000_000  # ~0.11 m all'equatore
+
+FLAG_WIKIPEDIA = 1
+FLAG_WIKIDATA = 2
+
+
+class PackError(ValueError):
+    pass
+
+
+# ---------- varint ----------
+def _zigzag(v: int) -> int:
+    return (v << 1) ^ (v >> 63)
+
+
+def _unzigzag(u: int) -> int:
+    return (u >> 1) ^ -(u & 1)
+
+
+def _put_varint(out: bytearray, u: int):
+    while u >= 0x80:
+        out.append((u & 0x7F) | 0x80)
+        u >>= 7
+    out.append(u)
+
+
+def _get_varint(buf: bytes, i: int) -> tuple[int, int]:
+    shift = u = 0
+    while True:
+        if i >= len(buf):
+            raise PackError("truncated varint")
+        b = buf[i]; i += 1
+        u |= (b & 0x7F) << shift
+        if b < 0x80:
+            return u, i
+        shift += 7
+        if shift > 63:
+            raise PackError("varint too long")
+
+
+# ---------- adattatori ----------
+def from_nearby(items: list[dict]) -> list[dict]:
+    """Righe di `models.poi.nearby` -> righe del formato."""
+    return [{"id": it["poi_id"], "name": it.get("name") or "", "lon": it["coords"][0], "lat": it["coords"][1],
+             "flags": FLAG_WIKIPEDIA if it.get("wiki_title") else 0} for it in items]
+
+
+def from_docs(docs: list[dict], lang: str = "it") -> list[dict]:
+    """Documenti `pois` (proiezione compatta) -> righe del formato."""
+    out = []
+    for p in docs:
+        name = p.get("name") or {}
+        if isinstance(name, dict):
+            name = name.get(lang) or name.get("en") or name.get("default") or next(iter(name.values()), "")
+        flags = (FLAG_WIKIPEDIA if p.get("wikipedia") else 0) | (FLAG_WIKIDATA if p.get("wikidata_qid") else 0)
+        lon, lat = p["location"]["coordinates"]
+        out.append({"id": p["_id"], "name": name or "", "lon": lon, "lat": lat, "flags": flags})
+    return out
+
+
+# ---------- encode / decode ----------
+def encode(rows: list[dict]) -> bytes:
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    _put_varint(out, len(rows))
+    try:
+        ids = b"".join(r["id"].binary if isinstance(r["id"], ObjectId) else bytes.fromhex(r["id"]) for r in rows)
+    except ValueError as e:
+        raise PackError(f"bad id: {e}") from None
+    if len(ids) != 12 * len(rows):
+        raise PackError("ids must be 12-byte ObjectIds")
+    out += ids
+    for axis in ("lon", "lat"):
+        prev = 0
+        for r in rows:
+            v = round(float(r[axis]) * SCALE)
+            _put_varint(out, _zigzag(v - prev))
+            prev = v
+    table: dict[str, int] = {}
+    idx = [table.setdefault(r["name"], len(table)) for r in rows]
+    _put_varint(out, len(table))
+    for s in table:
+        b = s.encode("utf-8")
+        _put_varint(out, len(b))
+        out += b
+    for i in idx:
+        _put_varint(out, i)
+    out += bytes(int(r.get("flags", 0)) & 0xFF for r in rows)
+    return bytes(out)
+
+
+def decode(buf: bytes) -> list[dict]:
+    if buf[:3] != MAGIC:
+        raise PackError("bad magic")
+    if len(buf) < 4 or buf[3] != VERSION:
+        raise PackError("unsupported version")
+    n, i = _get_varint(buf, 4)
+    if i + 12 * n > len(buf):
+        raise PackError("truncated ids")
+    ids = [buf[i + 12 * k: i + 12 * (k + 1)].hex() for k in range(n)]
+    i += 12 * n
+    axes = []
+    for _ in range(2):
+        prev, col = 0, []
+        for _ in range(n):
+            u, i = _get_varint(buf, i)
+            prev += _unzigzag(u)
+            col.append(prev / SCALE)
+        axes.append(col)
+    k, i = _get_varint(buf, i)
+    table = []
+    for _ in range(k):
+        ln, i = _get_varint(buf, i)
+        if i + ln > len(buf):
+            raise PackError("truncated string")
+        table.append(buf[i:i + ln].decode("utf-8"))
+        i += ln
+    names = []
+    for _ in range(n):
+        j, i = _get_varint(buf, i)
+        if j >= k:
+            raise PackError("bad string index")
+        names.append(table[j])
+    if i + n != len(buf):
+        raise PackError("bad length")
+    flags = buf[i:i + n]
+    return [{"id": ids[j], "name": names[j], "lon": axes[0][j], "lat": axes[1][j], "flags": flags[j]}
+            for j in range(n)]
+
+
+def wants(accept: str | None) -> bool:
+    """Il client chiede esplicitamente il formato binario."""
+    return bool(accept) and MEDIA_TYPE in accept
@@ -0,0 +1,44 @@
+# backend/src/utils/projection.py
+"""Proiezioni compatte per le risposte POI (`fields=`, estratti dei documenti)."""
+from fastapi import HTTPException
+
+# campi esponibili dei POI (whitelist: niente campi interni arbitrari)
+POI_FIELDS = {
+    "_id", "name", "aliases", "location", "langs", "photos", "wikidata_qid", "wikipedia",
+    "provider", "provider_id", "lat_round", "lon_round", "is_active",
+    "last_seen_at", "last_refresh_at", "created_at", "updated_at",
+}
+POI_DEFAULT = ("_id", "name", "location", "langs", "wikipedia", "wikidata_qid")
+
+DOC_MODES = ("none", "meta", "excerpt", "full")
+_DOC_META = {"_id": 0, "poi_id": 1, "source": 1, "lang": 1, "url": 1, "meta.title": 1}
+
+
+def poi_projection(fields: str | None) -> dict:
+    """`fields=name,location` -> proiezione Mongo; `_id` è sempre incluso."""
+    if not fields:
+        names = POI_DEFAULT
+    else:
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+        bad = [f for f in names if f.split(".")[0] not in POI_FIELDS]
+        if bad:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(bad)}")
+    proj = {f: 1 for f in names}
+    proj["_id"] = 1
+    return proj
+
+
+def doc_projection(mode: str, excerpt_chars: int = 300) -> dict | None:
+    """None = nessun documento. L'estratto viene tagliato lato server ($substrCP); i risultati passano da `poi_doc.present`."""
+    if mode not in DOC_MODES:
+        raise HTTPException(status_code=400, detail=f"docs must be one of {', '.join(DOC_MODES)}")
+    if mode == "none":
+        return None
+    if mode == "meta":
+        return dict(_DOC_META)
+    if mode == "excerpt":
+        # doc su doc_blobs: estratto da content_head; oltre quello lo completa poi_doc.present
+        text = {"$ifNull": ["$content_text", {"$ifNull": ["$content_head", ""]}]}
+        return {**_DOC_META, "excerpt": {"$substrCP": [text, 0, int(excerpt_chars)]},
+                "content_ref": 1, "content_len": 1}
+    return {"_id": 0}
@@ -0,0 +1,115 @@
+# backend/src/utils/rollup.py
+"""
+Funzioni pure per i rollup incrementali di usage_logs.
+
+Un bucket è un documento per (granularità, inizio intervallo) con contatori
+annidati; gli eventi di un batch vengono ridotti a un `$inc` per bucket.
+Le latenze finiscono in un istogramma a bucket fissi, da cui si stimano
+p50/p95/p99 senza rileggere gli eventi grezzi.
+"""
+from __future__ import annotations
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+GRANULARITIES = {"m": timedelta(minutes=1), "h": timedelta(hours=1)}
+
+# limiti superiori (ms) dell'istogramma latenze; l'ultimo bucket è "oltre"
+LAT_BOUNDS_MS = (5, 10, 25, 50, 75, 100, 150, 200, 300, 400, 500, 750,
+                 1000, 1500, 2000, 3000, 5000, 7500, 10000, 15000, 30000)
+
+def key(s) -> str:
+    """Chiave sicura come nome di campo Mongo (niente '.' o '$')."""
+    s = str(s) if s not in (None, "") else "unknown"
+    return s.replace(".", ":").replace("$", "_")
+
+def floor_ts(ts: datetime, gran: str) -> datetime:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    ts = ts.replace(second=0, microsecond=0)
+    return ts.replace(minute=0) if gran == "h" else ts
+
+def bucket_id(gran: str, start: datetime) -> str:
+    return f"{gran}:{start.strftime('%Y-%m-%dT%H:%M')}"
+
+def lat_bucket(ms: float) -> int:
+    for i, b in enumerate(LAT_BOUNDS_MS):
+        if ms <= b:
+            return i
+    return len(LAT_BOUNDS_MS)
+
+def fold(events: Iterable[dict], grans: Iterable[str] = ("m", "h"), top_pois_gran: str = "h") -> dict:
+    """
+    Riduce gli eventi a {bucket_id: {"bucket": datetime, "gran": str, "inc": {path: n}}}.
+    I conteggi per POI sono tenuti solo nella granularità `top_pois_gran`.
+    """
+    out: dict[str, dict] = {}
+    for e in events:
+        ts = e.get("ts")
+        if not isinstance(ts, datetime):
+            continue
+        ev = key(e.get("event"))
+        for g in grans:
+            start = floor_ts(ts, g)
+            bid = bucket_id(g, start)
+            b = out.get(bid)
+            if b is None:
+                b = out[bid] = {"bucket": start, "gran": g, "inc": Counter()}
+            inc = b["inc"]
+            inc["total"] += 1
+            inc[f"events.{ev}.n"] += 1
+            inc[f"events.{ev}.platform.{key(e.get('platform'))}"] += 1
+            inc[f"events.{ev}.network.{key(e.get('network'))}"] += 1
+            lat = e.get("latency_ms")
+            if isinstance(lat, (int, float)) and lat >= 0:
+                inc[f"events.{ev}.lat.{lat_bucket(lat)}"] += 1
+            if g == top_pois_gran and e.get("poi_id"):
+                inc[f"pois.{key(e['poi_id'])}"] += 1
+    return out
+
+def merge_hist(hists: Iterable[dict]) -> list[int]:
+    tot = [0] * (len(LAT_BOUNDS_MS) + 1)
+    for h in hists:
+        for k, v in (h or {}).items():
+            i = int(k)
+            if 0 <= i < len(tot):
+                tot[i] += int(v)
+    return tot
+
+def percentile(hist: list[int], q: float) -> float | None:
+    """Stima il quantile q (0..1) con interpolazione lineare nel bucket."""
+    n = sum(hist)
+    if n == 0:
+        return None
+    rank = q * n
+    cum = 0
+    for i, c in enumerate(hist):
+        if c and cum + c >= rank:
+            lo = LAT_BOUNDS_MS[i - 1] if i > 0 else 0
+            hi = LAT_BOUNDS_MS[i] if i < len(LAT_BOUNDS_MS) else LAT_BOUNDS_MS[-1] * 2
+            return round(lo + (hi - lo) * ((rank - cum) / c), 1)
+        cum += c
+    return float(LAT_BOUNDS_MS[-1])
+
+def summarize(docs: Iterable[dict], event: str | None = None) -> dict:
+    """Somma più bucket in un unico riepilogo (conteggi + percentili)."""
+    total = 0
+    events: dict[str, dict] = defaultdict(lambda: {"n": 0, "platform": Counter(), "network": Counter(), "_lat": []})
+    for d in docs:
+        for ev, v in (d.get("events") or {}).items():
+            if event and ev != key(event):
+                continue
+            agg = events[ev]
+            agg["n"] += int(v.get("n", 0))
+            agg["platform"].update(v.get("platform") or {})
+            agg["network"].update(v.get("network") or {})
+            agg["_lat"].append(v.get("lat") or {})
+            total += int(v.get("n", 0))
+    out = {}
+    for ev, agg in events.items():
+        h = merge_hist(agg.pop("_lat"))
+        out[ev.replace(":", ".")] = {
+            "n": agg["n"], "platform": dict(agg["platform"]), "network": dict(agg["network"]),
+            "latency_ms": {"p50": percentile(h, .5), "p95": percentile(h, .95), "p99": percentile(h, .99)},
+        }
+    return {"total": total, "events": out}
@@ -0,0 +1,15 @@
+# backend/src/utils/text.py
+"""Normalizzazione del testo condivisa da ricerca nomi e retrieval passaggi."""
+import re
+import unicodedata
+
+_NONWORD = re.compile(r"[\W_]+")
+# blocchi dei segni diacritici combinanti (latino, greco, cirillico)
+_COMBINING = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]+")
+
+
+def fold(s: str) -> str:
+    """NFKD senza diacritici, casefold, punteggiatura -> spazio."""
+    if not s.isascii():
+        s = _COMBINING.sub("", unicodedata.normalize("NFKD", s))
+    return " ".join(_NONWORD.sub(" ", s.casefold()).split())
@@ -0,0 +1,97 @@
+# backend/src/utils/tiles.py
+"""Tile slippy-map (z/x/y, Web Mercator) -> bbox WGS84 e poligono GeoJSON."""
+from math import asin, asinh, atan, cos, degrees, floor, pi, radians, sin, sinh, sqrt, tan
+
+MERCATOR_MAX_LAT = 85.0511287798066
+
+
+MAX_ZOOM = 30
+
+
+def valid(z: int, x: int, y: int) -> bool:
+    if not 0 <= z <= MAX_ZOOM:      # prima dello shift: z negativo o enorme dal path
+        return False
+    n = 1 << z
+    return 0 <= x < n and 0 <= y < n
+
+
+def _lat(y: int, n: int) -> float:
+    return degrees(atan(sinh(pi * (1 - 2 * y / n))))
+
+
+def bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """(west, south, east, north) in gradi."""
+    n = 1 << z
+    return (x / n * 360.0 - 180.0, _lat(y + 1, n), (x + 1) / n * 360.0 - 180.0, _lat(y, n))
+
+
+def polygon(z: int, x: int, y: int) -> dict:
+    """Anello chiuso antiorario. Ai zoom serviti (>= 12) la differenza fra lato
+    geodetico e parallelo è sotto il metro."""
+    w, s, e, n = bounds(z, x, y)
+    return {"type": "Polygon", "coordinates": [[[w, s], [e, s], [e, n], [w, n], [w, s]]]}
+
+
+def contains(z: int, x: int, y: int, lon: float, lat: float) -> bool:
+    """Intervallo semiaperto [w, e) x (s, n]: un punto sul bordo sta in una sola tile."""
+    w, s, e, n = bounds(z, x, y)
+    return w <= lon < e and s < lat <= n
+
+
+def tile_of(z: int, lon: float, lat: float) -> tuple[int, int]:
+    """Tile che contiene il punto (stessa convenzione di `contains`)."""
+    n = 1 << z
+    x = min(n - 1, max(0, floor((lon + 180.0) / 360.0 * n)))
+    lat = min(MERCATOR_MAX_LAT, max(-MERCATOR_MAX_LAT, lat))
+    y = min(n - 1, max(0, floor((1 - asinh(tan(radians(lat))) / pi) / 2 * n)))
+    if not contains(z, x, y, lon, lat):      # punto sul bordo nord: appartiene alla tile sopra
+        y = max(0, y - 1)
+    return x, y
+
+
+def _dist_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    dlat, dlon = radians(lat2 - lat1), radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return 2 * 6371000.0 * asin(sqrt(a))
+
+
+def _bbox(z: int, lat: float, lon: float, radius_m: float) -> tuple[int, int, int, int]:
+    dlat = degrees(radius_m / 6371000.0)
+    dlon = dlat / max(cos(radians(lat)), 1e-6)
+    x0, y0 = tile_of(z, lon - dlon, lat + dlat)
+    x1, y1 = tile_of(z, lon + dlon, lat - dlat)
+    return x0, y0, x1, y1
+
+
+def bbox_size(z: int, lat: float, lon: float, radius_m: float) -> int:
+    """Tile nel bbox del cerchio, senza enumerarle: limite superiore di `covered`."""
+    x0, y0, x1, y1 = _bbox(z, lat, lon, radius_m)
+    return (x1 - x0 + 1) * (y1 - y0 + 1)
+
+
+def covered(z: int, lat: float, lon: float, radius_m: float) -> list[tuple[int, int]]:
+    """Tile interamente dentro il cerchio: solo per queste una ricerca è completa."""
+    x0, y0, x1, y1 = _bbox(z, lat, lon, radius_m)
+    out = []
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            w, s, e, n = bounds(z, x, y)
+            if all(_dist_m(lat, lon, la, lo) <= radius_m for la, lo in ((s, w), (s, e), (n, w), (n, e))):
+                out.append((x, y))
+    return out
+
+
+def intersecting(z: int, lat: float, lon: float, radius_m: float) -> list[tuple[int, int]]:
+    """Tile toccate dal bbox del cerchio (superset di quelle che lo intersecano)."""
+    dlat = degrees(radius_m / 6371000.0)
+    dlon = dlat / max(cos(radians(lat)), 1e-6)
+    x0, y0 = tile_of(z, lon - dlon, lat + dlat)
+    x1, y1 = tile_of(z, lon + dlon, lat - dlat)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def circle(z: int, x: int, y: int) -> tuple[float, float, float]:
+    """(lat, lon, raggio_m) del cerchio che contiene tutta la tile."""
+    w, s, e, n = bounds(z, x, y)
+    lat, lon = (s + n) / 2, (w + e) / 2
+    return lat, lon, max(_dist_m(lat, lon, la, lo) for la, lo in ((s, w), (s, e), (n, w), (n, e)))
@@ -0,0 +1,94 @@
+# backend/tests/bench/inputs.py
+"""Input sintetici ma realistici per i micro-benchmark (deterministici)."""
+from __future__ import annotations
+import math
+import random
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+_KINDS = ("Chiesa di", "Basilica di", "Palazzo", "Fontana di", "Piazza", "Museo", "Torre", "Farmacia",
+          "Bar", "Ristorante", "Fermata", "Hotel", "Teatro", "Via", "Arco di", "Monumento a")
+_NAMES = ("San Pietro", "Santa Maria Maggiore", "Trevi", "Navona", "Farnese", "Venezia", "Borghese",
+          "Sant'Agnese in Agone", "San Luigi dei Francesi", "Garibaldi", "Vittorio Emanuele II",
+          "Campo de' Fiori", "della Minerva", "Colonna", "Barberini", "del Popolo", "Argentina")
+_WORDS = ("la", "basilica", "fu", "costruita", "nel", "secolo", "XVII", "su", "progetto", "di",
+          "Bernini", "e", "Borromini", "con", "una", "facciata", "barocca", "che", "domina", "piazza",
+          "il", "campanile", "romanico", "affreschi", "cappella", "navata", "restauro", "papa")
+
+
+def rng(seed: int = 42) -> random.Random:
+    return random.Random(seed)
+
+
+def city_points(n: int = 10_000, lat: float = 41.9009, lon: float = 12.4833, spread_m: float = 2000, seed: int = 1):
+    r = rng(seed)
+    k = 1 / 111_320.0
+    return [(lat + r.uniform(-spread_m, spread_m) * k,
+             lon + r.uniform(-spread_m, spread_m) * k / math.cos(math.radians(lat))) for _ in range(n)]
+
+
+def dense_city_names(n: int = 150, seed: int = 2) -> list[str]:
+    """Nomi come li restituisce Overpass in centro: molti quasi-duplicati."""
+    r = rng(seed)
+    out = []
+    for _ in range(n):
+        name = f"{r.choice(_KINDS)} {r.choice(_NAMES)}"
+        roll = r.random()
+        if roll < 0.15:
+            name = name.upper()
+        elif roll < 0.25:
+            name = name + " " + r.choice(("(ingresso)", "- lato nord", "2"))
+        out.append(name)
+    return out
+
+
+def wiki_titles(n: int = 10, seed: int = 3) -> list[str]:
+    r = rng(seed)
+    return [f"{r.choice(_KINDS)} {r.choice(_NAMES)}" + (f" ({r.choice(('Roma', 'chiesa', 'film'))})" if r.random() < .4 else "")
+            for _ in range(n)]
+
+
+def long_extract(chars: int = 60_000, seed: int = 4) -> str:
+    """Estratto Wikipedia lungo, con paragrafi e righe vuote multiple."""
+    r = rng(seed)
+    out, n = [], 0
+    while n < chars:
+        w = r.choice(_WORDS)
+        if r.random() < 0.07:
+            w += "."
+        if r.random() < 0.01:
+            w += "\n\n\n\n== Storia ==\n"
+        out.append(w)
+        n += len(w) + 1
+    return " ".join(out)[:chars]
+
+
+def nearby_items(n: int = 500, seed: int = 6) -> list[dict]:
+    """Righe come le restituisce `models.poi.nearby` (centro città denso)."""
+    r = rng(seed)
+    names = dense_city_names(n, seed)
+    out = []
+    for name, (lat, lon) in zip(names, city_points(n, spread_m=800, seed=seed)):
+        out.append({"poi_id": str(ObjectId()), "name": name, "distance_m": round(r.uniform(0, 800), 2),
+                    "coords": [lon, lat], "wiki_title": name if r.random() < .3 else None})
+    return out
+
+
+def poi_docs(n_pois: int = 30, docs_per_poi: int = 3, chars: int = 20_000, seed: int = 5) -> tuple[list[dict], list[dict]]:
+    """Documenti Mongo (con ObjectId) come li legge get_nearby_pois."""
+    r = rng(seed)
+    now = datetime.now(timezone.utc)
+    text = long_extract(chars, seed)
+    pois, docs = [], []
+    for i, (lat, lon) in enumerate(city_points(n_pois, spread_m=150, seed=seed)):
+        pid = ObjectId()
+        pois.append({"_id": pid, "name": {"default": f"POI {i}"}, "location": {"type": "Point", "coordinates": [lon, lat]},
+                     "lat_round": round(lat, 6), "lon_round": round(lon, 6), "provider": "osm",
+                     "provider_id": str(r.randrange(10**9)), "langs": ["it"], "is_active": True,
+                     "last_seen_at": now, "created_at": now, "updated_at": now})
+        for j in range(docs_per_poi):
+            docs.append({"_id": ObjectId(), "poi_id": pid, "source": "wikipedia", "lang": "it",
+                         "url": f"https://it.wikipedia.org/wiki/P{i}_{j}", "content_text": text,
+                         "sections": [], "meta": {"title": f"P{i}"}, "created_at": now})
+    return pois, docs
@@ -0,0 +1,268 @@
+# backend/tests/bench/micro.py
+"""
+Micro-benchmark delle funzioni pure sui percorsi caldi (nearby, dedup, cache,
+narrazione) con baseline versionata e gate sulle regressioni.
+
+    cd backend
+    python -m tests.bench.micro                 # esegue e confronta con baseline.json
+    python -m tests.bench.micro --save          # aggiorna la baseline
+    python -m tests.bench.micro -k dedup --threshold 15
+
+I tempi sono normalizzati rispetto a un carico di calibrazione fisso, così
+una baseline registrata su una macchina resta confrontabile su un'altra
+(entro il rumore). I benchmark oltre soglia vengono rimisurati (--retries) e
+si tiene il tempo migliore, per non fallire su un picco di carico.
+Exit code 1 se un benchmark resta oltre la soglia.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+# niente attese lunghe su app_config se Mongo non c'è (graph usa get_settings)
+os.environ.setdefault("MONGO_SERVER_SELECTION_TIMEOUT_MS", "300")
+
+from . import inputs  # noqa: E402
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_THRESHOLD_PCT = 25.0
+
+
+@dataclass
+class Bench:
+    name: str
+    setup: Callable[[], Callable[[], object]]   # ritorna la closure da cronometrare
+    threshold_pct: float | None = None
+
+
+def _calibration():
+    d = {}
+    acc = 0.0
+    for i in range(2000):
+        d[i & 255] = d.get(i & 255, 0) + i
+        acc += (i * 0.5) ** 0.5
+    return acc, "".join(str(k) for k in list(d)[:50])
+
+
+# ---------- registro ----------
+def _haversine():
+    from src.models.poi import _haversine
+    pts = inputs.city_points(10_000)
+    lat0, lon0 = 41.9009, 12.4833
+    return lambda: [_haversine(lat0, lon0, la, lo) for la, lo in pts]
+
+
+def _dedup():
+    from src.controllers.poi_controller import is_relevant_name
+    names = inputs.dense_city_names(150)
+    def run():
+        seen = []
+        for n in names:
+            if any(is_relevant_name(n, s) for s in seen):
+                continue
+            seen.append(n)
+        return seen
+    return run
+
+
+def _wiki_relevant():
+    from src.services.wiki_service import is_relevant
+    titles = inputs.wiki_titles(10)
+    names = inputs.dense_city_names(50, seed=7)
+    return lambda: [is_relevant(t, n) for n in names for t in titles]
+
+
+def _bucket():
+    from src.models.enrich_cache import _bucket
+    pts = inputs.city_points(10_000, seed=8)
+    return lambda: [_bucket(la, lo, 120) for la, lo in pts]
+
+
+def _serialize():
+    from src.controllers.poi_controller import serialize_doc
+    pois, docs = inputs.poi_docs(30, 3, chars=2000)
+    allr = pois + docs
+    # serialize_doc muta il dict: si serializzano copie (costo incluso)
+    return lambda: [serialize_doc(dict(d)) for d in allr]
+
+
+def _build_prompt():
+    from src.services.narration_service import _build_prompt
+    text = inputs.long_extract(60_000)
+    return lambda: _build_prompt("Basilica di San Pietro", text, "guide", "it")
+
+
+def _clean_text():
+    from src.services.narration_service import _clean_text
+    text = inputs.long_extract(60_000, seed=9)
+    return lambda: _clean_text(text)
+
+
+def _synthesize():
+    from src.services.agents import graph
+    graph.get_settings()  # carica settings/app_config fuori dal cronometro
+    _, docs = inputs.poi_docs(1, 3, chars=60_000)
+    docs = [{k: d[k] for k in ("source", "url", "lang", "content_text")} for d in docs]
+    return lambda: graph._synthesize_text(docs, "it", "quick")
+
+
+def _nearby_json():
+    from src.utils.jsonresp import dumps
+    items = inputs.nearby_items(500)
+    return lambda: dumps({"items": items})
+
+
+def _poipack_encode():
+    from src.utils import poipack
+    items = inputs.nearby_items(500)
+    return lambda: poipack.encode(poipack.from_nearby(items))
+
+
+def _poipack_decode():
+    from src.utils import poipack
+    buf = poipack.encode(poipack.from_nearby(inputs.nearby_items(500)))
+    return lambda: poipack.decode(buf)
+
+
+def _name_search():
+    from src.services.name_search import NameIndex
+    idx = NameIndex()
+    for i, (n, (la, lo)) in enumerate(zip(inputs.dense_city_names(20_000, seed=9), inputs.city_points(20_000))):
+        idx.upsert(str(i), {"default": n}, lo, la)
+    qs = ("ch", "chiesa di s", "piazza nav", "fontana di tre", "torre a")
+    return lambda: [idx.search(q, 41.9009, 12.4833) for q in qs]
+
+
+def _passages_chunk():
+    from src.services.passages import chunk
+    text = inputs.long_extract(60_000, seed=11)
+    return lambda: chunk(text)
+
+
+def _passages_ask():
+    from src.services import passages
+    _, docs = inputs.poi_docs(1, 3, chars=60_000)
+    docs = [{**d, "sections": passages.chunk(d["content_text"])} for d in docs]
+    qs = ("quando fu costruita la basilica", "chi dipinse gli affreschi della cappella", "storia del campanile")
+    # build + domande: il costo di una domanda a indice non in cache
+    return lambda: [passages.build(docs).search(q, lang="it") for q in qs]
+
+
+def _blob_decompress():
+    from src.models import doc_blob
+    codec, data = doc_blob.compress(inputs.long_extract(60_000, seed=12))
+    return lambda: doc_blob.decompress(codec, data)
+
+
+BENCHES: list[Bench] = [
+    Bench("haversine.10k", _haversine),
+    Bench("is_relevant_name.dedup_150", _dedup),
+    Bench("wiki.is_relevant.500", _wiki_relevant),
+    Bench("enrich_cache._bucket.10k", _bucket),
+    Bench("serialize_doc.120", _serialize),
+    Bench("narration._build_prompt.60k", _build_prompt),
+    Bench("narration._clean_text.60k", _clean_text),
+    Bench("graph._synthesize_text.3x60k", _synthesize, threshold_pct=50),  # pochi µs: rumore alto
+    Bench("nearby.json.500", _nearby_json),
+    Bench("poipack.encode.500", _poipack_encode),
+    Bench("poipack.decode.500", _poipack_decode),
+    Bench("name_search.typeahead.5q_20k", _name_search),
+    Bench("passages.chunk.60k", _passages_chunk),
+    Bench("passages.bm25.build+3q.3x60k", _passages_ask),
+    Bench("doc_blob.decompress.60k", _blob_decompress),
+]
+
+
+# ---------- esecuzione ----------
+def measure(fn: Callable[[], object], repeat: int = 7, min_time: float = 0.2) -> dict:
+    t = timeit.Timer(fn)
+    loops, total = t.autorange()
+    if total < min_time:
+        loops = max(1, int(loops * min_time / max(total, 1e-9)))
+    runs = [x / loops for x in t.repeat(repeat=repeat, number=loops)]
+    return {"ns": round(min(runs) * 1e9, 1), "median_ns": round(statistics.median(runs) * 1e9, 1), "loops": loops}
+
+
+def run(selected: list[Bench], repeat: int = 7, min_time: float = 0.2) -> dict:
+    calib = lambda: measure(_calibration, repeat=repeat, min_time=min_time / 2)["ns"]
+    results, calibs = {}, []
+    for b in selected:
+        fn = b.setup()
+        # calibrazione subito prima e dopo: assorbe le variazioni di frequenza/carico
+        c1 = calib()
+        m = measure(fn, repeat=repeat, min_time=min_time)
+        c = (c1 + calib()) / 2
+        m["norm"] = round(m["ns"] / c, 4)
+        results[b.name] = m
+        calibs.append(c)
+    return {"calibration_ns": round(statistics.median(calibs), 1) if calibs else None,
+            "python": platform.python_version(), "machine": platform.machine(), "results": results}
+
+
+def check(current: dict, baseline: dict, threshold_pct: float) -> tuple[list[str], list[str]]:
+    lines, failed = [], []
+    thr = {b.name: b.threshold_pct for b in BENCHES}
+    for name, cur in current["results"].items():
+        base = (baseline.get("results") or {}).get(name)
+        if not base:
+            lines.append(f"{name:34s} {cur['ns'] / 1e3:>10.1f} µs   (nessuna baseline)")
+            continue
+        delta = (cur["norm"] - base["norm"]) / base["norm"] * 100
+        limit = thr.get(name) or threshold_pct
+        flag = ""
+        if delta > limit:
+            flag = f"  REGRESSIONE > {limit:.0f}%"
+            failed.append(name)
+        lines.append(f"{name:34s} {cur['ns'] / 1e3:>10.1f} µs  norm {base['norm']:.3f} -> {cur['norm']:.3f} ({delta:+.1f}%){flag}")
+    return lines, failed
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Micro-benchmark funzioni calde")
+    ap.add_argument("-k", help="filtra per sottostringa del nome")
+    ap.add_argument("--save", action="store_true", help="scrive i risultati come nuova baseline")
+    ap.add_argument("--baseline", default=str(BASELINE))
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD_PCT, help="regressione ammessa (%%)")
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--retries", type=int, default=2, help="rimisure per i benchmark oltre soglia")
+    ap.add_argument("--json", help="scrive anche i risultati correnti in questo file")
+    a = ap.parse_args(argv)
+
+    selected = [b for b in BENCHES if not a.k or a.k in b.name]
+    cur = run(selected, repeat=a.repeat)
+    path = Path(a.baseline)
+    baseline = json.loads(path.read_text()) if path.exists() else {}
+    for _ in range(0 if a.save else a.retries):
+        _, failed = check(cur, baseline, a.threshold)
+        if not failed:
+            break
+        again = run([b for b in selected if b.name in failed], repeat=a.repeat)["results"]
+        for name, m in again.items():
+            if m["norm"] < cur["results"][name]["norm"]:
+                cur["results"][name] = m
+    if a.json:
+        Path(a.json).write_text(json.dumps(cur, indent=2))
+    if a.save:
+        base = json.loads(path.read_text()) if path.exists() else {"results": {}}
+        base.update({k: v for k, v in cur.items() if k != "results"})
+        base["results"] = {**base.get("results", {}), **cur["results"]}
+        path.write_text(json.dumps(base, indent=2, sort_keys=True) + "\n")
+        print(f"baseline aggiornata: {path}")
+    baseline = json.loads(path.read_text()) if path.exists() else {}
+    lines, failed = check(cur, baseline, a.threshold)
+    print("\n".join(lines))
+    if failed and not a.save:
+        print(f"\n{len(failed)} regressioni: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+import pytest
+from fastapi.testclient import TestClient
+
+_env = pytest.MonkeyPatch()
+
+def pytest_configure(config):
+    # prima della collection: i moduli src creano Settings (e i client Mongo) all'import.
+    # Senza Mongo le query falliscono in fretta invece di attendere 8 s di server selection.
+    _env.setenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "300")
+
+def pytest_unconfigure(config):
+    _env.undo()
+
+@pytest.fixture(autouse=True)
+def set_test_env(monkeypatch):
+    monkeypatch.setenv("STAGE", "local")
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+    yield
+
+@pytest.fixture
+def client():
+    from src.app import app
+    return TestClient(app)
+
+@pytest.fixture
+def clean_pois():
+    from src.infra.db import get_db
+    db = get_db()
+    db.pois.delete_many({})
+    yield
+    db.pois.delete_many({})
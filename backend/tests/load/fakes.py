@@ -0,0 +1,278 @@
+# backend/tests/load/fakes.py
+"""
+Server finti per Overpass, MediaWiki API, chat completions e token OIDC.
+
+Ogni provider gira sulla sua porta con latenza, tasso d'errore e dimensione
+del payload configurabili, così i run sono riproducibili e indipendenti
+dalla rete:
+
+    python -m tests.load.fakes --set overpass.latency_ms=800 --set wiki.error_rate=0.05
+
+Le risposte sono deterministiche rispetto alla richiesta (stessa query ->
+stessi POI), il rumore su latenza/errori dipende solo da --seed.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+import time
+from dataclasses import dataclass, field, asdict
+
+from aiohttp import web
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 50.0       # latenza media
+    jitter_ms: float = 20.0        # deviazione (distribuzione log-normale)
+    error_rate: float = 0.0        # quota risposte 429/503
+    size: int = 40                 # overpass: nodi; wiki: risultati; openai: parole
+    extract_chars: int = 6000      # wiki: lunghezza estratto
+
+
+@dataclass
+class FakesConfig:
+    seed: int = 42
+    overpass: FakeConfig = field(default_factory=lambda: FakeConfig(latency_ms=600, jitter_ms=400, size=40))
+    wiki: FakeConfig = field(default_factory=lambda: FakeConfig(latency_ms=120, jitter_ms=60, size=3))
+    openai: FakeConfig = field(default_factory=lambda: FakeConfig(latency_ms=1500, jitter_ms=500, size=250))
+    oidc: FakeConfig = field(default_factory=lambda: FakeConfig(latency_ms=80, jitter_ms=20))
+
+    def set(self, expr: str):
+        """`provider.campo=valore`, es. `overpass.latency_ms=900`."""
+        path, _, val = expr.partition("=")
+        prov, _, attr = path.partition(".")
+        if prov == "seed":
+            self.seed = int(val); return
+        cfg = getattr(self, prov)
+        cur = getattr(cfg, attr)
+        setattr(cfg, attr, type(cur)(val))
+
+
+_WORDS = ("basilica chiesa palazzo piazza fontana torre museo teatro ponte porta arco "
+          "villa castello loggia colonna obelisco giardino chiostro cappella mercato").split()
+_SAINTS = "Pietro Paolo Marco Luca Giovanni Agnese Cecilia Maria Lorenzo Clemente".split()
+
+
+def _rng(*parts) -> random.Random:
+    h = hashlib.sha256("|".join(map(str, parts)).encode()).digest()
+    return random.Random(int.from_bytes(h[:8], "big"))
+
+
+def _lorem(rng: random.Random, chars: int) -> str:
+    out, n = [], 0
+    while n < chars:
+        w = rng.choice(_WORDS)
+        out.append(w); n += len(w) + 1
+        if rng.random() < 0.08:
+            out[-1] += "."
+        if rng.random() < 0.01:
+            out[-1] += "\n\n"
+    return " ".join(out)[:chars]
+
+
+class _SigningKey:
+    """Chiave RS256 generata all'avvio: i token sono verificabili via JWKS."""
+    KID = "fake-1"
+
+    def __init__(self):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                     serialization.NoEncryption())
+        pub = key.public_key().public_bytes(serialization.Encoding.PEM,
+                                            serialization.PublicFormat.SubjectPublicKeyInfo)
+        self.jwk = {**jwk.construct(pub, "RS256").to_dict(), "kid": self.KID, "use": "sig"}
+
+    def sign(self, claims: dict) -> str:
+        return jwt.encode(claims, self.pem, algorithm="RS256", headers={"kid": self.KID})
+
+
+class Provider:
+    def __init__(self, name: str, cfg: FakeConfig, seed: int):
+        self.name = name
+        self.cfg = cfg
+        self.noise = random.Random(f"{seed}:{name}")
+        self.calls = 0
+
+    async def delay_or_error(self) -> web.Response | None:
+        self.calls += 1
+        c = self.cfg
+        if c.latency_ms > 0:
+            mu = max(c.latency_ms, 1.0)
+            sigma = min(1.5, (c.jitter_ms / mu) if mu else 0)
+            await asyncio.sleep(self.noise.lognormvariate(0, sigma) * mu / 1000.0 if sigma else mu / 1000.0)
+        if c.error_rate and self.noise.random() < c.error_rate:
+            return web.Response(status=self.noise.choice((429, 503)), text="fake upstream error")
+        return None
+
+
+# ---------- handler ----------
+_AROUND = re.compile(r"around:(\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)")
+
+
+def overpass_app(p: Provider) -> web.Application:
+    async def interpreter(req: web.Request):
+        if (err := await p.delay_or_error()) is not None:
+            return err
+        form = await req.post()
+        q = form.get("data") or req.query.get("data") or ""
+        m = _AROUND.search(q)
+        r, lat, lon = (float(m.group(1)), float(m.group(2)), float(m.group(3))) if m else (200.0, 0.0, 0.0)
+        # griglia ~100 m: punti vicini restituiscono in gran parte gli stessi POI
+        rng = _rng("overpass", round(lat, 3), round(lon, 3))
+        deg = r / 111_320.0
+        els = []
+        for i in range(p.cfg.size):
+            nid = rng.randrange(10**9, 10**10)
+            name = f"{rng.choice(_WORDS).title()} di San {rng.choice(_SAINTS)} {nid % 1000}"
+            tags = {"name": name, "tourism": rng.choice(("attraction", "museum", "artwork"))}
+            if rng.random() < 0.3:
+                tags["historic"] = "monument"
+            els.append({"type": "node", "id": nid,
+                        "lat": lat + rng.uniform(-deg, deg), "lon": lon + rng.uniform(-deg, deg), "tags": tags})
+        return web.json_response({"version": 0.6, "generator": "fake-overpass", "elements": els})
+    app = web.Application()
+    app.router.add_route("*", "/api/interpreter", interpreter)
+    return app
+
+
+def wiki_app(p: Provider) -> web.Application:
+    async def api(req: web.Request):
+        if (err := await p.delay_or_error()) is not None:
+            return err
+        q = req.query
+        if q.get("list") == "search":
+            term = q.get("srsearch", "")
+            rng = _rng("wiki-search", term)
+            hits = [{"title": term if i == 0 else f"{term} ({rng.choice(_WORDS)})", "pageid": rng.randrange(10**6)}
+                    for i in range(p.cfg.size)]
+            return web.json_response({"query": {"search": hits}})
+        if q.get("prop") == "extracts" or "revisions" in (q.get("prop") or ""):
+            pages = {}
+            for title in (q.get("titles") or "").split("|"):
+                rng = _rng("wiki-page", title)
+                pid = rng.randrange(10**6, 10**7)
+                pages[str(pid)] = {"pageid": pid, "title": title, "lastrevid": rng.randrange(10**8),
+                                   "extract": _lorem(rng, p.cfg.extract_chars)}
+            return web.json_response({"query": {"pages": pages}})
+        return web.json_response({"error": {"code": "badparams"}}, status=400)
+    app = web.Application()
+    app.router.add_get("/{lang}/w/api.php", api)
+    app.router.add_get("/w/api.php", api)
+    return app
+
+
+def openai_app(p: Provider) -> web.Application:
+    async def chat(req: web.Request):
+        if (err := await p.delay_or_error()) is not None:
+            return err
+        body = await req.json()
+        prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+        rng = _rng("openai", prompt[:200])
+        text = _lorem(rng, p.cfg.size * 6)
+        return web.json_response({
+            "id": "chatcmpl-fake", "object": "chat.completion", "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                      "total_tokens": (len(prompt) + len(text)) // 4},
+        })
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat)
+    return app
+
+
+def oidc_app(p: Provider) -> web.Application:
+    key = _SigningKey()
+
+    async def certs(req: web.Request):
+        return web.json_response({"keys": [key.jwk]})
+
+    async def token(req: web.Request):
+        if (err := await p.delay_or_error()) is not None:
+            return err
+        form = await req.post()
+        sub = hashlib.sha1(str(form.get("code", "")).encode()).hexdigest()[:12]
+        now = int(time.time())
+        claims = {"iss": str(req.url.origin()), "sub": f"user-{sub}", "email": f"{sub}@example.test",
+                  "iat": now, "exp": now + 3600}
+        tok = key.sign(claims)
+        return web.json_response({"access_token": tok, "id_token": tok, "refresh_token": "r-" + sub,
+                                  "expires_in": 3600, "token_type": "Bearer"})
+    app = web.Application()
+    app.router.add_post("/token", token)
+    app.router.add_get("/protocol/openid-connect/certs", certs)
+    return app
+
+
+_APPS = {"overpass": overpass_app, "wiki": wiki_app, "openai": openai_app, "oidc": oidc_app}
+
+
+class Fakes:
+    """Avvia tutti i provider finti sul loop corrente (porte effimere)."""
+    def __init__(self, cfg: FakesConfig | None = None, host: str = "127.0.0.1"):
+        self.cfg = cfg or FakesConfig()
+        self.host = host
+        self.providers: dict[str, Provider] = {}
+        self.ports: dict[str, int] = {}
+        self._runners: list[web.AppRunner] = []
+
+    async def start(self) -> "Fakes":
+        for name, factory in _APPS.items():
+            p = Provider(name, getattr(self.cfg, name), self.cfg.seed)
+            runner = web.AppRunner(factory(p), access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, self.host, 0)
+            await site.start()
+            self.ports[name] = site._server.sockets[0].getsockname()[1]
+            self.providers[name] = p
+            self._runners.append(runner)
+        return self
+
+    async def stop(self):
+        for r in self._runners:
+            await r.cleanup()
+        self._runners.clear()
+
+    def env(self) -> dict[str, str]:
+        """Variabili d'ambiente per puntare l'API ai fake."""
+        base = lambda n: f"http://{self.host}:{self.ports[n]}"
+        return {
+            "OVERPASS_URL": f"{base('overpass')}/api/interpreter",
+            "WIKI_API_URL": base("wiki") + "/{lang}/w/api.php",
+            "OPENAI_BASE_URL": f"{base('openai')}/v1",
+            "OPENAI_API_KEY": "fake-key",
+            "OIDC_ISS": base("oidc"),
+            "OIDC_TOKEN_URL": f"{base('oidc')}/token",
+            "OIDC_CLIENT_ID": "geoguide-load",
+            "OIDC_REDIRECT_URI": "http://localhost/callback",
+        }
+
+    def describe(self) -> dict:
+        return {"seed": self.cfg.seed, **{n: asdict(getattr(self.cfg, n)) for n in _APPS}}
+
+
+async def _main(args):
+    cfg = FakesConfig()
+    for s in args.set or []:
+        cfg.set(s)
+    fakes = await Fakes(cfg).start()
+    for k, v in fakes.env().items():
+        print(f"export {k}='{v}'")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await fakes.stop()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Provider esterni finti per i load test")
+    ap.add_argument("--set", action="append", help="provider.campo=valore (ripetibile)")
+    try:
+        asyncio.run(_main(ap.parse_args()))
+    except KeyboardInterrupt:
+        pass
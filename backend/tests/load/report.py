@@ -0,0 +1,95 @@
+# backend/tests/load/report.py
+"""Statistiche per endpoint e confronto tra run (es. tra due commit)."""
+from __future__ import annotations
+import argparse
+import json
+import math
+import subprocess
+import sys
+from collections import defaultdict
+
+
+def quantile(sorted_vals: list[float], q: float) -> float | None:
+    """Quantile con interpolazione lineare (stesso metodo di numpy 'linear')."""
+    if not sorted_vals:
+        return None
+    if len(sorted_vals) == 1:
+        return sorted_vals[0]
+    pos = (len(sorted_vals) - 1) * q
+    lo, hi = math.floor(pos), math.ceil(pos)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (pos - lo)
+
+
+class Recorder:
+    def __init__(self):
+        self.lat: dict[str, list[float]] = defaultdict(list)
+        self.status: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.bytes: dict[str, int] = defaultdict(int)
+
+    def add(self, endpoint: str, ms: float, status: int | str, size: int = 0):
+        self.lat[endpoint].append(ms)
+        self.status[endpoint][str(status)] += 1
+        self.bytes[endpoint] += size
+
+    def summary(self, wall_s: float) -> dict:
+        out = {}
+        for ep, vals in sorted(self.lat.items()):
+            v = sorted(vals)
+            st = dict(self.status[ep])
+            errors = sum(n for s, n in st.items() if not s.startswith(("2", "3")))
+            out[ep] = {
+                "count": len(v), "errors": errors,
+                "rps": round(len(v) / wall_s, 2) if wall_s else None,
+                "p50_ms": _r(quantile(v, .50)), "p95_ms": _r(quantile(v, .95)), "p99_ms": _r(quantile(v, .99)),
+                "mean_ms": _r(sum(v) / len(v)), "max_ms": _r(v[-1]),
+                "avg_bytes": round(self.bytes[ep] / len(v)), "status": st,
+            }
+        return out
+
+
+def _r(x):
+    return None if x is None else round(x, 1)
+
+
+def git_meta() -> dict:
+    def run(*a):
+        try:
+            return subprocess.check_output(["git", *a], stderr=subprocess.DEVNULL, text=True).strip()
+        except Exception:
+            return None
+    return {"commit": run("rev-parse", "--short", "HEAD"), "dirty": bool(run("status", "--porcelain"))}
+
+
+def compare(base: dict, head: dict, threshold_pct: float = 10.0) -> tuple[list[str], bool]:
+    """Confronta p50/p95/p99 e rps per endpoint; True se c'è una regressione oltre soglia."""
+    lines, regressed = [], False
+    for ep in sorted(set(base["endpoints"]) | set(head["endpoints"])):
+        b, h = base["endpoints"].get(ep), head["endpoints"].get(ep)
+        if not (b and h):
+            lines.append(f"{ep:32s} {'(solo base)' if b else '(solo head)'}")
+            continue
+        cells = []
+        for k in ("p50_ms", "p95_ms", "p99_ms"):
+            if b[k] and h[k] is not None:
+                d = (h[k] - b[k]) / b[k] * 100
+                flag = ""
+                if d > threshold_pct:
+                    flag, regressed = "!", True
+                cells.append(f"{k[:3]} {b[k]:>8.1f} -> {h[k]:>8.1f} ({d:+6.1f}%){flag}")
+        if b.get("rps") and h.get("rps"):
+            cells.append(f"rps {b['rps']:.1f} -> {h['rps']:.1f}")
+        lines.append(f"{ep:32s} " + " | ".join(cells))
+    return lines, regressed
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Confronta due report dei load test")
+    ap.add_argument("base"); ap.add_argument("head")
+    ap.add_argument("--threshold", type=float, default=10.0, help="regressione massima ammessa (%%)")
+    a = ap.parse_args()
+    with open(a.base) as f1, open(a.head) as f2:
+        base, head = json.load(f1), json.load(f2)
+    print(f"base {base['meta'].get('commit')}  head {head['meta'].get('commit')}  scenario {head['meta']['scenario']}")
+    lines, bad = compare(base, head, a.threshold)
+    print("\n".join(lines))
+    sys.exit(1 if bad else 0)
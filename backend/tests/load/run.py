@@ -0,0 +1,136 @@
+# backend/tests/load/run.py
+"""
+Load test riproducibile: fake provider + mongod locale seedato + API reale.
+
+    cd backend
+    python -m tests.load.run --scenario walking_tour --users 20
+    python -m tests.load.run --scenario cold_city --set overpass.latency_ms=2000
+    python -m tests.load.report results/abc123-walking_tour.json results/def456-walking_tour.json
+
+Il report JSON (throughput e p50/p95/p99 per endpoint) include commit,
+seed e configurazione dei fake, così due run sono confrontabili.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from . import scenarios
+from .fakes import Fakes, FakesConfig
+from .report import git_meta
+from .seed import LocalMongod, seed, DB_NAME, _free_port
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+class _FakesThread:
+    """I fake girano su un loop separato per non rubare CPU al driver."""
+    def __init__(self, cfg: FakesConfig):
+        self.cfg = cfg
+        self.loop = asyncio.new_event_loop()
+        self.fakes: Fakes | None = None
+        self._t = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self) -> Fakes:
+        self._t.start()
+        self.fakes = asyncio.run_coroutine_threadsafe(Fakes(self.cfg).start(), self.loop).result(10)
+        return self.fakes
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.fakes.stop(), self.loop).result(10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def _start_api(env: dict, port: int, workers: int) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", "src.app:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env={**os.environ, **env})
+
+
+def _wait_health(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/v1/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError("API non raggiungibile")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Load test GeoGuide")
+    ap.add_argument("--scenario", choices=sorted(scenarios.SCENARIOS), default="walking_tour")
+    ap.add_argument("--users", type=int, default=10)
+    ap.add_argument("--steps", type=int, help="passi per utente (default per scenario)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--pois", type=int, default=2000, help="POI seedati per città")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--mongo-uri", help="mongod locale già avviato (default: ne avvia uno)")
+    ap.add_argument("--base-url", help="API già avviata (salta avvio uvicorn e seed)")
+    ap.add_argument("--set", action="append", help="config fake: provider.campo=valore")
+    ap.add_argument("--out", help="file report JSON")
+    ap.add_argument("--rate-limit", action="store_true",
+                    help="lascia attivo il rate limit per client (ogni utente virtuale ha il suo IP)")
+    a = ap.parse_args(argv)
+
+    cfg = FakesConfig(seed=a.seed)
+    for s in a.set or []:
+        cfg.set(s)
+
+    mongod = api = None
+    with _FakesThread(cfg) as fakes:
+        try:
+            base_url = a.base_url
+            seeded = None
+            if not base_url:
+                if not a.mongo_uri:
+                    mongod = LocalMongod().start()
+                uri = a.mongo_uri or mongod.uri
+                seeded = seed(uri, DB_NAME, pois_per_city=a.pois, seed_value=a.seed)
+                port = _free_port()
+                api = _start_api({**fakes.env(), "STAGE": "local", "MONGO_URI": uri,
+                                  "RATE_LIMIT_ENABLED": str(a.rate_limit).lower()}, port, a.workers)
+                base_url = f"http://127.0.0.1:{port}"
+                _wait_health(base_url)
+            rec, wall = asyncio.run(scenarios.run(base_url, a.scenario, a.users, a.steps, a.seed))
+        finally:
+            if api:
+                api.terminate()
+                api.wait(10)
+            if mongod:
+                mongod.stop()
+
+        report = {
+            "meta": {**git_meta(), "scenario": a.scenario, "users": a.users, "steps": a.steps,
+                     "seed": a.seed, "workers": a.workers, "seeded": seeded, "fakes": fakes.describe(),
+                     "upstream_calls": {n: p.calls for n, p in fakes.providers.items()},
+                     "python": platform.python_version(), "at": datetime.now(timezone.utc).isoformat()},
+            "wall_s": round(wall, 3),
+            "endpoints": rec.summary(wall),
+        }
+
+    out = Path(a.out) if a.out else RESULTS_DIR / f"{report['meta']['commit'] or 'local'}-{a.scenario}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"{a.scenario}: {a.users} utenti, {wall:.1f}s -> {out}")
+    for ep, s in report["endpoints"].items():
+        print(f"  {ep:28s} n={s['count']:<6d} err={s['errors']:<4d} rps={s['rps']:<8} "
+              f"p50={s['p50_ms']} p95={s['p95_ms']} p99={s['p99_ms']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
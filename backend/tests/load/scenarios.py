@@ -0,0 +1,118 @@
+# backend/tests/load/scenarios.py
+"""
+Scenari scriptati (deterministici dato il seed):
+
+- walking_tour: utenti che camminano per il centro; a ogni passo
+  /v1/poi/nearby, ogni 3 passi /v1/nearby, narrazione del POI più vicino.
+- cold_city:    punti sparsi mai visti -> /v1/nearby con enrich (Overpass+Wiki).
+- hot_landmark: tutti sullo stesso landmark -> nearby + narrazione in cache.
+"""
+from __future__ import annotations
+import asyncio
+import math
+import random
+import time
+
+import httpx
+
+from .report import Recorder
+from .seed import CITIES, _offset
+
+LANGS = ("it", "en")
+STYLES = ("guide", "quick", "kids")
+
+
+async def _call(hx, rec: Recorder, label: str, method: str, url: str, **kw):
+    t0 = time.perf_counter()
+    try:
+        r = await hx.request(method, url, **kw)
+        rec.add(label, (time.perf_counter() - t0) * 1000, r.status_code, len(r.content))
+        return r
+    except httpx.HTTPError as e:
+        rec.add(label, (time.perf_counter() - t0) * 1000, type(e).__name__)
+        return None
+
+
+def _first_poi(r) -> str | None:
+    if r is None or r.status_code != 200:
+        return None
+    body = r.json()
+    items = body.get("items") or body.get("pois") or []
+    if not items:
+        return None
+    return items[0].get("poi_id") or items[0].get("_id")
+
+
+async def walking_tour(hx, rec, user: int, rng: random.Random, steps: int = 20, city: str = "rome"):
+    clat, clon = CITIES[city]
+    heading = rng.uniform(0, 2 * math.pi)
+    lat, lon = _offset(clat, clon, rng.uniform(-300, 300), rng.uniform(-300, 300))
+    lang = rng.choice(LANGS)
+    r = await _call(hx, rec, "POST /v1/auth/callback", "POST", "/v1/auth/callback",
+                    json={"code": f"code-{user}", "code_verifier": "v" * 43})
+    auth = {"authorization": f"Bearer {r.json()['access_token']}"} if r is not None and r.status_code == 200 else None
+    for step in range(steps):
+        if auth and step % 5 == 0:
+            await _call(hx, rec, "GET /v1/auth/me", "GET", "/v1/auth/me", headers=auth)
+        heading += rng.uniform(-0.5, 0.5)
+        lat, lon = _offset(lat, lon, 40 * math.cos(heading), 40 * math.sin(heading))
+        r = await _call(hx, rec, "POST /v1/poi/nearby", "POST", "/v1/poi/nearby",
+                        json={"lat": lat, "lon": lon, "radius_m": 120, "lang": lang})
+        if step % 3 == 0:
+            await _call(hx, rec, "POST /v1/nearby", "POST", "/v1/nearby",
+                        json={"lat": lat, "lon": lon, "radius": 200, "enrich": False})
+        pid = _first_poi(r)
+        if pid:
+            await _call(hx, rec, "POST /v1/narration", "POST", "/v1/narration",
+                        json={"poi_id": pid, "lang": lang, "style": rng.choice(STYLES)})
+
+
+async def cold_city(hx, rec, user: int, rng: random.Random, steps: int = 5, city: str = "berlin"):
+    clat, clon = CITIES[city]
+    for _ in range(steps):
+        lat, lon = _offset(clat, clon, rng.uniform(-5000, 5000), rng.uniform(-5000, 5000))
+        r = await _call(hx, rec, "POST /v1/nearby", "POST", "/v1/nearby",
+                        json={"lat": lat, "lon": lon, "radius": 200, "enrich": True})
+        pid = _first_poi(r)
+        if pid:
+            await _call(hx, rec, "POST /v1/narration", "POST", "/v1/narration",
+                        json={"poi_id": pid, "lang": rng.choice(LANGS), "style": "guide"})
+
+
+async def hot_landmark(hx, rec, user: int, rng: random.Random, steps: int = 30, city: str = "paris"):
+    lat, lon = CITIES[city]
+    for _ in range(steps):
+        jlat, jlon = _offset(lat, lon, rng.uniform(-15, 15), rng.uniform(-15, 15))
+        r = await _call(hx, rec, "POST /v1/poi/nearby", "POST", "/v1/poi/nearby",
+                        json={"lat": jlat, "lon": jlon, "radius_m": 80, "lang": "en"})
+        pid = _first_poi(r)
+        if pid:
+            await _call(hx, rec, "POST /v1/narration", "POST", "/v1/narration",
+                        json={"poi_id": pid, "lang": "en", "style": "guide"})
+
+
+class _UserClient:
+    """Client per utente virtuale: X-Forwarded-For distinto, come client reali dietro la CDN."""
+    def __init__(self, hx: httpx.AsyncClient, user: int):
+        self._hx = hx
+        self._ip = f"10.{user // 65536 % 256}.{user // 256 % 256}.{user % 256}"
+
+    async def request(self, method: str, url: str, **kw):
+        kw["headers"] = {"x-forwarded-for": self._ip, **(kw.get("headers") or {})}
+        return await self._hx.request(method, url, **kw)
+
+
+SCENARIOS = {"walking_tour": walking_tour, "cold_city": cold_city, "hot_landmark": hot_landmark}
+
+
+async def run(base_url: str, scenario: str, users: int = 10, steps: int | None = None,
+              seed: int = 42, timeout: float = 30.0) -> tuple[Recorder, float]:
+    fn = SCENARIOS[scenario]
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as hx:
+        t0 = time.perf_counter()
+        kw = {"steps": steps} if steps else {}
+        await asyncio.gather(*(fn(_UserClient(hx, u), rec, u, random.Random(f"{seed}:{scenario}:{u}"), **kw) for u in range(users)))
+        wall = time.perf_counter() - t0
+    return rec, wall
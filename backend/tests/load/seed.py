@@ -0,0 +1,144 @@
+# backend/tests/load/seed.py
+"""
+mongod locale usa-e-getta + dataset deterministico per i load test.
+
+    python -m tests.load.seed --uri mongodb://127.0.0.1:27017 --pois 5000
+
+Senza --uri avvia `mongod` (deve essere nel PATH) su una porta libera con
+dbpath temporaneo e lo termina all'uscita.
+"""
+from __future__ import annotations
+import argparse
+import math
+import random
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import MongoClient, GEOSPHERE, ASCENDING
+
+# città di riferimento per gli scenari (lat, lon)
+CITIES = {
+    "rome": (41.9009, 12.4833),
+    "paris": (48.8584, 2.2945),
+    "berlin": (52.5163, 13.3777),
+}
+DB_NAME = "geo_guide_local"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalMongod:
+    def __init__(self, binary: str = "mongod"):
+        self.binary = shutil.which(binary)
+        if not self.binary:
+            raise RuntimeError("mongod non trovato nel PATH: passare --uri di un'istanza locale")
+        self.dbpath = tempfile.mkdtemp(prefix="geoguide-load-")
+        self.port = _free_port()
+        self.proc: subprocess.Popen | None = None
+
+    @property
+    def uri(self) -> str:
+        return f"mongodb://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 30) -> "LocalMongod":
+        self.proc = subprocess.Popen(
+            [self.binary, "--dbpath", self.dbpath, "--port", str(self.port), "--bind_ip", "127.0.0.1",
+             "--quiet", "--nounixsocket"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                MongoClient(self.uri, serverSelectionTimeoutMS=500).admin.command("ping")
+                return self
+            except Exception:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("mongod non risponde")
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        shutil.rmtree(self.dbpath, ignore_errors=True)
+
+
+def _offset(lat: float, lon: float, dx_m: float, dy_m: float) -> tuple[float, float]:
+    return lat + dy_m / 111_320.0, lon + dx_m / (111_320.0 * math.cos(math.radians(lat)))
+
+
+def seed(uri: str, db_name: str = DB_NAME, pois_per_city: int = 2000, docs_per_poi: int = 2,
+         extract_chars: int = 4000, seed_value: int = 42, spread_m: float = 3000) -> dict:
+    """Svuota e ripopola pois/poi_docs in modo deterministico; crea gli indici."""
+    rng = random.Random(seed_value)
+    db = MongoClient(uri)[db_name]
+    for c in ("pois", "poi_docs", "narrations_cache", "searched_pois", "usage_logs", "nearby_enrich_cache"):
+        db[c].delete_many({})
+    db.pois.create_index([("location", GEOSPHERE)], name="geo_location")
+    db.pois.create_index([("name.en", ASCENDING)], name="name_en")
+    db.poi_docs.create_index([("poi_id", ASCENDING), ("lang", ASCENDING)], name="poi_lang")
+    now = datetime.now(timezone.utc)
+    text = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * (extract_chars // 57 + 1))[:extract_chars]
+    n_pois = n_docs = 0
+    for city, (clat, clon) in CITIES.items():
+        pois = []
+        for i in range(pois_per_city):
+            # metà concentrata nel centro (landmark), metà sparsa
+            r = rng.expovariate(1 / 250) if i % 2 else rng.uniform(0, spread_m)
+            a = rng.uniform(0, 2 * math.pi)
+            lat, lon = _offset(clat, clon, r * math.cos(a), r * math.sin(a))
+            name = f"{city.title()} POI {i:05d}"
+            pois.append({
+                "name": {"default": name, "en": name, "it": name}, "aliases": [],
+                "location": {"type": "Point", "coordinates": [lon, lat]},
+                "lat_round": round(lat, 6), "lon_round": round(lon, 6),
+                "provider": "osm", "provider_id": str(10**9 + n_pois + i),
+                "langs": ["en", "it"], "photos": [], "is_active": True,
+                "last_seen_at": now, "last_refresh_at": now - timedelta(days=rng.randint(0, 10)),
+                "created_at": now, "updated_at": now,
+            })
+        ids = db.pois.insert_many(pois).inserted_ids
+        n_pois += len(ids)
+        docs = []
+        for pid in ids:
+            for j in range(docs_per_poi):
+                lang = ("en", "it")[j % 2]
+                docs.append({"poi_id": pid, "source": "wikipedia", "lang": lang,
+                             "url": f"https://{lang}.wikipedia.org/wiki/{pid}_{j}",
+                             "content_text": text, "sections": [], "meta": {"title": str(pid)},
+                             "created_at": now, "updated_at": now})
+            if len(docs) >= 5000:
+                db.poi_docs.insert_many(docs); n_docs += len(docs); docs = []
+        if docs:
+            db.poi_docs.insert_many(docs); n_docs += len(docs)
+    return {"db": db_name, "pois": n_pois, "poi_docs": n_docs, "seed": seed_value}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Seed deterministico per i load test")
+    ap.add_argument("--uri", help="MongoDB locale già avviato (default: avvia mongod)")
+    ap.add_argument("--pois", type=int, default=2000, help="POI per città")
+    ap.add_argument("--seed", type=int, default=42)
+    a = ap.parse_args()
+    m = None if a.uri else LocalMongod().start()
+    try:
+        print(seed(a.uri or m.uri, pois_per_city=a.pois, seed_value=a.seed))
+        if m:
+            print(f"mongod su {m.uri}; Ctrl-C per terminare")
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if m:
+            m.stop()
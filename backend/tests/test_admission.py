@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from src.infra import admission, oidc
+
+
+class Clock:
+    t = 0.0
+    def __call__(self):
+        return self.t
+
+
+def test_token_bucket():
+    clk = Clock()
+    rl = admission.RateLimiter({"expensive": admission.Rule(rate=0.5, burst=2)}, clock=clk)
+    assert rl.take("expensive", "ip:1") == 0 and rl.take("expensive", "ip:1") == 0
+    assert rl.take("expensive", "ip:1") == pytest.approx(2.0)        # 1 token a 0.5/s
+    assert rl.take("expensive", "ip:2") == 0                         # bucket per client
+    clk.t = 2.0
+    assert rl.take("expensive", "ip:1") == 0
+    assert rl.take("unknown", "ip:1") == 0                           # classe senza regola
+
+
+def test_classify_e_client_key(monkeypatch):
+    assert admission.classify("GET", "/v1/health", {}) == (None, 0)
+    assert admission.classify("POST", "/v1/nearby", {}) == ("expensive", 1.0)
+    assert admission.classify("POST", "/v1/narration", {"cache": "false"}) == ("expensive", 3.0)
+    assert admission.classify("GET", "/v1/config", {}) == ("default", 1.0)
+    # XFF falsificabile: senza proxy fidati conta il peer, con N proxy la N-esima voce da destra
+    assert admission.client_key({"x-forwarded-for": "1.2.3.4, 10.0.0.1"}, "10.0.0.9") == "ip:10.0.0.9"
+    assert admission.client_key({"x-forwarded-for": "6.6.6.6, 1.2.3.4"}, "10.0.0.9", 1) == "ip:1.2.3.4"
+    assert admission.client_key({"x-forwarded-for": "6.6.6.6, 1.2.3.4, 10.0.0.1"}, "10.0.0.9", 2) == "ip:1.2.3.4"
+    assert admission.client_key({"x-forwarded-for": "1.2.3.4"}, "10.0.0.9", 3) == "ip:1.2.3.4"
+    assert admission.client_key({}, "10.0.0.9", 1) == "ip:10.0.0.9"
+    monkeypatch.setattr(oidc, "cached_claims", lambda t: {"sub": "u1"} if t == "good" else None)
+    assert admission.client_key({"authorization": "Bearer good"}, "10.0.0.9") == "sub:u1"
+    assert admission.client_key({"authorization": "Bearer forged"}, "10.0.0.9") == "ip:10.0.0.9"
+
+
+def test_aimd():
+    async def go():
+        lim = admission.AdaptiveLimit("t", initial=4, max_limit=6, max_wait=0.05)
+        for _ in range(20):
+            await lim.acquire(); await lim.release(True)
+        assert 5 <= lim.limit <= 6
+        before = lim.limit
+        await lim.acquire(); await lim.release(False)
+        after = lim.limit
+        assert after == pytest.approx(before * 0.7)
+        await lim.acquire(); await lim.release(False)                 # stessa raffica: niente seconda riduzione
+        assert lim.limit == after
+    asyncio.run(go())
+
+
+def test_shed_low_prima_di_normal():
+    async def go():
+        lim = admission.AdaptiveLimit("t2", initial=4, max_wait=0.05, low_share=0.5)
+        await lim.acquire(admission.LOW); await lim.acquire(admission.LOW)
+        with pytest.raises(admission.Overloaded) as e:
+            await lim.acquire(admission.LOW)                           # oltre la quota low: rifiuto immediato
+        assert e.value.retry_after >= 1
+        await lim.acquire(); await lim.acquire()                        # normal usa il margine rimasto
+        with pytest.raises(admission.Overloaded):
+            await lim.acquire()                                         # pieno: attende max_wait e rinuncia
+        await lim.release(True)
+        await lim.acquire()
+    asyncio.run(go())
+
+
+def test_guarded_503_riduce_il_limite(monkeypatch):
+    async def go():
+        lim = admission.AdaptiveLimit("t3", initial=8)
+        monkeypatch.setitem(admission._limits, "t3", lim)
+        async with admission.guarded("t3") as o:
+            o.status = 503
+        assert lim.limit < 8 and lim.inflight == 0
+        with pytest.raises(RuntimeError):
+            async with admission.guarded("t3"):
+                raise RuntimeError("boom")
+        assert lim.inflight == 0
+    asyncio.run(go())
+
+
+def test_middleware_429(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from src.app import app, overloaded
+    monkeypatch.setattr(admission, "_limiter", admission.RateLimiter({"default": admission.Rule(0.01, 2)}))
+    c = TestClient(app)
+    codes = [c.get("/v1/tiles/1/0/0").status_code for _ in range(3)]
+    assert codes[:2] == [400, 400] and codes[2] == 429
+    r = c.get("/v1/tiles/1/0/0")
+    assert int(r.headers["retry-after"]) >= 1 and r.headers["x-content-type-options"] == "nosniff"
+
+    other = FastAPI()
+    other.add_exception_handler(admission.Overloaded, overloaded)
+    @other.get("/x")
+    async def x():
+        raise admission.Overloaded("openai: low-priority work shed", retry_after=2)
+    r = TestClient(other).get("/x")
+    assert r.status_code == 429 and r.headers["retry-after"] == "2"
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from bson import ObjectId
+
+from src.app import app
+from src.controllers import poi_docs_controller
+from src.infra import aio
+from src.infra.settings import config_store
+
+SLOW = 0.2
+N = 8
+
+
+class SlowCursor:
+    def __init__(self, docs):
+        self.docs = docs
+    def sort(self, *a):
+        return self
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+    def __iter__(self):
+        time.sleep(SLOW)                     # come pymongo: blocca il thread fino alla risposta
+        return iter(self.docs)
+
+
+class SlowColl:
+    name = "poi_docs"
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+    def find(self, *a, **kw):
+        return SlowCursor([dict(d) for d in self.docs])
+    def find_one(self, *a, **kw):
+        time.sleep(SLOW)
+        return self.docs[0] if self.docs else None
+
+
+async def _heartbeat(stop: asyncio.Event) -> float:
+    """Il ritardo massimo dell'event loop mentre gira il carico."""
+    worst, last = 0.0, time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.005)
+        now = time.perf_counter()
+        worst, last = max(worst, now - last - 0.005), now
+    return worst
+
+
+async def _under_load(*coros):
+    stop = asyncio.Event()
+    hb = asyncio.create_task(_heartbeat(stop))
+    t0 = time.perf_counter()
+    out = await asyncio.gather(*coros)
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    return out, elapsed, await hb
+
+
+def test_event_loop_libero_con_mongo_lento(monkeypatch):
+    monkeypatch.setattr(aio, "_executor", ThreadPoolExecutor(max_workers=N))
+    coll = aio.AsyncCollection(SlowColl([{"x": 1}]))
+
+    async def blocking():                    # controllo: pymongo chiamato direttamente dall'handler
+        return SlowColl([{"x": 1}]).find_one()
+
+    _, _, lag = asyncio.run(_under_load(*(blocking() for _ in range(3))))
+    assert lag >= SLOW * 0.8                 # il battito si accorge del blocco
+
+    out, elapsed, lag = asyncio.run(_under_load(*(coll.find_one({}) for _ in range(N)),
+                                                *(coll.find({}).limit(1).to_list() for _ in range(N))))
+    assert out == [{"x": 1}] * N + [[{"x": 1}]] * N
+    assert lag < SLOW / 2                    # il loop non si è mai fermato
+    assert elapsed < SLOW * 4                # e le query sono andate in parallelo (seriali: 16 x SLOW)
+
+
+def test_route_async_concorrenti(monkeypatch):
+    monkeypatch.setattr(aio, "_executor", ThreadPoolExecutor(max_workers=N * 2))
+    pid = ObjectId()
+    docs = [{"_id": ObjectId(), "poi_id": pid, "lang": "it", "text": "Pantheon", "updated_at": None}]
+    monkeypatch.setattr(poi_docs_controller, "poi_docs", aio.AsyncCollection(SlowColl(docs)))
+
+    config_store().current()                 # prima versione di app_config: in produzione allo startup
+
+    async def load():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as c:
+            return await _under_load(*(c.get(f"/v1/poi/{pid}/docs?docs=meta") for _ in range(N)))
+
+    res, elapsed, lag = asyncio.run(load())
+    assert {r.status_code for r in res} == {200} and all(len(r.json()) == 1 for r in res)
+    assert lag < SLOW / 2
+    assert elapsed < SLOW * 2 * 3            # due query per richiesta, le richieste in parallelo
+
+
+def test_log_inline_su_lambda_fuori_dal_loop(monkeypatch):
+    """Su Lambda il buffer dei log scrive inline: insert_many + rollup non devono fermare il loop."""
+    from src.infra.buffer import BatchBuffer
+    from src.models import usage_log
+
+    class SlowSink:
+        def __init__(self):
+            self.docs = []
+        def insert_many(self, docs, ordered=False):
+            time.sleep(SLOW)
+            self.docs += docs
+
+    sink = SlowSink()
+    monkeypatch.setattr(aio, "_executor", ThreadPoolExecutor(max_workers=N))
+    monkeypatch.setattr(usage_log, "_buffer", BatchBuffer(sink, inline=True))
+    config_store().current()
+    evt = {"event": "poi.view", "ts": "2026-05-01T12:00:00Z", "session_id": "s"}
+
+    async def load():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as c:
+            return await _under_load(*(c.post("/v1/log/batch", json=[evt]) for _ in range(N // 2)),
+                                     *(usage_log.log_async(dict(evt)) for _ in range(N // 2)))
+
+    res, elapsed, lag = asyncio.run(load())
+    assert [r.status_code for r in res[:N // 2]] == [202] * (N // 2) and res[N // 2:] == [True] * (N // 2)
+    assert len(sink.docs) == N and lag < SLOW / 2 and elapsed < SLOW * 3
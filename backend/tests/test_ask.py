@@ -0,0 +1,80 @@
+import os
+
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.models import poi as poi_model, usage_log
+from src.services import narration_service, passages
+from tests.bench import inputs
+
+EXTRACT = """Il Colosseo è il più grande anfiteatro romano del mondo.
+
+== Storia ==
+La costruzione fu iniziata da Vespasiano nel 72 d.C. e completata da Tito nell'80.
+Nel Medioevo fu trasformato in fortezza dalla famiglia Frangipane.
+
+== Architettura ==
+L'edificio è ellittico, lungo 188 metri, con quattro ordini di arcate in travertino.
+
+== Note ==
+1. Una nota che non deve diventare un passaggio.
+"""
+
+
+def test_import_senza_ordine_fisso():
+    import subprocess, sys
+    for mod in ("src.services.passages", "src.services.narration_service", "src.models.poi_doc"):
+        r = subprocess.run([sys.executable, "-c", f"import {mod}"], capture_output=True, text=True,
+                           env={**os.environ, "MONGO_SERVER_SELECTION_TIMEOUT_MS": "300"})
+        assert r.returncode == 0, r.stderr[-500:]
+
+
+def test_chunk_offset_e_sezioni():
+    secs = passages.chunk(EXTRACT)
+    assert [s["title"] for s in secs] == ["", "Storia", "Architettura"]      # niente "Note"
+    assert passages.passage_text(EXTRACT, secs[1]).startswith("La costruzione fu iniziata")
+    long = inputs.long_extract(60_000)
+    secs = passages.chunk(long)
+    assert secs and all(0 < s["end"] - s["start"] <= passages.PASSAGE_CHARS for s in secs)
+    assert all(a["end"] <= b["start"] for a, b in zip(secs, secs[1:]))       # span disgiunti e in ordine
+
+
+def test_bm25_ranking_e_lingua():
+    docs = [
+        {"content_text": EXTRACT, "sections": passages.chunk(EXTRACT), "lang": "it", "url": "u-it"},
+        {"content_text": "The Colosseum was built under Vespasian and completed by Titus in 80 AD.",
+         "lang": "en", "url": "u-en"},                                       # senza sections: chunk al volo
+    ]
+    idx = passages.build(docs)
+    assert len(idx) == 4
+    top = idx.search("Chi ha costruito il Colosseo?", k=2, lang="it")
+    assert top[0][1]["title"] == "Storia"                                    # "costruito" ~ "costruzione"
+    assert idx.search("quanto è lungo l'edificio", lang="it")[0][1]["title"] == "Architettura"
+    assert idx.search("who built it", lang="en")[0][1]["url"] == "u-en"
+    assert idx.search("il la di che") == []                                  # solo stopword
+
+
+def test_prompt_limitato():
+    big = [(1.0, {"title": "S", "text": "x" * 5000})] * 4
+    prompt = narration_service._ask_prompt("Colosseo", "Quando?", big, "it", max_chars=2400)
+    assert prompt.count("x") == 2400
+
+
+def test_endpoint(monkeypatch):
+    pid = ObjectId()
+    idx = passages.build([{"content_text": EXTRACT, "lang": "it", "url": "https://it.wikipedia.org/wiki/Colosseo",
+                           "source": "wikipedia"}])
+    monkeypatch.setattr(poi_model, "get", lambda _id: {"_id": pid, "name": {"it": "Colosseo"}})
+    monkeypatch.setattr(passages, "index_for", lambda _id: idx)
+    monkeypatch.setattr(narration_service, "OPENAI_API_KEY", None)
+    logged = []
+    monkeypatch.setattr(usage_log, "_buffer", type("B", (), {"inline": False,
+                                                             "offer": lambda self, d, block=True: logged.extend(d) or True})())
+    c = TestClient(app)
+    r = c.post(f"/v1/poi/{pid}/ask", json={"question": "Chi ha costruito il Colosseo?", "lang": "it"})
+    body = r.json()
+    assert r.status_code == 200 and "Vespasiano" in body["answer"]
+    assert body["sources"] == [{"name": "wikipedia", "url": "https://it.wikipedia.org/wiki/Colosseo", "lang": "it"}]
+    assert [e["event"] for e in logged] == ["poi.ask"] and "event_raw" not in logged[0]   # non conta come errore
+    assert c.post(f"/v1/poi/{pid}/ask", json={"question": "?"}).status_code == 400
@@ -0,0 +1,14 @@
+from tests.bench import micro
+
+def test_benches_run_once():
+    """Ogni micro-benchmark deve restare eseguibile (le funzioni possono cambiare firma)."""
+    for b in micro.BENCHES:
+        assert b.setup()() is not None, b.name
+
+def test_check_flags_regressions():
+    base = {"results": {"haversine.10k": {"norm": 1.0, "ns": 100}}}
+    cur = {"results": {"haversine.10k": {"norm": 1.5, "ns": 150}}}
+    _, failed = micro.check(cur, base, threshold_pct=25)
+    assert failed == ["haversine.10k"]
+    _, failed = micro.check(base, base, threshold_pct=25)
+    assert failed == []
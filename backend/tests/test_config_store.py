@@ -0,0 +1,105 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+from src.infra import settings
+from src.infra.config_store import ConfigStore
+
+
+class FakeConfigColl:
+    def __init__(self):
+        self.doc = None
+        self.calls = []
+        self.down = False
+
+    def set(self, version, **limits):
+        self.doc = {"_id": "default", "version": version, "flags": {"tiles": version > 1},
+                    "limits": limits, "llm": {}, "updated_at": datetime(2024, 1, version, tzinfo=timezone.utc)}
+
+    def load(self, head_only):
+        self.calls.append("head" if head_only else "full")
+        if self.down:
+            raise ServerSelectionTimeoutError("down")
+        if self.doc and head_only:
+            return {k: self.doc[k] for k in ("_id", "version", "updated_at")}
+        return self.doc
+
+
+def test_poll_ricarica_solo_se_cambia():
+    coll = FakeConfigColl(); coll.set(1, poi_radius_m=80)
+    store = ConfigStore(coll.load, poll_secs=60)
+    assert store.current().limits["poi_radius_m"] == 80
+    assert store.current() is store.current() and coll.calls == ["full"]  # in memoria fino al prossimo poll
+    store._next_poll = 0
+    store.current()
+    assert coll.calls == ["full", "head"]                                   # stessa versione: solo il poll
+    coll.set(2, poi_radius_m=120); store._next_poll = 0
+    assert store.current().limits["poi_radius_m"] == 120
+    assert coll.calls[-2:] == ["head", "full"] and store.current().version == 2
+
+
+def test_poll_dall_event_loop_in_un_thread():
+    coll = FakeConfigColl(); coll.set(1, poi_radius_m=80)
+    store = ConfigStore(coll.load, poll_secs=60)
+    snap = store.current()
+    coll.set(2, poi_radius_m=120); store._next_poll = 0
+
+    async def handler():
+        return store.current()
+    assert asyncio.run(handler()) is snap                                  # subito la copia in memoria
+    for _ in range(200):
+        if store._snap is not snap and not store._polling:
+            break
+        time.sleep(0.01)
+    assert store.current().limits["poi_radius_m"] == 120 and coll.calls == ["full", "head", "full"]
+
+
+def test_mongo_giu_tiene_la_copia():
+    coll = FakeConfigColl(); coll.set(1)
+    store = ConfigStore(coll.load, poll_secs=60)
+    snap = store.current()
+    coll.down = True; store._next_poll = 0
+    assert store.current() is snap
+    empty = ConfigStore(coll.load, poll_secs=60).current()
+    assert dict(empty.doc) == {} and empty.etag is None
+
+
+def test_snapshot_immutabile():
+    coll = FakeConfigColl(); coll.set(1, poi_radius_m=80)
+    snap = ConfigStore(coll.load).current()
+    with pytest.raises(TypeError):
+        snap.limits["poi_radius_m"] = 1
+    assert b'"poi_radius_m":80' in snap.body.replace(b" ", b"")
+
+
+@pytest.fixture
+def store(monkeypatch):
+    coll = FakeConfigColl(); coll.set(1, poi_radius_m=80, narration_max_chars=500)
+    monkeypatch.setattr(settings, "_store", ConfigStore(coll.load, poll_secs=60))
+    monkeypatch.setattr(settings, "_effective", None)
+    return coll
+
+
+def test_get_settings_scambio_atomico(store):
+    s1 = settings.get_settings()
+    assert (s1.POI_DEFAULT_RADIUS_M, s1.NARRATION_MAX_CHARS) == (80, 500)
+    assert settings.get_settings() is s1
+    store.set(2, poi_radius_m=150, narration_max_chars=900)
+    settings.config_store()._next_poll = 0
+    s2 = settings.get_settings()
+    assert s2 is not s1 and (s2.POI_DEFAULT_RADIUS_M, s2.NARRATION_MAX_CHARS) == (150, 900)
+    assert s1.POI_DEFAULT_RADIUS_M == 80            # chi aveva la vecchia istanza non vede cambi a metà
+    assert settings.flag("tiles") is True and settings.flag("missing", 3) == 3
+
+
+def test_config_endpoint_da_memoria(store):
+    from fastapi.testclient import TestClient
+    from src.app import app
+    c = TestClient(app)
+    r = c.get("/v1/config")
+    assert r.status_code == 200 and r.json()["version"] == 1 and r.json()["_id"] == "default"
+    assert c.get("/v1/config", headers={"if-none-match": r.headers["etag"]}).status_code == 304
+    assert store.calls == ["full"]
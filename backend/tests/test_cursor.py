@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.models import usage_log
+from src.utils import cursor
+from src.utils.cursor import Page
+
+T0 = datetime(2026, 5, 1, 12, 0, 0)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs, self.hinted, self.closed = docs, None, False
+    def sort(self, order):
+        for field, direction in reversed(order):             # sort stabile: chiave secondaria prima
+            self.docs.sort(key=lambda d: d[field], reverse=direction < 0)
+        return self
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+    def hint(self, h):
+        self.hinted = h
+        return self
+    def close(self):
+        self.closed = True
+    def __iter__(self):
+        return iter(self.docs)
+
+
+class FakeColl:
+    """Quel che serve a Page: uguaglianza, $lte/$gte/$lt/$gt, $or."""
+    OPS = {"$lte": lambda a, b: a <= b, "$gte": lambda a, b: a >= b, "$lt": lambda a, b: a < b,
+           "$gt": lambda a, b: a > b}
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+    def _match(self, d, q):
+        for k, cond in q.items():
+            if k == "$or":
+                if not any(self._match(d, c) for c in cond):
+                    return False
+            elif isinstance(cond, dict):
+                if not all(self.OPS[op](d.get(k), v) for op, v in cond.items()):
+                    return False
+            elif d.get(k) != cond:
+                return False
+        return True
+    def find(self, q, proj=None):
+        self.queries.append(q)
+        return FakeCursor([d for d in self.docs if self._match(d, q)])
+
+
+def _docs(n, same_ts_every=4):
+    # blocchi di 4 eventi con lo stesso ts: i pari merito attraversano i confini di pagina
+    return [{"_id": ObjectId(), "ts": T0 - timedelta(seconds=i // same_ts_every), "session_id": "s1"}
+            for i in range(n)]
+
+
+def test_keyset_pari_merito_senza_buchi_ne_doppioni():
+    coll = FakeColl(_docs(23))
+    seen, token, pages = [], None, 0
+    while True:
+        page = Page(coll, {"session_id": "s1"}, "ts", 3, token, hint="session_ts_id")
+        seen += [d["_id"] for d in page]
+        pages += 1
+        if page.next is None:
+            break
+        token = page.next
+    assert len(seen) == len(set(seen)) == 23 and pages == 8
+    ts = [next(d["ts"] for d in coll.docs if d["_id"] == i) for i in seen]
+    assert ts == sorted(ts, reverse=True)
+    # ogni pagina è un range sull'indice, mai uno skip
+    assert all(set(q) <= {"session_id", "ts", "$or"} for q in coll.queries)
+
+
+def test_pari_merito_oltre_mille_cursore_di_dimensione_fissa():
+    # un batch da /log/batch: centinaia di eventi con lo stesso ts al ms
+    coll = FakeColl(_docs(1500, same_ts_every=1500))
+    seen, token, sizes = [], None, set()
+    while True:
+        page = Page(coll, {"session_id": "s1"}, "ts", 200, token, hint="session_ts_id")
+        seen += [d["_id"] for d in page]
+        if page.next is None:
+            break
+        token = page.next
+        sizes.add(len(token))
+    assert len(seen) == len(set(seen)) == 1500 and len(sizes) == 1
+    assert seen == sorted(seen, reverse=True)               # _id come secondo ordinamento
+
+
+def test_keyset_su_id_e_cursore_invalido():
+    docs = [{"_id": ObjectId(f"{i:024x}")} for i in range(5)]
+    p1 = Page(FakeColl(docs), {}, "_id", 2, direction=1)
+    assert [d["_id"] for d in p1] == [docs[0]["_id"], docs[1]["_id"]]
+    assert cursor.after({}, "_id", p1.next, direction=1) == {"_id": {"$gt": docs[1]["_id"]}}
+    for bad in ("not-a-cursor!", cursor.encode(T0, [str(ObjectId())])):  # formato vecchio: lista di pari merito
+        with pytest.raises(HTTPException) as e:
+            cursor.decode(bad)
+        assert e.value.status_code == 400
+
+
+def test_events_in_streaming(monkeypatch):
+    coll = FakeColl(_docs(5))
+    monkeypatch.setattr(usage_log, "page", lambda session_id=None, user_hash=None, limit=200, cursor=None:
+                        Page(coll, {"session_id": session_id}, "ts", limit, cursor, hint="session_ts_id"))
+    c = TestClient(app)
+    r = c.get("/v1/analytics/events", params={"session_id": "s1", "limit": 3})
+    assert r.status_code == 200 and len(r.json()["items"]) == 3
+    r2 = c.get("/v1/analytics/events", params={"session_id": "s1", "limit": 3, "cursor": r.json()["next"]})
+    body = r2.json()
+    assert len(body["items"]) == 2 and body["next"] is None
+    assert c.get("/v1/analytics/events", params={"session_id": "s1", "cursor": "%%%"}).status_code == 400
+    assert c.get("/v1/analytics/events").status_code == 400            # mai l'intero log grezzo
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from src.models import doc_blob, poi_doc
+from src.utils.projection import doc_projection
+from tests.bench import inputs
+
+
+class Res:
+    def __init__(self, upserted=0):
+        self.upserted_count = upserted
+
+
+class FakeCursor(list):
+    def sort(self, field, direction):
+        super().sort(key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        return FakeCursor(self[:n])
+
+
+class FakeColl:
+    """Quel che serve a doc_blob: uguaglianza, $in/$gt/$lt/$type, bulk di UpdateOne, delete, distinct."""
+
+    def __init__(self, docs=()):
+        self.docs = {d["_id"]: dict(d) for d in docs}
+        self.finds = 0
+
+    def _ok(self, d, q):
+        for k, cond in q.items():
+            v = d.get(k)
+            if isinstance(cond, dict):
+                for op, x in cond.items():
+                    if (op == "$in" and v not in x or op == "$gt" and not v > x or op == "$lt" and not v < x
+                            or op == "$type" and not isinstance(v, str)):
+                        return False
+            elif v != cond:
+                return False
+        return True
+
+    def find(self, q, proj=None):
+        self.finds += 1
+        return FakeCursor(dict(d) for d in self.docs.values() if self._ok(d, q))
+
+    def bulk_write(self, ops, ordered=True):
+        up = 0
+        for op in ops:
+            q, u = op._filter, op._doc
+            hit = next((d for d in self.docs.values() if self._ok(d, q)), None)
+            if hit is None:
+                if not op._upsert:
+                    continue
+                hit = self.docs[q["_id"]] = {"_id": q["_id"], **u.get("$setOnInsert", {})}
+                up += 1
+            hit.update(u.get("$set", {}))
+            for k in u.get("$unset", {}):
+                hit.pop(k, None)
+        return Res(up)
+
+    def delete_many(self, q):
+        gone = [k for k, d in self.docs.items() if self._ok(d, q)]
+        for k in gone:
+            del self.docs[k]
+        return type("R", (), {"deleted_count": len(gone)})()
+
+    def distinct(self, field, q):
+        return list({d[field] for d in self.docs.values() if self._ok(d, q) and field in d})
+
+
+@pytest.fixture
+def blobs(monkeypatch):
+    coll = FakeColl()
+    monkeypatch.setattr(doc_blob, "doc_blobs", coll)
+    monkeypatch.setattr(doc_blob, "_lru", doc_blob.OrderedDict())
+    monkeypatch.setattr(doc_blob, "_lru_chars", 0)
+    return coll
+
+
+def test_blob_unico_e_compresso(blobs):
+    text = inputs.long_extract(60_000)
+    a = doc_blob.body_fields(text)
+    b = doc_blob.body_fields(text)
+    assert a == b and len(blobs.docs) == 1
+    blob = blobs.docs[a["content_ref"]]
+    assert blob["zn"] < blob["n"] / 2 and blob["codec"] in ("zlib", "zstd")
+    assert a["content_len"] == 60_000 and a["content_head"] == text[:doc_blob.HEAD_CHARS]
+    assert doc_blob.decompress(blob["codec"], blob["z"]) == text
+
+
+def test_lettura_pigra_e_lru(blobs):
+    text = "Testo lungo " * 500
+    ref = doc_blob.body_fields(text)
+    doc_blob._lru.clear()
+    doc_blob._lru_chars = 0
+    docs = [{"url": "a", **ref}, {"url": "b", **ref}, {"url": "c", "content_text": "inline"}]
+    doc_blob.attach(docs)
+    assert [d["content_text"] for d in docs] == [text, text, "inline"] and blobs.finds == 1
+    doc_blob.attach([{**ref}])
+    assert blobs.finds == 1                                           # seconda lettura dalla LRU
+
+
+def test_present_estratti_e_full(blobs):
+    text = "x" * 3000
+    ref = doc_blob.body_fields(text)
+    assert doc_projection("excerpt", 10)["content_ref"] == 1
+    short = [{"url": "a", "excerpt": ref["content_head"][:2000], "content_ref": ref["content_ref"], "content_len": 3000}]
+    poi_doc.present(short, "excerpt", 2000)
+    assert short == [{"url": "a", "excerpt": "x" * 2000}]            # completato oltre content_head
+    before = blobs.finds
+    ok = [{"url": "a", "excerpt": "x" * 300, "content_ref": ref["content_ref"], "content_len": 3000}]
+    poi_doc.present(ok, "excerpt", 300)
+    assert ok == [{"url": "a", "excerpt": "x" * 300}] and blobs.finds == before
+    full = [{"url": "a", **ref}]
+    poi_doc.present(full, "full")
+    assert full == [{"url": "a", "content_text": text}]
+
+
+def test_migrazione_a_batch_e_sweep(blobs, monkeypatch):
+    city = inputs.long_extract(20_000, seed=3)
+    rows = [{"_id": ObjectId(f"{i:024x}"), "poi_id": i, "content_text": city if i % 3 else f"unico {i} " * 50}
+            for i in range(1, 11)]
+    rows.append({"_id": ObjectId(f"{99:024x}"), "content_ref": "gia-migrato"})
+    docs = FakeColl(rows)
+    monkeypatch.setattr(doc_blob, "poi_docs", docs)
+
+    stats = doc_blob.migrate(batch=4)
+    assert stats["docs"] == 10 and stats["blobs"] == 4                 # 1 pagina città + 3 testi unici
+    assert stats["stored"] < stats["chars"] and stats["last_id"] == rows[9]["_id"]
+    assert all("content_text" not in d and d["content_ref"] in blobs.docs for d in docs.docs.values()
+               if d["_id"] != rows[10]["_id"])
+    assert doc_blob.migrate(batch=4)["docs"] == 0                       # idempotente
+
+    old = datetime.now(timezone.utc) - timedelta(days=3)
+    for b in blobs.docs.values():
+        b["seen_at"] = old
+    monkeypatch.setattr(doc_blob, "wiki_pages", FakeColl([{"_id": "it:Pagina", "content_ref": docs.docs[rows[5]["_id"]]["content_ref"]}]))
+    del docs.docs[rows[2]["_id"]]                                       # unico riferimento al testo 3
+    del docs.docs[rows[3]["_id"]]                                       # la pagina città resta usata
+    del docs.docs[rows[5]["_id"]]                                       # il testo 6 resta in wiki_pages
+    assert doc_blob.sweep(min_age_hours=24, batch=2) == 1 and len(blobs.docs) == 3
+    assert doc_blob.existing(list(blobs.docs) + ["sparito"]) == set(blobs.docs)
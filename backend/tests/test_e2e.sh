@@ -13,15 +13,15 @@ curl -s "$BASE_URL/config" | jq .
 
 echo
 echo "== Step 2: Nearby POI con enrichment =="
-NEARBY=$(curl -s -X POST "$BASE_URL/nearby?max_inserts=25" \
+NEARBY=$(curl -s -X POST "$BASE_URL/nearby?max_inserts=25&docs=excerpt" \
   -H 'content-type: application/json' \
   -d "{\"lat\":$LAT,\"lon\":$LON,\"radius_m\":$RADIUS,\"lang\":\"$LANG\",\"enrich\":true}")
 
 echo "$NEARBY" | jq .
 
-# Prende il primo POI_ID dai documenti Wikipedia con content_text valido
+# Prende il primo POI_ID dai documenti Wikipedia con estratto valido
 POI_ID=$(echo "$NEARBY" | jq -r '
-  .docs[] | select(.source == "wikipedia" and (.content_text != null and .content_text != "")) | .poi_id
+  .docs[] | select(.source == "wikipedia" and (.excerpt != null and .excerpt != "")) | .poi_id
 ' | head -n 1)
 
 if [[ -z "$POI_ID" || "$POI_ID" == "null" ]]; then
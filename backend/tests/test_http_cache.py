@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from bson import ObjectId
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from src.app import conditional_get
+from src.utils import http_cache
+
+TS = datetime(2024, 5, 1, 12, 0, 0, 250000, tzinfo=timezone.utc)
+DOC = {"_id": ObjectId(), "updated_at": TS, "text": "x" * 5000}
+
+
+def _app():
+    app = FastAPI()
+    app.middleware("http")(conditional_get)
+    calls = {"n": 0}
+
+    @app.get("/doc")
+    def doc(request: Request, response: Response):
+        etag = http_cache.etag_for([DOC])
+        lm = http_cache.last_modified_of([DOC])
+        if nm := http_cache.not_modified(request, etag, lm):
+            return nm
+        calls["n"] += 1
+        response.headers.update(http_cache.headers_for(etag, lm))
+        return {"text": DOC["text"]}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    return TestClient(app), calls
+
+
+def test_etag_cambia_con_la_versione():
+    a = http_cache.etag_for([DOC])
+    assert a == http_cache.etag_for([dict(DOC)])
+    assert a != http_cache.etag_for([{**DOC, "updated_at": TS + timedelta(seconds=1)}])
+    assert a != http_cache.etag_for([DOC], "approved")
+    assert a.startswith('"') and a.endswith('"')
+
+
+def test_is_fresh_etag_e_data():
+    etag = http_cache.etag_for([DOC])
+    assert http_cache.is_fresh({"if-none-match": etag}, etag, TS)
+    assert http_cache.is_fresh({"if-none-match": f'"zzz", W/{etag}'}, etag, TS)
+    assert http_cache.is_fresh({"if-none-match": http_cache.variant_etag(etag, "gzip")}, etag, TS)
+    assert not http_cache.is_fresh({"if-none-match": '"zzz"'}, etag, TS)
+    since = format_datetime(TS, usegmt=True)  # secondi interi: i µs non devono contare
+    assert http_cache.is_fresh({"if-modified-since": since}, etag, TS)
+    assert not http_cache.is_fresh({"if-modified-since": format_datetime(TS - timedelta(seconds=5), usegmt=True)}, etag, TS)
+    # If-None-Match prevale su If-Modified-Since
+    assert not http_cache.is_fresh({"if-none-match": '"zzz"', "if-modified-since": since}, etag, TS)
+
+
+def test_pick_encoding():
+    assert http_cache.pick_encoding(None) is None
+    assert http_cache.pick_encoding("gzip;q=0, identity") is None
+    assert http_cache.pick_encoding("gzip, deflate") == "gzip"
+    assert http_cache.pick_encoding("*") in ("br", "gzip")
+
+
+def test_304_senza_ricostruire_il_body():
+    client, calls = _app()
+    r = client.get("/doc", headers={"accept-encoding": "identity"})
+    assert r.status_code == 200 and calls["n"] == 1
+    etag = r.headers["etag"]
+    r2 = client.get("/doc", headers={"if-none-match": etag})
+    assert r2.status_code == 304 and r2.content == b"" and r2.headers["etag"] == etag
+    assert calls["n"] == 1
+    r3 = client.get("/doc", headers={"if-modified-since": r.headers["last-modified"]})
+    assert r3.status_code == 304
+
+
+def test_compressione_gzip_e_soglia():
+    client, _ = _app()
+    r = client.get("/doc", headers={"accept-encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert r.headers["etag"].endswith('-gz"')
+    assert r.json()["text"] == DOC["text"]  # httpx decomprime
+    assert int(r.headers["content-length"]) < 1000
+    # la variante compressa rivalida come quella in chiaro
+    assert client.get("/doc", headers={"if-none-match": r.headers["etag"]}).status_code == 304
+    small = client.get("/small", headers={"accept-encoding": "gzip"})
+    assert "content-encoding" not in small.headers
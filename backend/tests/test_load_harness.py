@@ -0,0 +1,64 @@
+import asyncio
+import httpx
+from src.infra.oidc import JWKSCache, Verifier
+from tests.load.fakes import Fakes, FakesConfig
+from tests.load.report import Recorder, quantile, compare
+
+def _cfg(**over):
+    cfg = FakesConfig(seed=1)
+    for name in ("overpass", "wiki", "openai", "oidc"):
+        getattr(cfg, name).latency_ms = 0
+    for k, v in over.items():
+        cfg.set(f"{k}={v}")
+    return cfg
+
+def test_fakes_are_deterministic_and_configurable():
+    async def go():
+        fakes = await Fakes(_cfg(**{"overpass.size": 7, "wiki.extract_chars": 500})).start()
+        env = fakes.env()
+        try:
+            async with httpx.AsyncClient() as hx:
+                q = {"data": "[out:json];node(around:200,41.9,12.48)[\"name\"];out body;"}
+                a = (await hx.post(env["OVERPASS_URL"], data=q)).json()
+                b = (await hx.post(env["OVERPASS_URL"], data=q)).json()
+                wiki = env["WIKI_API_URL"].format(lang="it")
+                s = (await hx.get(wiki, params={"action": "query", "list": "search", "srsearch": "Colosseo"})).json()
+                e = (await hx.get(wiki, params={"action": "query", "prop": "extracts", "titles": "Colosseo"})).json()
+                c = (await hx.post(env["OPENAI_BASE_URL"] + "/chat/completions",
+                                   json={"model": "m", "messages": [{"role": "user", "content": "ciao"}]})).json()
+                t = (await hx.post(env["OIDC_TOKEN_URL"], data={"code": "x"})).json()
+                # il sync di JWKSCache non deve bloccare il loop che serve i fake
+                v = Verifier(JWKSCache(env["OIDC_ISS"] + "/protocol/openid-connect/certs"), issuer=env["OIDC_ISS"])
+                claims = await asyncio.to_thread(v.verify, t["id_token"])
+        finally:
+            await fakes.stop()
+        assert len(a["elements"]) == 7 and a == b
+        assert s["query"]["search"][0]["title"] == "Colosseo"
+        assert len(next(iter(e["query"]["pages"].values()))["extract"]) == 500
+        assert c["choices"][0]["message"]["content"] and c["usage"]["completion_tokens"] > 0
+        assert t["id_token"].count(".") == 2 and claims["sub"].startswith("user-")
+    asyncio.run(go())
+
+def test_fake_error_rate():
+    async def go():
+        fakes = await Fakes(_cfg(**{"oidc.error_rate": 1.0})).start()
+        try:
+            async with httpx.AsyncClient() as hx:
+                r = await hx.post(fakes.env()["OIDC_TOKEN_URL"], data={"code": "x"})
+        finally:
+            await fakes.stop()
+        assert r.status_code in (429, 503)
+    asyncio.run(go())
+
+def test_report_quantiles_and_compare():
+    assert quantile([1, 2, 3, 4, 5], .5) == 3
+    assert quantile(list(range(101)), .95) == 95
+    rec = Recorder()
+    for ms in range(1, 101):
+        rec.add("POST /v1/nearby", ms, 200 if ms < 100 else 503)
+    s = rec.summary(10.0)["POST /v1/nearby"]
+    assert s["count"] == 100 and s["errors"] == 1 and s["rps"] == 10.0
+    base = {"endpoints": {"POST /v1/nearby": s}}
+    head = {"endpoints": {"POST /v1/nearby": {**s, "p95_ms": s["p95_ms"] * 1.5}}}
+    assert compare(base, base)[1] is False
+    assert compare(base, head, threshold_pct=10)[1] is True
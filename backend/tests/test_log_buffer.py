@@ -0,0 +1,57 @@
+import threading, time
+from src.infra.buffer import BatchBuffer
+
+class FakeSink:
+    def __init__(self, delay=0.0):
+        self.batches = []; self.delay = delay; self.lock = threading.Lock()
+    def insert_many(self, docs, ordered=True):
+        assert ordered is False
+        time.sleep(self.delay)
+        with self.lock:
+            self.batches.append(list(docs))
+    @property
+    def docs(self):
+        return [d for b in self.batches for d in b]
+
+def test_flush_by_size():
+    sink = FakeSink()
+    buf = BatchBuffer(sink, max_batch=5, flush_secs=60, inline=False)
+    assert buf.offer([{"i": i} for i in range(12)])
+    deadline = time.time() + 2
+    while len(sink.docs) < 10 and time.time() < deadline:
+        time.sleep(0.01)
+    assert all(len(b) == 5 for b in sink.batches)
+    buf.close()
+    assert [d["i"] for d in sink.docs] == list(range(12))
+
+def test_flush_by_time():
+    sink = FakeSink()
+    buf = BatchBuffer(sink, max_batch=100, flush_secs=0.05, inline=False)
+    buf.offer([{"i": 1}])
+    deadline = time.time() + 2
+    while not sink.docs and time.time() < deadline:
+        time.sleep(0.01)
+    assert sink.docs == [{"i": 1}]
+    buf.close()
+
+def test_backpressure_when_full():
+    sink = FakeSink(delay=0.5)
+    buf = BatchBuffer(sink, max_batch=2, flush_secs=60, max_size=4, put_timeout=0.01, inline=False)
+    assert buf.offer([{"i": i} for i in range(4)])
+    assert buf.offer([{"i": 9}] * 4, block=False) is False
+    assert buf.dropped == 4
+    buf.close()
+    assert len(sink.docs) == 4
+
+def test_close_flushes_pending():
+    sink = FakeSink()
+    buf = BatchBuffer(sink, max_batch=100, flush_secs=60, inline=False)
+    buf.offer([{"i": 1}, {"i": 2}])
+    buf.close()
+    assert len(sink.docs) == 2 and len(buf) == 0
+
+def test_inline_mode_writes_immediately():
+    sink = FakeSink()
+    buf = BatchBuffer(sink, inline=True)
+    buf.offer([{"i": 1}])
+    assert sink.docs == [{"i": 1}]
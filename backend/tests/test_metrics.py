@@ -0,0 +1,61 @@
+import pytest
+from types import SimpleNamespace
+from src.infra import metrics
+
+def _val(name, **labels):
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0
+
+def test_outbound_records_status_and_errors():
+    before_ok = _val("geoguide_outbound_requests_total", provider="test", status="200")
+    before_err = _val("geoguide_outbound_requests_total", provider="test", status="error")
+    with metrics.outbound("test") as o:
+        o.status = 200
+    with pytest.raises(RuntimeError):
+        with metrics.outbound("test"):
+            raise RuntimeError("boom")
+    assert _val("geoguide_outbound_requests_total", provider="test", status="200") == before_ok + 1
+    assert _val("geoguide_outbound_requests_total", provider="test", status="error") == before_err + 1
+
+def test_mongo_listener_labels_collection():
+    lst = metrics.MongoCommandMetrics()
+    before = _val("geoguide_mongo_commands_total", command="find", outcome="ok")
+    lst.started(SimpleNamespace(command_name="find", command={"find": "pois"}, request_id=1, connection_id=("h", 1)))
+    lst.succeeded(SimpleNamespace(command_name="find", request_id=1, connection_id=("h", 1), duration_micros=1500))
+    assert _val("geoguide_mongo_commands_total", command="find", outcome="ok") == before + 1
+    assert _val("geoguide_mongo_command_duration_seconds_count", command="find", collection="pois") >= 1
+
+def test_cache_and_tokens():
+    metrics.cache_result("search", False)
+    metrics.llm_usage("m", {"prompt_tokens": 10, "completion_tokens": 5})
+    assert _val("geoguide_cache_requests_total", cache="search", result="miss") >= 1
+    assert _val("geoguide_llm_tokens_total", model="m", kind="completion") >= 5
+
+def test_mongo_pool_wait_and_contention():
+    lst, addr = metrics.MongoPoolMetrics(), ("db1", 27017)
+    ev = lambda **kw: SimpleNamespace(address=addr, connection_id=1, **kw)
+    before = _val("geoguide_mongo_pool_wait_seconds_count", address="db1:27017")
+    lst.connection_created(ev())
+    lst.connection_check_out_started(ev())
+    lst.connection_check_out_started(ev())
+    assert _val("geoguide_mongo_pool_waiting", address="db1:27017") == 2
+    lst.connection_checked_out(ev(duration=0.004))
+    lst.connection_check_out_failed(ev(reason="timeout", duration=0.5))
+    assert _val("geoguide_mongo_pool_waiting", address="db1:27017") == 0
+    assert _val("geoguide_mongo_pool_in_use", address="db1:27017") == 1
+    assert _val("geoguide_mongo_pool_wait_seconds_count", address="db1:27017") == before + 2
+    assert _val("geoguide_mongo_pool_checkout_failed_total", address="db1:27017", reason="timeout") >= 1
+    lst.connection_checked_in(ev())
+    lst.connection_closed(ev(reason="idle"))
+    assert _val("geoguide_mongo_pool_in_use", address="db1:27017") == 0
+    assert _val("geoguide_mongo_pool_connections", address="db1:27017") == 0
+
+def test_push_dopo_l_invocazione_lambda(monkeypatch):
+    from fastapi.testclient import TestClient
+    from src import app as app_mod
+    pushes, order = [], []
+    monkeypatch.setattr(metrics, "should_push", lambda: True)
+    monkeypatch.setattr(metrics, "maybe_push", lambda force=False: pushes.append(force) or order.append("push"))
+    TestClient(app_mod.app).get("/v1/health")
+    assert pushes == []                                  # mai dal middleware
+    monkeypatch.setattr(app_mod, "_asgi_handler", lambda e, c: order.append("asgi") or {"statusCode": 200})
+    assert app_mod.handler({}, None) == {"statusCode": 200} and order == ["asgi", "push"]
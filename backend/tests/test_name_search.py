@@ -0,0 +1,75 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.services import name_search
+from src.services.name_search import NameIndex, fold
+from tests.bench import inputs
+
+ROMA = (41.9009, 12.4833)
+MILANO = (45.4642, 9.19)
+
+
+def _idx():
+    idx = NameIndex()
+    idx.upsert("a", {"default": "Sant'Agnese in Agone", "en": "Saint Agnes in Agone"}, 12.4731, 41.8989)
+    idx.upsert("b", {"it": "Basilica di Santa Maria Maggiore", "alias0": "Liberiana"}, 12.4984, 41.8976)
+    idx.upsert("c", {"default": "Santa Maria delle Grazie"}, MILANO[1], MILANO[0])
+    idx.upsert("d", {"default": "Fontana di Trevi"}, 12.4833, 41.9009)
+    return idx
+
+
+def test_fold():
+    assert fold("  Sant'Agnese  in AGONE ") == "sant agnese in agone"
+    assert fold("Città di Castello") == "citta di castello"
+    assert fold("Straße_Nord") == "strasse nord"
+
+
+def test_prefissi_accenti_e_alias():
+    idx = _idx()
+    assert [h["poi_id"] for h in idx.search("sant agn")] == ["a"]
+    assert [h["poi_id"] for h in idx.search("SAINT AG")] == ["a"]
+    assert {h["poi_id"] for h in idx.search("santa mar")} == {"b", "c"}
+    assert idx.search("liber")[0]["poi_id"] == "b"                  # alias
+    assert idx.search("trevi", lang="it")[0]["name"] == "Fontana di Trevi"
+    assert idx.search("t") == []
+
+
+def test_geo_bias_e_refusi():
+    idx = _idx()
+    assert idx.search("santa maria", *MILANO)[0]["poi_id"] == "c"
+    assert idx.search("santa maria", *ROMA)[0]["poi_id"] == "b"
+    assert "distance_m" in idx.search("trevi", *ROMA)[0]
+    assert idx.search("fontana di trevvi")[0]["poi_id"] == "d"        # trigrammi
+
+
+def test_aggiornamenti_incrementali():
+    idx = _idx()
+    idx.upsert("d", {"default": "Fontana della Barcaccia"}, 12.4823, 41.9057)
+    assert idx.search("trevi") == [] and idx.search("barcac")[0]["poi_id"] == "d"
+    idx.remove("d")
+    assert idx.search("barcac") == [] and len(idx) == 3
+
+
+def test_type_ahead_veloce():
+    idx = NameIndex()
+    names = inputs.dense_city_names(20_000, seed=9)
+    for i, (n, (la, lo)) in enumerate(zip(names, inputs.city_points(20_000))):
+        idx.upsert(str(i), {"default": n}, lo, la)
+    lat = []
+    for q in ("ch", "chie", "chiesa di s", "piazza nav", "sant agn", "fontana di tre", "museo", "torre  a"):
+        for _ in range(5):
+            t0 = time.perf_counter()
+            idx.search(q, *ROMA)
+            lat.append(time.perf_counter() - t0)
+    lat.sort()
+    assert lat[int(len(lat) * 0.99) - 1] < 0.05      # margine largo per CI; il valore tipico è nel bench
+
+
+def test_endpoint(monkeypatch):
+    monkeypatch.setattr(name_search, "index", _idx)
+    c = TestClient(app)
+    r = c.get("/v1/poi/search", params={"q": "sant agn", "lat": ROMA[0], "lon": ROMA[1]})
+    assert r.status_code == 200 and r.json()["items"][0]["poi_id"] == "a"
+    assert c.get("/v1/poi/search", params={"q": "trevi", "lat": 41.9}).status_code == 400
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+
+from src.services import narration_service as ns
+
+PID = ObjectId()
+
+
+class FakeCache:
+    """narrations_cache ridotta: _id, $ne/$gte/$exists, sort e i write usati da set_cached."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def _match(self, d, q):
+        for k, cond in q.items():
+            v = d
+            for part in k.split("."):
+                v = v.get(part) if isinstance(v, dict) else None
+            if isinstance(cond, dict):
+                for op, x in cond.items():
+                    if op == "$ne" and v == x or op == "$gte" and (v is None or v < x) \
+                            or op == "$exists" and (v is not None) != x:
+                        return False
+            elif v != cond:
+                return False
+        return True
+
+    def find_one(self, q, sort=None):
+        hits = [d for d in self.docs.values() if self._match(d, q)]
+        for field, direction in reversed(sort or []):
+            hits.sort(key=lambda d: d.get(field) or 0, reverse=direction < 0)
+        return hits[0] if hits else None
+
+    def update_one(self, q, update, upsert=False):
+        d = self.docs.setdefault(q["_id"], {"_id": q["_id"], **update.get("$setOnInsert", {})})
+        d.update(update["$set"])
+        for k in update.get("$unset", {}):
+            d.pop(k, None)
+
+    def delete_many(self, q):
+        for k in [k for k, d in self.docs.items() if self._match(d, q)]:
+            del self.docs[k]
+
+
+def _setup(monkeypatch):
+    cache, calls = FakeCache(), []
+
+    async def fake_llm(prompt, lang, purpose="narration"):
+        calls.append((purpose, len(prompt)))
+        return f"[{lang}] testo"
+
+    monkeypatch.setattr(ns, "narrations_cache", cache)
+    monkeypatch.setattr(ns, "_narrations_read", FakeCache())      # secondario sempre indietro: legge il primario
+    monkeypatch.setattr(ns, "OPENAI_API_KEY", "k")
+    monkeypatch.setattr(ns, "_call_openai", fake_llm)
+    monkeypatch.setattr(ns, "_read_docs", lambda pid: ("Testo lungo di Wikipedia " * 400,
+                                                       [{"name": "wikipedia", "url": "https://it.wikipedia.org/wiki/X",
+                                                         "lang": "it"}]))
+    return cache, calls
+
+
+def test_derivata_da_altra_lingua(monkeypatch):
+    cache, calls = _setup(monkeypatch)
+    poi = {"_id": PID, "name": {"it": "Colosseo"}}
+    full = asyncio.run(ns.generate(poi, "it", "guide"))
+    assert full["derived"] is False and calls[-1][0] == "narration"
+
+    out = asyncio.run(ns.generate(poi, "en", "guide"))
+    assert out == {"from_cache": False, "derived": True, "text": "[en] testo"}
+    assert calls[-1][0] == "derive" and calls[-1][1] < calls[0][1]         # prompt molto più corto
+    doc = cache.docs[f"{PID}:en:guide"]
+    assert doc["derived_from"]["lang"] == "it" and doc["confidence"] < 0.85
+    assert doc["sources"][0]["url"] == "https://it.wikipedia.org/wiki/X"
+    assert doc["sources"][-1] == {"name": "narration", "lang": "it", "derived": True}
+    assert doc["stats"]["prompt_chars"] < cache.docs[f"{PID}:it:guide"]["stats"]["prompt_chars"]
+
+    # in cache ma marcata come derivata; mai derivare da una derivata
+    assert asyncio.run(ns.generate(poi, "en", "guide"))["derived"] is True
+    asyncio.run(ns.generate(poi, "fr", "guide"))
+    assert cache.docs[f"{PID}:fr:guide"]["derived_from"]["lang"] == "it"
+
+
+def test_rigenerazione_invalida_le_derivate(monkeypatch):
+    cache, calls = _setup(monkeypatch)
+    poi = {"_id": PID, "name": {"it": "Colosseo"}}
+    asyncio.run(ns.generate(poi, "it", "guide"))
+    asyncio.run(ns.generate(poi, "en", "guide"))
+    asyncio.run(ns.generate(poi, "it", "guide", cache=False))                 # nuova narrazione completa
+    assert f"{PID}:en:guide" not in cache.docs
+
+
+def test_senza_sorgente_affidabile_generazione_completa(monkeypatch):
+    cache, calls = _setup(monkeypatch)
+    cache.docs["x"] = {"_id": "x", "poi_id": PID, "lang": "it", "style": "guide", "text": "t",
+                       "confidence": 0.6, "updated_at": datetime(2026, 1, 1)}
+    out = asyncio.run(ns.generate({"_id": PID, "name": {}}, "en", "guide"))
+    assert out["derived"] is False and [c[0] for c in calls] == ["narration"]
+    monkeypatch.setattr(ns, "flag", lambda name, default=None: False if name == "narration_derive" else default)
+    asyncio.run(ns.generate({"_id": PID, "name": {}}, "de", "guide"))
+    assert [c[0] for c in calls] == ["narration", "narration"]
@@ -0,0 +1,123 @@
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from src.infra import oidc
+from src.models import user as user_model
+
+ISS = "https://idp.example.test/realms/geo"
+
+
+def _key(kid):
+    k = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = k.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    pub = k.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return pem, {**jwk.construct(pub, "RS256").to_dict(), "kid": kid}
+
+
+K1, K2 = _key("k1"), _key("k2")
+
+
+def _token(key=K1, **claims):
+    now = int(time.time())
+    body = {"iss": ISS, "sub": "u1", "email": "u1@example.test", "iat": now, "exp": now + 600, **claims}
+    return jwt.encode(body, key[0], algorithm="RS256", headers={"kid": key[1]["kid"]})
+
+
+class FakeJWKS(oidc.JWKSCache):
+    def __init__(self, keys, **kw):
+        super().__init__("http://idp/certs", **kw)
+        self.published = keys
+        self.fetches = 0
+
+    def _fetch(self):
+        self.fetches += 1
+        return {k["kid"]: k for k in self.published}
+
+
+def test_verifica_e_cache_claims():
+    jwks = FakeJWKS([K1[1]])
+    v = oidc.Verifier(jwks, issuer=ISS)
+    tok = _token()
+    assert v.verify(tok)["sub"] == "u1"
+    assert v.verify(tok)["sub"] == "u1" and jwks.fetches == 1 and len(v.cache) == 1
+    with pytest.raises(oidc.TokenError):
+        v.verify(_token(iss="https://evil.example"))
+    with pytest.raises(oidc.TokenError):
+        v.verify(tok[:-4] + "AAAA")                     # firma manomessa
+    with pytest.raises(oidc.TokenError):
+        v.verify(_token(exp=int(time.time()) - 5))
+
+
+def test_rotazione_kid_e_limite_refresh():
+    jwks = FakeJWKS([K1[1]], min_refresh=0)
+    v = oidc.Verifier(jwks, issuer=ISS)
+    v.verify(_token())
+    jwks.published = [K1[1], K2[1]]                      # l'IdP ruota le chiavi
+    assert v.verify(_token(K2, sub="u2"))["sub"] == "u2" and jwks.fetches == 2
+    jwks.min_refresh = 60
+    for _ in range(5):                                   # kid inventati: niente refresh a raffica
+        with pytest.raises(oidc.TokenError):
+            v.verify(_token(_key("zz"), sub=f"x{_}"))
+    assert jwks.fetches == 2
+
+
+def test_claims_cache_scade_con_exp():
+    c = oidc.ClaimsCache(maxsize=2)
+    now = time.time()
+    c.put("a", {"exp": now + 10}); c.put("b", {"exp": now + 10}); c.put("c", {"exp": now + 10})
+    assert c.get("a") is None and c.get("c") is not None   # LRU
+    assert c.get("b", now=now + 11) is None
+
+
+class FakeBuffer:
+    def __init__(self):
+        self.docs = []
+
+    def offer(self, docs, block=True):
+        self.docs.extend(docs)
+        return True
+
+
+def test_user_sync_scrive_solo_se_cambia():
+    buf = FakeBuffer()
+    sync = user_model.UserSync(buf)
+    claims = {"sub": "u1", "email": "a@x", "name": "A", "exp": 1}
+    assert sync.sync(claims) is True
+    assert sync.sync({**claims, "exp": 2, "iat": 3}) is False          # claims non di profilo: niente scrittura
+    assert sync.sync({**claims, "name": "A B"}) is True
+    assert [d["name"] for d in buf.docs] == ["A", "A B"] and sync.skipped == 1
+
+
+def test_sink_deduplica_per_sub(monkeypatch):
+    from datetime import datetime, timezone
+    ops = []
+    class FakeUsers:
+        def bulk_write(self, o, ordered=False):
+            ops.extend(o)
+    monkeypatch.setattr(user_model, "users", FakeUsers())
+    now = datetime.now(timezone.utc)
+    user_model._Sink().insert_many([{"sub": "u1", "name": "A", "_queued_at": now},
+                                    {"sub": "u1", "name": "B", "_queued_at": now},
+                                    {"sub": "u2", "name": "C", "_queued_at": now}])
+    assert len(ops) == 2
+    assert ops[0]._doc["$set"]["name"] == "B"
+
+
+def test_me_usa_il_verifier(monkeypatch):
+    from fastapi.testclient import TestClient
+    from src.app import app
+    buf = FakeBuffer()
+    monkeypatch.setattr(oidc, "_verifier", oidc.Verifier(FakeJWKS([K1[1]]), issuer=ISS))
+    monkeypatch.setattr(user_model, "_sync", user_model.UserSync(buf))
+    c = TestClient(app)
+    tok = _token()
+    assert c.get("/v1/auth/me").status_code == 401
+    assert c.get("/v1/auth/me", headers={"authorization": "Bearer nope"}).status_code == 401
+    for _ in range(3):
+        r = c.get("/v1/auth/me", headers={"authorization": f"Bearer {tok}"})
+        assert r.status_code == 200 and r.json()["sub"] == "u1"
+    assert len(buf.docs) == 1
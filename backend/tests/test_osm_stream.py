@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+from src.services import osm_service
+from src.services.overpass import OverpassPool, OverpassUnavailable
+from src.utils.jsonstream import ElementStream, StreamError
+
+ELEMENTS = [
+    {"type": "node", "id": 11, "lat": 41.8902, "lon": 12.4922, "tags": {"name": "Colosseo", "historic": "monument"}},
+    {"type": "node", "id": 12, "lat": 41.9, "lon": 12.5, "tags": {"tourism": "artwork"}},           # senza nome
+    {"type": "way", "id": 21, "center": {"lat": 41.8986, "lon": 12.4769},
+     "tags": {"name": "Pantheon", "wikidata": "Q99309", "historic": "building"}},
+    {"type": "relation", "id": 31, "center": {"lat": 41.9029, "lon": 12.4534}, "tags": {"name": "Città ☀ Vaticano"}},
+]
+BODY = json.dumps({"version": 0.6, "generator": "stand-in", "osm3s": {"copyright": "ODbL"},
+                   "elements": ELEMENTS, "remark": "runtime error: timed out"}, ensure_ascii=False).encode()
+
+
+def test_element_stream_a_pezzi():
+    for size in (1, 7, 64, len(BODY)):
+        s, out = ElementStream(), []
+        for i in range(0, len(BODY), size):
+            out += s.feed(BODY[i:i + size])            # anche multibyte spezzati
+        assert out == ELEMENTS
+        assert s.close() == {"remark": "runtime error: timed out"}
+
+
+def test_element_stream_troncato():
+    s = ElementStream()
+    assert s.feed(BODY[:len(BODY) // 2])
+    with pytest.raises(StreamError):
+        s.close()
+
+
+def test_profilo_e_query():
+    q = osm_service.build_query(osm_service.PROFILES["historic"], 41.9, 12.5, 300, timeout=20)
+    assert q.startswith("[out:json][timeout:20];")
+    assert 'way(around:300,41.9,12.5)["historic"]["name"];' in q
+    assert "out tags center qt;" in q and "out body" not in q
+    legacy = osm_service.build_query(osm_service.PROFILES["all_named"], 41.9, 12.5, 200)
+    assert "way" not in legacy and "center" not in legacy
+
+
+def test_to_poi():
+    pois = [osm_service.to_poi(e) for e in ELEMENTS]
+    assert pois[1] is None
+    assert pois[0]["provider_id"] == "11" and pois[0]["osm_type"] == "node"
+    assert pois[2]["provider_id"] == "way/21" and (pois[2]["lat"], pois[2]["lon"]) == (41.8986, 12.4769)
+    assert pois[2]["wikidata"] == "Q99309"
+
+
+def test_stream_da_mirror_locale(monkeypatch):
+    gate = asyncio.Event()
+    seen = []
+
+    async def interpreter(req):
+        resp = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await resp.prepare(req)
+        cut = BODY.index(b'{"type": "way"')
+        await resp.write(BODY[:cut])
+        await gate.wait()                              # il resto arriva solo dopo il primo POI
+        await resp.write(BODY[cut:])
+        return resp
+
+    async def go():
+        app = web.Application()
+        app.router.add_post("/api/interpreter", interpreter)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/api/interpreter"
+        monkeypatch.setattr(osm_service, "pool", lambda: OverpassPool([url]))
+        try:
+            # remark "runtime error": i POI arrivano, ma la risposta è segnalata come parziale
+            with pytest.raises(OverpassUnavailable, match="timed out"):
+                async for p in osm_service.stream_osm_pois(41.9, 12.5, 300, profile="tourism"):
+                    seen.append(p["name"])
+                    gate.set()
+        finally:
+            await runner.cleanup()
+    asyncio.run(go())
+    assert seen == ["Colosseo", "Pantheon", "Città ☀ Vaticano"]
+
+
+def test_slot_overpass_solo_per_la_lettura(monkeypatch):
+    from contextlib import aclosing
+    from src.infra import admission
+    closed = []
+
+    class Pool:
+        def __init__(self, hang=False):
+            self.hang = hang
+
+        async def stream(self, query):
+            try:
+                for el in ELEMENTS:
+                    yield el
+                if self.hang:
+                    await asyncio.Event().wait()
+            finally:
+                closed.append(True)
+
+    lim = admission.AdaptiveLimit("overpass", initial=4, slow_secs=0.05)
+    monkeypatch.setattr(admission, "_limits", {"overpass": lim})
+
+    async def slow_consumer():
+        monkeypatch.setattr(osm_service, "pool", lambda: Pool())
+        out = []
+        async for p in osm_service.stream_osm_pois(41.9, 12.5, 300):
+            await asyncio.sleep(0.05)                   # scritture Mongo del chiamante
+            out.append(p["name"])
+            assert lim.inflight == 0                    # slot già restituito
+        return out
+
+    async def early_stop():
+        monkeypatch.setattr(osm_service, "pool", lambda: Pool(hang=True))
+        async with aclosing(osm_service.stream_osm_pois(41.9, 12.5, 300)) as it:
+            async for p in it:
+                break
+        return lim.inflight
+
+    assert asyncio.run(slow_consumer()) == ["Colosseo", "Pantheon", "Città ☀ Vaticano"]
+    assert lim.limit > 4                                # il consumatore lento non conta come congestione
+    assert asyncio.run(early_stop()) == 0 and closed == [True, True]
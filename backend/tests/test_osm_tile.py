@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from src.models import osm_tile
+from src.utils import tiles
+
+T0 = datetime(2026, 5, 1)
+GRACE = timedelta(days=14)
+
+
+def test_tile_of_e_covered():
+    x, y = tiles.tile_of(18, 12.4922, 41.8902)
+    assert tiles.contains(18, x, y, 12.4922, 41.8902)
+    cov = tiles.covered(18, 41.8902, 12.4922, 200)
+    assert cov and all(tiles._dist_m(41.8902, 12.4922, la, lo) <= 200
+                       for cx, cy in cov for lo, la in tiles.polygon(18, cx, cy)["coordinates"][0])
+    assert tiles.covered(18, 41.8902, 12.4922, 20) == []         # raggio più piccolo di una tile
+
+
+def test_diff_tocca_solo_i_cambiamenti():
+    base = {"members": {"1": "a", "2": "b", "3": "c"}, "gone": {}, "version": 0}
+    p = osm_tile.diff(base, {"1": "a", "2": "b", "3": "c"}, T0, GRACE)
+    assert (p.revive, p.tombstone, p.deactivate) == ([], [], [])
+    assert p.snapshot["version"] == 1                             # prima volta: lo snapshot si salva
+
+    snap = p.snapshot
+    assert osm_tile.diff(snap, {"1": "a", "2": "b", "3": "c"}, T0, GRACE).snapshot is None
+
+    p = osm_tile.diff(snap, {"1": "a", "3": "c", "4": "d"}, T0 + timedelta(days=1), GRACE)
+    assert p.revive == ["d"] and p.tombstone == ["b"] and p.deactivate == []
+    assert p.snapshot["gone"] == {"2": ["b", T0 + timedelta(days=1)]} and p.snapshot["version"] == 2
+
+
+def test_tombstone_grace_e_ricomparsa():
+    snap = {"members": {"1": "a"}, "gone": {"2": ["b", T0]}, "version": 3}
+    p = osm_tile.diff(snap, {"1": "a"}, T0 + timedelta(days=3), GRACE)
+    assert p.snapshot is None                                     # ancora nel grace: niente scritture
+    p = osm_tile.diff(snap, {"1": "a", "2": "b"}, T0 + timedelta(days=3), GRACE)
+    assert p.revive == ["b"] and p.snapshot["gone"] == {}
+    p = osm_tile.diff(snap, {"1": "a"}, T0 + GRACE, GRACE)
+    assert p.deactivate == ["b"] and p.snapshot["gone"] == {}
+
+
+def test_poi_scartati_dal_dedup_restano():
+    snap = {"members": {"1": "a", "2": "b"}, "gone": {}, "version": 1}
+    p = osm_tile.diff(snap, {"1": "a", "2": None, "3": None}, T0, GRACE)   # 2 e 3 ancora in OSM, non salvati
+    assert (p.revive, p.tombstone) == ([], []) and p.snapshot is None
+    p = osm_tile.diff({**snap, "gone": {"2": ["b", T0]}}, {"2": None}, T0, GRACE)
+    assert p.revive == ["b"] and p.snapshot["members"] == {"2": "b"} and p.tombstone == ["a"]
+
+
+def test_baseline_una_query_per_il_bbox(monkeypatch):
+    cov = tiles.covered(18, 41.8902, 12.4922, 400)
+    inside = [{"_id": f"p{i}", "provider_id": str(i),
+               "location": {"coordinates": [(tiles.bounds(18, x, y)[0] + tiles.bounds(18, x, y)[2]) / 2,
+                                            (tiles.bounds(18, x, y)[1] + tiles.bounds(18, x, y)[3]) / 2]}}
+              for i, (x, y) in enumerate((cov[0], cov[-1]))]
+    queries, writes = [], []
+
+    class Coll:
+        def find(self, q, proj=None):
+            queries.append(q)
+            return [] if "_id" in q else inside
+        def update_many(self, *a):
+            pass
+        def bulk_write(self, ops, ordered=True):
+            writes.extend(ops)
+
+    monkeypatch.setattr(osm_tile, "pois", Coll())
+    monkeypatch.setattr(osm_tile, "osm_tiles", Coll())
+    st = osm_tile.reconcile("tourism", 18, cov, [], T0, GRACE)
+    assert len(queries) == 2 and len(writes) == len(cov)             # snapshot + un solo $geoWithin
+    assert st["tombstoned"] == 2
+    assert tiles.bbox_size(18, 41.8902, 12.4922, 50_000) > 100_000 > len(cov)
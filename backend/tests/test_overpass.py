@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+from prometheus_client import REGISTRY
+
+from src.services import overpass
+from src.services.overpass import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, OverpassPool
+
+
+class Clock:
+    t = 0.0
+    def __call__(self):
+        return self.t
+
+
+class StandIn:
+    """Overpass locale: risponde dopo `delay` secondi con `status`."""
+
+    def __init__(self, name: str, delay: float = 0.0, status: int = 200):
+        self.name, self.delay, self.status = name, delay, status
+        self.hits = 0
+
+    async def start(self):
+        async def interpreter(req):
+            self.hits += 1
+            await asyncio.sleep(self.delay)
+            if self.status != 200:
+                return web.Response(status=self.status, text="busy")
+            el = {"type": "node", "id": 1, "lat": 41.9, "lon": 12.5, "tags": {"name": self.name}}
+            return web.json_response({"generator": "stand-in", "elements": [el]})
+        app = web.Application()
+        app.router.add_post("/api/interpreter", interpreter)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/api/interpreter"
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def _src(data):
+    return data["elements"][0]["tags"]["name"]
+
+
+def _run(servers, body):
+    async def go():
+        for s in servers:
+            await s.start()
+        try:
+            return await body()
+        finally:
+            for s in servers:
+                await s.stop()
+    return asyncio.run(go())
+
+
+def test_breaker_half_open_una_sola_prova():
+    clk = Clock()
+    b = CircuitBreaker(failures=2, cooldown=10, clock=clk)
+    b.failure(); assert b.state == CLOSED
+    b.failure(); assert b.state == OPEN and not b.allow()
+    clk.t = 10
+    assert b.available() and b.allow() and b.state == HALF_OPEN
+    assert not b.allow()                          # la prova è già in corso
+    b.failure(); assert b.state == OPEN           # prova fallita: riapre subito
+    clk.t = 20
+    assert b.allow(); b.success()
+    assert b.state == CLOSED and b.allow()
+
+
+def test_hedge_vince_il_mirror_veloce_e_il_lento_viene_cancellato():
+    slow, fast = StandIn("slow", delay=2.0), StandIn("fast")
+
+    def count(mirror, outcome):
+        return REGISTRY.get_sample_value("geoguide_overpass_attempts_total",
+                                         {"mirror": mirror, "outcome": outcome}) or 0
+
+    async def body():
+        p = OverpassPool([slow.url, fast.url], hedge_default=0.1)
+        before = count(p.mirrors[0].name, "cancelled")
+        t0 = time.perf_counter()
+        data = await p.query("[out:json];")
+        return p, data, time.perf_counter() - t0, count(p.mirrors[0].name, "cancelled") - before
+    p, data, took, cancelled = _run([slow, fast], body)
+    assert _src(data) == "fast" and took < 1.0      # non si aspetta il perdente
+    assert slow.hits == 1 and fast.hits == 1 and cancelled == 1
+    assert p.mirrors[0].breaker.state == CLOSED             # cancellato non vuol dire guasto
+
+
+def test_errore_veloce_fa_failover_e_apre_il_breaker():
+    bad, good = StandIn("bad", status=429), StandIn("good")
+
+    async def body():
+        p = OverpassPool([bad.url, good.url], failures=2, hedge_default=5.0)
+        out = [await p.query("q") for _ in range(3)]
+        return p, out
+    p, out = _run([bad, good], body)
+    assert all(_src(d) == "good" for d in out)
+    assert bad.hits == 2                                # poi il breaker lo esclude
+    assert p.mirrors[0].breaker.state == OPEN
+    assert p.ranked()[0] is p.mirrors[1]
+
+
+def test_failover_riparte_l_hedge_dal_nuovo_primario():
+    bad, mid, spare = StandIn("bad", delay=0.3, status=503), StandIn("mid", delay=0.4), StandIn("spare")
+
+    def hedges(outcome):
+        return REGISTRY.get_sample_value("geoguide_overpass_hedges_total", {"outcome": outcome}) or 0
+
+    async def body():
+        p = OverpassPool([bad.url, mid.url, spare.url], hedge_min=0.1)
+        for m, v in zip(p.mirrors, (0.5, 1.0, 2.0)):      # hedge: bad a 0.5 s, mid a 1 s
+            for _ in range(10):
+                m.ok(v)
+        before = hedges("launched")
+        data = await p.query("q")
+        return data, hedges("launched") - before
+    data, launched = _run([bad, mid, spare], body)
+    assert _src(data) == "mid" and launched == 0        # niente hedge sul p90 di bad
+    assert bad.hits == 1 and spare.hits == 0
+
+
+def test_tutti_giu():
+    a, b = StandIn("a", status=504), StandIn("b", status=503)
+
+    async def body():
+        p = OverpassPool([a.url, b.url], failures=1)
+        with pytest.raises(overpass.OverpassUnavailable):
+            await p.query("q")
+        with pytest.raises(overpass.OverpassUnavailable, match="open"):
+            await p.query("q")
+    _run([a, b], body)
+
+
+def test_hedge_delay_dal_p90():
+    p = OverpassPool(["http://x/api"], hedge_min=0.2, hedge_max=2.0, hedge_default=1.5)
+    m = p.mirrors[0]
+    assert p.hedge_delay(m) == 1.5                      # pochi campioni: default
+    for v in (0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.8):
+        m.ok(v)
+    assert p.hedge_delay(m) == pytest.approx(0.8)
+    for _ in range(50):
+        m.ok(0.01)
+    assert p.hedge_delay(m) == 0.2
+
+
+def test_urls_da_settings_o_env(monkeypatch):
+    class S:
+        OVERPASS_URLS = " http://a/api , http://b/api "
+    assert overpass.urls_from(S) == ["http://a/api", "http://b/api"]
+    S.OVERPASS_URLS = ""
+    monkeypatch.setenv("OVERPASS_URL", "http://fake/api")
+    assert overpass.urls_from(S) == ["http://fake/api"]
+    monkeypatch.delenv("OVERPASS_URL")
+    assert overpass.urls_from(S) == list(overpass.DEFAULT_URLS)
@@ -9,4 +9,8 @@ def test_nearby_empty(client, clean_pois):
 
 def test_get_poi_not_found(client):
     r = client.get(f"/v1/poi/{ObjectId()}")
-    assert r.status_code == 404
\ No newline at end of file
+    assert r.status_code == 404
+
+def test_nearby_radius_non_numerico(client):
+    r = client.post("/v1/nearby", json={"lat": 41.9, "lon": 12.5, "radius": "tutto"})
+    assert r.status_code == 400
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from bson import ObjectId
+
+from src.utils import poipack
+from tests.bench import inputs
+
+
+def test_roundtrip_nearby():
+    items = inputs.nearby_items(200)
+    rows = poipack.from_nearby(items)
+    out = poipack.decode(poipack.encode(rows))
+    assert [r["id"] for r in out] == [it["poi_id"] for it in items]
+    assert [r["name"] for r in out] == [it["name"] for it in items]
+    for r, it in zip(out, items):
+        assert r["lon"] == pytest.approx(it["coords"][0], abs=1e-6)
+        assert r["lat"] == pytest.approx(it["coords"][1], abs=1e-6)
+        assert bool(r["flags"] & poipack.FLAG_WIKIPEDIA) == bool(it["wiki_title"])
+
+
+def test_from_docs_e_casi_limite():
+    oid = ObjectId()
+    docs = [{"_id": oid, "name": {"it": "Città", "en": "City"}, "location": {"coordinates": [-179.999999, -85.05]},
+             "wikidata_qid": "Q1"},
+            {"_id": ObjectId(), "name": {"en": "Only en"}, "location": {"coordinates": [179.999999, 85.05]},
+             "wikipedia": {"it": "X"}}]
+    out = poipack.decode(poipack.encode(poipack.from_docs(docs, "it")))
+    assert out[0]["id"] == str(oid) and out[0]["name"] == "Città" and out[1]["name"] == "Only en"
+    assert out[0]["flags"] == poipack.FLAG_WIKIDATA and out[1]["flags"] == poipack.FLAG_WIKIPEDIA
+    assert out[1]["lon"] == pytest.approx(179.999999) and out[0]["lat"] == pytest.approx(-85.05)
+    assert poipack.decode(poipack.encode([])) == []
+
+
+def test_tabella_nomi_e_dimensione():
+    items = inputs.nearby_items(500)
+    packed = poipack.encode(poipack.from_nearby(items))
+    as_json = json.dumps({"items": items}).encode()
+    assert len(packed) < len(as_json) / 3
+    same = [dict(it, name="Fontana di Trevi") for it in items[:50]]
+    once = poipack.encode(poipack.from_nearby(same))
+    assert once.count("Fontana di Trevi".encode()) == 1
+
+
+def test_input_corrotto():
+    buf = poipack.encode(poipack.from_nearby(inputs.nearby_items(5)))
+    for bad in (b"XXX" + buf[3:], buf[:3] + b"\x09" + buf[4:], buf[:-1], buf + b"\x00", buf[:20]):
+        with pytest.raises(poipack.PackError):
+            poipack.decode(bad)
+    with pytest.raises(poipack.PackError):
+        poipack.encode([{"id": "abc", "name": "x", "lon": 0, "lat": 0}])
+
+
+def test_wants():
+    assert poipack.wants("application/vnd.geoguide.poipack, application/json;q=0.5")
+    assert not poipack.wants("application/json") and not poipack.wants(None)
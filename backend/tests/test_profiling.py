@@ -0,0 +1,119 @@
+import time
+from src.infra import profiling
+
+def _busy(ms):
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+def test_signed_header_roundtrip():
+    tok = profiling.sign(secret="s3cret")
+    assert profiling.verify(tok, secret="s3cret")
+    assert not profiling.verify(tok, secret="other")
+    assert not profiling.verify(tok.replace(".", ".0"), secret="s3cret")
+    old = profiling.sign(ts=int(time.time()) - 3600, secret="s3cret")
+    assert not profiling.verify(old, secret="s3cret")
+
+def test_profile_collects_samples_and_spans():
+    p = profiling.Profile("rid-1", interval_ms=1)
+    tok = profiling.activate(p)
+    p.start()
+    try:
+        with profiling.span("work", cat="cpu"):
+            _busy(60)
+    finally:
+        p.stop()
+        profiling.deactivate(tok)
+    assert p.samples and any("_busy" in f for _, _, st in p.samples for f in st)
+    trace = p.to_chrome_trace()
+    names = {e["name"] for e in trace["traceEvents"]}
+    assert "work" in names
+    assert any(e["cat"] == "sample" and "_busy" in e["name"] for e in trace["traceEvents"] if e["ph"] == "X")
+
+def test_span_is_noop_without_profile():
+    with profiling.span("nothing"):
+        pass
+    assert profiling.current() is None
+
+def test_sampled_campiona_il_thread_dell_handler():
+    import threading
+    p = profiling.Profile("rid-2", interval_ms=1)
+    tok = profiling.activate(p)
+    p.start(sample=False)                      # come il middleware: nessun thread finché non se ne aggancia uno
+    try:
+        _busy(30)
+        assert not p.samples
+        handler = profiling.sampled(lambda: _busy(60))
+        t = threading.Thread(target=__import__("contextvars").copy_context().run, args=(handler,))
+        t.start(); t.join()
+    finally:
+        p.stop()
+        profiling.deactivate(tok)
+    assert any("_busy" in " ".join(st) for _, _, st in p.samples)
+    assert not any("test_sampled" in " ".join(st) for _, _, st in p.samples)   # mai il thread della richiesta
+    assert p._threads == {}
+
+def _altra_richiesta(ms):
+    _busy(ms)
+
+def test_handler_async_e_job_nei_pool():
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from src.infra import aio
+
+    async def handler():
+        for _ in range(4):
+            _busy(15)                          # codice dell'handler sul loop
+            await asyncio.sleep(0.015)         # intanto il loop serve un'altra richiesta
+        await aio.run(_busy, 40)               # job nel pool Mongo
+        await profiling.run_in_threadpool(_busy, 40)   # job nel threadpool di Starlette
+
+    async def altra():
+        for _ in range(8):
+            _altra_richiesta(10)
+            await asyncio.sleep(0.005)
+
+    async def main():
+        p = profiling.Profile("rid-3", interval_ms=1)
+        tok = profiling.activate(p)
+        p.start(sample=False)
+        try:
+            await asyncio.gather(profiling.sampled(handler)(), asyncio.create_task(altra(), context=__import__("contextvars").Context()))
+        finally:
+            p.stop()
+            profiling.deactivate(tok)
+        return p
+
+    old, aio._executor = aio._executor, ThreadPoolExecutor(max_workers=1, thread_name_prefix="mongo")
+    try:
+        p = asyncio.run(main())
+    finally:
+        aio._executor = old
+    loop = [st for _, tid, st in p.samples if p._names[tid] == "MainThread"]
+    pool = [st for _, tid, st in p.samples if p._names[tid].startswith("mongo")]
+    assert loop and all(st[1].startswith("handler") for st in loop)      # dal wrapper dell'handler in giù
+    assert not any("_altra_richiesta" in " ".join(st) for _, _, st in p.samples)
+    workers = [st for _, tid, st in p.samples if p._names[tid].startswith("AnyIO")]
+    assert any("_busy" in " ".join(st) for st in pool) and any("_busy" in " ".join(st) for st in workers)
+    tracks = {e["args"]["name"] for e in p.to_chrome_trace()["traceEvents"] if e["name"] == "thread_name"}
+    assert {"samples MainThread", "samples mongo_0"} <= tracks
+
+def test_sampled_route_una_sola_volta():
+    from fastapi import APIRouter, FastAPI
+    from fastapi.testclient import TestClient
+    r = APIRouter(route_class=profiling.SampledRoute)
+
+    @r.get("/a/{x}")
+    async def a(x: int, q: str = "d"):
+        return {"x": x, "q": q}
+
+    @r.get("/s")
+    def s():
+        return {"ok": True}
+
+    app = FastAPI()
+    app.include_router(r, prefix="/v1")
+    routes = {rt.path: rt for rt in app.routes if hasattr(rt, "endpoint")}
+    assert routes["/v1/a/{x}"].endpoint.__wrapped__ is a               # avvolto una volta sola
+    c = TestClient(app)
+    assert c.get("/v1/a/3?q=z").json() == {"x": 3, "q": "z"} and c.get("/v1/s").json() == {"ok": True}
@@ -0,0 +1,44 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from src.utils import jsonresp
+from src.utils.projection import POI_DEFAULT, doc_projection, poi_projection
+
+
+def test_poi_projection_default_e_campi():
+    assert set(poi_projection(None)) == set(POI_DEFAULT)
+    assert poi_projection("name, location") == {"name": 1, "location": 1, "_id": 1}
+    assert poi_projection("name.default") == {"name.default": 1, "_id": 1}
+
+
+def test_poi_projection_campo_sconosciuto():
+    with pytest.raises(HTTPException) as e:
+        poi_projection("name,password")
+    assert e.value.status_code == 400
+
+
+def test_doc_projection_modi():
+    assert doc_projection("none") is None
+    meta = doc_projection("meta")
+    assert "content_text" not in meta and meta["meta.title"] == 1
+    exc = doc_projection("excerpt", 120)
+    assert exc["excerpt"]["$substrCP"][2] == 120
+    assert doc_projection("full") == {"_id": 0}
+    with pytest.raises(HTTPException):
+        doc_projection("tutto")
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_tipi_mongo(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(jsonresp, "orjson", None)
+    elif jsonresp.orjson is None:
+        pytest.skip("orjson non installato")
+    oid = ObjectId()
+    ts = datetime(2024, 5, 1, 12, 30)
+    out = json.loads(jsonresp.dumps({"_id": oid, "ts": ts, "langs": ("it", "en"), "name": "Città"}))
+    assert out == {"_id": str(oid), "ts": "2024-05-01T12:30:00", "langs": ["it", "en"], "name": "Città"}
@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from src.infra import admission
+from src.infra.settings import Settings
+from src.models import usage_log
+from src.services import refresher
+from src.utils import tiles
+
+NOW = datetime(2026, 5, 1, 12, 0, 0)
+S = Settings(REFRESH_MIN_DEMAND=2.0, REFRESH_MIN_AGE_HOURS=24, REFRESH_OVERPASS_PER_RUN=2,
+             REFRESH_WIKI_PER_RUN=10, REFRESH_RETRY_SECS=1800, REFRESH_DEMAND_HALF_LIFE_HOURS=6)
+Z = S.REFRESH_TILE_ZOOM
+PANTHEON, DUOMO, BRERA = (41.8986, 12.4769), (45.4642, 9.1900), (45.4719, 9.1881)
+
+
+def xy(p):
+    return tiles.tile_of(Z, p[1], p[0])
+
+
+def rows(p, n, hours_ago=0):
+    return {"p": usage_log.latlon_q50m(*p), "hour": NOW - timedelta(hours=hours_ago), "n": n}
+
+
+def test_q50m_e_domanda_con_decadimento():
+    assert usage_log.parse_latlon(usage_log.latlon_q50m(*PANTHEON)) == (41.8985, 12.477)
+    assert usage_log.parse_latlon("boh") is None and usage_log.parse_latlon("95,0") is None
+    d = refresher.tile_demand([rows(PANTHEON, 8), rows(PANTHEON, 8, hours_ago=6), rows(DUOMO, 4, hours_ago=12),
+                               {"p": "rotto", "hour": NOW, "n": 99}], Z, NOW, 6)
+    assert d == {xy(PANTHEON): 12.0, xy(DUOMO): 1.0}
+
+
+def test_priorita_domanda_per_eta():
+    fresh = {"refreshed_at": NOW - timedelta(hours=3)}
+    old = {"refreshed_at": NOW - timedelta(days=4)}
+    assert refresher.priority(50, fresh, NOW, S) == 0                        # appena rinfrescata
+    assert refresher.priority(1, {}, NOW, S) == 0                            # domanda sotto soglia
+    assert refresher.priority(5, {}, NOW, S) > refresher.priority(5, old, NOW, S) > 0
+    assert refresher.priority(20, old, NOW, S) > refresher.priority(5, old, NOW, S)
+    failed = {**old, "failures": 2, "failed_at": NOW - timedelta(minutes=45)}
+    assert refresher.priority(20, failed, NOW, S) == 0                       # backoff: 2 x 30 min
+    assert refresher.priority(20, {**failed, "failed_at": NOW - timedelta(hours=2)}, NOW, S) > 0
+    order = refresher.plan({"a": 5, "b": 20, "c": 30}, {"a": old, "b": old, "c": fresh}, NOW, S)
+    assert order == ["b", "a"]
+
+
+class Tiles:
+    """area_tile in memoria."""
+
+    def __init__(self, states=None):
+        self.states = states or {}
+        self.leased, self.results, self.released = set(), {}, []
+
+    def get_many(self, z, xys):
+        return {k: dict(self.states[k]) for k in xys if k in self.states}
+
+    def seed_age(self, z, x, y):
+        return None
+
+    def set_demand(self, z, demand, now, data_at=None):
+        for k, d in demand.items():
+            self.states.setdefault(k, {})["demand"] = d
+
+    def claim(self, z, x, y, now, lease):
+        if (x, y) in self.leased:
+            return False
+        self.leased.add((x, y))
+        return True
+
+    def done(self, z, x, y, now, ok, stats=None):
+        self.leased.discard((x, y))
+        self.results[(x, y)] = ok
+
+    def release(self, z, x, y):
+        self.leased.discard((x, y))
+        self.released.append((x, y))
+
+
+def _setup(monkeypatch, demand_rows, states=None, outcome=None):
+    store, calls = Tiles(states), {"tiles": [], "wiki": []}
+    for fn in ("get_many", "seed_age", "set_demand", "claim", "done", "release"):
+        monkeypatch.setattr(refresher.area_tile, fn, getattr(store, fn))
+    monkeypatch.setattr(refresher.area_tile, "key", lambda z, x, y: f"{z}/{x}/{y}")
+    monkeypatch.setattr(refresher, "get_settings", lambda: S)
+    monkeypatch.setattr(refresher.usage_log, "nearby_demand", lambda since: demand_rows)
+
+    async def fake_tile(z, x, y, profile, budget, now):
+        calls["tiles"].append(((x, y), budget, admission.current_priority()))
+        r = (outcome or {}).get((x, y), "ok")
+        if r == "busy":
+            raise admission.Overloaded("overpass")
+        if r == "boom":
+            raise RuntimeError("boom")
+        return {"ok": r == "ok", "pois": 3, "new": 2, "enriched": 2 if r == "ok" else 0}
+
+    async def fake_wiki(limit=500, max_age=None):
+        calls["wiki"].append(limit)
+        return {"checked": limit, "changed": 0}
+
+    monkeypatch.setattr(refresher, "refresh_tile", fake_tile)
+    monkeypatch.setattr(refresher.wiki_service, "refresh_stale", fake_wiki)
+    return store, calls
+
+
+def test_giro_entro_i_budget(monkeypatch):
+    demand = [rows(PANTHEON, 30), rows(DUOMO, 10), rows(BRERA, 5)]
+    store, calls = _setup(monkeypatch, demand)
+    stats = asyncio.run(refresher.run_once(NOW))
+    # budget Overpass: 2 tile, le più richieste, a priorità bassa
+    assert [c[0] for c in calls["tiles"]] == [xy(PANTHEON), xy(DUOMO)]
+    assert {c[2] for c in calls["tiles"]} == {admission.LOW}
+    assert stats["refreshed"] == 2 and stats["enriched"] == 4
+    # budget Wikipedia: quel che resta dopo l'arricchimento dei POI nuovi
+    assert [c[1] for c in calls["tiles"]] == [10, 8] and calls["wiki"] == [6]
+    assert store.results == {xy(PANTHEON): True, xy(DUOMO): True} and not store.leased
+
+
+def test_tile_in_lavorazione_e_errori(monkeypatch):
+    demand = [rows(PANTHEON, 30), rows(DUOMO, 10), rows(BRERA, 5)]
+    store, calls = _setup(monkeypatch, demand, outcome={xy(DUOMO): "boom"})
+    store.leased.add(xy(PANTHEON))                                   # la sta facendo un altro worker
+    stats = asyncio.run(refresher.run_once(NOW))
+    assert stats["refreshed"] == 1 and stats["failed"] == 1
+    assert store.results == {xy(DUOMO): False, xy(BRERA): True}
+
+
+def test_provider_sotto_carico_interrompe_il_giro(monkeypatch):
+    demand = [rows(PANTHEON, 30), rows(DUOMO, 10)]
+    store, calls = _setup(monkeypatch, demand, outcome={xy(PANTHEON): "busy"})
+    stats = asyncio.run(refresher.run_once(NOW))
+    assert stats["busy"] == 1 and len(calls["tiles"]) == 1
+    assert store.released == [xy(PANTHEON)] and store.results == {}              # nessun backoff
+
+
+def test_tile_copre_la_tile_intera():
+    x, y = xy(PANTHEON)
+    lat, lon, r = tiles.circle(Z, x, y)
+    assert tiles.tile_of(Z, lon, lat) == (x, y)
+    w, s, e, n = tiles.bounds(Z, x, y)
+    assert all(tiles._dist_m(lat, lon, la, lo) <= r + 0.01 for la, lo in ((s, w), (n, e)))
+    assert (x, y) in tiles.intersecting(Z, *PANTHEON, 200) and len(tiles.intersecting(Z, lat, lon, 10)) == 1
@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+from src.utils import rollup
+
+T = datetime(2025, 8, 14, 10, 5, 30, tzinfo=timezone.utc)
+
+def test_fold_counts_per_bucket():
+    evs = [
+        {"event": "poi.nearby", "ts": T, "platform": "ios", "network": "wifi", "latency_ms": 120},
+        {"event": "poi.nearby", "ts": T, "platform": "android", "latency_ms": 40, "poi_id": "abc"},
+        {"event": "app.open", "ts": T.replace(minute=59)},
+    ]
+    out = rollup.fold(evs)
+    m = out["m:2025-08-14T10:05"]["inc"]
+    h = out["h:2025-08-14T10:00"]["inc"]
+    assert m["total"] == 2 and h["total"] == 3
+    assert m["events.poi:nearby.platform.ios"] == 1
+    assert m["events.poi:nearby.network.unknown"] == 1
+    assert "pois.abc" not in m and h["pois.abc"] == 1
+
+def test_percentiles_from_histogram():
+    evs = [{"event": "poi.view", "ts": T, "latency_ms": ms} for ms in range(1, 1001)]
+    inc = rollup.fold(evs, grans=("h",))["h:2025-08-14T10:00"]["inc"]
+    doc = {"events": {"poi:view": {"n": inc["events.poi:view.n"],
+                                   "lat": {k.rsplit(".", 1)[1]: v for k, v in inc.items() if ".lat." in k}}}}
+    s = rollup.summarize([doc])
+    lat = s["events"]["poi.view"]["latency_ms"]
+    assert s["total"] == 1000
+    assert 400 <= lat["p50"] <= 600
+    assert 900 <= lat["p95"] <= 1000 and lat["p95"] <= lat["p99"]
+
+def test_percentile_empty():
+    assert rollup.percentile([0] * 5, .5) is None
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.models import poi as poi_model
+from src.utils import poipack, tiles
+
+# tile z15 che contiene il Pantheon (41.8986, 12.4769)
+Z, X, Y = 15, 17519, 12176
+
+
+def test_bounds_e_contains():
+    w, s, e, n = tiles.bounds(Z, X, Y)
+    assert w < 12.4769 < e and s < 41.8986 < n
+    assert tiles.bounds(0, 0, 0) == pytest.approx((-180, -tiles.MERCATOR_MAX_LAT, 180, tiles.MERCATOR_MAX_LAT))
+    # i bordi condivisi appartengono a una sola delle due tile
+    assert tiles.contains(Z, X, Y, w, n) and not tiles.contains(Z, X, Y, e, n)
+    assert tiles.contains(Z, X + 1, Y, e, n)
+    assert not tiles.contains(Z, X, Y, w, s) and tiles.contains(Z, X, Y + 1, w, s)
+    ring = tiles.polygon(Z, X, Y)["coordinates"][0]
+    assert ring[0] == ring[-1] and len(ring) == 5
+
+
+def test_valid():
+    assert tiles.valid(2, 3, 3) and not tiles.valid(2, 4, 0) and not tiles.valid(2, 0, -1)
+    assert not tiles.valid(-1, 0, 0) and not tiles.valid(10**9, 0, 0)
+
+
+def test_in_tile_bordi_nella_query_e_limit_lato_server(monkeypatch):
+    w, s, e, n = tiles.bounds(Z, X, Y)
+    edge = [{"_id": i, "location": {"coordinates": [e, n]}} for i in range(3)]        # bordo est: tile accanto
+    inside = [{"_id": 10 + i, "location": {"coordinates": [12.4769, 41.8986]}} for i in range(3)]
+    limits = []
+
+    def match(q, d):
+        lon, lat = d["location"]["coordinates"]
+        lo, la = q["location.coordinates.0"], q["location.coordinates.1"]
+        return lo["$gte"] <= lon < lo["$lt"] and la["$gt"] < lat <= la["$lte"]
+
+    class Cur:
+        def __init__(self, docs): self.docs = docs
+        def sort(self, *a): return self
+        def limit(self, k):
+            limits.append(k)
+            return self.docs[:k]
+
+    monkeypatch.setattr(poi_model, "_geo", type("G", (), {"find": lambda self, q, p: Cur([d for d in edge + inside if match(q, d)])})())
+    assert [d["_id"] for d in poi_model.in_tile(Z, X, Y, {}, 2)] == [10, 11, 12]      # 2 + 1 = troncata
+    assert len(poi_model.in_tile(Z, X, Y, {}, 5)) == 3 and limits == [3, 6]
+
+
+@pytest.mark.parametrize("z", [-1, 99999999])
+def test_zoom_fuori_range(z):
+    assert TestClient(app).get(f"/v1/tiles/{z}/0/0").status_code == 400
+
+
+def _poi(i):
+    return {"_id": ObjectId(f"{i:024x}"), "name": {"it": f"P{i}"},
+            "location": {"type": "Point", "coordinates": [12.4769, 41.8986]},
+            "updated_at": datetime(2024, 1, i + 1, tzinfo=timezone.utc)}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+    def fake(z, x, y, proj, limit):
+        calls.append((z, x, y))
+        return [_poi(i) for i in range(3)]
+    monkeypatch.setattr(poi_model, "in_tile", fake)
+    return TestClient(app), calls
+
+
+def test_tile_cacheabile(client):
+    c, _ = client
+    r = c.get(f"/v1/tiles/{Z}/{X}/{Y}")
+    assert r.status_code == 200
+    body = r.json()
+    assert [p["name"]["it"] for p in body["pois"]] == ["P0", "P1", "P2"]
+    assert "updated_at" not in body["pois"][0] and body["truncated"] is False and r.headers["x-tile-truncated"] == "0"
+    assert "public" in r.headers["cache-control"] and "s-maxage=" in r.headers["cache-control"]
+    assert c.get(f"/v1/tiles/{Z}/{X}/{Y}").headers["etag"] == r.headers["etag"]
+    r2 = c.get(f"/v1/tiles/{Z}/{X}/{Y}", headers={"if-none-match": r.headers["etag"]})
+    assert r2.status_code == 304 and "s-maxage=" in r2.headers["cache-control"]
+
+
+def test_tile_fuori_range(client):
+    c, calls = client
+    assert c.get("/v1/tiles/3/8/0").status_code == 400
+    assert c.get("/v1/tiles/5/1/1").status_code == 400  # zoom troppo basso
+    assert calls == []
+
+
+def test_tile_formato_binario(client):
+    c, _ = client
+    js = c.get(f"/v1/tiles/{Z}/{X}/{Y}")
+    r = c.get(f"/v1/tiles/{Z}/{X}/{Y}", headers={"accept": poipack.MEDIA_TYPE})
+    assert r.headers["content-type"] == poipack.MEDIA_TYPE and r.headers["vary"] == "Accept"
+    assert r.headers["etag"] != js.headers["etag"]
+    assert [p["name"] for p in poipack.decode(r.content)] == ["P0", "P1", "P2"]
+
+
+def test_tile_compressa_mantiene_vary(client, monkeypatch):
+    c, _ = client
+    monkeypatch.setattr(poi_model, "in_tile", lambda *a: [_poi(i % 28) for i in range(60)])
+    r = c.get(f"/v1/tiles/{Z}/{X}/{Y}", headers={"accept-encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept, Accept-Encoding"
@@ -0,0 +1,164 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from src.services import wiki_service
+
+T0 = datetime(2026, 5, 1, 12, 0, 0)
+
+
+class WikiStandIn:
+    """API Wikipedia locale: revisioni e estratti da `self.pages`, registra le chiamate."""
+
+    def __init__(self):
+        self.pages = {"Colosseo": [1, 100, "Anfiteatro Flavio."], "Roma": [2, 200, "Capitale d'Italia."]}
+        self.calls = []
+
+    async def start(self):
+        async def api(req):
+            q = req.query
+            titles = q.get("titles", "").split("|")
+            self.calls.append((q.get("prop") or q.get("list"), titles))
+            if q.get("list") == "search":
+                return web.json_response({"query": {"search": [{"title": t} for t in self.pages]}})
+            out = []
+            for t in titles:
+                p = self.pages.get(t)
+                if p is None:
+                    out.append({"title": t, "missing": True})
+                    continue
+                page = {"pageid": p[0], "title": t, "revisions": [{"revid": p[1]}]}
+                if "extracts" in q.get("prop", ""):
+                    page["extract"] = p[2]
+                out.append(page)
+            return web.json_response({"query": {"pages": out}})
+        app = web.Application()
+        app.router.add_get("/{lang}/w/api.php", api)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}" + "/{lang}/w/api.php"
+        return self
+
+    def extracts(self):
+        return [c for c in self.calls if c[0] == "extracts|revisions"]
+
+    def revisions(self):
+        return [c for c in self.calls if c[0] == "revisions"]
+
+
+class Store:
+    """wiki_page, poi_doc.replace_text e narration_cache in memoria."""
+
+    def __init__(self):
+        self.pages, self.replaced, self.invalidated = {}, [], []
+        self.lost = set()                      # titoli il cui blob è stato spazzato
+
+    def get_many(self, lang, titles):
+        return {t: dict(self.pages[(lang, t)]) for t in titles if (lang, t) in self.pages}
+
+    def text_of(self, entries):
+        return {e["title"]: e["text"] for e in entries if e["title"] not in self.lost}
+
+    def without_blob(self, entries):
+        return [e["title"] for e in entries if e["title"] in self.lost]
+
+    def save(self, lang, title, pageid, revid, text, now):
+        self.pages[(lang, title)] = {"lang": lang, "title": title, "pageid": pageid, "revid": revid,
+                                     "text": text, "checked_at": now}
+        self.lost.discard(title)
+
+    def touch(self, lang, titles, now):
+        for t in titles:
+            self.pages[(lang, t)]["checked_at"] = now
+
+    def stale(self, before, limit=500):
+        return [p for p in self.pages.values() if p["checked_at"] < before][:limit]
+
+
+@pytest.fixture
+def env(monkeypatch):
+    store, api = Store(), WikiStandIn()
+    for fn in ("get_many", "text_of", "without_blob", "save", "touch", "stale"):
+        monkeypatch.setattr(wiki_service.wiki_page, fn, getattr(store, fn))
+    monkeypatch.setattr(wiki_service.poi_doc, "replace_text",
+                        lambda url, text, now=None: store.replaced.append((url, text)) or ["poi-a", "poi-b"])
+    monkeypatch.setattr(wiki_service.narration_cache, "invalidate_pois",
+                        lambda ids: store.invalidated.append(list(ids)) or len(ids))
+
+    def run(body):
+        async def go():
+            await api.start()
+            monkeypatch.setattr(wiki_service, "WIKI_API_URL", api.url)
+            try:
+                async with aiohttp.ClientSession() as s:
+                    return await body(s)
+            finally:
+                await api.runner.cleanup()
+        return asyncio.run(go())
+    return store, api, run
+
+
+def test_estratti_solo_per_pagine_nuove_o_cambiate(env):
+    store, api, run = env
+    titles = ["Colosseo", "Roma"]
+    out = run(lambda s: wiki_service.pages(s, "it", titles, T0, max_age=3600))
+    assert out == {"Colosseo": "Anfiteatro Flavio.", "Roma": "Capitale d'Italia."} and len(api.extracts()) == 2
+
+    # ancora fresche: nessuna chiamata
+    run(lambda s: wiki_service.pages(s, "it", titles, T0 + timedelta(minutes=30), max_age=3600))
+    assert len(api.calls) == 2
+
+    # scadute ma invariate: un solo batch di revid, niente estratti
+    later = T0 + timedelta(hours=2)
+    out = run(lambda s: wiki_service.pages(s, "it", titles, later, max_age=3600))
+    assert out["Roma"] == "Capitale d'Italia." and len(api.extracts()) == 2
+    assert api.revisions() == [("revisions", ["Colosseo", "Roma"])]
+    assert store.pages[("it", "Roma")]["checked_at"] == later and store.replaced == []
+
+
+def test_pagina_cambiata_aggiorna_doc_e_invalida_narrazioni(env):
+    store, api, run = env
+    run(lambda s: wiki_service.pages(s, "it", ["Colosseo", "Roma"], T0, max_age=3600))
+    api.pages["Colosseo"] = [1, 101, "Anfiteatro Flavio, restaurato."]
+    out = run(lambda s: wiki_service.pages(s, "it", ["Colosseo", "Roma"], T0 + timedelta(hours=2), max_age=3600))
+    assert out["Colosseo"] == "Anfiteatro Flavio, restaurato." and store.pages[("it", "Colosseo")]["revid"] == 101
+    assert [c[1] for c in api.extracts()][-1] == ["Colosseo"]                 # solo la pagina cambiata
+    assert store.replaced == [("https://it.wikipedia.org/wiki/Colosseo", "Anfiteatro Flavio, restaurato.")]
+    assert store.invalidated == [["poi-a", "poi-b"]]
+
+
+def test_batch_revisioni(env, monkeypatch):
+    store, api, run = env
+    monkeypatch.setattr(wiki_service, "REVISION_BATCH", 2)
+    api.pages.update({f"P{i}": [10 + i, 1000 + i, f"testo {i}"] for i in range(3)})
+    revs = run(lambda s: wiki_service.latest_revisions(s, "it", ["Colosseo", "Roma", "P0", "P1", "P2", "Sparita"]))
+    assert len(api.revisions()) == 3 and "Sparita" not in revs and revs["P2"] == (12, 1002)
+
+
+def test_refresh_stale(env):
+    store, api, run = env
+    old = datetime.utcnow() - timedelta(days=2)
+    run(lambda s: wiki_service.pages(s, "it", ["Colosseo", "Roma"], old, max_age=3600))
+    api.pages["Roma"] = [2, 201, "Capitale."]
+    stats = run(lambda s: wiki_service.refresh_stale(max_age=3600))
+    assert stats == {"checked": 2, "changed": 1} and store.pages[("it", "Roma")]["text"] == "Capitale."
+
+
+def test_blob_spazzato_si_riscarica(env):
+    store, api, run = env
+    run(lambda s: wiki_service.pages(s, "it", ["Colosseo", "Roma"], T0, max_age=3600))
+    store.lost.add("Roma")                                                    # voce fresca, blob cancellato
+    out = run(lambda s: wiki_service.pages(s, "it", ["Colosseo", "Roma"], T0 + timedelta(minutes=5), max_age=3600))
+    assert out == {"Colosseo": "Anfiteatro Flavio.", "Roma": "Capitale d'Italia."}
+    assert [c[1] for c in api.extracts()][-1] == ["Roma"] and not store.lost
+
+    store.lost.add("Colosseo")                                                # revid invariato: lo ripara il job
+    store.pages[("it", "Colosseo")]["checked_at"] = store.pages[("it", "Roma")]["checked_at"] = datetime.utcnow() - timedelta(days=1)
+    stats = run(lambda s: wiki_service.refresh_stale(max_age=3600))
+    assert stats == {"checked": 2, "changed": 0} and [c[1] for c in api.extracts()][-1] == ["Colosseo"]
+    assert not store.lost and store.replaced == []